@@ -0,0 +1,201 @@
+"""
+allocation.py
+Shared-cost allocation (IT / HR / facilities → operating cost centers) before calculate_variance:
+- a driver table gives one quantity per cost center and driver (headcount, square metres, tickets ...),
+  wide (Cost Center + one column per driver) or long (Cost Center / Driver / Value)
+- rules map each service cost center to its driver, in step-down order: {"IT": "Tickets", "HR": "Headcount"}
+- the drivers become one share matrix A (service → receiver, rows sum to 1); the cost pools of every
+  Version / Scenario / Month group are solved together as one linear system (I - A_ssᵀ) T = C with
+  np.linalg.solve, and the operating centers receive A_spᵀ T:
+    direct      : services allocate to operating centers only (A_ss = 0 → T = C)
+    step_down   : each service also allocates to the services after it (A_ss strictly upper triangular)
+    reciprocal  : services allocate to each other as the drivers say (full A_ss)
+Service rows leave the ledger and each operating center gets one "Allocated" row per group, so the
+allocated Planned / Actual flow into every existing report; totals are preserved exactly.
+Actual is allocated in the group currency (Actual × FX Rate); allocated rows carry FX Rate 1.
+Cost center codes are matched as text (hierarchy.cost_center_keys), so numeric codes read by
+read_excel as int64 / float64 match the driver table and the rules.
+"""
+
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import Dict, List, Mapping, Sequence, Union
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .hierarchy import cost_center_keys
+except ImportError:
+    from hierarchy import cost_center_keys
+
+ALLOCATION_METHODS = ("direct", "step_down", "reciprocal")
+GROUP_COLUMNS = ("Entity", "Version", "Scenario", "Month")
+COST_TYPE_COLUMN = "Cost Type"
+
+
+@dataclass
+class AllocationResult:
+    frame: pd.DataFrame
+    method: str
+    services: List[Dict] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        return {"method": self.method, "rows": int(len(self.frame)), "services": self.services}
+
+
+# ---------- inputs ----------
+
+def read_driver_table(content: bytes, filename: str) -> pd.DataFrame:
+    ext = os.path.splitext(filename.lower())[1]
+    if ext == ".csv":
+        raw = pd.read_csv(BytesIO(content))
+    elif ext in (".xlsx", ".xls"):
+        raw = pd.read_excel(BytesIO(content), engine="openpyxl")
+    elif ext == ".parquet":
+        raw = pd.read_parquet(BytesIO(content))
+    else:
+        raise ValueError(f"unsupported driver table format: {filename!r} (expected .csv, .xlsx, .parquet)")
+    return normalize_drivers(raw)
+
+
+def normalize_drivers(raw: pd.DataFrame) -> pd.DataFrame:
+    """→ index = Cost Center, คอลัมน์ = driver (float, ไม่มีค่า = 0)"""
+    if "Cost Center" not in raw.columns:
+        raise ValueError(f"driver table needs a Cost Center column; found {list(raw.columns)}")
+    cc = cost_center_keys(raw["Cost Center"])
+    if {"Driver", "Value"} <= set(raw.columns):
+        long = pd.DataFrame({"Cost Center": cc, "Driver": raw["Driver"].astype(str).str.strip(),
+                             "Value": pd.to_numeric(raw["Value"], errors="coerce")})
+        table = long.pivot_table(index="Cost Center", columns="Driver", values="Value", aggfunc="sum")
+    else:
+        values = raw.drop(columns=["Cost Center"]).apply(pd.to_numeric, errors="coerce")
+        table = values.groupby(cc.to_numpy()).sum(min_count=1)
+    table = table.dropna(axis=1, how="all").fillna(0.0).astype(float)
+    if table.empty or not len(table.columns):
+        raise ValueError("driver table has no numeric driver columns")
+    if (table.to_numpy() < 0).any():
+        raise ValueError("driver quantities must not be negative")
+    table.index.name = "Cost Center"
+    table.columns = [str(c) for c in table.columns]
+    return table
+
+
+def parse_rules(spec: Union[str, Sequence[str]]) -> Dict[str, str]:
+    """"IT=Tickets,HR=Headcount" (หรือ list) → {service: driver} ตามลำดับ step-down"""
+    items = spec.split(",") if isinstance(spec, str) else [p for s in spec for p in s.split(",")]
+    rules: Dict[str, str] = {}
+    for item in items:
+        if not item.strip():
+            continue
+        service, sep, driver = item.partition("=")
+        if not sep or not service.strip() or not driver.strip():
+            raise ValueError(f"allocation rule {item.strip()!r} must look like 'Service=Driver'")
+        if service.strip() in rules:
+            raise ValueError(f"service {service.strip()!r} has more than one rule")
+        rules[service.strip()] = driver.strip()
+    if not rules:
+        raise ValueError("no allocation rules given")
+    return rules
+
+
+# ---------- matrix ----------
+
+def share_matrix(drivers: pd.DataFrame, rules: Mapping[str, str], method: str):
+    """
+    A (service × receiver) ตาม method — คืน (A, centers, n_services); receivers = services ตามลำดับ rules
+    แล้วตามด้วย operating centers (cost center ใน driver table ที่ไม่ใช่ service)
+    """
+    if method not in ALLOCATION_METHODS:
+        raise ValueError(f"method must be one of {', '.join(ALLOCATION_METHODS)}")
+    services = list(rules)
+    operating = [c for c in drivers.index if c not in rules]
+    if not operating:
+        raise ValueError("driver table has no operating (non-service) cost centers")
+    centers = services + operating
+    table = drivers.reindex(centers, fill_value=0.0)
+
+    s = len(services)
+    shares = np.zeros((s, len(centers)))
+    for i, (service, driver) in enumerate(rules.items()):
+        if driver not in table.columns:
+            raise ValueError(f"driver {driver!r} (for {service!r}) not in driver table; found {list(table.columns)}")
+        w = table[driver].to_numpy(copy=True)
+        if method == "direct":
+            w[:s] = 0.0
+        elif method == "step_down":
+            w[:i + 1] = 0.0           # ไม่ย้อนกลับไป service ที่ปันไปแล้ว (และตัวเอง)
+        else:
+            w[i] = 0.0
+        total = w.sum()
+        if total <= 0:
+            raise ValueError(f"service {service!r}: driver {driver!r} is zero for every receiver")
+        shares[i] = w / total
+    return shares, centers, s
+
+
+def allocate_costs(df: pd.DataFrame, drivers: pd.DataFrame, rules: Mapping[str, str],
+                   method: str = "reciprocal") -> AllocationResult:
+    """
+    ปันส่วนต้นทุน service → operating centers (ก่อน calculate_variance)
+    df ต้องมี Cost Center / Planned / Actual (FX Rate ถ้ามี); ทุกกลุ่ม (GROUP_COLUMNS ที่มี) แก้สมการครั้งเดียว
+    """
+    shares, centers, s = share_matrix(drivers, rules, method)
+    services = centers[:s]
+
+    cc = cost_center_keys(df["Cost Center"])
+    service_code = pd.Index(services).get_indexer(cc)
+    is_service = service_code >= 0
+    by = [c for c in GROUP_COLUMNS if c in df.columns]
+    if by:
+        group_code = df.groupby(by, dropna=False, sort=False).ngroup().to_numpy()
+    else:
+        group_code = np.zeros(len(df), dtype=np.int64)
+    n_groups = int(group_code.max()) + 1 if len(df) else 0
+
+    actual = pd.to_numeric(df["Actual"], errors="coerce").fillna(0.0).to_numpy(float)
+    if "FX Rate" in df.columns:
+        actual = actual * pd.to_numeric(df["FX Rate"], errors="coerce").fillna(1.0).to_numpy(float)
+    planned = pd.to_numeric(df["Planned"], errors="coerce").fillna(0.0).to_numpy(float)
+
+    # C: (service, group × [Planned, Actual]) — ต้นทุนตรงของ service ในแต่ละกลุ่ม
+    flat = service_code[is_service] * n_groups + group_code[is_service]
+    size = s * n_groups
+    costs = np.stack([np.bincount(flat, weights=v[is_service], minlength=size).reshape(s, n_groups)
+                      for v in (planned, actual)], axis=2).reshape(s, 2 * n_groups)
+
+    a_ss, a_sp = shares[:, :s], shares[:, s:]
+    try:
+        totals = np.linalg.solve(np.eye(s) - a_ss.T, costs)      # T = C + A_ssᵀ T
+    except np.linalg.LinAlgError:
+        raise ValueError("services only allocate to each other (no share reaches an operating center)")
+    received = (a_sp.T @ totals).reshape(len(centers) - s, n_groups, 2)
+
+    op_idx, grp_idx = np.nonzero(np.abs(received).sum(axis=2) > 0)
+    alloc = pd.DataFrame({"Cost Center": np.asarray(centers[s:], dtype=object)[op_idx]})
+    if by:
+        first = np.unique(group_code, return_index=True)[1]
+        keys = df[by].iloc[first].reset_index(drop=True)
+        for col in by:
+            alloc[col] = keys[col].to_numpy()[grp_idx]
+    alloc["Planned"] = received[op_idx, grp_idx, 0]
+    alloc["Actual"] = received[op_idx, grp_idx, 1]
+    alloc["FX Rate"] = 1.0
+    alloc[COST_TYPE_COLUMN] = "Allocated"
+
+    # รหัสที่ normalize แล้วเขียนกลับ → แถว Direct กับ Allocated ของ cost center เดียวกันรวมกลุ่มกันได้
+    kept = df.loc[~is_service].assign(**{"Cost Center": cc[~is_service], COST_TYPE_COLUMN: "Direct"})
+    if "FX Rate" not in kept.columns:
+        kept["FX Rate"] = 1.0
+    frame = pd.concat([kept, alloc], ignore_index=True, sort=False)
+
+    costs = costs.reshape(s, n_groups, 2).sum(axis=1)
+    pooled = totals.reshape(s, n_groups, 2).sum(axis=1)
+    report = [
+        {"cost_center": svc, "driver": rules[svc],
+         "direct_planned": float(costs[i, 0]), "direct_actual": float(costs[i, 1]),
+         "pool_planned": float(pooled[i, 0]), "pool_actual": float(pooled[i, 1])}
+        for i, svc in enumerate(services)
+    ]
+    return AllocationResult(frame, method, report)
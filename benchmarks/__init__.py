@@ -0,0 +1,22 @@
+"""
+benchmarks
+Reproducible performance suite (correctness lives in tests/):
+- synthetic : seeded budget ledgers shaped like template/budget_plus_input_template.xlsx
+- micro     : calculate_variance / summarize_variance / suggest_as_dict / scenarios / alerts /
+              PDF + Excel generators, plus the budget_premium generators
+- endpoints : end-to-end uploads through both ASGI apps (in-process TestClient)
+- scaling   : parallel_agg (shared-memory shards) over 1..N workers vs the pandas path
+- runner    : timing, JSON results and baseline comparison
+
+    python -m benchmarks micro --rows 50000 --out results.json
+    python -m benchmarks all --rows 50000 --compare baseline.json --tolerance 0.25
+    python -m benchmarks scaling --rows 2000000 --workers 1,2,4,8
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+for _p in (ROOT.parent, ROOT):   # budget_plus.* และ budget_premium.* (เหมือน bench_formatting.py)
+    if str(_p) not in sys.path:
+        sys.path.insert(0, str(_p))
@@ -0,0 +1,62 @@
+"""
+python -m benchmarks {micro,endpoints,scaling,all} [--rows N] [--repeat R] [--out results.json]
+                     [--compare baseline.json --tolerance 0.2]
+scaling: parallel_agg over --workers 1,2,4,... (not part of "all": it is sized for multi-core nodes).
+Exit code 1 when a case errors, or when --compare finds a regression (median slower than
+baseline × (1 + tolerance)) or a baseline case that is now skipped / failing.
+"""
+
+import argparse
+import sys
+
+from . import endpoints, micro, scaling
+from .runner import compare, environment, load_results, print_comparison, run_cases, write_results
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m benchmarks", description="Budget Plus performance suite")
+    ap.add_argument("suite", choices=("micro", "endpoints", "scaling", "all"))
+    ap.add_argument("--rows", type=int, default=20_000)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--warmup", type=int, default=1)
+    ap.add_argument("--filter", default="", help="run only cases whose name contains this text")
+    ap.add_argument("--app", choices=("plus", "premium"), help="endpoints suite: one app only")
+    ap.add_argument("--workers", help="scaling suite: comma-separated worker counts (default 1,2,4,...,cpu_count)")
+    ap.add_argument("--out", help="write results JSON here (use as the next --compare baseline)")
+    ap.add_argument("--compare", help="baseline results JSON to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown ratio (0.2 = +20%%)")
+    args = ap.parse_args(argv)
+
+    cases = []
+    if args.suite in ("micro", "all"):
+        cases += micro.cases(args.rows, args.seed)
+    if args.suite in ("endpoints", "all"):
+        cases += endpoints.cases(args.rows, args.seed, only=args.app)
+    if args.suite == "scaling":
+        workers = [int(w) for w in args.workers.split(",")] if args.workers else None
+        cases += scaling.cases(args.rows, args.seed, workers)
+    if args.filter:
+        cases = [c for c in cases if args.filter in c.name]
+
+    print(f"{args.suite}: {len(cases)} cases, {args.rows:,} rows, repeat {args.repeat}")
+    results = run_cases(cases, args.repeat, args.warmup)
+    if args.suite == "scaling":
+        scaling.print_curve(results)
+    env = environment(suite=args.suite, rows=args.rows, seed=args.seed, repeat=args.repeat)
+    if args.out:
+        write_results(args.out, env, results)
+        print(f"results → {args.out}")
+
+    failed = [name for name, r in results.items() if "error" in r]
+    if args.compare:
+        baseline = load_results(args.compare)
+        if baseline["env"].get("params", {}).get("rows") != args.rows:
+            print(f"warning: baseline was measured with rows={baseline['env']['params'].get('rows')}", file=sys.stderr)
+        if print_comparison(compare(results, baseline["results"], args.tolerance), args.tolerance):
+            return 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+bench_formatting.py
+Columnar formatters vs. the per-cell functions they replace (same output, checked first).
+
+    python benchmarks/bench_formatting.py --rows 100000 --repeat 5
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+for p in (ROOT.parent, ROOT):   # budget_plus.* และ budget_premium.*
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
+
+from budget_plus.utils.number_format_utils import format_number, format_number_array
+from budget_premium.modules.number_format import (
+    format_currency, format_percent, format_currency_array, format_percent_array,
+)
+
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def cases(values: pd.Series, pct: pd.Series):
+    """(name, per-cell baseline, columnar) — baseline ตรงกับโค้ดเดิมใน /analyze และ add_formatted_columns"""
+    arr, pct_arr = values.to_numpy(), pct.to_numpy()
+    yield ("format_number number", lambda: [format_number(v, "number") for v in arr.tolist()],
+           lambda: format_number_array(arr, "number"))
+    yield ("format_number percent", lambda: [format_number(v, "percent") for v in pct_arr.tolist()],
+           lambda: format_number_array(pct_arr, "percent"))
+    yield ("format_number m", lambda: [format_number(v, "m") for v in arr.tolist()],
+           lambda: format_number_array(arr, "m"))
+    for scale in ("raw", "k", "m"):
+        yield (f"format_currency {scale}", lambda s=scale: values.apply(lambda x: format_currency(x, scale=s, decimals=2)),
+               lambda s=scale: format_currency_array(arr, scale=s, decimals=2))
+    yield ("format_percent", lambda: pct.apply(lambda x: format_percent(x, decimals=1)),
+           lambda: format_percent_array(pct_arr, decimals=1))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    values = pd.Series(rng.normal(0, 5e6, args.rows))
+    pct = pd.Series(rng.normal(0, 0.3, args.rows))
+    values[::97] = np.nan
+
+    print(f"rows={args.rows:,} repeat={args.repeat} (best of)")
+    print(f"{'case':<24}{'per-cell s':>12}{'columnar s':>12}{'speedup':>10}")
+    for name, baseline, columnar in cases(values, pct):
+        if list(baseline()) != columnar().tolist():
+            raise SystemExit(f"output mismatch: {name}")
+        t_base, t_col = _best(baseline, args.repeat), _best(columnar, args.repeat)
+        print(f"{name:<24}{t_base:>12.4f}{t_col:>12.4f}{t_base / t_col:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
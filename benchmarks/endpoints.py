@@ -0,0 +1,84 @@
+"""
+endpoints.py
+End-to-end benchmarks: upload a synthetic workbook through the ASGI apps in-process
+(fastapi TestClient → full middleware / routing / parsing / rendering path, no network).
+The budget_premium upload cache is cleared before each call so /process measures a cold upload.
+"""
+
+from typing import List, Optional, Tuple
+import logging
+
+from .runner import Case
+from .synthetic import generate_ledger, to_xlsx_bytes
+
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# (path, query params)
+PLUS_ENDPOINTS: List[Tuple[str, dict]] = [
+    ("/analyze", {}),
+    ("/analyze", {"format": "columnar", "raw": "true"}),
+    ("/analyze", {"stream": "ndjson"}),
+    ("/analyze-suggest", {}),
+    ("/download-report", {}),
+    ("/download-report", {"format": "parquet"}),
+    ("/download-pdf", {}),
+    ("/export-excel-exec", {}),
+    ("/report-exec", {}),
+]
+PREMIUM_ENDPOINTS: List[Tuple[str, dict]] = [
+    ("/process", {"limit": 50}),
+    ("/download-excel", {"scale": "k"}),
+    ("/download-pdf", {"scale": "k"}),
+]
+
+
+def _label(app: str, path: str, params: dict) -> str:
+    query = "&".join(f"{k}={v}" for k, v in params.items())
+    return f"{app} POST {path}" + (f"?{query}" if query else "")
+
+
+def _client(app_name: str):
+    from fastapi.testclient import TestClient
+    logging.getLogger("httpx").setLevel(logging.WARNING)   # ไม่ log ทุก request ระหว่างจับเวลา
+    if app_name == "plus":
+        from budget_plus.main import app
+    else:
+        from budget_premium.main import app
+    return TestClient(app)
+
+
+def _post(client, path: str, params: dict, content: bytes, before=None):
+    if before is not None:
+        before()
+    r = client.post(path, params=params, files={"file": ("ledger.xlsx", content, XLSX)})
+    if r.status_code != 200:
+        raise RuntimeError(f"{path} → HTTP {r.status_code}: {r.text[:200]}")
+    return len(r.content)
+
+
+def cases(rows: int, seed: int = 42, only: Optional[str] = None) -> List[Case]:
+    content_cache = {}
+
+    def content():
+        if "xlsx" not in content_cache:
+            content_cache["xlsx"] = to_xlsx_bytes(generate_ledger(rows=rows, seed=seed))
+        return content_cache["xlsx"]
+
+    out: List[Case] = []
+    for app_name, endpoints in (("plus", PLUS_ENDPOINTS), ("premium", PREMIUM_ENDPOINTS)):
+        if only and only != app_name:
+            continue
+        for path, params in endpoints:
+            def setup(app_name=app_name):
+                return _client(app_name), content()
+
+            def run(arg, path=path, params=params, app_name=app_name):
+                client, data = arg
+                before = None
+                if app_name == "premium":
+                    from budget_premium.modules import upload_cache
+                    before = upload_cache.clear
+                return _post(client, path, params, data, before)
+
+            out.append(Case(_label(app_name, path, params), run, setup))
+    return out
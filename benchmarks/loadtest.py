@@ -0,0 +1,282 @@
+"""
+loadtest.py
+Local load test: start the app under uvicorn (optionally several workers), replay a weighted
+mix of uploads at each concurrency level and report per endpoint: throughput, p50/p95/p99
+latency, error rate (by status code), plus server RSS (all worker processes) over time.
+
+    python -m benchmarks.loadtest --workers 2 --concurrency 1,4,8 --duration 30 \\
+        --mix analyze=6,download-pdf=2,export-excel-exec=1,report-exec=1 --rows 1000,20000 --out load.json
+    python -m benchmarks.loadtest --url http://staging:8000 ...   # existing server, no RSS sampling
+Each virtual user uploads its own copy of the workbook (one Planned cell differs), so concurrent
+requests are independent load: identical uploads would share one parse / render on the server
+(utils/singleflight.py). --same-payload sends byte-identical workbooks to measure that coalescing.
+"""
+
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from . import ROOT
+from .runner import environment
+from .synthetic import generate_ledger, to_xlsx_bytes
+
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+DEFAULT_MIX = "analyze=6,download-pdf=2,export-excel-exec=1,report-exec=1"
+RSS_SAMPLE_SECONDS = 0.5
+
+
+def parse_mix(text: str) -> List[Tuple[str, float]]:
+    """'analyze=6,report-exec=1' → [("/analyze", 6.0), ("/report-exec", 1.0)]"""
+    mix = []
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        name, _, weight = part.partition("=")
+        mix.append(("/" + name.strip().lstrip("/"), float(weight or 1)))
+    if not mix or sum(w for _, w in mix) <= 0:
+        raise ValueError(f"empty request mix: {text!r}")
+    return mix
+
+
+def percentiles(latencies: List[float]) -> Dict[str, Optional[float]]:
+    if not latencies:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {"p50_ms": round(p50 * 1000, 1), "p95_ms": round(p95 * 1000, 1),
+            "p99_ms": round(p99 * 1000, 1), "max_ms": round(max(latencies) * 1000, 1)}
+
+
+# ---------- server process ----------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _children(pid: int) -> List[int]:
+    kids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as f:
+                # field 4 = ppid (ชื่อโปรเซสอยู่ในวงเล็บและอาจมีช่องว่าง)
+                ppid = int(f.read().rsplit(b")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if ppid == pid:
+            kids.append(int(entry))
+    return kids
+
+
+def tree_rss_bytes(pid: int) -> Optional[int]:
+    """RSS รวมของ pid และลูกหลาน (uvicorn --workers = master + worker processes); None ถ้าไม่มี /proc"""
+    if not os.path.isdir("/proc"):
+        return None
+    page = os.sysconf("SC_PAGE_SIZE")
+    total, stack = 0, [pid]
+    while stack:
+        p = stack.pop()
+        try:
+            with open(f"/proc/{p}/statm", "rb") as f:
+                total += int(f.read().split()[1]) * page
+        except (OSError, ValueError, IndexError):
+            continue
+        stack.extend(_children(p))
+    return total
+
+
+class Server:
+    def __init__(self, workers: int, env: Dict[str, str]):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        cmd = [sys.executable, "-m", "uvicorn", "budget_plus.main:app", "--host", "127.0.0.1",
+               "--port", str(self.port), "--workers", str(workers), "--log-level", "warning"]
+        run_env = {**os.environ, **env}
+        run_env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(ROOT.parent), str(ROOT), run_env.get("PYTHONPATH")]))
+        self.proc = subprocess.Popen(cmd, env=run_env, cwd=str(ROOT.parent))
+
+    async def wait_ready(self, client, timeout: float = 60.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {self.proc.returncode}")
+            try:
+                if (await client.get(f"{self.url}/health")).status_code == 200:
+                    return
+            except Exception:
+                pass
+            await asyncio.sleep(0.25)
+        raise TimeoutError("server did not become ready")
+
+    def stop(self):
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+
+# ---------- load phases ----------
+async def _sample_rss(pid: int, t0: float, timeline: List, stop: asyncio.Event):
+    while not stop.is_set():
+        rss = tree_rss_bytes(pid)
+        if rss is not None:
+            timeline.append((round(time.monotonic() - t0, 2), round(rss / 2 ** 20, 1)))
+        try:
+            await asyncio.wait_for(stop.wait(), RSS_SAMPLE_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def user_workbooks(rows: int, users: int, seed: int) -> List[bytes]:
+    """workbook ต่อ virtual user: ข้อมูลเดียวกัน (งานเท่ากัน) แต่ bytes ต่างกัน → server ไม่รวม request"""
+    ledger = generate_ledger(rows=rows, seed=seed)
+    planned = ledger.columns.get_loc("Planned")
+    books = []
+    for u in range(users):
+        df = ledger.copy()
+        df.iat[0, planned] = df.iat[0, planned] + u * 0.01
+        books.append(to_xlsx_bytes(df))
+    return books
+
+
+async def run_phase(client, url: str, mix, workbooks: Dict[int, List[bytes]], concurrency: int,
+                    duration: float, seed: int) -> Dict:
+    rng = random.Random(seed + concurrency)
+    paths, weights = zip(*mix)
+    sizes = sorted(workbooks)
+    samples: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    deadline = time.monotonic() + duration
+
+    async def user(index: int):
+        while time.monotonic() < deadline:
+            path = rng.choices(paths, weights)[0]
+            rows = rng.choice(sizes)
+            key = f"{path} [{rows} rows]"
+            payload = workbooks[rows][index % len(workbooks[rows])]
+            t = time.perf_counter()
+            try:
+                r = await client.post(url + path, files={"file": ("ledger.xlsx", payload, XLSX)})
+                await r.aread()
+                code = str(r.status_code)
+            except Exception as e:
+                code = type(e).__name__
+            elapsed = time.perf_counter() - t
+            statuses[key][code] += 1
+            if code == "200":
+                samples[key].append(elapsed)
+
+    t0 = time.monotonic()
+    await asyncio.gather(*(user(i) for i in range(concurrency)))
+    wall = time.monotonic() - t0
+
+    endpoints = {}
+    for key in sorted(statuses):
+        total = sum(statuses[key].values())
+        ok = statuses[key].get("200", 0)
+        endpoints[key] = {
+            "requests": total,
+            "throughput_rps": round(ok / wall, 2),
+            "error_rate": round(1 - ok / total, 4) if total else 0.0,
+            "status": dict(statuses[key]),
+            **percentiles(samples[key]),
+        }
+    all_ok = [x for v in samples.values() for x in v]
+    total = sum(sum(s.values()) for s in statuses.values())
+    return {
+        "concurrency": concurrency,
+        "wall_s": round(wall, 2),
+        "requests": total,
+        "throughput_rps": round(len(all_ok) / wall, 2),
+        "error_rate": round(1 - len(all_ok) / total, 4) if total else 0.0,
+        **percentiles(all_ok),
+        "endpoints": endpoints,
+    }
+
+
+def print_phase(phase: Dict):
+    print(f"\nconcurrency {phase['concurrency']}: {phase['requests']} requests in {phase['wall_s']} s, "
+          f"{phase['throughput_rps']} req/s, errors {phase['error_rate']:.1%}, "
+          f"p50 {phase['p50_ms']} / p95 {phase['p95_ms']} / p99 {phase['p99_ms']} ms"
+          + (f", peak RSS {phase['rss_peak_mb']} MB" if phase.get("rss_peak_mb") else ""))
+    print(f"  {'endpoint':<40}{'req':>6}{'req/s':>8}{'err':>7}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for key, e in phase["endpoints"].items():
+        print(f"  {key:<40}{e['requests']:>6}{e['throughput_rps']:>8}{e['error_rate']:>7.1%}"
+              f"{e['p50_ms'] or '-':>9}{e['p95_ms'] or '-':>9}{e['p99_ms'] or '-':>9}")
+
+
+async def main_async(args) -> Dict:
+    import httpx
+
+    mix = parse_mix(args.mix)
+    sizes = [int(x) for x in args.rows.split(",") if x]
+    levels = [int(x) for x in args.concurrency.split(",") if x]
+    users = 1 if args.same_payload else max(levels)
+    workbooks = {n: user_workbooks(n, users, args.seed) for n in sizes}
+
+    server = None if args.url else Server(args.workers, {"BUDGET_APP_PROFILE": "full"})
+    url = args.url.rstrip("/") if args.url else server.url
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=max(levels) + 2, max_keepalive_connections=max(levels) + 2)
+    report = {"env": environment(workers=args.workers, url=args.url, mix=args.mix, rows=sizes,
+                                 concurrency=levels, duration=args.duration, seed=args.seed,
+                                 same_payload=args.same_payload),
+              "phases": []}
+    try:
+        async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+            if server:
+                await server.wait_ready(client)
+            t0 = time.monotonic()
+            for level in levels:
+                timeline: List = []
+                stop = asyncio.Event()
+                sampler = asyncio.create_task(_sample_rss(server.proc.pid, t0, timeline, stop)) if server else None
+                phase = await run_phase(client, url, mix, workbooks, level, args.duration, args.seed)
+                if sampler:
+                    stop.set()
+                    await sampler
+                    phase["rss_mb"] = timeline
+                    phase["rss_peak_mb"] = max((mb for _, mb in timeline), default=None)
+                report["phases"].append(phase)
+                print_phase(phase)
+    finally:
+        if server:
+            server.stop()
+    return report
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m benchmarks.loadtest", description="Local load test (uvicorn + httpx)")
+    ap.add_argument("--url", help="test an already running server instead of starting one")
+    ap.add_argument("--workers", type=int, default=1, help="uvicorn --workers")
+    ap.add_argument("--concurrency", default="1,4,8", help="comma-separated concurrency levels (one phase each)")
+    ap.add_argument("--duration", type=float, default=20.0, help="seconds per phase")
+    ap.add_argument("--mix", default=DEFAULT_MIX, help="endpoint=weight,...")
+    ap.add_argument("--rows", default="1000,10000", help="synthetic workbook sizes (picked uniformly)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--same-payload", action="store_true",
+                    help="every user uploads byte-identical workbooks (measures server-side coalescing)")
+    ap.add_argument("--timeout", type=float, default=120.0, help="per-request timeout (s)")
+    ap.add_argument("--out", help="write the report JSON here")
+    args = ap.parse_args(argv)
+
+    report = asyncio.run(main_async(args))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nreport → {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+micro.py
+Function-level benchmarks on a synthetic ledger (frame built once per case, untimed).
+Renderer imports happen inside the cases, so a missing optional package skips only its cases.
+"""
+
+from functools import partial
+from typing import List
+import os
+import tempfile
+
+from .runner import Case
+from .synthetic import generate_ledger
+
+
+def _calc(rows: int, seed: int):
+    from budget_plus.utils.variance_utils import calculate_variance
+    return calculate_variance(generate_ledger(rows=rows, seed=seed))
+
+
+def _excel_v2(df):
+    from budget_plus.excel_dashboard_v2 import generate_excel_dashboard_v2
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        generate_excel_dashboard_v2(df, path, top_n=10)
+    finally:
+        os.remove(path)
+
+
+def _premium_frame(rows: int, seed: int):
+    df = generate_ledger(rows=rows, seed=seed)
+    df["Adjusted Actual"] = df["Actual"] * df["FX Rate"]
+    df["Variance"] = df["Adjusted Actual"] - df["Planned"]
+    return df
+
+
+def cases(rows: int, seed: int = 42) -> List[Case]:
+    raw = partial(generate_ledger, rows=rows, seed=seed)
+    calc = partial(_calc, rows, seed)
+    premium = partial(_premium_frame, rows, seed)
+
+    def variance(df):
+        from budget_plus.utils.variance_utils import calculate_variance
+        return calculate_variance(df)
+
+    def summarize(df):
+        from budget_plus.utils.variance_utils import summarize_variance
+        return summarize_variance(df)
+
+    def suggest(df):
+        from budget_plus.next_actions import suggest_as_dict
+        return suggest_as_dict(df)
+
+    def scenarios(df):
+        from budget_plus.scenarios_alerts import compute_scenarios
+        return compute_scenarios(df)
+
+    def alerts(df):
+        from budget_plus.scenarios_alerts import scan_alerts
+        return scan_alerts(df, pct_threshold=0.08)
+
+    def pdf(df):
+        from budget_plus.pdf_summary import generate_pdf_default
+        return generate_pdf_default(df)
+
+    def premium_pdf(df):
+        from budget_premium.modules.pdf_dashboard import generate_pdf_dashboard
+        return generate_pdf_dashboard(df, scale="k")
+
+    def premium_excel(df):
+        from budget_premium.modules.excel_dashboard import generate_excel_dashboard
+        return generate_excel_dashboard(df, scale="k")
+
+    def premium_format(df):
+        from budget_premium.modules.display_utils import add_formatted_columns
+        return add_formatted_columns(df, money_cols=["Planned", "Actual", "Adjusted Actual", "Variance"], scale="k")
+
+    def premium_next(df):
+        from budget_premium.modules.next_action import recommend_next_actions
+        return recommend_next_actions(df)
+
+    return [
+        Case("plus.calculate_variance", variance, raw),
+        Case("plus.summarize_variance", summarize, calc),
+        Case("plus.suggest_as_dict", suggest, calc),
+        Case("plus.compute_scenarios", scenarios, calc),
+        Case("plus.scan_alerts", alerts, calc),
+        Case("plus.generate_pdf_default", pdf, calc),
+        Case("plus.generate_excel_dashboard_v2", _excel_v2, calc),
+        Case("premium.add_formatted_columns", premium_format, premium),
+        Case("premium.recommend_next_actions", premium_next, premium),
+        Case("premium.generate_pdf_dashboard", premium_pdf, premium),
+        Case("premium.generate_excel_dashboard", premium_excel, premium),
+    ]
@@ -0,0 +1,144 @@
+"""
+runner.py
+Timing, JSON results and baseline comparison shared by the micro and endpoint suites.
+A case is (name, setup, fn): setup() runs once (untimed) and returns fn's argument.
+Results record min / median of `repeat` runs after `warmup` runs; comparisons use the median.
+Only a missing optional third-party package (OPTIONAL_DEPENDENCIES) skips a case; any other
+ImportError — budget_plus / budget_premium not importable, a broken import — is an error, and
+compare() fails a baseline case that is now skipped or errors.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import traceback
+
+from . import ROOT
+
+
+# แพ็กเกจ optional: ไม่ได้ติดตั้ง = ข้าม case ได้ (อย่างอื่น = error)
+OPTIONAL_DEPENDENCIES = ("fpdf", "pyarrow", "pypdf", "orjson", "yaml", "httpx")
+
+
+def _optional_missing(e: ImportError) -> bool:
+    return (e.name or "").split(".")[0] in OPTIONAL_DEPENDENCIES
+
+
+@dataclass
+class Case:
+    name: str
+    fn: Callable[[Any], Any]
+    setup: Optional[Callable[[], Any]] = None
+
+
+def time_case(case: Case, repeat: int = 5, warmup: int = 1) -> Dict:
+    try:
+        arg = case.setup() if case.setup else None
+        for _ in range(warmup):
+            case.fn(arg)
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            case.fn(arg)
+            times.append(time.perf_counter() - t0)
+    except ImportError as e:
+        if _optional_missing(e):   # optional dependency (เช่น fpdf, pyarrow) ไม่ได้ติดตั้ง
+            return {"skipped": f"{type(e).__name__}: {e}"}
+        return {"error": f"{type(e).__name__}: {e}", "trace": traceback.format_exc(limit=3)}
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}", "trace": traceback.format_exc(limit=3)}
+    return {
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "max_s": max(times),
+        "repeat": repeat,
+    }
+
+
+def run_cases(cases: Iterable[Case], repeat: int, warmup: int, verbose: bool = True) -> Dict[str, Dict]:
+    results = {}
+    for case in cases:
+        res = time_case(case, repeat, warmup)
+        results[case.name] = res
+        if verbose:
+            if "median_s" in res:
+                print(f"  {case.name:<44} {res['median_s'] * 1000:10.2f} ms  (min {res['min_s'] * 1000:.2f})")
+            else:
+                print(f"  {case.name:<44} {'skipped' if 'skipped' in res else 'ERROR'}: "
+                      f"{res.get('skipped') or res.get('error')}")
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def environment(**params) -> Dict:
+    import numpy
+    import pandas
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "pandas": pandas.__version__,
+        "numpy": numpy.__version__,
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": params,
+    }
+
+
+def write_results(path: str, env: Dict, results: Dict[str, Dict]):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"env": env, "results": results}, f, indent=2, ensure_ascii=False)
+
+
+def load_results(path: str) -> Dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(current: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float = 0.2) -> List[Dict]:
+    """
+    เทียบ median กับ baseline: ratio > 1 + tolerance = regression, < 1 - tolerance = improvement
+    case ที่ baseline วัดได้แต่รอบนี้ skipped/error = "failed" (ไม่ปล่อยผ่านเงียบๆ)
+    (case ที่ไม่มีในฝั่งใดฝั่งหนึ่ง หรือ baseline เองไม่มี median ไม่นำมาเทียบ)
+    """
+    rows = []
+    for name, cur in current.items():
+        base = baseline.get(name)
+        if not base or "median_s" not in base or base["median_s"] <= 0:
+            continue
+        if "median_s" not in cur:
+            rows.append({"name": name, "baseline_s": base["median_s"], "current_s": None, "ratio": None,
+                         "status": "failed", "reason": cur.get("skipped") or cur.get("error")})
+            continue
+        ratio = cur["median_s"] / base["median_s"]
+        status = "regression" if ratio > 1 + tolerance else "improvement" if ratio < 1 - tolerance else "ok"
+        rows.append({"name": name, "baseline_s": base["median_s"], "current_s": cur["median_s"],
+                     "ratio": round(ratio, 3), "status": status})
+    return rows
+
+
+def print_comparison(rows: List[Dict], tolerance: float) -> int:
+    """พิมพ์ตาราง แล้วคืนจำนวน regression + case ที่ failed (ใช้เป็น exit code ใน CI)"""
+    print(f"\ncompare (tolerance ±{tolerance:.0%}):")
+    for r in rows:
+        if r["status"] == "failed":
+            print(f"  {r['name']:<44} {r['baseline_s'] * 1000:10.2f} → {'FAILED':>10}     {r['reason']}")
+            continue
+        flag = {"regression": "  <-- REGRESSION", "improvement": "  (faster)"}.get(r["status"], "")
+        print(f"  {r['name']:<44} {r['baseline_s'] * 1000:10.2f} → {r['current_s'] * 1000:10.2f} ms  x{r['ratio']:.2f}{flag}")
+    regressions = sum(r["status"] == "regression" for r in rows)
+    failed = sum(r["status"] == "failed" for r in rows)
+    print(f"{regressions} regression(s), {failed} failed", file=sys.stderr if regressions or failed else sys.stdout)
+    return regressions + failed
@@ -0,0 +1,63 @@
+"""
+scaling.py
+Scaling curve of parallel_agg.aggregate (summary + top-K + monthly / per-cost-center alerts)
+over worker counts, against the single-process pandas path it replaces
+(summarize_variance + nlargest + scan_alerts). Worker pools are started during warmup.
+
+    python -m benchmarks scaling --rows 2000000 --workers 1,2,4,8 --out scaling.json
+"""
+
+from functools import partial
+from typing import Dict, List, Optional, Sequence
+import os
+
+from .runner import Case
+from .synthetic import generate_ledger
+
+
+def _calc(rows: int, seed: int):
+    from budget_plus.utils.variance_utils import calculate_variance
+    return calculate_variance(generate_ledger(rows=rows, cost_centers=2_000, seed=seed))
+
+
+def default_workers() -> List[int]:
+    cpus = os.cpu_count() or 1
+    out, w = [], 1
+    while w < cpus:
+        out.append(w)
+        w *= 2
+    return out + [cpus]
+
+
+def cases(rows: int, seed: int = 42, workers: Optional[Sequence[int]] = None) -> List[Case]:
+    calc = partial(_calc, rows, seed)
+
+    def pandas_baseline(df):
+        from budget_plus.utils.variance_utils import summarize_variance
+        from budget_plus.scenarios_alerts import scan_alerts
+        summarize_variance(df)
+        df["Variance"].abs().nlargest(20)
+        scan_alerts(df, pct_threshold=0.08)
+
+    def parallel(w, df):
+        from budget_plus.parallel_agg import aggregate
+        aggregate(df, workers=w, top_k=20).alerts()
+
+    out = [Case("scaling.pandas", pandas_baseline, calc)]
+    for w in workers or default_workers():
+        out.append(Case(f"scaling.parallel_agg.w{w}", partial(parallel, w), calc))
+    return out
+
+
+def print_curve(results: Dict[str, Dict]):
+    """speedup เทียบกับ pandas และกับ parallel_agg 1 worker"""
+    base = results.get("scaling.pandas", {}).get("median_s")
+    one = results.get("scaling.parallel_agg.w1", {}).get("median_s")
+    print(f"  {'case':<28} {'median ms':>10} {'vs pandas':>10} {'vs w1':>8}")
+    for name, res in results.items():
+        if "median_s" not in res:
+            continue
+        t = res["median_s"]
+        vs_base = f"{base / t:.2f}x" if base else "-"
+        vs_one = f"{one / t:.2f}x" if one and name != "scaling.pandas" else "-"
+        print(f"  {name:<28} {t * 1000:10.1f} {vs_base:>10} {vs_one:>8}")
@@ -0,0 +1,135 @@
+"""
+synthetic.py
+Seeded synthetic budget ledgers in the shape of template/budget_plus_input_template.xlsx
+(Version, Scenario, Cost Center, Planned, Actual, FX Rate, Approval Status, Expense Type,
+Commentary, Role, Threshold Alert, Owner, Line ID) plus Month, optional dimension columns
+(Category / Department / Region / Product / Customer) and Price / Quantity drivers.
+Same arguments + same seed → identical frame and identical workbook bytes.
+
+    python -m benchmarks.synthetic --rows 100000 --out ledger.xlsx
+"""
+
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+import argparse
+
+import numpy as np
+import pandas as pd
+
+TEMPLATE_COLUMNS = [
+    "Version", "Scenario", "Cost Center", "Planned", "Actual", "FX Rate", "Approval Status",
+    "Expense Type", "Commentary", "Role", "Threshold Alert", "Owner", "Line ID",
+]
+DIMENSION_VALUES: Dict[str, List[str]] = {
+    "Category": ["Personnel", "Travel", "Software", "Hardware", "Marketing", "Facilities", "Services"],
+    "Department": ["Finance", "Sales", "Engineering", "Operations", "HR", "Legal"],
+    "Region": ["APAC", "EMEA", "NA", "LATAM"],
+    "Product": [f"P{i:03d}" for i in range(40)],
+    "Customer": [f"C{i:04d}" for i in range(500)],
+}
+# สกุลเงิน → (อัตราเฉลี่ย, ความผันผวนรายเดือน)
+FX_RATES: Dict[str, Tuple[float, float]] = {"THB": (1.0, 0.0), "USD": (35.5, 0.02), "EUR": (38.2, 0.025), "JPY": (0.24, 0.03)}
+COMMENTS = ["", "", "", "Ad spend increased", "Cloud service upgrade", "Vendor renegotiation", "One-off repair"]
+
+
+@dataclass
+class LedgerSpec:
+    rows: int = 10_000
+    cost_centers: int = 50
+    months: int = 12
+    start_month: str = "2024-01"
+    dimensions: List[str] = field(default_factory=lambda: ["Category", "Department", "Region"])
+    currencies: List[str] = field(default_factory=lambda: ["THB"])   # > 1 สกุล = FX Rate ไม่คงที่
+    versions: List[str] = field(default_factory=lambda: ["V1"])
+    scenarios: List[str] = field(default_factory=lambda: ["Base"])
+    drivers: bool = True      # Price / Quantity (ให้ scenarios คำนวณ Price/Volume ได้)
+    seed: int = 42
+
+
+def generate_ledger(spec: Optional[LedgerSpec] = None, **overrides) -> pd.DataFrame:
+    spec = spec or LedgerSpec()
+    if overrides:
+        spec = LedgerSpec(**{**spec.__dict__, **overrides})
+    rng = np.random.default_rng(spec.seed)
+    n = int(spec.rows)
+
+    cc_names = np.array([f"CC{i:04d}" for i in range(spec.cost_centers)])
+    # cost center ใหญ่เล็กไม่เท่ากัน (Zipf-ish) เหมือนข้อมูลจริง
+    weights = 1.0 / np.arange(1, spec.cost_centers + 1)
+    cc_idx = rng.choice(spec.cost_centers, size=n, p=weights / weights.sum())
+    month_idx = rng.integers(0, spec.months, size=n)
+    months = pd.period_range(spec.start_month, periods=spec.months, freq="M").strftime("%Y-%m").to_numpy()
+
+    base = rng.lognormal(mean=9.0, sigma=1.0, size=n) * (1.0 + 0.5 * (cc_idx % 7) / 7)
+    planned = np.round(base, 2)
+    # แต่ละ cost center มีแนวโน้มใช้เกิน/ต่ำกว่างบของตัวเอง + noise
+    bias = rng.normal(0.0, 0.06, size=spec.cost_centers)[cc_idx]
+    actual = np.round(planned * (1.0 + bias + rng.normal(0.0, 0.08, size=n)), 2)
+
+    currency = rng.choice(spec.currencies, size=n)
+    fx = np.ones(n)
+    for cur in spec.currencies:
+        mean, vol = FX_RATES.get(cur, (1.0, 0.02))
+        path = mean * np.exp(np.cumsum(rng.normal(0.0, vol, size=spec.months)))
+        mask = currency == cur
+        fx[mask] = np.round(path[month_idx[mask]] if vol else mean, 4)
+
+    df = pd.DataFrame({
+        "Version": rng.choice(spec.versions, size=n),
+        "Scenario": rng.choice(spec.scenarios, size=n),
+        "Cost Center": cc_names[cc_idx],
+        "Planned": planned,
+        "Actual": actual,
+        "FX Rate": fx,
+        "Approval Status": rng.choice(["Approved", "Pending", "Rejected"], size=n, p=[0.8, 0.15, 0.05]),
+        "Expense Type": rng.choice(["OPEX", "CAPEX"], size=n, p=[0.85, 0.15]),
+        "Commentary": rng.choice(COMMENTS, size=n),
+        "Role": rng.choice(["Analyst", "Manager", "Director"], size=n, p=[0.6, 0.3, 0.1]),
+        "Threshold Alert": np.where(np.abs(actual - planned) > 0.1 * planned, "Above", ""),
+        "Owner": rng.choice(["Alice", "Bob", "Carol", "Dan", "Eve"], size=n),
+        "Line ID": np.arange(100, 100 + n),
+        "Month": months[month_idx],
+    })
+    if len(spec.currencies) > 1:
+        df["Currency"] = currency
+    for dim in spec.dimensions:
+        df[dim] = rng.choice(DIMENSION_VALUES[dim], size=n)
+    if spec.drivers:
+        qty = rng.integers(1, 500, size=n)
+        df["Quantity"] = qty
+        df["Price"] = np.round(actual / qty, 4)
+    return df
+
+
+def to_xlsx_bytes(df: pd.DataFrame) -> bytes:
+    """เขียน xlsx แบบ deterministic (เวลาในเมตาดาต้าคงที่)"""
+    buf = BytesIO()
+    with pd.ExcelWriter(buf, engine="xlsxwriter") as writer:
+        writer.book.set_properties({"created": pd.Timestamp("2024-01-01").to_pydatetime()})
+        df.to_excel(writer, index=False, sheet_name="Sheet1")
+    return buf.getvalue()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Seeded synthetic budget ledger → xlsx")
+    ap.add_argument("--rows", type=int, default=10_000)
+    ap.add_argument("--cost-centers", type=int, default=50)
+    ap.add_argument("--months", type=int, default=12)
+    ap.add_argument("--dimensions", default="Category,Department,Region", help="comma-separated, '' = none")
+    ap.add_argument("--currencies", default="THB", help="comma-separated, e.g. THB,USD,EUR")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", default="synthetic_ledger.xlsx")
+    args = ap.parse_args(argv)
+    df = generate_ledger(LedgerSpec(
+        rows=args.rows, cost_centers=args.cost_centers, months=args.months, seed=args.seed,
+        dimensions=[d for d in args.dimensions.split(",") if d],
+        currencies=[c for c in args.currencies.split(",") if c],
+    ))
+    with open(args.out, "wb") as f:
+        f.write(to_xlsx_bytes(df))
+    print(f"{args.out}: {len(df):,} rows × {len(df.columns)} columns")
+
+
+if __name__ == "__main__":
+    main()
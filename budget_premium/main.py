@@ -1,6 +1,7 @@
 # budget_premium/main.py
+from typing import Optional
 from fastapi import FastAPI, UploadFile, File, Query, HTTPException
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import StreamingResponse
 import pandas as pd
 from io import BytesIO
 
@@ -10,10 +11,19 @@ from budget_premium.modules.display_utils import add_formatted_columns
 from budget_premium.modules.next_action import recommend_next_actions
 from budget_premium.modules.pdf_dashboard import generate_pdf_dashboard
 from budget_premium.modules.excel_dashboard import generate_excel_dashboard
+from budget_premium.modules import upload_cache
+# JSON response ใช้ตัวเดียวกับ budget_plus (utils/fast_json.py ที่ repo root)
+try:
+    from budget_plus.utils.fast_json import FastJSONResponse, frame_payload, RESPONSE_FORMATS
+except ImportError:
+    from utils.fast_json import FastJSONResponse, frame_payload, RESPONSE_FORMATS
 
 app = FastAPI(title="Budget Premium Agent (Upgraded)", version="3.1")
 
 ALLOWED_SCALES = ["raw", "k", "m"]
+MONEY_COLS = ["Planned", "Actual", "Adjusted Actual", "Variance"]
+PCT_COLS = ["Growth", "Margin %", "YoY %"]
+MAX_PAGE_SIZE = 1000
 
 
 def _read_excel_from_upload(file_bytes: bytes) -> pd.DataFrame:
@@ -44,33 +54,66 @@ async def health():
     return {"status": "ok", "version": app.version}
 
 
-@app.post("/process")
+def _build_upload_entry(contents: bytes, upload_id: str) -> upload_cache.UploadEntry:
+    """อ่าน + คำนวณครั้งเดียวต่อไฟล์: คอลัมน์พื้นฐาน, สรุปยอด และ next actions"""
+    df = _compute_base_columns(_read_excel_from_upload(contents))
+    summary = {"rows": int(len(df))}
+    for c in MONEY_COLS:
+        if c in df.columns:
+            summary[c] = float(pd.to_numeric(df[c], errors="coerce").sum())
+    return upload_cache.UploadEntry(
+        upload_id=upload_id, df=df, summary=summary, next_actions=recommend_next_actions(df),
+    )
+
+
+@app.post("/process", response_class=FastJSONResponse)
 async def process(
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    upload_id: Optional[str] = Query(None, description="id จากการเรียกครั้งก่อน (เปิดหน้าถัดไปโดยไม่ต้องอัปโหลดซ้ำ)"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
     scale: str = Query("raw", enum=ALLOWED_SCALES),
     money_decimals: int = 2,
     pct_decimals: int = 2,
+    format: str = Query("records", enum=RESPONSE_FORMATS),
+    raw: bool = Query(False, description="true = ค่าตัวเลขดิบเท่านั้น ไม่เพิ่มคอลัมน์ (disp)"),
 ):
-    contents = await file.read()
-    df = _read_excel_from_upload(contents)
-    df = _compute_base_columns(df)
-
-    # สร้างคอลัมน์สำหรับ “แสดงผล” โดยไม่กระทบค่าจริง
-    display = add_formatted_columns(
-        df,
-        money_cols=[c for c in ["Planned", "Actual", "Adjusted Actual", "Variance"] if c in df.columns],
-        pct_cols=[c for c in ["Growth", "Margin %", "YoY %"] if c in df.columns],
+    if format not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {RESPONSE_FORMATS}")
+    if file is not None:
+        contents = await file.read()
+        entry = upload_cache.get_or_build(contents, lambda uid: _build_upload_entry(contents, uid))
+    elif upload_id:
+        entry = upload_cache.get(upload_id)
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Unknown or expired upload_id; please upload the file again")
+    else:
+        raise HTTPException(status_code=400, detail="Either file or upload_id is required")
+
+    df = entry.df
+    page = df.iloc[offset:offset + limit]
+
+    # format เฉพาะแถวของหน้านี้ (ค่าจริงไม่ถูกแก้)
+    display = page if raw else add_formatted_columns(
+        page,
+        money_cols=[c for c in MONEY_COLS if c in df.columns],
+        pct_cols=[c for c in PCT_COLS if c in df.columns],
         scale=scale,
         decimals=money_decimals,
         pct_decimals=pct_decimals,
     )
 
-    # คำแนะนำถัดไป (rule-based)
-    recs = recommend_next_actions(df)
-
-    # ตัดให้ไม่ยาวเกินไป
-    preview = display.head(50).to_dict(orient="records")
-    return JSONResponse({"preview": preview, "next_actions": recs})
+    end = offset + len(page)
+    return FastJSONResponse({
+        "upload_id": entry.upload_id,
+        "total_rows": int(len(df)),
+        "offset": offset,
+        "limit": limit,
+        "next_offset": end if end < len(df) else None,
+        "summary": entry.summary,
+        "preview": frame_payload(display, format),
+        "next_actions": entry.next_actions,
+    })
 
 
 @app.post("/download-excel")
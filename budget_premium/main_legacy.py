@@ -1,4 +1,5 @@
-from fastapi import FastAPI, UploadFile, File
+from typing import Optional
+from fastapi import FastAPI, UploadFile, File, Query, HTTPException
 from fastapi.responses import JSONResponse, StreamingResponse
 import pandas as pd
 from io import BytesIO
@@ -11,21 +12,41 @@ from modules.access_control import check_access
 from modules.scenario_engine import apply_scenarios
 from modules.versioning import compare_versions
 from modules.erp_sync import export_to_erp_format
+# NDJSON / SSE chunker ใช้ตัวเดียวกับ budget_plus (utils/streaming.py ที่ repo root; modules/__init__.py เพิ่ม path)
+try:
+    from budget_plus.utils.streaming import stream_frame, STREAM_MODES, DEFAULT_CHUNK_ROWS
+except ImportError:
+    from utils.streaming import stream_frame, STREAM_MODES, DEFAULT_CHUNK_ROWS
 
 app = FastAPI(title="Budget Premium Agent (Full)", version="3.0")
 
+def _row_pipeline(df):
+    """ขั้นตอนรายแถว (ทำทั้ง df หรือทีละ chunk ตอน stream ก็ได้ผลเหมือนกัน)"""
+    df = df.copy()
+    df["Reallocation Advice"] = df.apply(suggest_reallocation, axis=1)
+    df = apply_scenarios(df)
+    return forecast_from_drivers(df)
+
 @app.post("/analyze")
-async def analyze(file: UploadFile = File(...), user_role: str = "editor"):
+async def analyze(
+    file: UploadFile = File(...),
+    user_role: str = "editor",
+    stream: Optional[str] = Query(None, enum=STREAM_MODES),
+    chunk_rows: int = Query(DEFAULT_CHUNK_ROWS, ge=1, le=100_000),
+):
     check_access(user_role, action="analyze")
+    if stream is not None and stream not in STREAM_MODES:
+        raise HTTPException(status_code=400, detail=f"stream must be one of {STREAM_MODES}")
     contents = await file.read()
     df = pd.read_excel(BytesIO(contents))
     df["Adjusted Actual"] = df["Actual"] * df["FX Rate"]
     df["Variance"] = df["Adjusted Actual"] - df["Planned"]
-    df["Accuracy Score"] = compute_accuracy_score(df)
-    df["Reallocation Advice"] = df.apply(suggest_reallocation, axis=1)
-    df = apply_scenarios(df)
+    df["Accuracy Score"] = compute_accuracy_score(df)   # ค่ารวมทั้งไฟล์ → คำนวณก่อนแบ่ง chunk
     log_changes(df)
-    df = forecast_from_drivers(df)
+    if stream is not None:
+        # reallocation/scenario/forecast ทำทีละ chunk ระหว่างส่ง → แถวแรกถึง client ก่อนประมวลผลครบ
+        return stream_frame(df, stream, chunk_rows, transform=_row_pipeline)
+    df = _row_pipeline(df)
     return JSONResponse(content=df.to_dict(orient="records"))
 
 @app.post("/download-report")
@@ -0,0 +1,12 @@
+"""
+Premium modules. Code shared with budget_plus (columnar number formatting, JSON responses,
+NDJSON / SSE streaming) has one copy, in the utils/ package at the repo root; importing this
+package puts the repo root on sys.path so premium also finds it when run from its own folder.
+"""
+
+import os
+import sys
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _ROOT not in sys.path:
+    sys.path.append(_ROOT)
@@ -0,0 +1,22 @@
+
+import pandas as pd
+
+# จำนวนกลุ่มสูงสุดในกราฟ ที่เหลือรวมเป็น "Other"
+CHART_TOP_N = 15
+OTHER_LABEL = "Other"
+
+def grouped_top_n(df: pd.DataFrame, key: str, value_cols: list[str], top_n: int | None = CHART_TOP_N,
+                  rank_col: str = "Variance") -> pd.DataFrame:
+    """
+    Group df by key, keep the top_n groups by |sum(rank_col)| and fold the rest into "Other".
+    Falls back to ranking by the summed value_cols when rank_col is missing.
+    """
+    cols = value_cols + ([rank_col] if rank_col in df.columns and rank_col not in value_cols else [])
+    summary = df.groupby(key)[cols].sum()
+    if top_n is None or len(summary) <= top_n:
+        return summary[value_cols]
+    rank = summary[rank_col] if rank_col in summary.columns else summary[value_cols].sum(axis=1)
+    order = rank.abs().sort_values(ascending=False).index
+    top = summary.loc[order[:top_n], value_cols]
+    other = summary.loc[order[top_n:], value_cols].sum().rename(OTHER_LABEL)
+    return pd.concat([top, other.to_frame().T])
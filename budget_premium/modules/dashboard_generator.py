@@ -3,6 +3,7 @@ import matplotlib
 matplotlib.use("Agg")   # ต้องมาก่อน pyplot
 import matplotlib.pyplot as plt
 from io import BytesIO
+from .chart_limits import grouped_top_n
 
 def generate_pdf_summary(df):
     pdf = FPDF()
@@ -12,7 +13,7 @@ def generate_pdf_summary(df):
     for _, row in df[df["Variance"].abs() > 2000].iterrows():
         pdf.cell(200, 10, f"⚠️ Variance - {row['Cost Center']} | {row['Project']} = {row['Variance']:.2f}", ln=True)
     chart = BytesIO()
-    df.groupby("Cost Center")[["Planned", "Adjusted Actual"]].sum().plot(kind="bar")
+    grouped_top_n(df, "Cost Center", ["Planned", "Adjusted Actual"]).plot(kind="bar")
     plt.tight_layout()
     plt.savefig(chart, format="png")
     chart.seek(0)
@@ -1,5 +1,12 @@
+"""
+number_format.py
+Display formatting for the premium dashboards (currency / percent, raw / K / M scale).
+The columnar *_array variants render through grouped_fixed from budget_plus
+utils/number_format_utils.py, the single implementation shared by both apps.
+"""
 
 from typing import Literal, Optional
+import numpy as np
 
 Scale = Literal["raw","k","m"]
 def _scale_value(v: float, scale: Scale) -> float:
@@ -23,3 +30,33 @@ def apply_scale_series(s, scale: Scale="raw"):
     if scale == "raw": return s
     factor = 1_000 if scale == "k" else 1_000_000
     return s / factor
+
+# ---- columnar formatting ----
+# ตัว format แบบทั้งคอลัมน์มีที่เดียว (utils/number_format_utils.py ของ budget_plus) — premium import มาใช้
+try:
+    from budget_plus.utils.number_format_utils import grouped_fixed
+except ImportError:
+    from utils.number_format_utils import grouped_fixed   # repo root อยู่ใน sys.path (modules/__init__.py)
+
+def _numeric(values) -> Optional[np.ndarray]:
+    arr = np.asarray(values)
+    return arr.astype(np.float64, copy=False).ravel() if arr.dtype.kind in "biuf" else None
+
+def _as_object(cells: list) -> np.ndarray:
+    out = np.empty(len(cells), dtype=object)
+    out[:] = cells
+    return out
+
+def format_currency_array(values, scale: Scale="raw", decimals: int=2) -> np.ndarray:
+    """format_currency for a whole column (array / Series / list); identical strings"""
+    vals = _numeric(values)
+    if vals is None:  # object column (None / mixed) → ทีละค่าแบบเดิม
+        return _as_object([format_currency(v, scale, decimals) for v in np.asarray(values).ravel().tolist()])
+    return _as_object(grouped_fixed(apply_scale_series(vals, scale), decimals))
+
+def format_percent_array(values, decimals: int=2) -> np.ndarray:
+    """format_percent for a whole column (array / Series / list); identical strings"""
+    vals = _numeric(values)
+    if vals is None:
+        return _as_object([format_percent(v, decimals) for v in np.asarray(values).ravel().tolist()])
+    return _as_object([c + "%" for c in grouped_fixed(vals * 100, decimals)])
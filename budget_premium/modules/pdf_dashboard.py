@@ -6,6 +6,7 @@ matplotlib.use("Agg")   # ต้องมาก่อน pyplot
 import matplotlib.pyplot as plt
 import pandas as pd
 from .number_format import format_currency
+from .chart_limits import grouped_top_n
 
 class PDF(FPDF):
     def header(self):
@@ -45,7 +46,7 @@ def generate_pdf_dashboard(df: pd.DataFrame, scale: str="raw", decimals:int=2) -
     # Chart
     if {"Cost Center","Planned","Adjusted Actual"}.issubset(df.columns):
         chart = BytesIO()
-        df.groupby("Cost Center")[["Planned","Adjusted Actual"]].sum().plot(kind="bar")
+        grouped_top_n(df, "Cost Center", ["Planned","Adjusted Actual"]).plot(kind="bar")
         plt.tight_layout()
         plt.savefig(chart, format="png")
         plt.close()
@@ -0,0 +1,65 @@
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import pandas as pd
+
+# จำนวนไฟล์ที่ cache ไว้ (LRU) และอายุสูงสุดต่อไฟล์ (วินาที)
+MAX_ENTRIES = int(os.getenv("BUDGET_UPLOAD_CACHE_SIZE", "8"))
+TTL_SECONDS = float(os.getenv("BUDGET_UPLOAD_CACHE_TTL", "900"))
+
+@dataclass
+class UploadEntry:
+    upload_id: str
+    df: pd.DataFrame                       # ค่าจริงหลัง _compute_base_columns (ยังไม่ format)
+    summary: dict = field(default_factory=dict)
+    next_actions: list = field(default_factory=list)
+    created: float = field(default_factory=time.monotonic)
+
+_entries: "OrderedDict[str, UploadEntry]" = OrderedDict()
+_lock = threading.Lock()
+
+def upload_id_for(contents: bytes) -> str:
+    """id ของไฟล์ = hash ของเนื้อหา (อัปโหลดไฟล์เดิมซ้ำ → ได้ entry เดิม)"""
+    return hashlib.sha256(contents).hexdigest()[:32]
+
+def _expired(entry: UploadEntry, now: float) -> bool:
+    return now - entry.created > TTL_SECONDS
+
+def get(upload_id: str) -> Optional[UploadEntry]:
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(upload_id)
+        if entry is None:
+            return None
+        if _expired(entry, now):
+            del _entries[upload_id]
+            return None
+        _entries.move_to_end(upload_id)
+        return entry
+
+def put(entry: UploadEntry) -> UploadEntry:
+    now = time.monotonic()
+    with _lock:
+        _entries[entry.upload_id] = entry
+        _entries.move_to_end(entry.upload_id)
+        for key in [k for k, e in _entries.items() if _expired(e, now)]:
+            del _entries[key]
+        while len(_entries) > max(MAX_ENTRIES, 1):
+            _entries.popitem(last=False)
+    return entry
+
+def get_or_build(contents: bytes, build: Callable[[str], UploadEntry]) -> UploadEntry:
+    """คืน entry ที่ cache ไว้ของไฟล์นี้ หรือ build(upload_id) ครั้งเดียวแล้วเก็บไว้"""
+    upload_id = upload_id_for(contents)
+    entry = get(upload_id)
+    return entry if entry is not None else put(build(upload_id))
+
+def clear():
+    with _lock:
+        _entries.clear()
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from modules.number_format import format_currency, format_percent, format_currency_array, format_percent_array
+from modules.display_utils import add_formatted_columns
+
+VALUES = np.concatenate([
+    np.random.default_rng(1).normal(0, 5e6, 2000),
+    [0.0, -0.0, -0.001, 0.5, 1.005, -999.995, 123_456_789.125, 1e40, np.nan, np.inf],
+])
+
+
+def test_format_currency_array_matches_scalar():
+    for scale in ("raw", "k", "m"):
+        for decimals in (0, 2, 3):
+            expected = [format_currency(v, scale=scale, decimals=decimals) for v in VALUES]
+            assert format_currency_array(VALUES, scale=scale, decimals=decimals).tolist() == expected
+
+
+def test_format_percent_array_matches_scalar():
+    for decimals in (0, 1, 2):
+        assert format_percent_array(VALUES, decimals=decimals).tolist() == [format_percent(v, decimals=decimals) for v in VALUES]
+
+
+def test_object_column_keeps_none_as_blank():
+    values = np.array([1.5, None, 2], dtype=object)
+    assert format_currency_array(values).tolist() == ["1.50", "", "2.00"]
+    assert format_percent_array(values).tolist() == ["150.00%", "", "200.00%"]
+
+
+def test_add_formatted_columns_display_strings():
+    df = pd.DataFrame({"Planned": [1_234_567.0, -250.0], "Margin %": [0.125, -0.5]})
+    out = add_formatted_columns(df, money_cols=["Planned"], pct_cols=["Margin %"], scale="k", decimals=1, pct_decimals=1)
+    assert out["Planned (disp)"].tolist() == ["1,234.6", "-0.2"]
+    assert out["Margin % (disp)"].tolist() == ["12.5%", "-50.0%"]
+    assert out["Planned"].tolist() == [1_234_567.0, -250.0]
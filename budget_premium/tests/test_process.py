@@ -0,0 +1,71 @@
+from io import BytesIO
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from budget_premium.main import app
+from budget_premium.modules import upload_cache
+
+client = TestClient(app)
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _upload(n=120):
+    df = pd.DataFrame({
+        "Cost Center": [f"CC{i}" for i in range(n)],
+        "Planned": [1000.0 * (i + 1) for i in range(n)],
+        "Actual": [1100.0 * (i + 1) for i in range(n)],
+        "FX Rate": [1.0] * n,
+    })
+    buf = BytesIO()
+    df.to_excel(buf, index=False, engine="openpyxl")
+    return buf.getvalue()
+
+
+def test_process_paginates_with_upload_id(monkeypatch):
+    upload_cache.clear()
+    contents = _upload()
+    r = client.post("/process", params={"limit": 50}, files={"file": ("t.xlsx", contents, XLSX)})
+    assert r.status_code == 200
+    first = r.json()
+    assert first["total_rows"] == 120 and first["next_offset"] == 50
+    assert len(first["preview"]) == 50
+    assert first["preview"][0]["Planned (disp)"] == "1,000.00"
+    assert first["summary"]["rows"] == 120
+
+    # หน้าถัดไปไม่ต้องอ่าน Excel ซ้ำ
+    monkeypatch.setattr("budget_premium.main._read_excel_from_upload", lambda _: (_ for _ in ()).throw(AssertionError("re-read")))
+    r = client.post("/process", params={"upload_id": first["upload_id"], "offset": 100, "limit": 50, "scale": "k"})
+    page = r.json()
+    assert [row["Cost Center"] for row in page["preview"]] == [f"CC{i}" for i in range(100, 120)]
+    assert page["preview"][0]["Planned (disp)"] == "101.00"
+    assert page["next_offset"] is None
+    assert page["next_actions"] == first["next_actions"]
+
+    # อัปโหลดไฟล์เดิมซ้ำ → ใช้ entry เดิม
+    r = client.post("/process", files={"file": ("t.xlsx", contents, XLSX)})
+    assert r.json()["upload_id"] == first["upload_id"]
+
+
+def test_process_unknown_upload_id():
+    upload_cache.clear()
+    assert client.post("/process", params={"upload_id": "missing"}).status_code == 404
+    assert client.post("/process").status_code == 400
+
+
+def test_upload_cache_is_bounded(monkeypatch):
+    upload_cache.clear()
+    monkeypatch.setattr(upload_cache, "MAX_ENTRIES", 2)
+    for i in range(3):
+        upload_cache.put(upload_cache.UploadEntry(upload_id=str(i), df=pd.DataFrame()))
+    assert upload_cache.get("0") is None
+    assert upload_cache.get("2") is not None
+
+
+def test_process_columnar_raw():
+    upload_cache.clear()
+    r = client.post("/process", params={"format": "columnar", "raw": "true", "limit": 3},
+                    files={"file": ("t.xlsx", _upload(5), XLSX)})
+    preview = r.json()["preview"]
+    assert preview["Planned"] == [1000.0, 2000.0, 3000.0]
+    assert "Planned (disp)" not in preview
@@ -0,0 +1,32 @@
+import json
+import os
+import sys
+from io import BytesIO
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from main_legacy import app
+
+client = TestClient(app)
+
+
+def test_legacy_analyze_ndjson_matches_json():
+    n = 5
+    df = pd.DataFrame({
+        "Planned": [10000.0 * (i + 1) for i in range(n)],
+        "Actual": [12000.0 * (i + 1) for i in range(n)],
+        "FX Rate": [1.0] * n,
+        "Cost Center": [f"CC{i}" for i in range(n)],
+        "Scenario": ["Base"] * n,
+        "Driver": [i for i in range(n)],
+    })
+    buf = BytesIO()
+    df.to_excel(buf, index=False, engine="openpyxl")
+    files = lambda: {"file": ("t.xlsx", BytesIO(buf.getvalue()), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
+
+    full = client.post("/analyze", files=files()).json()
+    r = client.post("/analyze", params={"stream": "ndjson", "chunk_rows": 2}, files=files())
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in r.text.splitlines()] == full
@@ -0,0 +1,282 @@
+"""
+chunked.py
+Out-of-core analysis for ledgers larger than memory (CSV / Parquet / Arrow IPC-Feather).
+The input is read `chunk_rows` lines at a time; each chunk is prepared (FX-adjusted actual +
+variance) and folded into aggregates whose size depends on the number of groups, not lines:
+- sums per (Version, Scenario, Cost Center)  → same table as summarize_variance
+- sums / percent means per Cost Center        → PDF report (generate_pdf_with_chart)
+- suggestion stats, scenario totals, monthly series → next actions, scenarios, alerts
+- the top-K line-level variance drivers (min-heap of K rows)
+Summary, suggestions, scenarios, alerts and the PDF are then built from the merged aggregates.
+
+    python -m budget_plus.chunked ledger.parquet --json result.json --pdf report.pdf
+Parquet / Arrow inputs need pyarrow (same optional dependency as the columnar exports).
+"""
+
+from dataclasses import dataclass
+from itertools import count
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Sequence, Union
+import argparse
+import heapq
+import os
+import sys
+
+import pandas as pd
+
+try:
+    from .utils.variance_utils import calculate_variance
+    from .utils.columnar_export import _arrow
+    from .utils.metrics import stage
+    from .next_actions import suggestion_stats, merge_suggestion_stats, recommend_from_stats, suggestion_dict
+    from .scenarios_alerts import scenario_totals, merge_totals, scenarios_from_totals
+    from .scenarios_alerts import monthly_totals, alerts_from_monthly
+    from .config import PERCENT_COLUMNS, CHUNK_ROWS, CHUNK_TOP_K
+except ImportError:
+    from utils.variance_utils import calculate_variance
+    from utils.columnar_export import _arrow
+    from utils.metrics import stage
+    from next_actions import suggestion_stats, merge_suggestion_stats, recommend_from_stats, suggestion_dict
+    from scenarios_alerts import scenario_totals, merge_totals, scenarios_from_totals
+    from scenarios_alerts import monthly_totals, alerts_from_monthly
+    from config import PERCENT_COLUMNS, CHUNK_ROWS, CHUNK_TOP_K
+
+CHUNK_FORMATS = ("csv", "parquet", "arrow", "feather")
+SUMMARY_KEYS = ["Version", "Scenario", "Cost Center"]
+SUM_COLUMNS = ["Planned", "Actual", "FX Adjusted Actual", "Variance"]
+
+Source = Union[str, os.PathLike, BinaryIO]
+
+
+def detect_format(name: str) -> str:
+    ext = os.path.splitext(str(name).lower())[1].lstrip(".")
+    fmt = {"csv": "csv", "txt": "csv", "parquet": "parquet", "pq": "parquet",
+           "arrow": "arrow", "ipc": "arrow", "feather": "feather"}.get(ext)
+    if fmt is None:
+        raise ValueError(f"unsupported ledger format: {name!r} (expected {', '.join(CHUNK_FORMATS)})")
+    return fmt
+
+
+def iter_chunks(source: Source, fmt: str, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """DataFrame ทีละไม่เกิน chunk_rows แถว (ไม่อ่านทั้งไฟล์เข้าหน่วยความจำ)"""
+    if fmt == "csv":
+        # เฉพาะช่องว่างเป็นค่าว่าง ("NA" = North America ไม่ใช่ missing)
+        yield from pd.read_csv(source, chunksize=chunk_rows, keep_default_na=False, na_values=[""])
+        return
+    if fmt not in CHUNK_FORMATS:
+        raise ValueError(f"unsupported ledger format: {fmt!r}")
+    if _arrow() is None:
+        raise RuntimeError(f"reading {fmt} needs pyarrow")
+    pa, _, pq = _arrow()
+    if fmt == "parquet":
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+        return
+    # Arrow IPC / Feather V2: batch ในไฟล์อาจใหญ่กว่า chunk_rows → slice (zero-copy)
+    stream = pa.memory_map(os.fspath(source)) if isinstance(source, (str, os.PathLike)) else source
+    reader = pa.ipc.open_file(stream)
+    for i in range(reader.num_record_batches):
+        batch = reader.get_batch(i)
+        for start in range(0, batch.num_rows, chunk_rows):
+            yield batch.slice(start, chunk_rows).to_pandas()
+
+
+class _GroupSums:
+    """ผลรวมต่อกลุ่มที่รวมข้าม chunk ได้ (ขนาด = จำนวนกลุ่ม)"""
+
+    def __init__(self, keys: List[str]):
+        self.keys = keys
+        self.frame: Optional[pd.DataFrame] = None
+
+    def add(self, part: pd.DataFrame):
+        grouped = part.groupby(self.keys, sort=False).sum()
+        if self.frame is None:
+            self.frame = grouped
+        else:
+            self.frame = pd.concat([self.frame, grouped]).groupby(level=list(range(len(self.keys))), sort=False).sum()
+
+    def result(self) -> pd.DataFrame:
+        if self.frame is None:
+            return pd.DataFrame(columns=self.keys)
+        return self.frame.sort_index().reset_index()
+
+
+@dataclass
+class ChunkedResult:
+    rows: int
+    chunks: int
+    summary: pd.DataFrame            # = summarize_variance(ทั้งไฟล์)
+    cost_centers: pd.DataFrame       # sums + percent means ต่อ Cost Center
+    top_drivers: pd.DataFrame        # top-K แถวตาม |Variance|
+    stats: Dict[str, Any]            # next_actions.suggestion_stats (merged)
+    totals: Dict[str, float]         # scenarios_alerts.scenario_totals (merged)
+    monthly: Optional[pd.DataFrame]  # scenarios_alerts.monthly_totals (merged)
+
+    def suggestions(self, thresholds: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        return suggestion_dict(recommend_from_stats(self.stats, thresholds))
+
+    def scenarios(self) -> Dict[str, Any]:
+        return scenarios_from_totals(self.totals)
+
+    def alerts(self, pct_threshold: float = 0.08) -> Dict[str, Any]:
+        return alerts_from_monthly(self.monthly, pct_threshold)
+
+    def percent_avgs(self) -> Dict[str, float]:
+        return {col: (total / n if n else float("nan")) for col, (total, n) in self.stats["percent"].items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "chunks": self.chunks,
+            "summary": self.summary.to_dict(orient="records"),
+            "suggestions": self.suggestions(),
+            "scenarios": self.scenarios(),
+            "alerts": self.alerts(),
+            "top_drivers": self.top_drivers.to_dict(orient="records"),
+        }
+
+    def to_pdf(self):
+        """PDF เดียวกับ generate_pdf_default แต่สร้างจาก aggregate (แถว 'Other' เฉลี่ย % ต่อ Cost Center)"""
+        try:
+            from .pdf_summary import generate_pdf_with_chart
+        except ImportError:
+            from pdf_summary import generate_pdf_with_chart
+        return generate_pdf_with_chart(
+            self.cost_centers, include_percent=True, add_next_actions=True, add_scenarios_alerts=True,
+            actions_result=self.suggestions(), scenarios_alerts=(self.scenarios(), self.alerts()),
+            n_records=self.rows, percent_avgs=self.percent_avgs(),
+        )
+
+
+class LedgerAggregator:
+    def __init__(self, top_k: int = CHUNK_TOP_K):
+        self.top_k = max(int(top_k), 0)
+        self.rows = 0
+        self.chunks = 0
+        self._summary: Optional[_GroupSums] = None
+        self._cost_centers = _GroupSums(["Cost Center"])
+        self._stats: Optional[Dict[str, Any]] = None
+        self._totals: Optional[Dict[str, float]] = None
+        self._monthly: Optional[_GroupSums] = None
+        self._heap: List = []          # (|Variance|, seq, record) — min-heap ขนาด top_k
+        self._seq = count()
+
+    def add(self, chunk: pd.DataFrame):
+        """chunk ที่คำนวณ FX Adjusted Actual / Variance แล้ว"""
+        if chunk.empty:
+            return
+        self.rows += len(chunk)
+        self.chunks += 1
+
+        keys = [k for k in SUMMARY_KEYS if k in chunk.columns]
+        sums = [c for c in SUM_COLUMNS if c in chunk.columns]
+        if self._summary is None:
+            self._summary = _GroupSums(keys)
+        self._summary.add(chunk[keys + sums])
+
+        if "Cost Center" in chunk.columns:
+            cc = chunk[["Cost Center", "Planned", "FX Adjusted Actual", "Variance"]].copy()
+            for col in PERCENT_COLUMNS:
+                if col in chunk.columns:
+                    cc[col] = chunk[col]
+                    cc[f"__n__{col}"] = chunk[col].notna().astype("int64")
+            self._cost_centers.add(cc)
+
+        stats = suggestion_stats(chunk)
+        self._stats = stats if self._stats is None else merge_suggestion_stats(self._stats, stats)
+        totals = scenario_totals(chunk)
+        self._totals = totals if self._totals is None else merge_totals(self._totals, totals)
+        monthly = monthly_totals(chunk)
+        if monthly is not None:
+            if self._monthly is None:
+                self._monthly = _GroupSums(["Month"])
+            self._monthly.add(monthly.reset_index())
+
+        if self.top_k:
+            self._push_drivers(chunk)
+
+    def _push_drivers(self, chunk: pd.DataFrame):
+        magnitude = chunk["Variance"].abs()
+        floor = self._heap[0][0] if len(self._heap) >= self.top_k else None
+        candidates = magnitude.nlargest(self.top_k)
+        if floor is not None:
+            candidates = candidates[candidates > floor]
+        for idx, value in candidates.items():
+            item = (float(value), next(self._seq), chunk.loc[idx].to_dict())
+            if len(self._heap) < self.top_k:
+                heapq.heappush(self._heap, item)
+            else:
+                heapq.heappushpop(self._heap, item)
+
+    def result(self) -> ChunkedResult:
+        if self._stats is None:
+            raise ValueError("no rows in ledger")
+        cost_centers = self._cost_centers.result()
+        for col in PERCENT_COLUMNS:
+            n_col = f"__n__{col}"
+            if n_col in cost_centers.columns:
+                cost_centers[col] = cost_centers[col] / cost_centers[n_col].where(cost_centers[n_col] > 0)
+                cost_centers = cost_centers.drop(columns=[n_col])
+        drivers = [rec for _, _, rec in sorted(self._heap, key=lambda x: (-x[0], x[1]))]
+        return ChunkedResult(
+            rows=self.rows,
+            chunks=self.chunks,
+            summary=self._summary.result(),
+            cost_centers=cost_centers,
+            top_drivers=pd.DataFrame(drivers),
+            stats=self._stats,
+            totals=self._totals,
+            monthly=None if self._monthly is None else self._monthly.result().set_index("Month"),
+        )
+
+
+def process_ledger(
+    source: Source,
+    fmt: Optional[str] = None,
+    chunk_rows: int = CHUNK_ROWS,
+    prepare: Callable[[pd.DataFrame], pd.DataFrame] = calculate_variance,
+    top_k: int = CHUNK_TOP_K,
+) -> ChunkedResult:
+    """
+    อ่าน ledger ทีละ chunk → prepare (ค่าเริ่มต้น calculate_variance; main.py ส่งตัว normalize คอลัมน์)
+    → รวม aggregate; หน่วยความจำ ~ chunk_rows + จำนวนกลุ่ม ไม่ขึ้นกับความยาวไฟล์
+    """
+    fmt = fmt or detect_format(source if isinstance(source, (str, os.PathLike)) else getattr(source, "name", ""))
+    agg = LedgerAggregator(top_k=top_k)
+    for chunk in iter_chunks(source, fmt, chunk_rows):
+        with stage("chunk_prepare"):
+            prepared = prepare(chunk)
+        with stage("chunk_aggregate"):
+            agg.add(prepared)
+    return agg.result()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m budget_plus.chunked", description="Out-of-core ledger analysis")
+    ap.add_argument("ledger", help="CSV / Parquet / Arrow (Feather) file")
+    ap.add_argument("--format", choices=CHUNK_FORMATS, help="default: from the file extension")
+    ap.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    ap.add_argument("--top-k", type=int, default=CHUNK_TOP_K)
+    ap.add_argument("--json", help="write summary / suggestions / scenarios / alerts / top drivers here")
+    ap.add_argument("--summary-csv", help="write the Version × Scenario × Cost Center summary here")
+    ap.add_argument("--pdf", help="write the PDF report here")
+    args = ap.parse_args(argv)
+
+    result = process_ledger(args.ledger, args.format, args.chunk_rows, top_k=args.top_k)
+    print(f"{result.rows:,} rows in {result.chunks} chunks → {len(result.summary):,} summary groups")
+    if args.json:
+        try:
+            from .utils.fast_json import dumps
+        except ImportError:
+            from utils.fast_json import dumps
+        with open(args.json, "wb") as f:
+            f.write(dumps(result.to_dict()))
+    if args.summary_csv:
+        result.summary.to_csv(args.summary_csv, index=False)
+    if args.pdf:
+        with open(args.pdf, "wb") as f:
+            f.write(result.to_pdf().getvalue())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,69 @@
+import os
+import tempfile
+
 # ✅ คอลัมน์ประเภทเปอร์เซ็นต์ (จะถูก format เป็น % ตอนแสดงผล / ใน Excel)
 PERCENT_COLUMNS = [
     "Margin",
     "Growth",
     "Utilization",
 ]
+
+# ✅ จำกัดจำนวนกลุ่มในกราฟ/สรุป (ที่เหลือรวมเป็น "Other") — None = ไม่จำกัด
+CHART_TOP_N = 15
+SUMMARY_TOP_N = 50
+
+# ✅ PDF แบบขนาน (opt-in): แยก section ไป render ใน worker process แล้วรวมไฟล์
+#    ปิดไว้เป็นค่าเริ่มต้น — ตารางสรุปถูกจำกัดที่ SUMMARY_TOP_N แถว รายงานปกติจึงสั้นเกินกว่าที่ค่า spawn/merge จะคุ้ม
+#    (ตาราง 1000 แถว: 2.0 วินาทีแบบขนาน vs 0.43 วินาทีแบบ canvas เดียว) — เปิดเมื่อ summary_top_n=None กับข้อมูลใหญ่
+PDF_PARALLEL = os.getenv("BUDGET_PDF_PARALLEL", "0").strip().lower() in ("1", "true", "yes")
+PDF_SECTION_ROWS = 2500     # จำนวนแถวของตารางสรุปต่อ 1 section (~50 หน้า)
+PDF_WORKERS = None          # None = os.cpu_count()
+
+# ✅ profile ของแอป: "full" = ทุก endpoint, "lite" = เฉพาะ JSON analysis (/analyze, /analyze-suggest)
+#    lite ไม่ mount endpoint ที่สร้าง Excel/PDF/ZIP → ไม่โหลด matplotlib/reportlab/openpyxl เลย
+APP_PROFILE = os.getenv("BUDGET_APP_PROFILE", "full").strip().lower()
+
+# ✅ admin token สำหรับ ?profile=1 และ /admin/* (ว่าง = ปิด profiling ทั้งหมด)
+ADMIN_TOKEN = os.getenv("BUDGET_ADMIN_TOKEN", "")
+PROFILE_STORE_SIZE = 20         # จำนวน profile ล่าสุดที่เก็บไว้ให้ดาวน์โหลด
+PROFILE_SAMPLE_INTERVAL = 0.005  # วินาทีต่อ sample (sampling profiler)
+
+# ✅ event-loop watchdog: บันทึก route + stack เมื่อ loop ค้างเกินเกณฑ์ (0 = ปิด)
+LOOP_BLOCK_THRESHOLD = float(os.getenv("BUDGET_LOOP_BLOCK_MS", "250")) / 1000
+LOOP_HEARTBEAT_INTERVAL = 0.05
+
+# ✅ admission control: งบหน่วยความจำรวมของ request ที่รันพร้อมกัน (ประเมินจากแถว × คอลัมน์ × ไฟล์ที่สร้าง)
+MEMORY_BUDGET_MB = int(os.getenv("BUDGET_MEMORY_BUDGET_MB", "1024"))
+MAX_INPUT_ROWS = int(os.getenv("BUDGET_MAX_INPUT_ROWS", "1000000"))
+ADMISSION_QUEUE_TIMEOUT = 10.0  # วินาทีที่รอคิวก่อนตอบ 503
+
+# ✅ dataset store: POST /datasets เก็บข้อมูลที่ normalize แล้ว (Feather, อ่านแบบ mmap)
+#    → endpoint วิเคราะห์/รายงานส่ง ?dataset_id= แทนการอัปโหลดไฟล์ซ้ำ
+DATASET_DIR = os.getenv("BUDGET_DATASET_DIR", os.path.join(tempfile.gettempdir(), "budget_datasets"))
+DATASET_TTL_SECONDS = float(os.getenv("BUDGET_DATASET_TTL_HOURS", "24")) * 3600  # นับจากการใช้ครั้งล่าสุด
+DATASET_MAX_MB = int(os.getenv("BUDGET_DATASET_MAX_MB", "2048"))                   # เกิน → ลบตัวที่ไม่ได้ใช้นานสุด
+DATASET_MAX_ITEMS = 200
+
+# ✅ out-of-core (POST /analyze-chunked, chunked.py): CSV / Parquet / Arrow อ่านทีละ chunk
+#    → หน่วยความจำ ~ CHUNK_ROWS แถว + จำนวนกลุ่ม ไม่ขึ้นกับความยาวไฟล์
+CHUNK_ROWS = 200_000
+CHUNK_TOP_K = 20                 # จำนวนรายการ variance สูงสุด (ระดับบรรทัด) ที่เก็บไว้
+MAX_CHUNKED_UPLOAD_MB = int(os.getenv("BUDGET_MAX_CHUNKED_UPLOAD_MB", "2048"))
+
+# ✅ aggregation หลาย process (parallel_agg.py): แบ่งแถวตาม hash ของ Cost Center → shared memory
+#    ใช้อัตโนมัติเมื่อข้อมูลถึง PARALLEL_AGG_MIN_ROWS แถว และมีมากกว่า 1 core
+PARALLEL_AGG_MIN_ROWS = int(os.getenv("BUDGET_PARALLEL_AGG_MIN_ROWS", "500000"))
+PARALLEL_AGG_WORKERS = None     # None = os.cpu_count()
+
+# ✅ consolidation หลาย entity (POST /consolidate): แปลงทุกไฟล์เป็นสกุลเงินกลุ่มด้วยตารางอัตรา (Currency, Date)
+GROUP_CURRENCY = os.getenv("BUDGET_GROUP_CURRENCY", "THB").strip().upper()
+CONSOLIDATION_MAX_FILES = 20
+CONSOLIDATION_WORKERS = None    # None = os.cpu_count() (อ่าน workbook แต่ละไฟล์ใน process แยก)
+
+# ✅ FX store (fx_store.py, /fx/rates): ตารางอัตรา Currency / Date / Rate เก็บเป็นไฟล์เดียว (.csv หรือ .parquet)
+#    workbook ที่มีคอลัมน์ Currency แต่ไม่มี FX Rate → เติมอัตรา as-of จาก store (สกุลเงินกลุ่ม = 1)
+FX_STORE_PATH = os.getenv("BUDGET_FX_STORE_PATH", os.path.join(tempfile.gettempdir(), "budget_fx_rates.csv"))
+
+# ✅ ลำดับชั้น cost center (hierarchy.py, /hierarchy): ตาราง parent–child ไฟล์เดียว
+#    /analyze?rollup=true และ /export-excel-exec?hierarchy_level= ใช้ยอดรวมทั้ง subtree
+HIERARCHY_PATH = os.getenv("BUDGET_HIERARCHY_PATH", os.path.join(tempfile.gettempdir(), "budget_cost_center_hierarchy.csv"))
@@ -0,0 +1,163 @@
+"""
+consolidation.py
+Multi-entity consolidation into one group-currency ledger (POST /consolidate):
+- entity workbooks (local currency) are parsed in parallel in the shared process pool
+- an FX rate table keyed by (Currency, Date) — "1 unit of Currency = Rate units of group currency",
+  one row per rate change (e.g. month-end) — is attached with one sorted as-of merge
+  (pd.merge_asof by Currency: the latest rate on or before each row's Month), not per-row lookups
+- rows without a Month use the latest rate of their currency; group-currency rows use 1.0
+- Planned and Actual are translated to the group currency (the local figures are kept in
+  "Local Planned" / "Local Actual", the rate used in "Translation Rate"); "FX Rate" is set to 1
+  so calculate_variance does not apply the rate a second time
+The result carries "Entity" and "Currency" columns and feeds every existing report via the dataset store.
+"""
+
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .utils.process_pool import resolve_workers, run_all
+    from .config import CONSOLIDATION_WORKERS
+except ImportError:
+    from utils.process_pool import resolve_workers, run_all
+    from config import CONSOLIDATION_WORKERS
+
+RATE_COLUMN_ALIASES: Dict[str, List[str]] = {
+    "Currency": ["Currency", "Ccy", "CCY", "Currency Code"],
+    "Date": ["Date", "Month", "Period", "As Of", "Effective Date"],
+    "Rate": ["Rate", "FX Rate", "FX", "Rate To Group"],
+}
+
+
+@dataclass
+class EntityFrame:
+    name: str
+    frame: pd.DataFrame           # normalize คอลัมน์แล้ว (Cost Center / Planned / Actual ...)
+    currency: Optional[str]       # สกุลเงินท้องถิ่น (ถ้าไฟล์ไม่มีคอลัมน์ Currency)
+
+
+class MissingRates(ValueError):
+    def __init__(self, missing: List[Dict[str, Any]]):
+        self.missing = missing
+        shown = ", ".join(f"{m['currency']} @ {m['month'] or 'latest'}" for m in missing[:10])
+        super().__init__(f"no FX rate for {len(missing)} currency/month pair(s): {shown}")
+
+
+# ---------- parsing ----------
+
+def read_workbook(content: bytes) -> pd.DataFrame:
+    """ฟังก์ชันระดับโมดูล → ส่งไปรันใน worker process ได้"""
+    return pd.read_excel(BytesIO(content), engine="openpyxl")
+
+
+def read_workbooks(contents: Sequence[bytes], workers: Optional[int] = CONSOLIDATION_WORKERS) -> List[pd.DataFrame]:
+    """หลายไฟล์พร้อมกันใน process pool (openpyxl ติด GIL — thread ไม่ช่วย); ไฟล์เดียว/1 core อ่านตรงนี้เลย"""
+    workers = min(resolve_workers(workers), len(contents))
+    if workers <= 1:
+        return [read_workbook(c) for c in contents]
+    return run_all([(read_workbook, (c,)) for c in contents], workers)
+
+
+def read_rate_table(content: bytes, filename: str) -> pd.DataFrame:
+    ext = os.path.splitext(filename.lower())[1]
+    if ext == ".csv":
+        raw = pd.read_csv(BytesIO(content))
+    elif ext in (".xlsx", ".xls"):
+        raw = pd.read_excel(BytesIO(content), engine="openpyxl")
+    elif ext == ".parquet":
+        raw = pd.read_parquet(BytesIO(content))
+    else:
+        raise ValueError(f"unsupported rate table format: {filename!r} (expected .csv, .xlsx, .parquet)")
+    return normalize_rate_table(raw)
+
+
+def normalize_rate_table(raw: pd.DataFrame) -> pd.DataFrame:
+    """→ Currency (ตัวพิมพ์ใหญ่) / Date (datetime64) / Rate (float) เรียงตาม Date"""
+    rename = {}
+    for target, candidates in RATE_COLUMN_ALIASES.items():
+        found = next((c for c in candidates if c in raw.columns), None)
+        if found is None:
+            raise ValueError(f"rate table needs a {target} column (one of {candidates}); found {list(raw.columns)}")
+        rename[found] = target
+    rates = raw[list(rename)].rename(columns=rename)
+    rates = pd.DataFrame({
+        "Currency": rates["Currency"].astype(str).str.strip().str.upper(),
+        "Date": pd.to_datetime(rates["Date"], errors="coerce").astype("datetime64[ns]"),
+        "Rate": pd.to_numeric(rates["Rate"], errors="coerce"),
+    }).dropna()
+    if rates.empty:
+        raise ValueError("rate table has no usable (Currency, Date, Rate) rows")
+    return rates.sort_values("Date", kind="stable").reset_index(drop=True)
+
+
+# ---------- rates ----------
+
+def attach_rates(df: pd.DataFrame, rates: pd.DataFrame, group_currency: str) -> np.ndarray:
+    """
+    อัตรา as-of ต่อแถว (ตามลำดับแถวเดิมของ df): merge_asof ครั้งเดียวบนข้อมูลที่เรียงตามวันที่
+    df ต้องมีคอลัมน์ Currency; Month (ถ้ามี) เป็นวันที่ของแถว
+    """
+    currency = df["Currency"].astype(str).str.strip().str.upper().to_numpy()
+    if "Month" in df.columns:
+        dates = pd.to_datetime(df["Month"], errors="coerce").to_numpy()
+    else:
+        dates = np.full(len(df), np.datetime64("NaT"), dtype="datetime64[ns]")
+    no_month = np.isnat(dates)
+    dates = np.where(no_month, np.datetime64(pd.Timestamp.max), dates)   # ไม่มี Month → อัตราล่าสุด
+
+    order = np.argsort(dates, kind="stable")
+    left = pd.DataFrame({"Date": dates[order], "Currency": currency[order]})
+    merged = pd.merge_asof(left, rates, on="Date", by="Currency", direction="backward")
+    out = np.empty(len(df))
+    out[order] = merged["Rate"].to_numpy()
+    out[currency == group_currency.upper()] = 1.0
+
+    missing = np.isnan(out)
+    if missing.any():
+        pairs = pd.DataFrame({"currency": currency[missing], "month": np.where(no_month[missing], None,
+                              pd.DatetimeIndex(dates[missing]).strftime("%Y-%m-%d"))}).drop_duplicates()
+        raise MissingRates(pairs.sort_values(["currency", "month"]).to_dict(orient="records"))
+    return out
+
+
+def consolidate(entities: Sequence[EntityFrame], rates: pd.DataFrame, group_currency: str) -> Tuple[pd.DataFrame, List[Dict]]:
+    """
+    รวมทุก entity เป็น DataFrame เดียวในสกุลเงินกลุ่ม (ยังไม่คำนวณ variance — ส่งต่อ calculate_variance)
+    คืน (frame, สรุปต่อ entity)
+    """
+    frames, report = [], []
+    for entity in entities:
+        data = entity.frame.copy(deep=False)
+        if "Currency" in data.columns:
+            if entity.currency:
+                data["Currency"] = data["Currency"].fillna(entity.currency)
+        elif entity.currency:
+            data["Currency"] = entity.currency
+        else:
+            raise ValueError(f"entity {entity.name!r}: no Currency column and no local currency given")
+        data["Entity"] = entity.name
+        frames.append(data)
+        report.append({
+            "entity": entity.name,
+            "rows": int(len(data)),
+            "currencies": sorted(data["Currency"].astype(str).str.upper().unique().tolist()),
+        })
+
+    combined = pd.concat(frames, ignore_index=True, sort=False)
+    rate = attach_rates(combined, rates, group_currency)
+    combined["Currency"] = combined["Currency"].astype(str).str.strip().str.upper()
+    combined["Local Planned"] = combined["Planned"]
+    combined["Local Actual"] = combined["Actual"]
+    combined["Planned"] = combined["Planned"] * rate
+    combined["Actual"] = combined["Actual"] * rate
+    combined["Translation Rate"] = rate
+    combined["FX Rate"] = 1.0
+    for row in report:
+        mask = combined["Entity"] == row["entity"]
+        row["planned_group"] = float(combined.loc[mask, "Planned"].sum())
+    return combined, report
@@ -0,0 +1,90 @@
+"""
+dataset_routes.py
+Stored datasets (mounted in every profile; ingestion itself is POST /datasets in main.py,
+which owns column normalization):
+- GET    /datasets       : datasets currently in the store (most recently used first)
+- GET    /datasets/{id}  : rows / columns / size / expiry of one dataset
+- DELETE /datasets/{id}  : remove it before its TTL
+DATASET_STORE is shared with main.py and report_exec_routes.py, which accept ?dataset_id=.
+"""
+
+from typing import Sequence
+import pandas as pd
+
+from fastapi import APIRouter, HTTPException
+
+try:
+    from .utils.profiling import run_in_threadpool
+    from .utils.dataset_store import DatasetStore, DatasetInfo
+    from .utils.memory_budget import estimate_frame_cost, admit, AdmissionRejected, rejection_http_error
+    from .utils.metrics import stage, add_rows
+    from .config import DATASET_DIR, DATASET_TTL_SECONDS, DATASET_MAX_MB, DATASET_MAX_ITEMS
+except ImportError:
+    from utils.profiling import run_in_threadpool
+    from utils.dataset_store import DatasetStore, DatasetInfo
+    from utils.memory_budget import estimate_frame_cost, admit, AdmissionRejected, rejection_http_error
+    from utils.metrics import stage, add_rows
+    from config import DATASET_DIR, DATASET_TTL_SECONDS, DATASET_MAX_MB, DATASET_MAX_ITEMS
+
+router = APIRouter(tags=["datasets"])
+
+DATASET_STORE = DatasetStore(DATASET_DIR, DATASET_TTL_SECONDS, DATASET_MAX_MB * 1024 * 1024, DATASET_MAX_ITEMS)
+
+
+def _not_found(dataset_id: str) -> HTTPException:
+    return HTTPException(
+        status_code=404,
+        detail=f"ไม่พบ dataset '{dataset_id}' (หมดอายุหรือถูกลบแล้ว — อัปโหลดใหม่ที่ POST /datasets)",
+    )
+
+
+def dataset_or_404(dataset_id: str) -> DatasetInfo:
+    info = DATASET_STORE.info(dataset_id)
+    if info is None:
+        raise _not_found(dataset_id)
+    return info
+
+
+async def admit_dataset(dataset_id: str, artifacts: Sequence[str] = ("json",)) -> DatasetInfo:
+    """404 ถ้าไม่มี dataset + admission ตามขนาดที่เก็บไว้ (ไม่มีต้นทุน parse)"""
+    info = dataset_or_404(dataset_id)
+    try:
+        await admit(estimate_frame_cost(info.rows, info.cols, artifacts))
+    except AdmissionRejected as e:
+        raise rejection_http_error(e)
+    return info
+
+
+async def read_dataset(dataset_id: str) -> pd.DataFrame:
+    """อ่านแบบ memory-mapped (ไม่ต้อง parse Excel ซ้ำ)"""
+    with stage("dataset_read"):
+        df = await run_in_threadpool(DATASET_STORE.load, dataset_id)
+    if df is None:   # ถูกลบ/หมดอายุระหว่างรอคิว
+        raise _not_found(dataset_id)
+    add_rows(len(df))
+    return df
+
+
+async def load_dataset(dataset_id: str, artifacts: Sequence[str] = ("json",)) -> pd.DataFrame:
+    await admit_dataset(dataset_id, artifacts)
+    return await read_dataset(dataset_id)
+
+
+@router.get("/datasets")
+def list_datasets():
+    return {
+        "ttl_seconds": DATASET_STORE.ttl,
+        "datasets": [i.to_dict(DATASET_STORE.ttl) for i in DATASET_STORE.list()],
+    }
+
+
+@router.get("/datasets/{dataset_id}")
+def get_dataset(dataset_id: str):
+    return dataset_or_404(dataset_id).to_dict(DATASET_STORE.ttl)
+
+
+@router.delete("/datasets/{dataset_id}")
+def delete_dataset(dataset_id: str):
+    dataset_or_404(dataset_id)
+    DATASET_STORE.delete(dataset_id)
+    return {"deleted": dataset_id}
@@ -0,0 +1,125 @@
+"""
+diagnostics_routes.py
+Operational endpoints (mounted in every profile):
+- GET /diagnostics/imports : cold-import timing of the app module, per module and per package
+                             (fresh interpreter; cached per process, ?refresh=true + X-Admin-Token to re-run)
+- GET /metrics             : per-stage / per-request latency histograms and rows / bytes counters
+                             (Prometheus text exposition format, collected in-process)
+- GET /diagnostics/event-loop : event-loop lag and recent stalls (route + stack of the blocking code)
+- GET /admin/profiles      : request profiles captured with ?profile=1|cprofile (X-Admin-Token)
+- GET /admin/profiles/{id} : one profile as collapsed stacks / pstats dump / text summary
+"""
+
+from typing import Dict, Optional
+import sys
+import threading
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import Response
+
+try:
+    from .utils.import_report import import_time_report, HEAVY_MODULES
+    from .utils.metrics import render_latest, CONTENT_TYPE
+    from .utils.profiling import ProfileStore, PROFILE_FORMATS, require_admin
+    from .utils.loop_watchdog import LoopWatchdog
+    from .config import APP_PROFILE, ADMIN_TOKEN, PROFILE_STORE_SIZE
+    from .config import LOOP_BLOCK_THRESHOLD, LOOP_HEARTBEAT_INTERVAL
+except ImportError:
+    from utils.import_report import import_time_report, HEAVY_MODULES
+    from utils.metrics import render_latest, CONTENT_TYPE
+    from utils.profiling import ProfileStore, PROFILE_FORMATS, require_admin
+    from utils.loop_watchdog import LoopWatchdog
+    from config import APP_PROFILE, ADMIN_TOKEN, PROFILE_STORE_SIZE
+    from config import LOOP_BLOCK_THRESHOLD, LOOP_HEARTBEAT_INTERVAL
+
+router = APIRouter(tags=["diagnostics"])
+
+MAIN_MODULE = f"{__package__}.main" if __package__ else "main"
+
+# profile ที่ ProfilingMiddleware เก็บไว้ (main.py ส่ง store นี้ให้ middleware)
+PROFILE_STORE = ProfileStore(PROFILE_STORE_SIZE)
+# เริ่ม/หยุดใน lifespan ของ main.py
+LOOP_WATCHDOG = LoopWatchdog(LOOP_BLOCK_THRESHOLD, LOOP_HEARTBEAT_INTERVAL)
+
+_import_report: Optional[Dict] = None
+_import_lock = threading.Lock()
+
+
+@router.get("/diagnostics/imports")
+def diagnostics_imports(
+    top: int = Query(30, ge=1, le=500),
+    refresh: bool = Query(False, description="true = วัดใหม่ (X-Admin-Token)"),
+    x_admin_token: Optional[str] = Header(None),
+):
+    """เวลา import ของแอปแบบ cold start (รัน interpreter ใหม่ 1 ครั้ง แล้ว cache ไว้)"""
+    global _import_report
+    if refresh:
+        _require_admin(x_admin_token)     # แต่ละครั้ง = interpreter ใหม่ (สูงสุด 120 วินาที)
+    with _import_lock:
+        if _import_report is None or refresh:
+            try:
+                _import_report = import_time_report(MAIN_MODULE, top=500)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"วัดเวลา import ไม่สำเร็จ: {e}")
+        report = _import_report
+
+    return {
+        **report,
+        "modules": report["modules"][:top],
+        "packages": report["packages"][:top],
+        "profile": APP_PROFILE,
+        # โมดูลหนักที่ถูกโหลดแล้วใน process นี้ (จาก request ที่ใช้ renderer)
+        "heavy_loaded_now": [m for m in HEAVY_MODULES if m in sys.modules],
+    }
+
+
+@router.get("/diagnostics/event-loop")
+def diagnostics_event_loop(limit: int = Query(20, ge=1, le=50)):
+    """lag ของ event loop + รายการ stall ล่าสุด (route ที่ทำงาน sync อยู่ พร้อม stack)"""
+    return LOOP_WATCHDOG.snapshot(limit)
+
+
+@router.get("/metrics")
+def metrics():
+    """ตัวเลขทั้งหมดในรูป Prometheus text format (scrape ได้ตรง ๆ)"""
+    return Response(content=render_latest(), media_type=CONTENT_TYPE)
+
+
+def _require_admin(token: Optional[str]):
+    require_admin(ADMIN_TOKEN, token)
+
+
+@router.get("/admin/profiles")
+def list_profiles(x_admin_token: Optional[str] = Header(None)):
+    _require_admin(x_admin_token)
+    return {"profiles": PROFILE_STORE.list()}
+
+
+_PROFILE_MEDIA = {
+    "collapsed": ("text/plain; charset=utf-8", "txt"),
+    "pstats": ("application/octet-stream", "prof"),
+    "text": ("text/plain; charset=utf-8", "txt"),
+}
+
+
+@router.get("/admin/profiles/{profile_id}")
+def get_profile(
+    profile_id: str,
+    format: Optional[str] = Query(None, description="collapsed | pstats | text (ค่าเริ่มต้นตาม mode)"),
+    x_admin_token: Optional[str] = Header(None),
+):
+    _require_admin(x_admin_token)
+    entry = PROFILE_STORE.get(profile_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="ไม่พบ profile (อาจถูกลบไปแล้วเพราะเก็บได้จำกัด)")
+    fmt = format or ("collapsed" if entry["mode"] == "sample" else "text")
+    if fmt not in PROFILE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format ต้องเป็นหนึ่งใน {', '.join(PROFILE_FORMATS)}")
+    if fmt not in entry["formats"]:
+        raise HTTPException(status_code=404, detail=f"profile นี้ไม่มี {fmt} (มี: {', '.join(entry['formats'])})")
+    media_type, ext = _PROFILE_MEDIA[fmt]
+    return Response(
+        content=entry[fmt],
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=profile_{profile_id}_{fmt}.{ext}"},
+    )
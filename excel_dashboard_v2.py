@@ -5,6 +5,8 @@ Generate an Executive Dashboard Excel with:
 - Dynamic dimension for variance chart (Category/Department/Region/Product/Customer/Cost Center)
 - Scenarios sheet (±5% for FX/Price/Volume when columns available)
 - Alerts sheet (rolling 3M trend crossing > 8%, requires Month column)
+- Hierarchy sheet + "CC Level N" dimensions when a cost center hierarchy is given
+  (hierarchy_level=N charts variance by the level-N ancestor instead of the flat Cost Center)
 """
 
 from typing import Optional, Dict, Any, List
@@ -12,6 +14,7 @@ import pandas as pd
 import numpy as np
 
 from .scenarios_alerts import compute_scenarios, scan_alerts
+from .utils.metrics import stage
 
 DEFAULT_DIM_PRIORITY = ["Category", "Department", "Region", "Product", "Customer", "Cost Center"]
 
@@ -35,10 +38,19 @@ def generate_excel_dashboard_v2(
     outfile: str,
     next_actions: Optional[Dict[str, Any]] = None,
     dim_priority: Optional[List[str]] = None,
-    top_n: int = 10
+    top_n: int = 10,
+    hierarchy=None,
+    hierarchy_level: Optional[int] = None,
 ) -> str:
     data = _ensure_calc(df)
-    dim = _pick_dim(data, dim_priority)
+    if hierarchy is not None and "Cost Center" in data.columns:
+        data = data.join(hierarchy.level_columns(data["Cost Center"]))
+    else:
+        hierarchy = None
+    if hierarchy is not None and hierarchy_level:
+        dim = hierarchy.level_name(min(hierarchy_level, hierarchy.depth))
+    else:
+        dim = _pick_dim(data, dim_priority)
 
     total_plan = float(data["Planned"].sum())
     total_actual_fx = float(data["FX Adjusted Actual"].sum())
@@ -52,7 +64,8 @@ def generate_excel_dashboard_v2(
                   .sum()
                   .sort_values("Variance", ascending=False))
 
-    with pd.ExcelWriter(outfile, engine="xlsxwriter") as writer:
+    # excel_write รวมเวลาทั้งไฟล์ (scenarios / alerts วัดแยกซ้อนอยู่ข้างใน)
+    with stage("excel_write"), pd.ExcelWriter(outfile, engine="xlsxwriter") as writer:
         wb = writer.book
 
         # Formats
@@ -131,6 +144,21 @@ def generate_excel_dashboard_v2(
         for idx, col in enumerate(data.columns):
             ws_details.set_column(idx, idx, 18)
 
+        # Hierarchy sheet (ยอดรวมทั้ง subtree ทุก node, ย่อหน้าตามระดับ)
+        if hierarchy is not None:
+            tree = hierarchy.rollup(data, by=())
+            ws_h = wb.add_worksheet("Hierarchy")
+            cols = ["Cost Center", "Level", "Planned", "FX Adjusted Actual", "Variance"]
+            for c, name in enumerate(cols):
+                ws_h.write(0, c, name, fmt_hdr)
+            for r, rec in enumerate(tree[cols].itertuples(index=False), start=1):
+                ws_h.write(r, 0, "    " * (rec[1] - 1) + str(rec[0]))
+                ws_h.write(r, 1, int(rec[1]))
+                for c in (2, 3, 4):
+                    ws_h.write(r, c, float(rec[c]), fmt_money)
+            ws_h.set_column(0, 0, 36)
+            ws_h.set_column(1, 4, 18)
+
         # Drivers sheet (top abs variance)
         drv = (data.assign(abs_var=lambda d: d["Variance"].abs())
                .sort_values("abs_var", ascending=False)
@@ -142,7 +170,8 @@ def generate_excel_dashboard_v2(
             ws_drv.set_column(idx, idx, 18)
 
         # Scenarios sheet
-        sc = compute_scenarios(data)
+        with stage("scenarios"):
+            sc = compute_scenarios(data)
         sc_df = pd.DataFrame(sc["scenarios"])
         sc_df.to_excel(writer, index=False, sheet_name="Scenarios")
         ws_sc = writer.sheets["Scenarios"]
@@ -155,7 +184,8 @@ def generate_excel_dashboard_v2(
         ws_sc.write(1, len(sc_df.columns)+2, sc["summary"]["base_variance"])
 
         # Alerts sheet
-        al = scan_alerts(data, pct_threshold=0.08)
+        with stage("alerts"):
+            al = scan_alerts(data, pct_threshold=0.08)
         # time series
         ser_cols = ["Month", "Planned", "FX Adjusted Actual", "ratio", "rolling3m"]
         ser_df = pd.DataFrame(al.get("series", []))
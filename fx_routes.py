@@ -0,0 +1,70 @@
+"""
+fx_routes.py
+Local FX rate store (mounted in every profile):
+- GET    /fx/rates             : currencies in the store with their date range / number of points
+- POST   /fx/rates             : upload a rate table (Currency / Date / Rate; .csv, .xlsx, .parquet),
+                                 merged into the store (?replace=true replaces it) — X-Admin-Token
+- GET    /fx/rates/{currency}  : as-of rate for ?date= (default: latest)
+- DELETE /fx/rates             : empty the store — X-Admin-Token
+Writes are admin-only: the curve changes the result of every endpoint for workbooks with a Currency column.
+FX_STORE is shared with main.py (fills a missing "FX Rate" column) and POST /consolidate.
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, File, Header, HTTPException, Query, UploadFile
+
+try:
+    from .fx_store import FxStore
+    from .utils.profiling import require_admin, run_in_threadpool
+    from .config import ADMIN_TOKEN, FX_STORE_PATH, GROUP_CURRENCY
+except ImportError:
+    from fx_store import FxStore
+    from utils.profiling import require_admin, run_in_threadpool
+    from config import ADMIN_TOKEN, FX_STORE_PATH, GROUP_CURRENCY
+
+router = APIRouter(tags=["fx"])
+
+FX_STORE = FxStore(FX_STORE_PATH)
+
+
+@router.get("/fx/rates")
+def list_rates():
+    return {"group_currency": GROUP_CURRENCY, "currencies": FX_STORE.currencies()}
+
+
+@router.post("/fx/rates")
+async def upload_rates(
+    file: UploadFile = File(...),
+    replace: bool = Query(False, description="true = แทนที่ทั้งตาราง"),
+    x_admin_token: Optional[str] = Header(None),
+):
+    require_admin(ADMIN_TOKEN, x_admin_token)
+    content = await file.read()
+    if not content:
+        raise HTTPException(status_code=400, detail="ไฟล์ว่างเปล่า")
+    try:
+        currencies = await run_in_threadpool(FX_STORE.load_file, content, file.filename or "", replace)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"อ่านตารางอัตราแลกเปลี่ยนไม่สำเร็จ: {e}")
+    return {"group_currency": GROUP_CURRENCY, "currencies": currencies}
+
+
+@router.get("/fx/rates/{currency}")
+def get_rate(currency: str, date: Optional[str] = Query(None, description="YYYY-MM-DD (ไม่ระบุ = อัตราล่าสุด)")):
+    if currency.strip().upper() == GROUP_CURRENCY:
+        return {"currency": GROUP_CURRENCY, "date": date, "rate": 1.0}
+    try:
+        rate = FX_STORE.rate(currency, date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"วันที่ไม่ถูกต้อง: {e}")
+    if rate is None:
+        raise HTTPException(status_code=404, detail=f"ไม่พบอัตรา {currency.upper()} ณ {date or 'ล่าสุด'}")
+    return {"currency": currency.strip().upper(), "date": date, "rate": rate}
+
+
+@router.delete("/fx/rates")
+def clear_rates(x_admin_token: Optional[str] = Header(None)):
+    require_admin(ADMIN_TOKEN, x_admin_token)
+    FX_STORE.clear()
+    return {"cleared": True}
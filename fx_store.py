@@ -0,0 +1,200 @@
+"""
+fx_store.py
+Local FX curve store: one rate table (Currency, Date, Rate = group-currency units per 1 unit),
+loaded from CSV / Parquet / Excel, persisted as one file (FX_STORE_PATH; .csv or .parquet) and
+cached in memory as one sorted NumPy (dates, rates) pair per currency.
+- rates_for(currency, month) fills rates for a whole frame with as-of binary search
+  (np.searchsorted per currency, on the distinct months only): a handful of vectorized ops for 1M rows
+- the file is the source of truth: every uvicorn worker reloads its cache when the file's mtime changes
+- calculate_variance / compute_scenarios take fx_store=...; main.py fills a missing "FX Rate"
+  column from the store for workbooks that carry a "Currency" column
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Union
+import hashlib
+import os
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .consolidation import MissingRates, normalize_rate_table, read_rate_table
+except ImportError:
+    from consolidation import MissingRates, normalize_rate_table, read_rate_table
+
+_NAT = np.iinfo(np.int64).min
+_LATEST = np.iinfo(np.int64).max      # แถวที่ไม่มี Month → อัตราล่าสุด
+
+
+@dataclass
+class RateSeries:
+    dates: np.ndarray    # int64 ns, เรียงจากน้อยไปมาก
+    rates: np.ndarray    # float64
+
+    def asof(self, when: np.ndarray) -> np.ndarray:
+        idx = np.searchsorted(self.dates, when, side="right") - 1
+        out = self.rates[np.maximum(idx, 0)]
+        return np.where(idx >= 0, out, np.nan)
+
+
+class FxStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._table = pd.DataFrame({"Currency": pd.Series(dtype=object), "Date": pd.Series(dtype="datetime64[ns]"),
+                                    "Rate": pd.Series(dtype=float)})
+        self._series: Dict[str, RateSeries] = {}
+        self._version = ""
+
+    # ---------- cache ----------
+    def _refresh(self):
+        """โหลดใหม่เมื่อไฟล์เปลี่ยน (worker อื่นอัปเดต) — ไม่มีไฟล์ = store ว่าง"""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            if mtime is None:
+                table = self._table.iloc[0:0]
+            elif self.path.endswith(".parquet"):
+                table = normalize_rate_table(pd.read_parquet(self.path))
+            else:
+                table = normalize_rate_table(pd.read_csv(self.path))
+            self._set(table)
+            self._mtime = mtime
+
+    def _set(self, table: pd.DataFrame):
+        table = table.sort_values(["Currency", "Date"], kind="stable").reset_index(drop=True)
+        series = {}
+        for ccy, part in table.groupby("Currency", sort=False):
+            series[ccy] = RateSeries(part["Date"].to_numpy("datetime64[ns]").view("i8"), part["Rate"].to_numpy(float))
+        self._table, self._series = table, series
+        self._version = hashlib.sha256(pd.util.hash_pandas_object(table, index=False).to_numpy().tobytes()).hexdigest()[:16]
+
+    @property
+    def table(self) -> pd.DataFrame:
+        self._refresh()
+        return self._table
+
+    def currencies(self) -> Dict[str, Dict]:
+        self._refresh()
+        return {
+            ccy: {"from": str(pd.Timestamp(s.dates[0]).date()), "to": str(pd.Timestamp(s.dates[-1]).date()),
+                  "points": int(len(s.dates))}
+            for ccy, s in self._series.items()
+        }
+
+    @property
+    def version(self) -> str:
+        """hash ของตารางอัตรา ("" = store ว่าง) — ใส่ใน key ของผลลัพธ์ที่เก็บไว้ซึ่งใช้อัตราจาก store"""
+        self._refresh()
+        return self._version if self._series else ""
+
+    def has_rates(self) -> bool:
+        self._refresh()
+        return bool(self._series)
+
+    # ---------- lookups ----------
+    def series(self, currency: str) -> Optional[RateSeries]:
+        self._refresh()
+        return self._series.get(str(currency).strip().upper())
+
+    def rate(self, currency: str, when=None) -> Optional[float]:
+        s = self.series(currency)
+        if s is None:
+            return None
+        t = _LATEST if when is None else pd.Timestamp(when).value
+        value = s.asof(np.array([t], dtype=np.int64))[0]
+        return None if np.isnan(value) else float(value)
+
+    def rates_for(self, currency: Union[pd.Series, Sequence], month: Optional[Union[pd.Series, Sequence]] = None,
+                  group_currency: Optional[str] = None, strict: bool = True) -> np.ndarray:
+        """
+        อัตรา as-of ต่อแถว: factorize สกุลเงิน/เดือน (ค่าที่ไม่ซ้ำมีไม่กี่ค่า) → searchsorted ต่อสกุลเงิน
+        strict=True → MissingRates เมื่อมีแถวที่หาอัตราไม่ได้; False → NaN
+        """
+        self._refresh()
+        cur_codes, cur_uniques = pd.factorize(pd.Series(currency).to_numpy())
+        when = _month_ns(month, len(cur_codes))
+
+        out = np.full(len(cur_codes), np.nan)
+        group = (group_currency or "").strip().upper()
+        for code, raw in enumerate(cur_uniques):
+            rows = np.flatnonzero(cur_codes == code)
+            ccy = str(raw).strip().upper()
+            if ccy == group:
+                out[rows] = 1.0
+            elif ccy in self._series:
+                out[rows] = self._series[ccy].asof(when[rows])
+
+        if strict and np.isnan(out).any():
+            missing = np.isnan(out)
+            labels = np.where(cur_codes[missing] >= 0, np.asarray(cur_uniques, dtype=object)[cur_codes[missing]], None)
+            pairs = pd.DataFrame({
+                "currency": [str(c).strip().upper() for c in labels],
+                "month": [None if t == _LATEST else str(pd.Timestamp(t).date()) for t in when[missing]],
+            }).drop_duplicates()
+            raise MissingRates(pairs.sort_values(["currency", "month"], na_position="first").to_dict(orient="records"))
+        return out
+
+    # ---------- updates ----------
+    def update(self, rates: pd.DataFrame, replace: bool = False) -> Dict[str, Dict]:
+        """เพิ่ม/แทนที่อัตรา (คีย์ Currency + Date; ค่าใหม่ชนะ) แล้วเขียนไฟล์แบบ atomic"""
+        rates = normalize_rate_table(rates)
+        base = None if replace else self.table
+        merged = rates if base is None or base.empty else pd.concat([base, rates], ignore_index=True)
+        merged = merged.drop_duplicates(["Currency", "Date"], keep="last")
+        with self._lock:
+            self._write(merged)
+            self._set(merged)
+            self._mtime = os.stat(self.path).st_mtime
+        return self.currencies()
+
+    def load_file(self, content: bytes, filename: str, replace: bool = False) -> Dict[str, Dict]:
+        return self.update(read_rate_table(content, filename), replace=replace)
+
+    def _write(self, table: pd.DataFrame):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        try:
+            if self.path.endswith(".parquet"):
+                table.to_parquet(tmp, index=False)
+            else:
+                table.to_csv(tmp, index=False)
+            os.replace(tmp, self.path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def clear(self):
+        with self._lock:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self._set(self._table.iloc[0:0])
+            self._mtime = None
+
+
+def _month_ns(month, n: int) -> np.ndarray:
+    """Month → int64 ns (แปลงเฉพาะค่าที่ไม่ซ้ำ); ไม่มี/แปลงไม่ได้ → อัตราล่าสุด"""
+    if month is None:
+        return np.full(n, _LATEST, dtype=np.int64)
+    codes, uniques = pd.factorize(pd.Series(month).to_numpy())
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object), errors="coerce").to_numpy("datetime64[ns]").view("i8")
+    parsed = np.where(parsed == _NAT, _LATEST, parsed)
+    return np.where(codes >= 0, parsed[np.maximum(codes, 0)] if len(parsed) else _LATEST, _LATEST)
+
+
+def fill_fx_rate(df: pd.DataFrame, store: "FxStore", group_currency: Optional[str] = None) -> pd.DataFrame:
+    """ตั้งคอลัมน์ FX Rate จาก store ตาม Currency (+ Month ถ้ามี)"""
+    df["FX Rate"] = store.rates_for(df["Currency"], df["Month"] if "Month" in df.columns else None, group_currency)
+    return df
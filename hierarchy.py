@@ -0,0 +1,295 @@
+"""
+hierarchy.py
+Cost center hierarchy (parent–child table, e.g. a 6-level chart of accounts) and subtree rollups:
+- the tree is precomputed once per upload into a pre-order layout: every node's subtree is the
+  contiguous slice [pos, end) of that order, so the closure ("ancestor of") relation is just the
+  interval table — closure() expands it to (Ancestor, Descendant, Distance) rows when needed
+- rollup() sums rows per node with one bincount, then one cumulative sum over the pre-order
+  layout gives the subtree totals of every node at once (cs[end] - cs[pos]), per Version/Scenario
+- level_columns() maps each row's Cost Center to its ancestor at each level ("CC Level 1" ...),
+  so any level can be used as a grouping dimension (excel_dashboard_v2, groupby)
+Cost centers that are not in the tree roll up under one "(Unmapped)" root so totals reconcile.
+HierarchyStore keeps the uploaded table as one CSV file (HIERARCHY_PATH), reloaded on mtime change.
+"""
+
+from io import BytesIO
+from typing import Dict, List, Optional, Sequence
+import os
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+
+HIERARCHY_COLUMN_ALIASES: Dict[str, List[str]] = {
+    "Cost Center": ["Cost Center", "CostCenter", "Node", "Child", "Code"],
+    "Parent": ["Parent", "Parent Cost Center", "Parent Code", "Parent Node"],
+}
+UNMAPPED = "(Unmapped)"
+LEVEL_PREFIX = "CC Level "
+ROLLUP_VALUES = ("Planned", "Actual", "FX Adjusted Actual", "Variance")
+
+
+def read_hierarchy(content: bytes, filename: str) -> pd.DataFrame:
+    ext = os.path.splitext(filename.lower())[1]
+    if ext == ".csv":
+        raw = pd.read_csv(BytesIO(content), dtype=str, keep_default_na=False, na_values=[""])
+    elif ext in (".xlsx", ".xls"):
+        raw = pd.read_excel(BytesIO(content), engine="openpyxl", dtype=str)
+    elif ext == ".parquet":
+        raw = pd.read_parquet(BytesIO(content))
+    else:
+        raise ValueError(f"unsupported hierarchy format: {filename!r} (expected .csv, .xlsx, .parquet)")
+    return normalize_hierarchy(raw)
+
+
+def normalize_hierarchy(raw: pd.DataFrame) -> pd.DataFrame:
+    """→ Cost Center / Parent (ข้อความ; root = Parent ว่าง)"""
+    rename = {}
+    for target, candidates in HIERARCHY_COLUMN_ALIASES.items():
+        found = next((c for c in candidates if c in raw.columns), None)
+        if found is None:
+            raise ValueError(f"hierarchy needs a {target} column (one of {candidates}); found {list(raw.columns)}")
+        rename[found] = target
+    edges = raw[list(rename)].rename(columns=rename)
+    node = edges["Cost Center"].astype("string").str.strip()
+    parent = edges["Parent"].astype("string").str.strip().replace("", pd.NA)
+    edges = pd.DataFrame({"Cost Center": node, "Parent": parent}).dropna(subset=["Cost Center"])
+    edges = edges[edges["Cost Center"] != ""]
+    if edges.empty:
+        raise ValueError("hierarchy has no (Cost Center, Parent) rows")
+    return edges.astype(object).where(edges.notna(), None).reset_index(drop=True)
+
+
+def cost_center_keys(cost_center: pd.Series) -> pd.Series:
+    """
+    Cost Center ของ ledger → ข้อความตัดช่องว่าง (ว่าง = None) ให้ตรงกับ node ในต้นไม้ (เก็บเป็นข้อความ)
+    read_excel อ่านรหัสตัวเลข (1001) เป็น int64 — หรือ float64 (1001.0) ถ้ามีช่องว่าง
+    """
+    if cost_center.dtype.kind == "f" and np.all(np.mod(cost_center.dropna(), 1) == 0):
+        cost_center = cost_center.astype("Int64")
+    keys = cost_center.astype("string").str.strip()
+    return keys.astype(object).where(keys.notna() & (keys != ""), None)
+
+
+class CostCenterHierarchy:
+    """
+    nodes / parent / level / end เรียงตาม pre-order: subtree ของ node i = ตำแหน่ง [i, end[i])
+    """
+
+    def __init__(self, edges: pd.DataFrame):
+        edges = normalize_hierarchy(edges)
+        dup = edges["Cost Center"][edges["Cost Center"].duplicated()]
+        if len(dup):
+            raise ValueError(f"cost center(s) listed more than once: {sorted(set(dup))[:10]}")
+        self.edges = edges
+
+        names = pd.Index(pd.unique(pd.concat([edges["Cost Center"], edges["Parent"].dropna()], ignore_index=True)))
+        parent_of = np.full(len(names), -1, dtype=np.int64)
+        parent_of[names.get_indexer(edges["Cost Center"])] = [
+            -1 if p is None else names.get_loc(p) for p in edges["Parent"]
+        ]
+
+        # pre-order ด้วย stack (ลูกเรียงตามลำดับในไฟล์) — พ่อมาก่อนลูกเสมอ
+        children: List[List[int]] = [[] for _ in range(len(names))]
+        for child, parent in enumerate(parent_of):
+            if parent >= 0:
+                children[parent].append(child)
+        order, level = [], np.zeros(len(names), dtype=np.int64)
+        stack = [r for r in np.flatnonzero(parent_of < 0)[::-1]]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            for child in reversed(children[node]):
+                level[child] = level[node] + 1
+                stack.append(child)
+        if len(order) != len(names):
+            stuck = sorted(set(names) - set(names[order]))
+            raise ValueError(f"hierarchy has a cycle through: {stuck[:10]}")
+
+        order = np.asarray(order, dtype=np.int64)
+        pos = np.empty_like(order)
+        pos[order] = np.arange(len(order))
+        self.nodes = np.asarray(names[order], dtype=object)
+        self.parent = np.where(parent_of[order] >= 0, pos[np.maximum(parent_of[order], 0)], -1)
+        self.level = level[order]
+        self.index = pd.Index(self.nodes)
+        # end[i] = ตำแหน่งแรกหลัง subtree = node ถัดไปที่ level <= level[i]
+        self.end = np.empty(len(order), dtype=np.int64)
+        stack: List[int] = []
+        for i, lv in enumerate(self.level):
+            while stack and self.level[stack[-1]] >= lv:
+                self.end[stack.pop()] = i
+            stack.append(i)
+        self.end[stack] = len(order)
+
+    @classmethod
+    def from_file(cls, content: bytes, filename: str) -> "CostCenterHierarchy":
+        return cls(read_hierarchy(content, filename))
+
+    @property
+    def depth(self) -> int:
+        return int(self.level.max()) + 1
+
+    def describe(self) -> Dict:
+        roots = self.nodes[self.parent < 0]
+        return {
+            "nodes": int(len(self.nodes)),
+            "depth": self.depth,
+            "roots": [str(r) for r in roots[:50]],
+            "nodes_per_level": np.bincount(self.level).tolist(),
+            "leaves": int(np.sum(self.end - np.arange(len(self.nodes)) == 1)),
+        }
+
+    # ---------- closure / ancestors ----------
+    def closure(self) -> pd.DataFrame:
+        """ตาราง closure เต็ม (รวมตัวเอง, Distance 0): แถวละคู่ ancestor–descendant"""
+        sizes = self.end - np.arange(len(self.nodes))
+        anc = np.repeat(np.arange(len(self.nodes)), sizes)
+        desc = np.arange(len(anc)) - np.repeat(np.cumsum(sizes) - sizes, sizes) + anc
+        return pd.DataFrame({
+            "Ancestor": self.nodes[anc],
+            "Descendant": self.nodes[desc],
+            "Distance": self.level[desc] - self.level[anc],
+        })
+
+    def ancestor_matrix(self) -> np.ndarray:
+        """(node, level) → ตำแหน่งของบรรพบุรุษที่ level นั้น; ลึกกว่าตัวเอง = ตัวเอง (เติมลง)"""
+        anc = np.empty((len(self.nodes), self.depth), dtype=np.int64)
+        for lv in range(self.depth):
+            at = np.flatnonzero(self.level == lv)
+            if lv:
+                anc[at, :lv] = anc[self.parent[at], :lv]
+            anc[at, lv:] = at[:, None]
+        return anc
+
+    def level_name(self, level: int) -> str:
+        return f"{LEVEL_PREFIX}{level}"
+
+    def level_columns(self, cost_center: pd.Series) -> pd.DataFrame:
+        """คอลัมน์ "CC Level 1".."CC Level N" ต่อแถว — cost center ที่ไม่อยู่ในต้นไม้: Level 1 = (Unmapped)"""
+        keys = cost_center_keys(cost_center)
+        codes = self.index.get_indexer(keys)
+        anc = self.ancestor_matrix()
+        labels = np.append(self.nodes, None)
+        out = {}
+        for lv in range(self.depth):
+            col = anc[:, lv].take(codes, mode="clip")
+            col = np.where(codes >= 0, col, len(self.nodes))
+            values = labels[col]
+            if lv == 0:
+                values = np.where(codes >= 0, values, UNMAPPED)
+            else:
+                values = np.where(codes >= 0, values, keys.to_numpy(dtype=object))
+            out[self.level_name(lv + 1)] = values
+        return pd.DataFrame(out, index=cost_center.index)
+
+    # ---------- rollups ----------
+    def _extended(self, unmapped: np.ndarray):
+        """ต่อท้าย pre-order ด้วย root (Unmapped) + cost center ที่ไม่อยู่ในต้นไม้ (เป็นลูกของมัน)"""
+        n, k = len(self.nodes), len(unmapped)
+        if not k:
+            return self.nodes, self.parent, self.level, self.end
+        nodes = np.concatenate([self.nodes, [UNMAPPED], unmapped.astype(object)])
+        parent = np.concatenate([self.parent, [-1], np.full(k, n)])
+        level = np.concatenate([self.level, [0], np.ones(k, dtype=np.int64)])
+        end = np.concatenate([self.end, [n + 1 + k], np.arange(n + 2, n + 2 + k)])
+        return nodes, parent, level, end
+
+    def rollup(self, df: pd.DataFrame, values: Sequence[str] = ROLLUP_VALUES,
+               by: Sequence[str] = ("Version", "Scenario"), max_level: Optional[int] = None) -> pd.DataFrame:
+        """
+        ยอดรวมทั้ง subtree ของทุก node (ต่อกลุ่ม by ที่มีใน df) — bincount ครั้งเดียว + cumsum ตาม pre-order
+        คืน: by..., Cost Center, Parent, Level (1 = root), Leaf, Rows, values...  (เฉพาะ node ที่มีข้อมูล)
+        """
+        values = [v for v in values if v in df.columns]
+        by = [b for b in by if b in df.columns]
+        cc = cost_center_keys(df["Cost Center"])
+        known = cc.isna() | (self.index.get_indexer(cc) >= 0)
+        unmapped = pd.unique(cc[~known].to_numpy(dtype=object))
+        nodes, parent, level, end = self._extended(unmapped)
+        node_codes = pd.Index(nodes).get_indexer(cc)
+
+        if by:
+            group_codes, groups = pd.factorize(pd.MultiIndex.from_frame(df[by]))
+        else:
+            group_codes, groups = np.zeros(len(df), dtype=np.int64), None
+        n_groups = int(group_codes.max()) + 1 if len(group_codes) else 0
+        keep = (node_codes >= 0) & (group_codes >= 0)
+        flat = node_codes[keep] * n_groups + group_codes[keep]
+
+        size = len(nodes) * n_groups
+        direct = np.empty((len(nodes), n_groups, len(values) + 1))
+        direct[..., 0] = np.bincount(flat, minlength=size).reshape(len(nodes), n_groups)
+        for j, col in enumerate(values, start=1):
+            weights = pd.to_numeric(df[col], errors="coerce").to_numpy(float)[keep]
+            direct[..., j] = np.bincount(flat, weights=np.nan_to_num(weights), minlength=size).reshape(len(nodes), n_groups)
+
+        cs = np.concatenate([np.zeros((1,) + direct.shape[1:]), np.cumsum(direct, axis=0)])
+        subtree = cs[end] - cs[np.arange(len(nodes))]        # (node, group, 1 + values)
+
+        node_idx, group_idx = np.nonzero(subtree[..., 0] > 0)
+        if max_level is not None:
+            ok = level[node_idx] < max_level
+            node_idx, group_idx = node_idx[ok], group_idx[ok]
+        order = np.lexsort((node_idx, group_idx))
+        node_idx, group_idx = node_idx[order], group_idx[order]
+
+        out = {}
+        if by:
+            keys = groups.take(group_idx)
+            for i, b in enumerate(by):
+                out[b] = keys.get_level_values(i)
+        out["Cost Center"] = nodes[node_idx]
+        out["Parent"] = np.append(nodes, None)[np.where(parent[node_idx] >= 0, parent[node_idx], len(nodes))]
+        out["Level"] = level[node_idx] + 1
+        out["Leaf"] = end[node_idx] - node_idx == 1
+        out["Rows"] = subtree[node_idx, group_idx, 0].astype(np.int64)
+        for j, col in enumerate(values, start=1):
+            out[col] = subtree[node_idx, group_idx, j]
+        return pd.DataFrame(out)
+
+
+class HierarchyStore:
+    """ตาราง parent–child ไฟล์เดียว; โหลดใหม่เมื่อ mtime เปลี่ยน (worker อื่นอัปโหลด)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._tree: Optional[CostCenterHierarchy] = None
+
+    def get(self) -> Optional[CostCenterHierarchy]:
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._tree = None if mtime is None else CostCenterHierarchy(
+                        pd.read_csv(self.path, dtype=str, keep_default_na=False, na_values=[""]))
+                    self._mtime = mtime
+        return self._tree
+
+    def load_file(self, content: bytes, filename: str) -> CostCenterHierarchy:
+        tree = CostCenterHierarchy.from_file(content, filename)    # ตรวจ (ซ้ำ / วน) ก่อนเขียนทับ
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp = f"{self.path}.{uuid.uuid4().hex}.tmp"
+            try:
+                tree.edges.to_csv(tmp, index=False)
+                os.replace(tmp, self.path)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            self._tree, self._mtime = tree, os.stat(self.path).st_mtime
+        return tree
+
+    def clear(self):
+        with self._lock:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self._tree, self._mtime = None, None
@@ -0,0 +1,67 @@
+"""
+hierarchy_routes.py
+Cost center hierarchy (mounted in every profile):
+- GET    /hierarchy          : node / level counts and roots of the stored tree
+- POST   /hierarchy          : upload a parent–child table (Cost Center / Parent; .csv, .xlsx, .parquet),
+                               replacing the stored one (rejected if a node repeats or the tree has a cycle)
+- GET    /hierarchy/closure  : the precomputed closure table (Ancestor / Descendant / Distance)
+- DELETE /hierarchy          : remove it
+HIERARCHY_STORE is shared with main.py (/analyze?rollup=true, /export-excel-exec?hierarchy_level=).
+Writes are admin-only (X-Admin-Token): the tree changes the rollups every client gets.
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, File, Header, HTTPException, UploadFile
+
+try:
+    from .utils.profiling import require_admin, run_in_threadpool
+    from .hierarchy import HierarchyStore
+    from .utils.fast_json import FastJSONResponse, frame_payload
+    from .config import ADMIN_TOKEN, HIERARCHY_PATH
+except ImportError:
+    from utils.profiling import require_admin, run_in_threadpool
+    from hierarchy import HierarchyStore
+    from utils.fast_json import FastJSONResponse, frame_payload
+    from config import ADMIN_TOKEN, HIERARCHY_PATH
+
+router = APIRouter(tags=["hierarchy"])
+
+HIERARCHY_STORE = HierarchyStore(HIERARCHY_PATH)
+
+
+def _stored():
+    tree = HIERARCHY_STORE.get()
+    if tree is None:
+        raise HTTPException(status_code=404, detail="ยังไม่มีลำดับชั้น cost center — อัปโหลดที่ POST /hierarchy")
+    return tree
+
+
+@router.get("/hierarchy")
+def get_hierarchy():
+    return _stored().describe()
+
+
+@router.post("/hierarchy")
+async def upload_hierarchy(file: UploadFile = File(...), x_admin_token: Optional[str] = Header(None)):
+    require_admin(ADMIN_TOKEN, x_admin_token)
+    content = await file.read()
+    if not content:
+        raise HTTPException(status_code=400, detail="ไฟล์ว่างเปล่า")
+    try:
+        tree = await run_in_threadpool(HIERARCHY_STORE.load_file, content, file.filename or "")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"อ่านลำดับชั้น cost center ไม่สำเร็จ: {e}")
+    return tree.describe()
+
+
+@router.get("/hierarchy/closure", response_class=FastJSONResponse)
+def get_closure():
+    return FastJSONResponse(content=frame_payload(_stored().closure(), "records"))
+
+
+@router.delete("/hierarchy")
+def clear_hierarchy(x_admin_token: Optional[str] = Header(None)):
+    require_admin(ADMIN_TOKEN, x_admin_token)
+    HIERARCHY_STORE.clear()
+    return {"cleared": True}
@@ -1,21 +1,36 @@
 # budget_plus/main.py
 
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse, StreamingResponse, HTMLResponse
+from fastapi import APIRouter, FastAPI, UploadFile, File, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse, HTMLResponse, Response
+from contextlib import asynccontextmanager
 import pandas as pd
 from io import BytesIO
 import logging
-from typing import List, Dict, Tuple, Optional
+from typing import Awaitable, Callable, List, Dict, Tuple, Optional
+from functools import partial
 import os
 import tempfile
 
 # --- รองรับทั้งรันแบบ "แพ็กเกจ" และ "ไฟล์เดี่ยวที่ราก" ---
 try:
     # กรณีรันแบบแพ็กเกจ (uvicorn budget_plus.main:app)
-    from .utils.number_format_utils import format_number
-    from .pdf_summary import generate_pdf_default
-    from .config import PERCENT_COLUMNS
-    from .utils.variance_utils import calculate_variance, summarize_variance
+    from .utils.number_format_utils import format_number_array
+    from .utils.fast_json import FastJSONResponse, frame_payload, RESPONSE_FORMATS
+    from .utils.streaming import stream_frame, STREAM_MODES, DEFAULT_CHUNK_ROWS
+    from .utils.columnar_export import export_bundle, columnar_available, EXPORT_FORMATS  # pyarrow โหลดตอนใช้
+    from .utils.lazy_import import lazy
+    from .utils.metrics import MetricsMiddleware, stage, add_rows
+    from .utils.profiling import ProfilingMiddleware, run_in_threadpool
+    from .utils.loop_watchdog import RouteTrackerMiddleware
+    from .utils.memory_budget import MemoryBudget, MemoryBudgetMiddleware, AdmissionRejected, CostEstimate
+    from .utils.memory_budget import estimate_cost, estimate_frame_cost, admit, rejection_http_error, MB
+    from .utils.singleflight import parse_excel, artifact_flight, content_key
+    from .config import PERCENT_COLUMNS, APP_PROFILE, ADMIN_TOKEN, PROFILE_SAMPLE_INTERVAL
+    from .config import MEMORY_BUDGET_MB, MAX_INPUT_ROWS, ADMISSION_QUEUE_TIMEOUT
+    from .config import CHUNK_ROWS, CHUNK_TOP_K, MAX_CHUNKED_UPLOAD_MB
+    from .config import GROUP_CURRENCY, CONSOLIDATION_MAX_FILES
+    from .utils.variance_utils import calculate_variance
+    from .parallel_agg import summarize
 
     # Optional packs
     try:
@@ -23,19 +38,16 @@ try:
     except Exception:
         suggest_as_dict = None
 
-    # ใช้เวอร์ชันใหม่ของ Excel Dashboard (v2)
-    try:
-        from .excel_dashboard_v2 import generate_excel_dashboard_v2
-    except Exception:
-        generate_excel_dashboard_v2 = None
-
-    # เติมชีต Playbooks ลง Excel + คัดเลือก playbooks จาก YAML
-    try:
-        from .excel_playbooks_append import append_playbooks_sheet
-        from .playbooks_loader import load_playbooks, select_playbooks
-    except Exception:
-        append_playbooks_sheet = None
-        load_playbooks = select_playbooks = None
+    from .diagnostics_routes import router as diagnostics_router, PROFILE_STORE, LOOP_WATCHDOG
+    from .dataset_routes import router as dataset_router, DATASET_STORE, admit_dataset, read_dataset
+    from .fx_routes import router as fx_router, FX_STORE
+    from .hierarchy_routes import router as hierarchy_router, HIERARCHY_STORE
+    from .utils.dataset_store import dataset_id_for
+    from .utils.shared_frame import sweep_stale
+    from .chunked import process_ledger, detect_format, CHUNK_FORMATS
+    from .consolidation import EntityFrame, MissingRates, consolidate, read_rate_table, read_workbooks
+    from .fx_store import fill_fx_rate
+    from .allocation import ALLOCATION_METHODS, allocate_costs, parse_rules, read_driver_table
 
     # Router ชุด ZIP (PDF+Excel+Playbooks)
     try:
@@ -44,34 +56,79 @@ try:
         report_exec_router = None
 
 except ImportError:  # กรณีรันจากราก repo (uvicorn main:app)
-    from utils.number_format_utils import format_number
-    from pdf_summary import generate_pdf_default
-    from config import PERCENT_COLUMNS
-    from utils.variance_utils import calculate_variance, summarize_variance
+    from utils.number_format_utils import format_number_array
+    from utils.fast_json import FastJSONResponse, frame_payload, RESPONSE_FORMATS
+    from utils.streaming import stream_frame, STREAM_MODES, DEFAULT_CHUNK_ROWS
+    from utils.columnar_export import export_bundle, columnar_available, EXPORT_FORMATS  # pyarrow โหลดตอนใช้
+    from utils.lazy_import import lazy
+    from utils.metrics import MetricsMiddleware, stage, add_rows
+    from utils.profiling import ProfilingMiddleware, run_in_threadpool
+    from utils.loop_watchdog import RouteTrackerMiddleware
+    from utils.memory_budget import MemoryBudget, MemoryBudgetMiddleware, AdmissionRejected, CostEstimate
+    from utils.memory_budget import estimate_cost, estimate_frame_cost, admit, rejection_http_error, MB
+    from utils.singleflight import parse_excel, artifact_flight, content_key
+    from config import PERCENT_COLUMNS, APP_PROFILE, ADMIN_TOKEN, PROFILE_SAMPLE_INTERVAL
+    from config import MEMORY_BUDGET_MB, MAX_INPUT_ROWS, ADMISSION_QUEUE_TIMEOUT
+    from config import CHUNK_ROWS, CHUNK_TOP_K, MAX_CHUNKED_UPLOAD_MB
+    from config import GROUP_CURRENCY, CONSOLIDATION_MAX_FILES
+    from utils.variance_utils import calculate_variance
+    from parallel_agg import summarize
 
     try:
         from next_actions import suggest_as_dict
     except Exception:
         suggest_as_dict = None
 
-    try:
-        from excel_dashboard_v2 import generate_excel_dashboard_v2
-    except Exception:
-        generate_excel_dashboard_v2 = None
-
-    try:
-        from excel_playbooks_append import append_playbooks_sheet
-        from playbooks_loader import load_playbooks, select_playbooks
-    except Exception:
-        append_playbooks_sheet = None
-        load_playbooks = select_playbooks = None
+    from diagnostics_routes import router as diagnostics_router, PROFILE_STORE, LOOP_WATCHDOG
+    from dataset_routes import router as dataset_router, DATASET_STORE, admit_dataset, read_dataset
+    from fx_routes import router as fx_router, FX_STORE
+    from hierarchy_routes import router as hierarchy_router, HIERARCHY_STORE
+    from utils.dataset_store import dataset_id_for
+    from utils.shared_frame import sweep_stale
+    from chunked import process_ledger, detect_format, CHUNK_FORMATS
+    from consolidation import EntityFrame, MissingRates, consolidate, read_rate_table, read_workbooks
+    from fx_store import fill_fx_rate
+    from allocation import ALLOCATION_METHODS, allocate_costs, parse_rules, read_driver_table
 
     try:
         from report_exec_routes import router as report_exec_router
     except Exception:
         report_exec_router = None
 
-app = FastAPI(title="Budget Plus Agent", version="1.2.0")
+# ตัว render หนัก (matplotlib / reportlab / openpyxl / PyYAML / pyarrow) โหลดตอนใช้ครั้งแรก
+generate_pdf_default = lazy("pdf_summary", "generate_pdf_default", __package__)
+# ใช้เวอร์ชันใหม่ของ Excel Dashboard (v2)
+generate_excel_dashboard_v2 = lazy("excel_dashboard_v2", "generate_excel_dashboard_v2", __package__)
+# เติมชีต Playbooks ลง Excel + คัดเลือก playbooks จาก YAML
+append_playbooks_sheet = lazy("excel_playbooks_append", "append_playbooks_sheet", __package__)
+load_playbooks = lazy("playbooks_loader", "load_playbooks", __package__)
+select_playbooks = lazy("playbooks_loader", "select_playbooks", __package__)
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    # watchdog จับ event loop ที่ค้าง (งาน sync ใน async route) → log + /diagnostics/event-loop
+    await LOOP_WATCHDOG.start()
+    # shared memory ของ process ก่อนหน้าที่ถูก kill กลางงาน (PDF / aggregation แบบหลาย process)
+    sweep_stale()
+    try:
+        yield
+    finally:
+        await LOOP_WATCHDOG.stop()
+
+
+app = FastAPI(title="Budget Plus Agent", version="1.2.0", lifespan=_lifespan)
+# latency ต่อ request/stage + rows/bytes → GET /metrics (Prometheus text format)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RouteTrackerMiddleware)
+# peak RSS ต่อ request (/metrics) + คืนงบหน่วยความจำที่ admission จองไว้เมื่อส่ง response เสร็จ
+MEMORY_BUDGET = MemoryBudget(MEMORY_BUDGET_MB * MB, max_rows=MAX_INPUT_ROWS, queue_timeout=ADMISSION_QUEUE_TIMEOUT)
+app.add_middleware(MemoryBudgetMiddleware, budget=MEMORY_BUDGET)
+# ?profile=1|cprofile + X-Admin-Token → เก็บ profile ไว้ที่ /admin/profiles/{id} (ไม่ตั้ง token = ปิด)
+app.add_middleware(ProfilingMiddleware, store=PROFILE_STORE, admin_token=ADMIN_TOKEN,
+                   interval=PROFILE_SAMPLE_INTERVAL)
+# endpoint ที่สร้างไฟล์ (Excel/PDF/ZIP) — ไม่ mount ใน profile "lite" (JSON อย่างเดียว)
+reports_router = APIRouter()
 logging.basicConfig(level=logging.INFO)
 
 # ====== Settings / Limits ======
@@ -102,10 +159,11 @@ def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
     return df.rename(columns=rename_map) if rename_map else df
 
 
-def _ensure_required_columns(df: pd.DataFrame) -> pd.DataFrame:
+@stage("normalize")
+def _ensure_required_columns(df: pd.DataFrame, fx_from_store: bool = True) -> pd.DataFrame:
     """
     - ต้องมี: 'Cost Center', 'Planned'
-    - เติม 'Actual'=0 และ 'FX Rate'=1 ถ้าไม่มี
+    - เติม 'Actual'=0 ถ้าไม่มี; ไม่มี 'FX Rate' → อัตรา as-of จาก FX store ถ้ามีคอลัมน์ 'Currency', ไม่งั้น 1
     - คำนวณ 'FX Adjusted Actual' และ 'Variance' ถ้ายังไม่มี
     """
     df = _normalize_columns(df)
@@ -120,7 +178,13 @@ def _ensure_required_columns(df: pd.DataFrame) -> pd.DataFrame:
     if "Actual" not in df.columns:
         df["Actual"] = 0
     if "FX Rate" not in df.columns:
-        df["FX Rate"] = 1
+        if fx_from_store and "Currency" in df.columns and FX_STORE.has_rates():
+            try:
+                fill_fx_rate(df, FX_STORE, GROUP_CURRENCY)
+            except MissingRates as e:
+                raise HTTPException(status_code=400, detail={"message": "FX store ไม่มีอัตราที่ต้องใช้", "missing": e.missing})
+        else:
+            df["FX Rate"] = 1
 
     if "FX Adjusted Actual" not in df.columns:
         df["FX Adjusted Actual"] = df["Actual"] * df["FX Rate"]
@@ -138,8 +202,27 @@ def _ensure_required_columns(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-async def _validate_and_read_excel(upload: UploadFile) -> pd.DataFrame:
-    """ตรวจไฟล์ + อ่าน Excel เป็น DataFrame (async)"""
+async def _admit_upload(content: bytes, filename: str, artifacts: Tuple[str, ...]):
+    """ประเมินหน่วยความจำจากขนาดชีต × ไฟล์ที่จะสร้าง แล้วจองงบ (413 = ใหญ่เกินงบ, 503 = รอคิวนานเกิน)"""
+    await _admit_estimate(estimate_cost(content, filename, artifacts))
+
+
+async def _admit_estimate(estimate):
+    try:
+        await admit(estimate)
+    except AdmissionRejected as e:
+        raise rejection_http_error(e)
+
+
+async def _read_upload(upload: UploadFile, artifacts: Tuple[str, ...] = ("json",)) -> Tuple[bytes, str]:
+    """ตรวจไฟล์ + admission ตามต้นทุนที่ประเมิน → (เนื้อไฟล์, sha256) สำหรับ parse / singleflight"""
+    content = await _read_checked(upload)
+    await _admit_upload(content, (upload.filename or "").lower(), artifacts)
+    return content, content_key(content)
+
+
+async def _read_checked(upload: UploadFile) -> bytes:
+    """ตรวจนามสกุล / ไฟล์ว่าง / ขนาด แล้วคืนเนื้อไฟล์ (ยังไม่จองงบหน่วยความจำ)"""
     filename = (upload.filename or "").lower()
     if not filename.endswith(ALLOWED_EXTS):
         raise HTTPException(
@@ -163,15 +246,61 @@ async def _validate_and_read_excel(upload: UploadFile) -> pd.DataFrame:
                 f"จำกัด {MAX_UPLOAD_BYTES/1024/1024:.0f} MB"
             ),
         )
+    return content
 
+
+async def _parse_upload(content: bytes, digest: str) -> pd.DataFrame:
+    """อ่าน Excel (ไฟล์เดียวกันที่อัปโหลดพร้อมกันหลาย request → parse ครั้งเดียว)"""
     try:
-        df = pd.read_excel(BytesIO(content), engine="openpyxl")
+        df, _ = await parse_excel(content, digest)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"อ่านไฟล์ Excel ไม่สำเร็จ: {e}")
 
     if df is None or df.empty:
         raise HTTPException(status_code=400, detail="ไม่พบข้อมูลในไฟล์ (empty DataFrame)")
-    return df
+    add_rows(len(df))
+    # frame อาจถูกใช้ร่วมกับ request อื่น → shallow copy (route เพิ่ม/แทนคอลัมน์ ไม่แก้ค่าเดิม)
+    return df.copy(deep=False)
+
+
+DATASET_ID_HELP = "ใช้ dataset จาก POST /datasets แทนการอัปโหลดไฟล์"
+
+
+async def _open_source(
+    upload: Optional[UploadFile], dataset_id: Optional[str], artifacts: Tuple[str, ...] = ("json",)
+) -> Tuple[str, Callable[[], Awaitable[pd.DataFrame]]]:
+    """
+    ไฟล์ที่อัปโหลด หรือ ?dataset_id= → (key สำหรับ singleflight, ฟังก์ชันโหลด DataFrame)
+    admission ทำตรงนี้ (ก่อนเข้าคิว singleflight)
+    """
+    if upload is not None and dataset_id:
+        raise HTTPException(status_code=400, detail="ส่งไฟล์หรือ dataset_id อย่างใดอย่างหนึ่งเท่านั้น")
+    if dataset_id:
+        await admit_dataset(dataset_id, artifacts)
+        return f"dataset:{dataset_id}", partial(read_dataset, dataset_id)
+    if upload is None:
+        raise HTTPException(status_code=400, detail="กรุณาอัปโหลดไฟล์ Excel หรือระบุ dataset_id")
+    content, digest = await _read_upload(upload, artifacts)
+    return digest, partial(_parse_upload, content, digest)
+
+
+async def _load_frame(
+    upload: Optional[UploadFile], dataset_id: Optional[str], artifacts: Tuple[str, ...] = ("json",)
+) -> pd.DataFrame:
+    _, load = await _open_source(upload, dataset_id, artifacts)
+    return await load()
+
+
+def _prepare_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """normalize คอลัมน์ + คำนวณ variance (ชุดเดียวกับที่ทุก endpoint ทำก่อนวิเคราะห์)"""
+    try:
+        df_ready = _ensure_required_columns(df)
+        with stage("variance"):
+            return calculate_variance(df_ready)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"จัดรูป/คำนวณไม่สำเร็จ: {e}")
 
 
 # ====== Routes ======
@@ -185,6 +314,7 @@ async def root():
         "<code>/download-pdf</code>, <code>/analyze-suggest</code>, "
         "<code>/export-excel-exec</code>, <code>/report-exec</code>"
         "</p>"
+        "<p>อัปโหลดครั้งเดียวที่ <code>POST /datasets</code> แล้วส่ง <code>?dataset_id=</code> แทนไฟล์</p>"
     )
 
 
@@ -193,9 +323,213 @@ async def health():
     return {"ok": True, "version": "1.2.0"}
 
 
-@app.post("/analyze")
-async def analyze(file: UploadFile = File(...)):
-    df = await _validate_and_read_excel(file)
+def _fx_keyed(key: str) -> str:
+    """
+    key ของผลลัพธ์ที่เก็บไว้ + เวอร์ชันของ FX store (ถ้ามีอัตรา): _ensure_required_columns อาจเติม FX Rate
+    จาก store → อัปเดตอัตราแล้วอัปโหลดไฟล์เดิม ต้องได้ dataset ใหม่ (รู้ก่อน parse ไม่ได้ว่าไฟล์ใช้ store หรือไม่)
+    """
+    version = FX_STORE.version
+    return content_key(f"{key}|fx:{version}".encode("utf-8")) if version else key
+
+
+async def _ingest_dataset(content: bytes, digest: str, dataset_id: str, filename: str):
+    df_calc = await run_in_threadpool(_prepare_frame, await _parse_upload(content, digest))
+    with stage("dataset_write"):
+        return await run_in_threadpool(DATASET_STORE.put, dataset_id, df_calc, filename)
+
+
+@app.post("/datasets", status_code=201)
+async def create_dataset(file: UploadFile = File(...)):
+    """อัปโหลด + normalize + คำนวณ variance แล้วเก็บเป็น Feather → ใช้ ?dataset_id= กับทุก endpoint"""
+    if not DATASET_STORE.available():
+        raise HTTPException(status_code=501, detail="ไม่รองรับ dataset บนเซิร์ฟเวอร์นี้ (ต้องติดตั้ง pyarrow)")
+
+    content, digest = await _read_upload(file, ("columnar",))
+    dataset_id = dataset_id_for(_fx_keyed(digest))
+    existing = DATASET_STORE.info(dataset_id, touch=True)
+    if existing is not None:
+        # ไฟล์เดิม (และอัตราใน FX store เดิม) → ใช้ dataset เดิม ไม่ต้อง parse ซ้ำ (ต่ออายุ TTL)
+        return JSONResponse(content=existing.to_dict(DATASET_STORE.ttl))
+
+    try:
+        info, _ = await artifact_flight.do(("datasets", dataset_id), _ingest_dataset, content, digest, dataset_id,
+                                           file.filename or "")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"บันทึก dataset ไม่สำเร็จ: {e}")
+    return JSONResponse(status_code=201, content=info.to_dict(DATASET_STORE.ttl))
+
+
+def _entity_names(files: List[UploadFile]) -> List[str]:
+    """ชื่อ entity = ชื่อไฟล์ไม่รวมนามสกุล (ซ้ำกัน → เติม #2, #3)"""
+    names, seen = [], {}
+    for f in files:
+        base = os.path.splitext(os.path.basename(f.filename or "entity"))[0] or "entity"
+        seen[base] = seen.get(base, 0) + 1
+        names.append(base if seen[base] == 1 else f"{base} #{seen[base]}")
+    return names
+
+
+def _consolidate_frames(frames: List[pd.DataFrame], names: List[str], currencies: List[Optional[str]],
+                        rates: pd.DataFrame, group_currency: str):
+    entities = []
+    for name, frame, currency in zip(names, frames, currencies):
+        if frame is None or frame.empty:
+            raise HTTPException(status_code=400, detail=f"ไม่พบข้อมูลในไฟล์ของ entity '{name}'")
+        # FX Rate มาจากตารางอัตราของ consolidation (แนบทีหลัง) ไม่ใช่ FX store
+        entities.append(EntityFrame(name, _ensure_required_columns(frame, fx_from_store=False), currency))
+    try:
+        combined, report = consolidate(entities, rates, group_currency)
+    except MissingRates as e:
+        raise HTTPException(status_code=400, detail={"message": "ตารางอัตราแลกเปลี่ยนไม่ครอบคลุม", "missing": e.missing})
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"รวมข้อมูลไม่สำเร็จ: {e}")
+    with stage("variance"):
+        return calculate_variance(combined), report
+
+
+@app.post("/consolidate", status_code=201)
+async def consolidate_entities(
+    files: List[UploadFile] = File(..., description="ไฟล์ Excel ของแต่ละ entity (สกุลเงินท้องถิ่น)"),
+    fx_rates: Optional[UploadFile] = File(None, description="ตารางอัตรา Currency / Date / Rate (.csv, .xlsx, .parquet); ไม่ส่ง = ใช้ FX store"),
+    currencies: Optional[str] = Query(None, description="สกุลเงินท้องถิ่นตามลำดับไฟล์ เช่น USD,EUR (ไม่ต้องระบุถ้าไฟล์มีคอลัมน์ Currency)"),
+    group_currency: str = Query(GROUP_CURRENCY),
+):
+    """
+    รวมหลาย entity เป็น dataset เดียวในสกุลเงินกลุ่ม → ใช้ ?dataset_id= กับทุกรายงานเดิม
+    อ่าน workbook พร้อมกันหลาย process + แนบอัตราด้วย as-of merge ครั้งเดียว
+    """
+    if not DATASET_STORE.available():
+        raise HTTPException(status_code=501, detail="ไม่รองรับ dataset บนเซิร์ฟเวอร์นี้ (ต้องติดตั้ง pyarrow)")
+    if len(files) > CONSOLIDATION_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"รวมได้ไม่เกิน {CONSOLIDATION_MAX_FILES} ไฟล์ต่อครั้ง")
+    local = [c.strip().upper() or None for c in currencies.split(",")] if currencies else [None] * len(files)
+    if len(local) != len(files):
+        raise HTTPException(status_code=400, detail=f"currencies มี {len(local)} ค่า แต่มี {len(files)} ไฟล์")
+    group_currency = group_currency.strip().upper()
+
+    # จองงบครั้งเดียวจากต้นทุนรวมทุกไฟล์ (จองทีละไฟล์ → request รอคิวตัวเองจนได้ 503 แม้เซิร์ฟเวอร์ว่าง)
+    contents = [await _read_checked(f) for f in files]
+    estimates = [estimate_cost(c, (f.filename or "").lower(), ("columnar",)) for c, f in zip(contents, files)]
+    await _admit_estimate(CostEstimate(rows=sum(e.rows for e in estimates),
+                                       cols=max(e.cols for e in estimates),
+                                       bytes=sum(e.bytes for e in estimates)))
+    uploads = [(c, content_key(c)) for c in contents]
+    if fx_rates is not None:
+        try:
+            rates = read_rate_table(await fx_rates.read(), fx_rates.filename or "")
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"อ่านตารางอัตราแลกเปลี่ยนไม่สำเร็จ: {e}")
+    elif FX_STORE.has_rates():
+        rates = FX_STORE.table
+    else:
+        raise HTTPException(status_code=400, detail="กรุณาส่งตารางอัตรา (fx_rates) หรืออัปโหลดที่ POST /fx/rates ก่อน")
+
+    names = _entity_names(files)
+    key = "|".join([group_currency, content_key(rates.to_csv(index=False).encode("utf-8"))]
+                   + [f"{n}:{c}:{d}" for n, c, (_, d) in zip(names, local, uploads)])
+    dataset_id = dataset_id_for(content_key(key.encode("utf-8")))
+    existing = DATASET_STORE.info(dataset_id, touch=True)
+    if existing is not None:
+        return JSONResponse(content=existing.to_dict(DATASET_STORE.ttl))
+
+    try:
+        with stage("parse"):
+            frames = await run_in_threadpool(read_workbooks, [content for content, _ in uploads])
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"อ่านไฟล์ Excel ไม่สำเร็จ: {e}")
+    add_rows(sum(len(f) for f in frames))
+
+    df_calc, report = await run_in_threadpool(_consolidate_frames, frames, names, local, rates, group_currency)
+    filename = "consolidated: " + ", ".join(f.filename or n for f, n in zip(files, names))
+    with stage("dataset_write"):
+        info = await run_in_threadpool(DATASET_STORE.put, dataset_id, df_calc, filename)
+    body = info.to_dict(DATASET_STORE.ttl)
+    body.update(group_currency=group_currency, entities=report)
+    return JSONResponse(status_code=201, content=body)
+
+
+def _allocate_frame(df: pd.DataFrame, drivers: pd.DataFrame, rules: Dict[str, str], method: str):
+    df_ready = _ensure_required_columns(df)
+    try:
+        with stage("allocation"):
+            result = allocate_costs(df_ready, drivers, rules, method)
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"ปันส่วนต้นทุนไม่สำเร็จ: {e}")
+    with stage("variance"):
+        return calculate_variance(result.frame), result
+
+
+@app.post("/allocate", status_code=201)
+async def allocate_shared_costs(
+    drivers: UploadFile = File(..., description="ตาราง driver: Cost Center + คอลัมน์ driver (Headcount, Square Metres, Tickets ...) หรือ Cost Center / Driver / Value"),
+    rules: str = Query(..., description="service=driver ตามลำดับ step-down เช่น IT=Tickets,HR=Headcount,FAC=Square Metres"),
+    method: str = Query("reciprocal", description="direct | step_down | reciprocal"),
+    file: Optional[UploadFile] = File(None),
+    dataset_id: Optional[str] = Query(None, description=DATASET_ID_HELP),
+):
+    """
+    ปันส่วนต้นทุน service (IT / HR / อาคาร) ไปยัง operating cost centers ก่อนคำนวณ variance
+    → เก็บเป็น dataset ใหม่ ใช้ ?dataset_id= กับทุกรายงานเดิม
+    """
+    if not DATASET_STORE.available():
+        raise HTTPException(status_code=501, detail="ไม่รองรับ dataset บนเซิร์ฟเวอร์นี้ (ต้องติดตั้ง pyarrow)")
+    if method not in ALLOCATION_METHODS:
+        raise HTTPException(status_code=400, detail=f"method ต้องเป็นหนึ่งใน {', '.join(ALLOCATION_METHODS)}")
+    try:
+        rule_map = parse_rules(rules)
+        driver_bytes = await drivers.read()
+        driver_table = read_driver_table(driver_bytes, drivers.filename or "")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"อ่านตาราง driver / rules ไม่สำเร็จ: {e}")
+
+    source_key, load = await _open_source(file, dataset_id, ("columnar",))
+    key = "|".join([source_key, method, ",".join(f"{k}={v}" for k, v in rule_map.items()), content_key(driver_bytes)])
+    new_id = dataset_id_for(_fx_keyed(content_key(key.encode("utf-8"))))
+    existing = DATASET_STORE.info(new_id, touch=True)
+    if existing is not None:
+        return JSONResponse(content=existing.to_dict(DATASET_STORE.ttl))
+
+    df_calc, result = await run_in_threadpool(_allocate_frame, await load(), driver_table, rule_map, method)
+    with stage("dataset_write"):
+        info = await run_in_threadpool(DATASET_STORE.put, new_id, df_calc, f"allocated ({method}): {drivers.filename or ''}")
+    body = info.to_dict(DATASET_STORE.ttl)
+    body.update(allocation=result.to_dict())
+    return JSONResponse(status_code=201, content=body)
+
+
+def _format_summary(frame: pd.DataFrame) -> pd.DataFrame:
+    """format คอลัมน์เงิน/เปอร์เซ็นต์ทีละคอลัมน์ (bulk) แทนการวนทีละ record"""
+    formatted = {}
+    for col in ("Planned", "Actual", "FX Adjusted Actual", "Variance"):
+        if col in frame.columns:
+            formatted[col] = format_number_array(frame[col].to_numpy(), "number")
+    for col in PERCENT_COLUMNS:
+        if col in frame.columns:
+            formatted[col] = format_number_array(frame[col].to_numpy(), "percent")
+    return frame.assign(**formatted)
+
+
+@app.post("/analyze", response_class=FastJSONResponse)
+async def analyze(
+    file: Optional[UploadFile] = File(None),
+    dataset_id: Optional[str] = Query(None, description=DATASET_ID_HELP),
+    format: str = Query("records", description="records = [{...}] | columnar = {column: [values]}"),
+    raw: bool = Query(False, description="true = ส่งค่าตัวเลขดิบ ไม่ format เป็นข้อความ"),
+    stream: Optional[str] = Query(None, description="ndjson | sse = ทยอยส่งผลลัพธ์ทีละ chunk"),
+    chunk_rows: int = Query(DEFAULT_CHUNK_ROWS, ge=1, le=100_000),
+    rollup: bool = Query(False, description="true = ยอดรวมทั้ง subtree ตามลำดับชั้น cost center (POST /hierarchy)"),
+    level: Optional[int] = Query(None, ge=1, description="rollup: แสดงถึงระดับนี้ (1 = root)"),
+):
+    if format not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format ต้องเป็นหนึ่งใน {', '.join(RESPONSE_FORMATS)}")
+    if stream is not None and stream not in STREAM_MODES:
+        raise HTTPException(status_code=400, detail=f"stream ต้องเป็นหนึ่งใน {', '.join(STREAM_MODES)}")
+    hierarchy = HIERARCHY_STORE.get() if rollup else None
+    if rollup and hierarchy is None:
+        raise HTTPException(status_code=400, detail="rollup=true ต้องอัปโหลดลำดับชั้น cost center ก่อน (POST /hierarchy)")
+    df = await _load_frame(file, dataset_id)
 
     try:
         df_ready = _ensure_required_columns(df)
@@ -205,36 +539,100 @@ async def analyze(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail=f"จัดรูปคอลัมน์ไม่สำเร็จ: {e}")
 
     try:
-        df_calc = calculate_variance(df_ready)
-        summary = summarize_variance(df_calc)
+        with stage("variance"):
+            df_calc = calculate_variance(df_ready)
+            summary = summarize(df_calc) if hierarchy is None else hierarchy.rollup(df_calc, max_level=level)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"คำนวณสรุปไม่สำเร็จ: {e}")
 
-    records = summary.to_dict(orient="records")
-    for r in records:
-        for col in ("Planned", "Actual", "FX Adjusted Actual", "Variance"):
-            if col in r:
-                r[col] = format_number(r[col], "number")
-        for col in PERCENT_COLUMNS:
-            if col in r:
-                r[col] = format_number(r[col], "percent")
-    return JSONResponse(content=records)
+    if stream is not None:
+        # format + serialize ทีละ chunk ระหว่างส่ง (ไม่สร้าง record ทั้งหมดไว้ก่อน)
+        return stream_frame(summary, stream, chunk_rows, transform=None if raw else _format_summary)
 
+    with stage("format"):
+        payload = frame_payload(summary if raw else _format_summary(summary), format)
+    return FastJSONResponse(content=payload)
 
-@app.post("/download-report")
-async def download_report(file: UploadFile = File(...)):
-    df = await _validate_and_read_excel(file)
+
+# จำนวนคอลัมน์ยังไม่รู้ตอน admission (ยังไม่ได้อ่านไฟล์) → ประมาณเผื่อไว้
+CHUNK_ESTIMATE_COLS = 32
+
+
+@app.post("/analyze-chunked", response_class=FastJSONResponse)
+async def analyze_chunked(
+    file: UploadFile = File(...),
+    output: str = Query("json", description="json = summary + suggestions + scenarios + alerts + top drivers | pdf"),
+    chunk_rows: int = Query(CHUNK_ROWS, ge=1_000, le=5_000_000),
+    top_k: int = Query(CHUNK_TOP_K, ge=0, le=1_000),
+):
+    """ledger ขนาดใหญ่ (CSV / Parquet / Arrow): อ่านทีละ chunk แล้วสรุปจาก aggregate ที่รวมกันแล้ว"""
+    if output not in ("json", "pdf"):
+        raise HTTPException(status_code=400, detail="output ต้องเป็น json หรือ pdf")
     try:
-        df_ready = _ensure_required_columns(df)
-        df_calc = calculate_variance(df_ready)
+        fmt = detect_format(file.filename or "")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"รองรับเฉพาะไฟล์ {', '.join(CHUNK_FORMATS)}")
+    if fmt != "csv" and not columnar_available():
+        raise HTTPException(status_code=501, detail=f"ไม่รองรับ {fmt} บนเซิร์ฟเวอร์นี้ (ต้องติดตั้ง pyarrow)")
+    if file.size is not None and file.size > MAX_CHUNKED_UPLOAD_MB * MB:
+        raise HTTPException(status_code=413, detail=f"ไฟล์ใหญ่เกินกำหนด - จำกัด {MAX_CHUNKED_UPLOAD_MB} MB")
+
+    # หน่วยความจำขึ้นกับขนาด chunk ไม่ใช่ความยาวไฟล์
+    await _admit_estimate(estimate_frame_cost(chunk_rows, CHUNK_ESTIMATE_COLS, (output,)))
+    try:
+        # ไฟล์ที่อัปโหลดถูก spool ลงดิสก์แล้ว → อ่านจาก file object ทีละ chunk
+        result = await run_in_threadpool(process_ledger, file.file, fmt, chunk_rows, _prepare_frame, top_k)
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"จัดรูป/คำนวณไม่สำเร็จ: {e}")
+        raise HTTPException(status_code=400, detail=f"ประมวลผลแบบ chunk ไม่สำเร็จ: {e}")
+    add_rows(result.rows)
+
+    if output == "pdf":
+        pdf_bytes = await run_in_threadpool(lambda: result.to_pdf().getvalue())
+        return Response(
+            content=pdf_bytes,
+            media_type="application/pdf",
+            headers={"Content-Disposition": "attachment; filename=budget_plus_report.pdf"},
+        )
+    with stage("format"):
+        payload = result.to_dict()
+    return FastJSONResponse(content=payload)
+
+
+@reports_router.post("/download-report")
+async def download_report(
+    file: Optional[UploadFile] = File(None),
+    dataset_id: Optional[str] = Query(None, description=DATASET_ID_HELP),
+    format: str = Query("xlsx", description="xlsx | parquet | arrow | feather (ZIP: report + summary)"),
+):
+    if format != "xlsx" and format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format ต้องเป็นหนึ่งใน xlsx, {', '.join(EXPORT_FORMATS)}")
+    if format != "xlsx" and not columnar_available():
+        raise HTTPException(status_code=501, detail=f"ไม่รองรับ {format} บนเซิร์ฟเวอร์นี้ (ต้องติดตั้ง pyarrow)")
+
+    df = await _load_frame(file, dataset_id, ("xlsx",) if format == "xlsx" else ("columnar", "zip"))
+    df_calc = _prepare_frame(df)
+
+    if format != "xlsx":
+        try:
+            summary = summarize(df_calc)
+        except Exception:
+            summary = None  # ไม่มีคอลัมน์ Version/Scenario → ส่งเฉพาะรายละเอียด
+        try:
+            with stage("columnar_write"):
+                bundle = export_bundle({"report": df_calc, "summary": summary}, format)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"สร้างไฟล์ {format} ไม่สำเร็จ: {e}")
+        return StreamingResponse(
+            bundle,
+            media_type="application/zip",
+            headers={"Content-Disposition": f"attachment; filename=budget_plus_report_{format}.zip"},
+        )
 
     buffer = BytesIO()
     try:
-        with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
+        with stage("excel_write"), pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
             df_calc.to_excel(writer, index=False, sheet_name="Report")
             wb = writer.book
             ws = writer.sheets["Report"]
@@ -259,26 +657,31 @@ async def download_report(file: UploadFile = File(...)):
     )
 
 
-@app.post("/download-pdf")
-async def download_pdf(file: UploadFile = File(...)):
-    df = await _validate_and_read_excel(file)
+def _render_pdf(df: pd.DataFrame) -> bytes:
+    df_calc = _prepare_frame(df)
     try:
-        df_ready = _ensure_required_columns(df)
-        df_calc = calculate_variance(df_ready)
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"จัดรูป/คำนวณไม่สำเร็จ: {e}")
-
-    try:
-        pdf_buffer = generate_pdf_default(df_calc)
+        with stage("pdf"):
+            return generate_pdf_default(df_calc).getvalue()
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"สร้าง PDF ไม่สำเร็จ: {e}")
 
-    return StreamingResponse(
-        pdf_buffer,
+
+async def _build_pdf(load: Callable[[], Awaitable[pd.DataFrame]]) -> bytes:
+    return await run_in_threadpool(_render_pdf, await load())
+
+
+@reports_router.post("/download-pdf")
+async def download_pdf(
+    file: Optional[UploadFile] = File(None),
+    dataset_id: Optional[str] = Query(None, description=DATASET_ID_HELP),
+):
+    key, load = await _open_source(file, dataset_id, ("pdf",))
+    # ข้อมูลชุดเดียวกันที่ส่งมาพร้อมกัน → render ครั้งเดียว ทุก request ได้ bytes ชุดเดียวกัน
+    pdf_bytes, _ = await artifact_flight.do(("download-pdf", key), _build_pdf, load)
+    return Response(
+        content=pdf_bytes,
         media_type="application/pdf",
         headers={"Content-Disposition": "attachment; filename=budget_plus_report.pdf"},
     )
@@ -286,24 +689,21 @@ async def download_pdf(file: UploadFile = File(...)):
 
 # ====== NEW: Analyze + Next Action Recommender (JSON) ======
 @app.post("/analyze-suggest")
-async def analyze_suggest(file: UploadFile = File(...)):
+async def analyze_suggest(
+    file: Optional[UploadFile] = File(None),
+    dataset_id: Optional[str] = Query(None, description=DATASET_ID_HELP),
+):
     if suggest_as_dict is None:
         raise HTTPException(
             status_code=501,
             detail="ไม่พบโมดูล next_actions.py (Upgrade Pack). โปรดติดตั้งก่อนใช้งาน /analyze-suggest"
         )
 
-    df = await _validate_and_read_excel(file)
-    try:
-        df_ready = _ensure_required_columns(df)
-        df_calc = calculate_variance(df_ready)
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"จัดรูป/คำนวณไม่สำเร็จ: {e}")
+    df_calc = _prepare_frame(await _load_frame(file, dataset_id))
 
     try:
-        result = suggest_as_dict(df_calc)
+        with stage("next_actions"):
+            result = suggest_as_dict(df_calc)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"วิเคราะห์/แนะนำถัดไปไม่สำเร็จ: {e}")
 
@@ -311,27 +711,25 @@ async def analyze_suggest(file: UploadFile = File(...)):
 
 
 # ====== NEW: Export Executive Dashboard (Excel v2 + Next Actions + Playbooks) ======
-@app.post("/export-excel-exec")
-async def export_excel_exec(file: UploadFile = File(...)):
-    if generate_excel_dashboard_v2 is None:
+@reports_router.post("/export-excel-exec")
+async def export_excel_exec(
+    file: Optional[UploadFile] = File(None),
+    dataset_id: Optional[str] = Query(None, description=DATASET_ID_HELP),
+    hierarchy_level: Optional[int] = Query(None, ge=1, description="ใช้ระดับนี้ของลำดับชั้น cost center เป็นมิติของกราฟ"),
+):
+    if not generate_excel_dashboard_v2.available():
         raise HTTPException(
             status_code=501,
             detail="ไม่พบโมดูล excel_dashboard_v2.py. โปรดติดตั้งก่อนใช้งาน /export-excel-exec"
         )
 
-    df = await _validate_and_read_excel(file)
-    try:
-        df_ready = _ensure_required_columns(df)
-        df_calc = calculate_variance(df_ready)
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"จัดรูป/คำนวณไม่สำเร็จ: {e}")
+    df_calc = _prepare_frame(await _load_frame(file, dataset_id, ("xlsx",)))
 
     actions: Optional[Dict] = None
     if suggest_as_dict is not None:
         try:
-            actions = suggest_as_dict(df_calc)
+            with stage("next_actions"):
+                actions = suggest_as_dict(df_calc)
         except Exception:
             actions = None
 
@@ -346,11 +744,13 @@ async def export_excel_exec(file: UploadFile = File(...)):
             temp_path,
             next_actions=actions,
             dim_priority=["Category", "Department", "Region", "Product", "Customer", "Cost Center"],
-            top_n=10
+            top_n=10,
+            hierarchy=HIERARCHY_STORE.get(),
+            hierarchy_level=hierarchy_level,
         )
 
         # เติมชีต Playbooks หากมีโมดูลและ YAML พร้อม
-        if append_playbooks_sheet and load_playbooks and select_playbooks and actions:
+        if actions and append_playbooks_sheet.available() and load_playbooks.available():
             # ค้นหาโฟลเดอร์ playbooks ได้ทั้งแบบแพ็กเกจและราก
             base_dir = os.path.dirname(__file__) if "__file__" in globals() else "."
             pb_dir = os.path.join(base_dir, "playbooks")
@@ -379,6 +779,14 @@ async def export_excel_exec(file: UploadFile = File(...)):
     )
 
 
-# ====== Include /report-exec router (ZIP: PDF + Excel + Playbooks) ======
-if report_exec_router is not None:
-    app.include_router(report_exec_router)
+# ====== Routers ======
+app.include_router(diagnostics_router)
+app.include_router(dataset_router)
+app.include_router(fx_router)
+app.include_router(hierarchy_router)
+
+if APP_PROFILE != "lite":
+    app.include_router(reports_router)
+    # /report-exec (ZIP: PDF + Excel + Playbooks)
+    if report_exec_router is not None:
+        app.include_router(report_exec_router)
@@ -36,32 +36,37 @@ class AnalysisSuggestion:
     next_actions: List[NextAction]
     drilldowns: Dict[str, List[str]]
 
-def _fx_contribution_row(row: pd.Series) -> float:
+DRILLDOWN_KEYS = ["Category", "Department", "Region", "Product", "Customer"]
+PERCENT_SIGNALS = ["Margin", "Growth", "Utilization"]
+
+def _fx_contribution(data: pd.DataFrame) -> pd.Series:
     """
-    Returns the portion of variance explained by FX for a row.
+    Returns the portion of variance explained by FX for each row (vectorized).
     If FX Rate column exists, FX Adjusted Actual - Actual reflects FX effect on actuals.
     """
-    if "FX Rate" not in row.index:
-        return 0.0
-    actual = float(row.get("Actual", 0) or 0)
-    fx_adj = float(row.get("FX Adjusted Actual", actual) or actual)
-    planned = float(row.get("Planned", 0) or 0)
+    zeros = pd.Series(0.0, index=data.index)
+    actual = data["Actual"].astype(float) if "Actual" in data.columns else zeros
+    fx_adj = data["FX Adjusted Actual"].astype(float) if "FX Adjusted Actual" in data.columns else actual
+    fx_adj = fx_adj.where(fx_adj != 0, actual)
+    planned = data["Planned"].astype(float) if "Planned" in data.columns else zeros
     # Total variance (fx_adj - planned)
     total_var = fx_adj - planned
     # FX-only delta relative to raw actuals
     fx_only = fx_adj - actual
-    if total_var == 0:
-        return 0.0
-    return float(fx_only) / float(total_var)
+    nonzero = total_var != 0
+    return (fx_only / total_var.where(nonzero)).where(nonzero, 0.0)
 
 def _safe_pct(num: float, den: float) -> float:
     if den == 0:
         return 0.0
     return float(num) / float(den)
 
-def recommend_next_actions(df: pd.DataFrame, thresholds: Dict[str, float] = None) -> AnalysisSuggestion:
-    th = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
-    data = df.copy()
+def suggestion_stats(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Additive statistics the rules below are built from. Stats of separate chunks of one
+    ledger can be combined with merge_suggestion_stats (out-of-core processing).
+    """
+    data = df.copy(deep=False)
 
     # Ensure calculation columns exist
     if "FX Adjusted Actual" not in data.columns:
@@ -70,15 +75,47 @@ def recommend_next_actions(df: pd.DataFrame, thresholds: Dict[str, float] = None
     if "Variance" not in data.columns:
         data["Variance"] = data["FX Adjusted Actual"] - data.get("Planned", 0)
 
+    stats: Dict[str, Any] = {
+        "planned": float(data.get("Planned", pd.Series([0])).sum()),
+        "actual_fx": float(data.get("FX Adjusted Actual", pd.Series([0])).sum()),
+        # Percent signals (if present): (sum, count) → mean
+        "percent": {col: (float(data[col].sum()), int(data[col].count()))
+                    for col in PERCENT_SIGNALS if col in data.columns},
+        "fx": None,
+        "drilldowns": {key: data.groupby(key)["Variance"].sum() for key in DRILLDOWN_KEYS if key in data.columns},
+    }
+    if "FX Rate" in data.columns:
+        weight = data["Variance"].abs()
+        stats["fx"] = (float((_fx_contribution(data) * weight).sum()), float(weight.sum()))
+    return stats
+
+def merge_suggestion_stats(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    percent = dict(a["percent"])
+    for col, (total, n) in b["percent"].items():
+        t0, n0 = percent.get(col, (0.0, 0))
+        percent[col] = (t0 + total, n0 + n)
+    fx = a["fx"] if b["fx"] is None else b["fx"] if a["fx"] is None else (a["fx"][0] + b["fx"][0], a["fx"][1] + b["fx"][1])
+    drilldowns = dict(a["drilldowns"])
+    for key, sums in b["drilldowns"].items():
+        drilldowns[key] = drilldowns[key].add(sums, fill_value=0) if key in drilldowns else sums
+    return {"planned": a["planned"] + b["planned"], "actual_fx": a["actual_fx"] + b["actual_fx"],
+            "percent": percent, "fx": fx, "drilldowns": drilldowns}
+
+def recommend_next_actions(df: pd.DataFrame, thresholds: Dict[str, float] = None) -> AnalysisSuggestion:
+    return recommend_from_stats(suggestion_stats(df), thresholds)
+
+def recommend_from_stats(stats: Dict[str, Any], thresholds: Dict[str, float] = None) -> AnalysisSuggestion:
+    th = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+
     # Summary metrics
-    total_plan = float(data.get("Planned", pd.Series([0])).sum())
-    total_actual_fx = float(data.get("FX Adjusted Actual", pd.Series([0])).sum())
+    total_plan = stats["planned"]
+    total_actual_fx = stats["actual_fx"]
     total_var = total_actual_fx - total_plan
 
-    # Percent signals (if present)
-    margin = float(data.get("Margin", pd.Series([None])).mean()) if "Margin" in data.columns else None
-    growth = float(data.get("Growth", pd.Series([None])).mean()) if "Growth" in data.columns else None
-    util = float(data.get("Utilization", pd.Series([None])).mean()) if "Utilization" in data.columns else None
+    means = {col: (total / n if n else float("nan")) for col, (total, n) in stats["percent"].items()}
+    margin = means.get("Margin")
+    growth = means.get("Growth")
+    util = means.get("Utilization")
 
     summary = {
         "total_planned": total_plan,
@@ -108,11 +145,9 @@ def recommend_next_actions(df: pd.DataFrame, thresholds: Dict[str, float] = None
         ))
 
     # Rule 2: FX explains a large fraction of variance
-    if "FX Rate" in data.columns:
-        data["_fx_contrib"] = data.apply(_fx_contribution_row, axis=1)
-        fx_weighted = float((data["_fx_contrib"] * data["Variance"].abs()).sum())
-        var_weight = float((data["Variance"].abs()).sum()) or 1.0
-        fx_contrib_pct = fx_weighted / var_weight
+    if stats["fx"] is not None:
+        fx_weighted, var_weight = stats["fx"]
+        fx_contrib_pct = fx_weighted / (var_weight or 1.0)
         if fx_contrib_pct >= th["fx_contrib_warn_pct"]:
             actions.append(NextAction(
                 title="Run FX impact decomposition and simulate hedging scenarios",
@@ -183,10 +218,8 @@ def recommend_next_actions(df: pd.DataFrame, thresholds: Dict[str, float] = None
 
     # Drilldown keys if present
     drilldowns: Dict[str, List[str]] = {}
-    for key in ["Category", "Department", "Region", "Product", "Customer"]:
-        if key in data.columns:
-            top = (data.groupby(key)["Variance"].sum().abs().sort_values(ascending=False).head(th["top_n"]).index.tolist())
-            drilldowns[key] = top
+    for key, sums in stats["drilldowns"].items():
+        drilldowns[key] = sums.abs().sort_values(ascending=False).head(th["top_n"]).index.tolist()
 
     return AnalysisSuggestion(
         summary=summary,
@@ -195,7 +228,9 @@ def recommend_next_actions(df: pd.DataFrame, thresholds: Dict[str, float] = None
     )
 
 def suggest_as_dict(df: pd.DataFrame, thresholds: Dict[str, float] = None) -> Dict[str, Any]:
-    s = recommend_next_actions(df, thresholds)
+    return suggestion_dict(recommend_next_actions(df, thresholds))
+
+def suggestion_dict(s: AnalysisSuggestion) -> Dict[str, Any]:
     return {
         "summary": s.summary,
         "next_actions": [
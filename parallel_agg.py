@@ -0,0 +1,228 @@
+"""
+parallel_agg.py
+Multi-core aggregation of a prepared frame (FX Adjusted Actual / Variance already computed):
+- rows are sharded by a hash of Cost Center, so every cost center lives in exactly one shard
+- key codes + numeric columns are published once into shared memory (utils/shared_frame.py),
+  laid out shard by shard; workers attach the handle and read their slice (the frame is never pickled)
+- each worker returns, for its rows only: grouped sums (bincount over global group codes),
+  its top-K |Variance| rows, per-month sums and the per-cost-center rolling 3M alert crossings
+- the parent merges: groups and cost centers are disjoint between shards, months are added
+summarize(df) switches to this path automatically at PARALLEL_AGG_MIN_ROWS rows when more than
+one worker is available; below that (or on one core) it is summarize_variance as before.
+
+    python -m benchmarks scaling --rows 2000000 --workers 1,2,4,8
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .utils.variance_utils import summarize_variance
+    from .utils.process_pool import resolve_workers, run_all
+    from .utils.shared_frame import FrameHandle, attach, publish
+    from .scenarios_alerts import alerts_from_monthly
+    from .config import PARALLEL_AGG_MIN_ROWS, PARALLEL_AGG_WORKERS, CHUNK_TOP_K
+except ImportError:
+    from utils.variance_utils import summarize_variance
+    from utils.process_pool import resolve_workers, run_all
+    from utils.shared_frame import FrameHandle, attach, publish
+    from scenarios_alerts import alerts_from_monthly
+    from config import PARALLEL_AGG_MIN_ROWS, PARALLEL_AGG_WORKERS, CHUNK_TOP_K
+
+SUMMARY_KEYS = ["Version", "Scenario", "Cost Center"]
+SUM_COLUMNS = ["Planned", "Actual", "FX Adjusted Actual", "Variance"]
+
+
+@dataclass
+class ParallelResult:
+    summary: pd.DataFrame                  # = summarize_variance(df)
+    top_drivers: pd.DataFrame              # top-K แถวตาม |Variance| (มากไปน้อย)
+    monthly: Optional[pd.DataFrame]        # = scenarios_alerts.monthly_totals(df)
+    cost_center_alerts: List[Dict[str, Any]]
+    shards: int
+    workers: int
+
+    def alerts(self, pct_threshold: float = 0.08) -> Dict[str, Any]:
+        return alerts_from_monthly(None if self.monthly is None else self.monthly.copy(), pct_threshold)
+
+
+# ---------- worker side ----------
+
+def _nan0(values: np.ndarray) -> np.ndarray:
+    return np.where(np.isnan(values), 0.0, values)
+
+
+def _shard_result(cols: Dict[str, np.ndarray], n_months: int, top_k: int, pct_threshold: float) -> Dict[str, Any]:
+    """ผลของ 1 shard (ทุก array ที่คืนเป็นสำเนา ไม่อ้างอิง shared memory)"""
+    out: Dict[str, Any] = {}
+
+    group = cols["group"]
+    valid = group >= 0
+    ids, inv = np.unique(group[valid], return_inverse=True)
+    out["groups"] = ids
+    out["sums"] = np.column_stack([
+        np.bincount(inv, weights=_nan0(cols[c][valid]), minlength=len(ids)) for c in SUM_COLUMNS
+    ]) if len(ids) else np.zeros((0, len(SUM_COLUMNS)))
+
+    magnitude = np.abs(cols["Variance"])
+    magnitude = np.where(np.isnan(magnitude), -1.0, magnitude)
+    k = min(int(top_k), len(magnitude))
+    top = np.argpartition(-magnitude, k - 1)[:k] if k else np.zeros(0, dtype=np.int64)
+    top = top[magnitude[top] >= 0]
+    out["top_magnitude"] = magnitude[top]
+    out["top_rows"] = cols["row"][top]
+
+    month = cols["month"]
+    if n_months:
+        has_month = month >= 0
+        m = month[has_month]
+        planned = _nan0(cols["Planned"][has_month])
+        actual = _nan0(cols["FX Adjusted Actual"][has_month])
+        out["month_planned"] = np.bincount(m, weights=planned, minlength=n_months)
+        out["month_actual"] = np.bincount(m, weights=actual, minlength=n_months)
+
+        # rolling 3M ต่อ cost center: shard มี cost center ครบทุกแถว จึงคำนวณจบใน worker ได้
+        cc = cols["cc"][has_month]
+        ok = cc >= 0
+        ccs, cc_inv = np.unique(cc[ok], return_inverse=True)
+        size = len(ccs) * n_months
+        key = cc_inv * n_months + m[ok]
+        p = np.bincount(key, weights=planned[ok], minlength=size).reshape(len(ccs), n_months)
+        a = np.bincount(key, weights=actual[ok], minlength=size).reshape(len(ccs), n_months)
+        ratio = np.divide(a, p, out=np.ones_like(a), where=p != 0)    # plan = 0 → neutral (เหมือน scan_alerts)
+        if n_months >= 3:
+            csum = np.cumsum(ratio, axis=1)
+            rolling = (csum[:, 2:] - np.pad(csum, ((0, 0), (1, 0)))[:, :-3]) / 3.0
+            hit_cc, hit_m = np.nonzero(rolling >= 1.0 + pct_threshold)
+            out["alert_cc"] = ccs[hit_cc]
+            out["alert_month"] = hit_m + 2
+            out["alert_ratio"] = rolling[hit_cc, hit_m]
+    return out
+
+
+def _aggregate_shard(handle: FrameHandle, start: int, end: int, n_months: int, top_k: int,
+                     pct_threshold: float) -> Dict[str, Any]:
+    """worker: attach segment → view เฉพาะช่วง [start, end) ของทุกคอลัมน์ (ไม่คัดลอก)"""
+    with attach(handle, start, end) as frame:
+        cols = {col: frame[col].to_numpy() for col in frame.columns}
+        result = _shard_result(cols, n_months, top_k, pct_threshold)
+        del cols     # ต้องไม่มี view ค้างก่อนปิด segment
+    return result
+
+
+# ---------- parent side ----------
+
+def shard_of_rows(cost_centers: pd.Series, shards: int) -> Tuple[np.ndarray, np.ndarray, pd.Index]:
+    """(shard ต่อแถว, code ของ Cost Center, ค่า Cost Center) — hash เฉพาะค่าที่ไม่ซ้ำ"""
+    codes, uniques = pd.factorize(cost_centers, sort=True)
+    per_cc = (pd.util.hash_array(np.asarray(uniques, dtype=object)) % np.uint64(shards)).astype(np.int64)
+    rows = np.where(codes >= 0, per_cc[np.maximum(codes, 0)] if len(per_cc) else 0, 0)
+    return rows.astype(np.int64), codes.astype(np.int64), pd.Index(uniques)
+
+
+def _group_codes(df: pd.DataFrame, cc_codes: np.ndarray, cc_uniques: pd.Index):
+    """(Version, Scenario, Cost Center) → group id เรียงตามคีย์ (-1 ถ้าคีย์ใดว่าง) + ค่าคีย์ของแต่ละ group"""
+    v_codes, v_uniques = pd.factorize(df["Version"], sort=True)
+    s_codes, s_uniques = pd.factorize(df["Scenario"], sort=True)
+    ns, nc = max(len(s_uniques), 1), max(len(cc_uniques), 1)
+    valid = (v_codes >= 0) & (s_codes >= 0) & (cc_codes >= 0)
+    combined = np.where(valid, (v_codes.astype(np.int64) * ns + s_codes) * nc + cc_codes, -1)
+    group, uniques = pd.factorize(combined, sort=True)
+    if len(uniques) and uniques[0] == -1:
+        group, uniques = group - 1, uniques[1:]
+    group = np.where(valid, group, -1).astype(np.int64)
+    keys = pd.DataFrame({
+        "Version": np.asarray(v_uniques, dtype=object)[uniques // (ns * nc)],
+        "Scenario": np.asarray(s_uniques, dtype=object)[(uniques // nc) % ns],
+        "Cost Center": np.asarray(cc_uniques, dtype=object)[uniques % nc],
+    })
+    return group, keys
+
+
+def _month_codes(df: pd.DataFrame):
+    if "Month" not in df.columns:
+        return np.full(len(df), -1, dtype=np.int64), None
+    codes, uniques = pd.factorize(pd.to_datetime(df["Month"], errors="coerce"), sort=True)
+    return codes.astype(np.int64), pd.DatetimeIndex(uniques)
+
+
+def aggregate(df: pd.DataFrame, workers: Optional[int] = PARALLEL_AGG_WORKERS, shards: Optional[int] = None,
+              top_k: int = CHUNK_TOP_K, pct_threshold: float = 0.08) -> ParallelResult:
+    """
+    summary + top-K drivers + monthly series + per-cost-center alerts
+    workers=1 → คำนวณใน process เดียว (ไม่ใช้ shared memory) ด้วยโค้ดเดียวกัน
+    shards ค่าเริ่มต้น = 2 × workers (cost center ใหญ่ไม่กระจุกอยู่ใน worker เดียวทั้งหมด)
+    """
+    missing = [c for c in SUMMARY_KEYS + SUM_COLUMNS if c not in df.columns]
+    if missing:
+        raise KeyError(f"missing columns: {missing}")
+    workers = resolve_workers(workers)
+    shards = max(int(shards or 2 * workers), 1) if workers > 1 else 1
+    n = len(df)
+
+    shard, cc_codes, cc_uniques = shard_of_rows(df["Cost Center"], shards)
+    group, keys = _group_codes(df, cc_codes, cc_uniques)
+    month, months = _month_codes(df)
+    n_months = 0 if months is None else len(months)
+    sources = {c: df[c].to_numpy(dtype=np.float64) for c in SUM_COLUMNS}
+    sources.update(group=group, cc=cc_codes, month=month, row=np.arange(n, dtype=np.int64))
+
+    if shards == 1:
+        parts = [_shard_result(sources, n_months, top_k, pct_threshold)]
+    else:
+        parts = _run_shards(sources, shard, shards, workers, n_months, top_k, pct_threshold)
+    return _merge(df, parts, keys, months, cc_uniques, top_k, shards, workers)
+
+
+def _run_shards(sources: Dict[str, np.ndarray], shard: np.ndarray, shards: int, workers: int,
+                n_months: int, top_k: int, pct_threshold: float) -> List[Dict[str, Any]]:
+    order = np.argsort(shard, kind="stable")
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(shard, minlength=shards))])
+    # คัดลอกลง shared memory ครั้งเดียว เรียงตาม shard → แต่ละ worker อ่านช่วงแถวต่อเนื่องของตัวเอง
+    with publish(pd.DataFrame(sources, copy=False), order=order) as shared:
+        calls = [
+            (_aggregate_shard, (shared.handle, int(lo), int(hi), n_months, top_k, pct_threshold))
+            for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo
+        ]
+        return run_all(calls, workers)
+
+
+def _merge(df: pd.DataFrame, parts: List[Dict[str, Any]], keys: pd.DataFrame, months: Optional[pd.DatetimeIndex],
+           cc_uniques: pd.Index, top_k: int, shards: int, workers: int) -> ParallelResult:
+    sums = np.zeros((len(keys), len(SUM_COLUMNS)))
+    present = np.zeros(len(keys), dtype=bool)
+    for part in parts:                       # group ของแต่ละ shard ไม่ซ้ำกัน → วางตรงตำแหน่งได้เลย
+        sums[part["groups"]] = part["sums"]
+        present[part["groups"]] = True
+    summary = pd.concat([keys, pd.DataFrame(sums, columns=SUM_COLUMNS)], axis=1)[present].reset_index(drop=True)
+
+    magnitude = np.concatenate([p["top_magnitude"] for p in parts])
+    rows = np.concatenate([p["top_rows"] for p in parts]).astype(np.int64)
+    best = np.lexsort((rows, -magnitude))[:top_k]
+    top_drivers = df.iloc[rows[best]]
+
+    monthly, cc_alerts = None, []
+    if months is not None:
+        monthly = pd.DataFrame({
+            "Planned": sum(p.get("month_planned", np.zeros(len(months))) for p in parts),
+            "FX Adjusted Actual": sum(p.get("month_actual", np.zeros(len(months))) for p in parts),
+        }, index=pd.DatetimeIndex(months, name="Month"))
+        for p in parts:
+            for cc, m, ratio in zip(p.get("alert_cc", ()), p.get("alert_month", ()), p.get("alert_ratio", ())):
+                cc_alerts.append({"cost_center": cc_uniques[cc], "month": str(months[m].date()), "ratio": float(ratio)})
+        cc_alerts.sort(key=lambda a: (a["month"], str(a["cost_center"])))
+    return ParallelResult(summary, top_drivers, monthly, cc_alerts, shards, workers)
+
+
+def use_parallel(rows: int, workers: Optional[int] = PARALLEL_AGG_WORKERS) -> bool:
+    return rows >= PARALLEL_AGG_MIN_ROWS and resolve_workers(workers) > 1
+
+
+def summarize(df: pd.DataFrame) -> pd.DataFrame:
+    """summarize_variance ที่สลับเป็นแบบหลาย process อัตโนมัติเมื่อข้อมูลใหญ่ถึงเกณฑ์"""
+    if not use_parallel(len(df)):
+        return summarize_variance(df)
+    return aggregate(df, top_k=0).summary
@@ -0,0 +1,118 @@
+
+"""
+pdf_canvas.py
+Shared reportlab canvas factory for every PDF the app produces:
+- new_canvas(): page compression always on (ไม่พึ่งค่า global ของ rl_config)
+- new_page(): showPage() + restore the current font / fill colour (reportlab starts every
+  page in Helvetica 12 black, which would drop the Thai font mid-section)
+- draw_form(): repeated page furniture (header/footer rules, KPI box frames) is drawn once
+  per document as a form XObject and re-used with a single "Do" on every page
+- register_ttf() / thai_font() / font_for(): process-wide registry of parsed TTF fonts,
+  so a Thai font is parsed once per process instead of once per report
+Images drawn with drawImage are already de-duplicated per document by reportlab (content digest).
+"""
+
+from typing import Callable, Dict, Iterable, Optional, Tuple
+import os
+import threading
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+DEFAULT_FONT = "Helvetica"
+THAI_FONT_NAME = "BudgetThai"
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ลำดับการค้นหาฟอนต์ไทย: env → โฟลเดอร์ fonts/ ในแพ็กเกจ → ฟอนต์ระบบ (Debian/Ubuntu)
+THAI_FONT_CANDIDATES = [
+    os.path.join(_BASE_DIR, "fonts", "THSarabunNew.ttf"),
+    os.path.join(_BASE_DIR, "fonts", "NotoSansThai-Regular.ttf"),
+    "/usr/share/fonts/truetype/noto/NotoSansThai-Regular.ttf",
+    "/usr/share/fonts/truetype/tlwg/Garuda.ttf",
+    "/usr/share/fonts/truetype/tlwg/Loma.ttf",
+    "/usr/share/fonts/truetype/thai/Garuda.ttf",
+]
+
+_registry: Dict[str, Optional[str]] = {}   # font name → path ที่ลงทะเบียนแล้ว (None = หาไม่เจอ/โหลดไม่ได้)
+_registry_lock = threading.Lock()
+
+
+def new_canvas(buf, pagesize: Tuple[float, float] = A4, **kwargs) -> "canvas.Canvas":
+    """สร้าง Canvas แบบบีบอัด content stream เสมอ"""
+    kwargs.setdefault("pageCompression", 1)
+    return canvas.Canvas(buf, pagesize=pagesize, **kwargs)
+
+
+def new_page(c: "canvas.Canvas", font: str, size: float, fill=None):
+    """ขึ้นหน้าใหม่แล้วตั้งฟอนต์ (และสีข้อความ) เดิมกลับ — showPage() รีเซ็ตเป็น Helvetica 12 สีดำ"""
+    c.showPage()
+    c.setFont(font, size)
+    if fill is not None:
+        c.setFillColor(fill)
+
+
+def draw_form(c: "canvas.Canvas", name: str, x: float, y: float,
+              draw: Callable[["canvas.Canvas"], None], bbox: Optional[Tuple[float, float, float, float]] = None):
+    """
+    วาด draw(c) เป็น form XObject ชื่อ name ครั้งแรกที่เจอในเอกสาร แล้ววางที่ (x, y)
+    การเรียกครั้งถัดไป (หน้าเดียวกันหรือหน้าอื่น) เป็นแค่การอ้างอิง form เดิม
+    draw ต้องวาดโดยอิงจุดกำเนิด (0, 0); bbox = (lowerx, lowery, upperx, uppery)
+    """
+    if not c.hasForm(name):
+        lx, ly, ux, uy = bbox if bbox is not None else (0, 0, None, None)
+        c.beginForm(name, lx, ly, ux, uy)
+        draw(c)
+        c.endForm()
+    c.saveState()
+    c.translate(x, y)
+    c.doForm(name)
+    c.restoreState()
+
+
+def register_ttf(name: str, path: str) -> bool:
+    """Parse + ลงทะเบียน TTF ครั้งเดียวต่อ process (thread-safe); คืน True ถ้าใช้งานได้"""
+    with _registry_lock:
+        if _registry.get(name):
+            return True
+        try:
+            pdfmetrics.registerFont(TTFont(name, path))
+        except Exception:
+            return False
+        _registry[name] = path
+        return True
+
+
+def thai_font() -> Optional[str]:
+    """ชื่อฟอนต์ไทยที่ลงทะเบียนแล้ว หรือ None ถ้าไม่มีฟอนต์ไทยในเครื่อง (ผลลัพธ์ถูก cache)"""
+    if THAI_FONT_NAME in _registry:
+        return THAI_FONT_NAME if _registry[THAI_FONT_NAME] else None
+    env_path = os.getenv("BUDGET_PDF_THAI_FONT")
+    for path in ([env_path] if env_path else []) + THAI_FONT_CANDIDATES:
+        if os.path.isfile(path) and register_ttf(THAI_FONT_NAME, path):
+            return THAI_FONT_NAME
+    with _registry_lock:
+        _registry.setdefault(THAI_FONT_NAME, None)
+    return None
+
+
+def _is_latin1(text: str) -> bool:
+    try:
+        text.encode("latin-1")
+        return True
+    except UnicodeEncodeError:
+        return False
+
+
+def font_for(texts: Iterable[str], default: str = DEFAULT_FONT) -> str:
+    """
+    ใช้ฟอนต์มาตรฐาน (ไม่ต้องฝังฟอนต์) ถ้าข้อความทั้งหมดเป็น Latin-1
+    ถ้ามีภาษาไทย/อักขระอื่น → ใช้ฟอนต์ไทยที่ลงทะเบียนไว้ (ถ้ามี)
+    """
+    if isinstance(texts, str):
+        texts = [texts]
+    if all(_is_latin1(str(t)) for t in texts):
+        return default
+    return thai_font() or default
@@ -0,0 +1,94 @@
+
+"""
+pdf_parallel.py
+Render independent PDF sections in worker processes, then merge them:
+- render_sections(sections): each Section(fn, args) → PDF bytes, one worker process per section
+- merge_sections(titles, parts): concatenate, add one outline entry per section,
+  and stamp "Page i / N" on every page after the merge (sections don't know global page numbers)
+"""
+
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Any, Callable, List, Optional, Tuple
+
+from reportlab.lib.pagesizes import A4
+
+try:
+    from .utils.process_pool import run_all
+except ImportError:
+    from utils.process_pool import run_all
+
+# pypdf เป็น optional: ถ้าไม่มีจะ render แบบ canvas เดียวตามเดิม
+try:
+    from pypdf import PdfReader, PdfWriter
+    from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject
+except Exception:
+    PdfReader = PdfWriter = None
+
+
+@dataclass
+class Section:
+    title: str
+    fn: Callable[..., bytes]      # ต้องเป็นฟังก์ชันระดับโมดูล (pickle ไปยัง worker ได้)
+    args: Tuple[Any, ...] = ()
+
+
+def parallel_available() -> bool:
+    return PdfWriter is not None
+
+
+def render_sections(sections: List[Section], workers: Optional[int] = None) -> List[bytes]:
+    """Render ทุก section พร้อมกันใน process pool; คืน PDF bytes ตามลำดับ section"""
+    return run_all([(s.fn, s.args) for s in sections], workers)
+
+
+def _page_number_font(writer: "PdfWriter"):
+    return writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+        NameObject("/Encoding"): NameObject("/WinAnsiEncoding"),
+    }))
+
+
+def _stamp_page_numbers(writer: "PdfWriter"):
+    """
+    ต่อ content stream เล็กๆ ท้ายแต่ละหน้า ("Page i / N" มุมขวาล่าง)
+    แทน merge_page ซึ่งต้อง decode/encode content ของทุกหน้าใหม่
+    """
+    font = _page_number_font(writer)
+    total = len(writer.pages)
+    x, y = A4[0] - 60, 20
+    for i, page in enumerate(writer.pages, start=1):
+        resources = page["/Resources"].get_object()
+        fonts = resources.get("/Font")
+        if fonts is None:
+            fonts = DictionaryObject()
+            resources[NameObject("/Font")] = fonts
+        fonts.get_object()[NameObject("/FPageNo")] = font
+
+        stream = DecodedStreamObject()
+        stream.set_data(f"q 0 g BT /FPageNo 8 Tf 1 0 0 1 {x} {y} Tm (Page {i} / {total}) Tj ET Q".encode("ascii"))
+        ref = writer._add_object(stream)
+
+        contents = page.get("/Contents")
+        parts = contents.get_object() if contents is not None else ArrayObject()
+        parts = ArrayObject(parts) if isinstance(parts, ArrayObject) else ArrayObject([contents])
+        parts.append(ref)
+        page[NameObject("/Contents")] = parts
+
+
+def merge_sections(titles: List[str], parts: List[bytes]) -> BytesIO:
+    """รวม PDF ของแต่ละ section + outline (bookmark) ต่อ section + เลขหน้าใหม่ทั้งเล่ม"""
+    writer = PdfWriter()
+    for title, data in zip(titles, parts):
+        first_page = len(writer.pages)
+        writer.append(PdfReader(BytesIO(data)))
+        if len(writer.pages) > first_page:
+            writer.add_outline_item(title, first_page)
+    _stamp_page_numbers(writer)
+
+    out = BytesIO()
+    writer.write(out)
+    out.seek(0)
+    return out
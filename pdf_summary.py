@@ -5,6 +5,7 @@ import matplotlib
 matplotlib.use("Agg")
 
 import matplotlib.pyplot as plt
+import logging
 from io import BytesIO
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
@@ -16,11 +17,25 @@ from reportlab.lib import colors
 try:
     # กรณีรันแบบแพ็กเกจ (uvicorn budget_plus.main:app)
     from .utils.number_format_utils import format_number
-    from .config import PERCENT_COLUMNS
+    from .utils.chart_utils import top_n_keys, bucket_other, order_buckets
+    from .config import PERCENT_COLUMNS, CHART_TOP_N, SUMMARY_TOP_N
+    from .config import PDF_PARALLEL, PDF_SECTION_ROWS, PDF_WORKERS
+    from .utils.shared_frame import publish, frame_from
+    from .pdf_table import TableColumn, format_table, draw_table
+    from .pdf_parallel import Section, render_sections, merge_sections, parallel_available
+    from .pdf_canvas import new_canvas, draw_form
+    from .utils.metrics import stage
 except ImportError:
     # กรณีรันแบบ root module (uvicorn main:app)
     from utils.number_format_utils import format_number
-    from config import PERCENT_COLUMNS
+    from utils.chart_utils import top_n_keys, bucket_other, order_buckets
+    from config import PERCENT_COLUMNS, CHART_TOP_N, SUMMARY_TOP_N
+    from config import PDF_PARALLEL, PDF_SECTION_ROWS, PDF_WORKERS
+    from utils.shared_frame import publish, frame_from
+    from pdf_table import TableColumn, format_table, draw_table
+    from pdf_parallel import Section, render_sections, merge_sections, parallel_available
+    from pdf_canvas import new_canvas, draw_form
+    from utils.metrics import stage
 
 # ========== Next Actions ==========
 try:
@@ -154,7 +169,7 @@ def _ensure_calc(df):
     - FX Adjusted Actual
     - Variance
     """
-    data = df.copy()
+    data = df.copy(deep=False)   # เพิ่มคอลัมน์ใหม่เท่านั้น ไม่แก้ค่าเดิม (df อาจเป็น view อ่านอย่างเดียว)
     if "FX Adjusted Actual" not in data.columns:
         if "Actual" in data.columns:
             data["FX Adjusted Actual"] = data["Actual"]
@@ -168,10 +183,12 @@ def _ensure_calc(df):
 
 # ---------- Executive Summary (หน้าแรก) ----------
 def _kpi_box(c, x, y, w, h, title, value, subtitle=None):
-    """วาดกล่อง KPI แบบเรียบหรู"""
-    c.setStrokeColor(colors.HexColor("#E0E0E0"))
-    c.setFillColor(colors.white)
-    c.roundRect(x, y - h, w, h, 8, stroke=1, fill=1)
+    """วาดกล่อง KPI แบบเรียบหรู (กรอบเป็น form XObject ใช้ซ้ำทุกกล่องขนาดเดียวกัน)"""
+    def frame(fc):
+        fc.setStrokeColor(colors.HexColor("#E0E0E0"))
+        fc.setFillColor(colors.white)
+        fc.roundRect(0, 0, w, h, 8, stroke=1, fill=1)
+    draw_form(c, f"kpi_frame_{w:.0f}x{h:.0f}", x, y - h, frame, bbox=(-1, -1, w + 1, h + 1))
 
     c.setFont("Helvetica", 10)
     c.setFillColor(colors.HexColor("#7A7A7A"))
@@ -195,8 +212,8 @@ def _mean_or_none(series):
         return None
 
 
-def draw_executive_summary_page(c: "canvas.Canvas", df, actions_result=None):
-    """หน้าแรก: KPI + ค่าเฉลี่ย % + Teaser Next Actions"""
+def draw_executive_summary_page(c: "canvas.Canvas", df, actions_result=None, percent_avgs=None):
+    """หน้าแรก: KPI + ค่าเฉลี่ย % + Teaser Next Actions (percent_avgs: ค่าเฉลี่ยที่คำนวณไว้แล้ว เช่น จาก chunked.py)"""
     width, height = A4
     margin = 2 * cm
     c.setFont("Helvetica-Bold", 18)
@@ -232,7 +249,7 @@ def draw_executive_summary_page(c: "canvas.Canvas", df, actions_result=None):
         y2 -= 14
         x = margin
         for col in avail:
-            val = _mean_or_none(df[col])
+            val = percent_avgs[col] if percent_avgs and col in percent_avgs else _mean_or_none(df[col])
             label = f"{col}: {format_number(val or 0, 'percent')}"
             c.setFont("Helvetica", 11)
             c.drawString(x, y2, label)
@@ -250,9 +267,18 @@ def draw_executive_summary_page(c: "canvas.Canvas", df, actions_result=None):
             c.drawString(margin, y3, f"{i}. {title}")
             y3 -= 14
 
-    c.setStrokeColor(colors.HexColor("#EEEEEE"))
-    c.line(margin, 2*cm, width - margin, 2*cm)
-    c.setStrokeColor(colors.black)
+    _draw_footer_rule(c)
+
+
+def _draw_footer_rule(c: "canvas.Canvas"):
+    """เส้นคั่นท้ายหน้า (form XObject เดียวต่อเอกสาร)"""
+    width, _ = A4
+    margin = 2 * cm
+
+    def rule(fc):
+        fc.setStrokeColor(colors.HexColor("#EEEEEE"))
+        fc.line(0, 0, width - margin * 2, 0)
+    draw_form(c, "footer_rule", margin, 2 * cm, rule, bbox=(-1, -1, width - margin * 2 + 1, 1))
 
 
 def _wrap_text(text, width):
@@ -270,62 +296,33 @@ def _wrap_text(text, width):
         yield " ".join(line)
 
 
-def generate_pdf_with_chart(df, style_map=None, include_percent=True, add_next_actions=True, add_scenarios_alerts=True):
+def _grouped_summary(df, group_key, include_percent, top_n):
     """
-    Generate PDF report:
-      1) Executive Summary (KPI page)
-      2) Main chart + grouped summary
-      3) Next Actions (optional)
-      4) Scenarios & Alerts (optional)
+    Sum Planned / FX Adjusted Actual / Variance per group_key (+ avg percent columns).
+    Groups outside the top_n by |Variance| are folded into a single "Other" row.
     """
-    if style_map is None:
-        style_map = {
-            "Planned": "number",
-            "FX Adjusted Actual": "number",
-            "Variance": "number",
-        }
-        for col in PERCENT_COLUMNS:
-            style_map[col] = "percent"
-
-    # ให้แน่ใจว่ามีคอลัมน์ที่ใช้ในกราฟ/สรุป
-    df = _ensure_calc(df)
-
-    # เตรียม Next Actions สำหรับ Executive Summary teaser
-    try:
-        actions_result = suggest_as_dict(df)
-    except Exception:
-        actions_result = None
+    keep = top_n_keys(df, group_key, top_n) if group_key else None
+    data = bucket_other(df, group_key, keep) if keep is not None else df
 
-    # ====== สร้าง PDF ======
-    pdf_buffer = BytesIO()
-    c = canvas.Canvas(pdf_buffer, pagesize=A4)
-    width, height = A4
-
-    # ---------- Page 1: Executive Summary ----------
-    draw_executive_summary_page(c, df, actions_result=actions_result)
-    c.showPage()
-
-    # ===== สรุปราย Cost Center (หรือทั้งก้อนถ้าไม่มีคอลัมน์) =====
-    group_key = "Cost Center" if "Cost Center" in df.columns else None
     if group_key:
-        grouped = df.groupby(group_key, as_index=False).agg({
+        grouped = data.groupby(group_key, as_index=False).agg({
             "Planned": "sum",
             "FX Adjusted Actual": "sum",
             "Variance": "sum"
         })
     else:
-        grouped = df[["Planned", "FX Adjusted Actual", "Variance"]].sum(numeric_only=True).to_frame().T
+        grouped = data[["Planned", "FX Adjusted Actual", "Variance"]].sum(numeric_only=True).to_frame().T
         grouped.insert(0, "Cost Center", ["Total"])
 
     # เฉลี่ย percent columns ต่อ group
     if include_percent:
         percent_avgs = {}
         for col in PERCENT_COLUMNS:
-            if col in df.columns:
+            if col in data.columns:
                 if group_key:
-                    avg_col = df.groupby(group_key, as_index=False)[col].mean()
+                    avg_col = data.groupby(group_key, as_index=False)[col].mean()
                 else:
-                    avg_col = df[[col]].mean(numeric_only=True).to_frame().T
+                    avg_col = data[[col]].mean(numeric_only=True).to_frame().T
                     avg_col.insert(0, "Cost Center", "Total")
                 avg_col = avg_col.rename(columns={col: f"__avg__{col}"})
                 percent_avgs[col] = avg_col
@@ -333,14 +330,22 @@ def generate_pdf_with_chart(df, style_map=None, include_percent=True, add_next_a
         for col, avgdf in percent_avgs.items():
             grouped = grouped.merge(avgdf, on="Cost Center", how="left")
 
-    # ===== วาดกราฟ (Planned vs Actual by Cost Center) =====
+    if keep is not None:
+        grouped = order_buckets(grouped, group_key, keep)
+    return grouped
+
+
+@stage("chart_render")
+def _render_chart_png(grouped) -> bytes:
+    """กราฟ Planned vs Actual by Cost Center → PNG bytes"""
     fig, ax = plt.subplots(figsize=(8, 4))
     bar_width = 0.35
     index = range(len(grouped))
     ax.bar(list(index), grouped["Planned"], bar_width, label="Planned")
     ax.bar([i + bar_width for i in index], grouped["FX Adjusted Actual"], bar_width, label="Actual")
     ax.set_xticks([i + bar_width / 2 for i in index])
-    ax.set_xticklabels(grouped["Cost Center"], rotation=0)
+    many = len(grouped) > 6
+    ax.set_xticklabels(grouped["Cost Center"], rotation=30 if many else 0, ha="right" if many else "center")
     ax.set_ylabel("Cost (in units)")
     ax.set_title("Planned vs Actual by Cost Center")
     ax.legend()
@@ -349,65 +354,205 @@ def generate_pdf_with_chart(df, style_map=None, include_percent=True, add_next_a
     chart_buffer = BytesIO()
     plt.savefig(chart_buffer, format="PNG")
     plt.close(fig)
-    chart_buffer.seek(0)
-    chart_bytes = chart_buffer.getvalue()
+    return chart_buffer.getvalue()
+
 
-    # ---------- Page 2: Main chart + summary ----------
+def _draw_chart_header(c: "canvas.Canvas", n_records, grouped):
+    """หัวหน้า Budget Summary + กราฟ (ตารางเริ่มที่ y = height - 450)"""
+    width, height = A4
     c.setFont("Helvetica-Bold", 16)
     c.drawString(60, height - 50, "📊 Budget Summary Report")
 
     c.setFont("Helvetica", 12)
-    c.drawString(60, height - 80, f"Total Records: {len(df)}")
+    c.drawString(60, height - 80, f"Total Records: {n_records}")
 
-    img_reader = ImageReader(BytesIO(chart_bytes))
+    img_reader = ImageReader(BytesIO(_render_chart_png(grouped)))
     c.drawImage(img_reader, 60, height - 420, width=470, height=200, preserveAspectRatio=True, mask='auto')
 
-    summary_y = height - 460
-    line_height = 18
-    for i, row in grouped.iterrows():
-        text = (
-            f"{row['Cost Center']}: "
-            f"Planned={format_number(row['Planned'], style_map.get('Planned', 'number'))}, "
-            f"Actual={format_number(row['FX Adjusted Actual'], style_map.get('FX Adjusted Actual', 'number'))}, "
-            f"Var={format_number(row['Variance'], style_map.get('Variance', 'number'))}"
-        )
-
-        if include_percent:
-            for col in PERCENT_COLUMNS:
-                avg_key = f"__avg__{col}"
-                if avg_key in grouped.columns:
-                    text += f", {col}={format_number(row.get(avg_key, 0), style_map.get(col, 'percent'))}"
-
-        y = summary_y - i * line_height
-        if y < 60:
-            c.showPage()
-            c.setFont("Helvetica", 12)
-            summary_y = height - 60
-            y = summary_y
-        c.drawString(60, y, text)
 
-    # ---------- Page 3: Next Actions ----------
-    if add_next_actions:
-        c.showPage()
+def _summary_columns(summary_rows, style_map, include_percent):
+    columns = [
+        TableColumn("Cost Center", "Cost Center", align="left"),
+        TableColumn("Planned", "Planned", style_map.get("Planned", "number")),
+        TableColumn("Actual", "FX Adjusted Actual", style_map.get("FX Adjusted Actual", "number")),
+        TableColumn("Var", "Variance", style_map.get("Variance", "number")),
+    ]
+    if include_percent:
+        for col in PERCENT_COLUMNS:
+            avg_key = f"__avg__{col}"
+            if avg_key in summary_rows.columns:
+                columns.append(TableColumn(col, avg_key, style_map.get(col, "percent")))
+    return columns
+
+
+def _safe_scenarios_alerts(df):
+    try:
+        with stage("scenarios"):
+            sc = compute_scenarios(df)          # ใช้ df หลัง ensure_calc
+        with stage("alerts"):
+            al = scan_alerts(df, pct_threshold=0.08)
+    except Exception:
+        sc, al = {"summary": {}, "scenarios": []}, {"series": [], "crossings": [], "note": "Compute failed."}
+    return sc, al
+
+
+# ---------- Sections (แต่ละส่วนเป็น PDF อิสระ สำหรับ render แบบขนาน) ----------
+def _section_pdf(draw, *args) -> bytes:
+    buf = BytesIO()
+    c = new_canvas(buf)
+    draw(c, *args)
+    c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def _render_executive_section(frame, actions_result, percent_avgs=None) -> bytes:
+    with frame_from(frame) as df:
+        return _section_pdf(lambda c: draw_executive_summary_page(c, df, actions_result=actions_result,
+                                                                  percent_avgs=percent_avgs))
+
+
+def _render_summary_section(n_records, grouped, rows, columns, with_chart) -> bytes:
+    def draw(c):
+        _, height = A4
+        if with_chart:
+            _draw_chart_header(c, n_records, grouped)
+        draw_table(c, format_table(rows, columns), x0=60, top=height - 450 if with_chart else None, bottom=60)
+    return _section_pdf(draw)
+
+
+def _render_actions_section(actions) -> bytes:
+    return _section_pdf(draw_next_actions_page, actions)
+
+
+def _render_scenarios_section(frame, scenarios_alerts=None) -> bytes:
+    if scenarios_alerts:
+        return _section_pdf(draw_scenarios_alerts_page, *scenarios_alerts)
+    with frame_from(frame) as df:
+        return _section_pdf(draw_scenarios_alerts_page, *_safe_scenarios_alerts(df))
+
+
+def _generate_pdf_parallel(df, actions_result, grouped, summary_rows, columns, add_next_actions, add_scenarios_alerts,
+                           scenarios_alerts=None, n_records=None, percent_avgs=None):
+    """
+    แยกรายงานเป็น section อิสระ (Executive Summary / Summary ทีละช่วงแถว / Next Actions / Scenarios)
+    render แต่ละ section ใน worker process แล้วรวมไฟล์ + ใส่เลขหน้าและ outline ใหม่
+    """
+    n_records = len(df) if n_records is None else n_records
+    # worker ได้แค่ handle ของ shared memory (ไม่ pickle df ทั้งก้อนไปทุก section); unlink เมื่อ render เสร็จ/ล้ม
+    with publish(df) as shared:
+        frame = shared.handle
+        sections = [Section("Executive Summary", _render_executive_section, (frame, actions_result, percent_avgs))]
+        step = max(int(PDF_SECTION_ROWS), 1)
+        for start in range(0, max(len(summary_rows), 1), step):
+            rows = summary_rows.iloc[start:start + step]
+            title = "Budget Summary" if start == 0 else f"Budget Summary (rows {start + 1}-{start + len(rows)})"
+            sections.append(Section(title, _render_summary_section, (n_records, grouped, rows, columns, start == 0)))
+        if add_next_actions:
+            sections.append(Section("Next Actions", _render_actions_section, (actions_result or {"next_actions": []},)))
+        if add_scenarios_alerts:
+            sections.append(Section("Scenarios & Alerts", _render_scenarios_section, (frame, scenarios_alerts)))
+
+        # stage ที่เกิดใน worker process ไม่ถูกนับ — วัดรวมเป็น pdf_draw ฝั่ง parent
+        with stage("pdf_draw"):
+            parts = render_sections(sections, workers=PDF_WORKERS)
+    with stage("pdf_merge"):
+        return merge_sections([s.title for s in sections], parts)
+
+
+def generate_pdf_with_chart(df, style_map=None, include_percent=True, add_next_actions=True, add_scenarios_alerts=True,
+                            top_n=CHART_TOP_N, summary_top_n=SUMMARY_TOP_N, parallel=None,
+                            actions_result=None, scenarios_alerts=None, n_records=None, percent_avgs=None):
+    """
+    Generate PDF report:
+      1) Executive Summary (KPI page)
+      2) Main chart + grouped summary
+      3) Next Actions (optional)
+      4) Scenarios & Alerts (optional)
+
+    top_n / summary_top_n cap the groups shown in the chart / summary lines
+    (the remainder is aggregated into "Other"); None disables the cap.
+    parallel: opt-in (None = PDF_PARALLEL, off by default; needs pypdf). The parallel path renders
+    sections in worker processes and merges them — it only pays off for very long summary tables
+    (summary_top_n=None on large data), never for the capped default report.
+
+    actions_result / scenarios_alerts=(scenarios, alerts) / n_records / percent_avgs skip the
+    computation from df: chunked.py passes per-Cost Center aggregates as df plus these,
+    computed over the whole ledger.
+    """
+    if style_map is None:
+        style_map = {
+            "Planned": "number",
+            "FX Adjusted Actual": "number",
+            "Variance": "number",
+        }
+        for col in PERCENT_COLUMNS:
+            style_map[col] = "percent"
+
+    # ให้แน่ใจว่ามีคอลัมน์ที่ใช้ในกราฟ/สรุป
+    df = _ensure_calc(df)
+
+    # เตรียม Next Actions สำหรับ Executive Summary teaser
+    if actions_result is None:
         try:
-            actions = actions_result if actions_result else suggest_as_dict(df)
+            with stage("next_actions"):
+                actions_result = suggest_as_dict(df)
         except Exception:
-            actions = {"next_actions": []}
-        draw_next_actions_page(c, actions)
+            actions_result = None
+    n_records = len(df) if n_records is None else n_records
+
+    # ===== สรุปราย Cost Center (หรือทั้งก้อนถ้าไม่มีคอลัมน์) =====
+    # กราฟและบรรทัดสรุปจำกัดจำนวนกลุ่มแยกกัน ที่เหลือรวมเป็น "Other"
+    group_key = "Cost Center" if "Cost Center" in df.columns else None
+    grouped = _grouped_summary(df, group_key, include_percent, top_n)
+    summary_rows = _grouped_summary(df, group_key, include_percent, summary_top_n)
+    columns = _summary_columns(summary_rows, style_map, include_percent)
 
-    # ---------- Page 4: Scenarios & Alerts ----------
-    if add_scenarios_alerts:
+    if parallel is None:
+        parallel = PDF_PARALLEL
+    if parallel and parallel_available():
         try:
-            sc = compute_scenarios(df)          # ใช้ df หลัง ensure_calc
-            al = scan_alerts(df, pct_threshold=0.08)
+            return _generate_pdf_parallel(df, actions_result, grouped, summary_rows, columns,
+                                          add_next_actions, add_scenarios_alerts,
+                                          scenarios_alerts, n_records, percent_avgs)
         except Exception:
-            sc, al = {"summary": {}, "scenarios": []}, {"series": [], "crossings": [], "note": "Compute failed."}
+            logging.getLogger(__name__).exception("parallel PDF render failed; falling back to single canvas")
+
+    # ====== สร้าง PDF ======
+    # chart_render / scenarios / alerts ซ้อนอยู่ในช่วง pdf_draw
+    with stage("pdf_draw"):
+        pdf_buffer = BytesIO()
+        c = new_canvas(pdf_buffer)
+        width, height = A4
+
+        # ---------- Page 1: Executive Summary ----------
+        draw_executive_summary_page(c, df, actions_result=actions_result, percent_avgs=percent_avgs)
         c.showPage()
-        draw_scenarios_alerts_page(c, sc, al)
 
-    # ปิดไฟล์
-    c.showPage()
-    c.save()
+        # ---------- Page 2: Main chart + summary ----------
+        _draw_chart_header(c, n_records, grouped)
+
+        # ตารางสรุป: format ทีละคอลัมน์ แล้วแบ่งหน้าพร้อมหัวตารางซ้ำ
+        draw_table(c, format_table(summary_rows, columns), x0=60, top=height - 450, bottom=60)
+
+        # ---------- Page 3: Next Actions ----------
+        if add_next_actions:
+            c.showPage()
+            try:
+                actions = actions_result if actions_result else suggest_as_dict(df)
+            except Exception:
+                actions = {"next_actions": []}
+            draw_next_actions_page(c, actions)
+
+        # ---------- Page 4: Scenarios & Alerts ----------
+        if add_scenarios_alerts:
+            sc, al = scenarios_alerts or _safe_scenarios_alerts(df)
+            c.showPage()
+            draw_scenarios_alerts_page(c, sc, al)
+
+        # ปิดไฟล์
+        c.showPage()
+        c.save()
     pdf_buffer.seek(0)
     return pdf_buffer
 
@@ -5,6 +5,13 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.units import cm
 from reportlab.lib import colors
 
+try:
+    from .pdf_canvas import font_for, new_page
+except ImportError:
+    from pdf_canvas import font_for, new_page
+
+MUTED = colors.HexColor("#555555")
+
 def _wrap(text: str, width: int = 100) -> List[str]:
     words = text.split()
     line, n, out = [], 0, []
@@ -28,6 +35,9 @@ def draw_next_actions_page(c: "canvas.Canvas", actions_result: Dict):
     y -= 22
 
     items = actions_result.get("next_actions", []) or []
+    texts = [str(v) for act in items
+             for v in (act.get("title", ""), act.get("rationale", ""), act.get("expected_outcome", ""), *(act.get("how_to") or []))]
+    body_font, title_font = font_for(texts), font_for(texts, "Helvetica-Bold")
     if not items:
         c.setFont("Helvetica", 11)
         c.drawString(x0, y, "No recommendations available.")
@@ -44,31 +54,31 @@ def draw_next_actions_page(c: "canvas.Canvas", actions_result: Dict):
         card_h = 0  # dynamic; we draw border after text ifต้องการ
 
         # Title
-        c.setFont("Helvetica-Bold", 12)
+        c.setFont(title_font, 12)
         c.setFillColor(colors.HexColor("#333333"))
         c.drawString(x0, y, f"{idx}. {title}")
         y -= lh
 
         # Why
-        c.setFont("Helvetica", 11)
-        c.setFillColor(colors.HexColor("#555555"))
+        c.setFont(body_font, 11)
+        c.setFillColor(MUTED)
         for chunk in _wrap(f"Why: {rationale}", 100):
             c.drawString(x0, y, chunk); y -= lh
-            if y < 2 * cm: c.showPage(); y = height - 2 * cm
+            if y < 2 * cm: new_page(c, body_font, 11, MUTED); y = height - 2 * cm
 
         # How-to steps
         c.setFillColor(colors.black)
         for step in (how or []):
             for chunk in _wrap(f"- {step}", 96):
                 c.drawString(x0 + 12, y, chunk); y -= lh
-                if y < 2 * cm: c.showPage(); y = height - 2 * cm
+                if y < 2 * cm: new_page(c, body_font, 11); y = height - 2 * cm
 
         # Expected outcome
         if outcome:
-            c.setFillColor(colors.HexColor("#555555"))
+            c.setFillColor(MUTED)
             for chunk in _wrap(f"Outcome: {outcome}", 100):
                 c.drawString(x0, y, chunk); y -= lh
-                if y < 2 * cm: c.showPage(); y = height - 2 * cm
+                if y < 2 * cm: new_page(c, body_font, 11, MUTED); y = height - 2 * cm
 
         # spacing between cards
         y -= 8
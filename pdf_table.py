@@ -0,0 +1,173 @@
+
+"""
+pdf_table.py
+Paginated table engine for large grouped summaries (reportlab canvas).
+- format_table(df, columns): format every column in bulk up front
+- draw_table(c, table, ...): paginate with a repeated header row; each page is drawn
+  from a row slice of the pre-formatted column arrays (linear time, no per-row state)
+"""
+
+from dataclasses import dataclass, field
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.rl_accel import escapePDF
+from reportlab.pdfbase.pdfmetrics import stringWidth, getFont
+from reportlab.pdfgen import canvas
+
+try:
+    from .utils.number_format_utils import format_number_array
+    from .pdf_canvas import font_for
+except ImportError:
+    from utils.number_format_utils import format_number_array
+    from pdf_canvas import font_for
+
+
+@dataclass
+class TableColumn:
+    header: str
+    key: str
+    style: Optional[str] = None      # None = text; otherwise a format_number style
+    align: str = "right"             # "left" | "right"
+
+
+@dataclass
+class TableData:
+    columns: List[TableColumn]
+    cells: List[np.ndarray] = field(default_factory=list)   # one formatted array per column
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.cells[0]) if self.cells else 0
+
+
+def format_table(df: pd.DataFrame, columns: List[TableColumn]) -> TableData:
+    """Pre-format all cells column by column (ไม่วนทีละแถว)"""
+    cells = []
+    for col in columns:
+        values = df[col.key].to_numpy() if col.key in df.columns else np.full(len(df), "", dtype=object)
+        if col.style is None:
+            cells.append(values.astype(str).astype(object))
+        else:
+            cells.append(format_number_array(values, col.style))
+    return TableData(columns=columns, cells=cells)
+
+
+def _column_widths(table: TableData, font: str, text_font: str, header_font: str, size: float, pad: float) -> List[float]:
+    """ความกว้างคอลัมน์ = ข้อความที่ยาวที่สุด (วัดเฉพาะสตริงที่ยาวที่สุดของแต่ละคอลัมน์)"""
+    widths = []
+    for col, cells in zip(table.columns, table.cells):
+        w = stringWidth(col.header, header_font, size)
+        if len(cells):
+            lengths = np.fromiter(map(len, cells), dtype=np.int64, count=len(cells))
+            longest = cells[int(np.argmax(lengths))]
+            w = max(w, stringWidth(longest, font if col.style else text_font, size))
+        widths.append(w + pad)
+    return widths
+
+
+def _ascii_widths(cells: np.ndarray, font: str, size: float) -> Optional[np.ndarray]:
+    """
+    ความกว้างของทุกเซลล์ในคอลัมน์ในครั้งเดียว (lookup ตาราง glyph width ของฟอนต์)
+    ใช้ได้เฉพาะข้อความ ASCII (ตัวเลขที่ format แล้ว) — คืน None ถ้าไม่ใช่
+    """
+    try:
+        codes = np.array(cells.tolist(), dtype="S")
+    except UnicodeEncodeError:
+        return None
+    if codes.itemsize == 0 or len(codes) == 0:
+        return np.zeros(len(codes))
+    glyph = np.asarray(getFont(font).widths, dtype=np.float64)
+    glyph[0] = 0.0  # ช่องว่างท้าย fixed-width bytes
+    matrix = codes.view(np.uint8).reshape(len(codes), codes.itemsize)
+    return glyph[matrix].sum(axis=1) * (size / 1000.0)
+
+
+def _draw_header(c: "canvas.Canvas", table: TableData, xs, widths, y, header_font, size):
+    c.setFont(header_font, size)
+    for col, x, w in zip(table.columns, xs, widths):
+        if col.align == "right":
+            c.drawRightString(x + w, y, col.header)
+        else:
+            c.drawString(x, y, col.header)
+
+
+def draw_table(
+    c: "canvas.Canvas",
+    table: TableData,
+    x0: float = 60,
+    top: Optional[float] = None,
+    bottom: float = 60,
+    page_top: Optional[float] = None,
+    line_height: float = 14,
+    font: str = "Helvetica",
+    header_font: str = "Helvetica-Bold",
+    text_font: Optional[str] = None,
+    size: float = 10,
+    col_pad: float = 12,
+) -> float:
+    """
+    วาดตารางลง canvas ตั้งแต่ y=top ลงไป; ขึ้นหน้าใหม่เมื่อถึง bottom และวาดหัวตารางซ้ำทุกหน้า
+    page_top = y เริ่มต้นของหน้าถัดๆ ไป (default: ขอบบน A4 - 60)
+    text_font = ฟอนต์ของคอลัมน์ข้อความ (default: font หรือฟอนต์ไทยถ้ามีข้อความภาษาไทย)
+    คืนค่า y ถัดไปบนหน้าสุดท้าย
+    """
+    width, height = A4
+    top = height - 60 if top is None else top
+    page_top = height - 60 if page_top is None else page_top
+
+    if text_font is None:
+        texts = [cells for col, cells in zip(table.columns, table.cells) if col.style is None]
+        text_font = font_for((s for cells in texts for s in cells), default=font)
+
+    widths = _column_widths(table, font, text_font, header_font, size, col_pad)
+    xs = list(np.cumsum([x0] + widths[:-1]))
+    right_aligned = [col.align == "right" for col in table.columns]
+
+    # ตัวเลข (ASCII) ชิดขวา: คำนวณตำแหน่ง x ของทุกเซลล์ไว้ล่วงหน้าแบบ vectorized
+    right_x = []
+    for cells, x, w, right in zip(table.cells, xs, widths, right_aligned):
+        cell_w = _ascii_widths(cells, font, size) if right else None
+        right_x.append(None if cell_w is None else (x + w) - cell_w)
+
+    n = table.n_rows
+    start = 0
+    y_top = top
+    while True:
+        _draw_header(c, table, xs, widths, y_top, header_font, size)
+        c.setLineWidth(0.5)
+        c.line(x0, y_top - 4, xs[-1] + widths[-1], y_top - 4)
+        y_first = y_top - line_height
+
+        rows = max(int((y_first - bottom) // line_height) + 1, 1)
+        stop = min(start + rows, n)
+
+        ys = (y_first - line_height * np.arange(stop - start)).tolist()
+        for cells, x, w, right, cx in zip(table.cells, xs, widths, right_aligned, right_x):
+            page_cells = cells[start:stop]
+            if cx is not None:
+                # หนึ่ง text object ต่อคอลัมน์ต่อหน้า (เลี่ยงการสร้าง text object ทีละเซลล์)
+                # setFont ตั้ง Tf ไว้ใน graphics state → BT..ET ด้านล่างใช้ฟอนต์นี้โดยไม่ต้องอ้างชื่อภายใน
+                # escapePDF: ตัวเลขติดลบแบบ (1,234) ต้อง escape วงเล็บใน string literal
+                c.setFont(font, size)
+                ops = "\n".join(
+                    f"1 0 0 1 {px:.2f} {py:.2f} Tm ({escapePDF(s)}) Tj"
+                    for s, px, py in zip(page_cells, cx[start:stop].tolist(), ys)
+                )
+                c.addLiteral(f"BT\n{ops}\nET")
+            elif right:
+                c.setFont(text_font, size)
+                for s, y in zip(page_cells, ys):
+                    c.drawRightString(x + w, y, s)
+            else:
+                t = c.beginText(x, y_first)
+                t.setFont(text_font, size, line_height)
+                t.textLines(list(page_cells), trim=0)
+                c.drawText(t)
+
+        start = stop
+        if start >= n:
+            return float(ys[-1] - line_height) if len(ys) else float(y_first)
+        c.showPage()
+        y_top = page_top
@@ -7,51 +7,75 @@ Expose POST /report-exec to produce a ZIP bundle:
 - Executive_Playbooks.pdf (playbooks-only appendix)
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from functools import partial
+from typing import Optional
+from fastapi.responses import Response
 from io import BytesIO
 import pandas as pd
 import zipfile, os, tempfile
 
 # Import from local package if available
 try:
+    from .utils.profiling import run_in_threadpool
     from .utils.variance_utils import calculate_variance
-    from .pdf_summary import generate_pdf_default
+    from .utils.lazy_import import lazy
+    from .utils.metrics import stage, add_rows
+    from .utils.memory_budget import estimate_cost, admit, AdmissionRejected, rejection_http_error
+    from .utils.singleflight import parse_excel, artifact_flight, content_key
 except Exception:
+    from utils.profiling import run_in_threadpool
     from utils.variance_utils import calculate_variance
-    from pdf_summary import generate_pdf_default
+    from utils.lazy_import import lazy
+    from utils.metrics import stage, add_rows
+    from utils.memory_budget import estimate_cost, admit, AdmissionRejected, rejection_http_error
+    from utils.singleflight import parse_excel, artifact_flight, content_key
 
 try:
     from .next_actions import suggest_as_dict
+    from .dataset_routes import admit_dataset, read_dataset
 except Exception:
     from next_actions import suggest_as_dict
+    from dataset_routes import admit_dataset, read_dataset
 
-try:
-    from .excel_dashboard import generate_excel_dashboard
-except Exception:
-    from excel_dashboard import generate_excel_dashboard
-
-try:
-    from .playbooks_loader import load_playbooks, select_playbooks
-except Exception:
-    from playbooks_loader import load_playbooks, select_playbooks
-
-try:
-    from .excel_playbooks_append import append_playbooks_sheet
-except Exception:
-    from excel_playbooks_append import append_playbooks_sheet
-
-try:
-    from .report_playbooks_pdf import generate_playbooks_pdf
-except Exception:
-    from report_playbooks_pdf import generate_playbooks_pdf
+# ตัว render (reportlab / matplotlib / openpyxl / PyYAML) โหลดตอนเรียก /report-exec ครั้งแรก
+generate_pdf_default = lazy("pdf_summary", "generate_pdf_default", __package__)
+generate_excel_dashboard_v2 = lazy("excel_dashboard_v2", "generate_excel_dashboard_v2", __package__)
+load_playbooks = lazy("playbooks_loader", "load_playbooks", __package__)
+select_playbooks = lazy("playbooks_loader", "select_playbooks", __package__)
+append_playbooks_sheet = lazy("excel_playbooks_append", "append_playbooks_sheet", __package__)
+generate_playbooks_pdf = lazy("report_playbooks_pdf", "generate_playbooks_pdf", __package__)
 
 router = APIRouter()
 
 MAX_UPLOAD_BYTES = 20 * 1024 * 1024  # 20MB
 
 @router.post("/report-exec")
-async def report_exec(file: UploadFile = File(...)):
+async def report_exec(
+    file: Optional[UploadFile] = File(None),
+    dataset_id: Optional[str] = Query(None, description="ใช้ dataset จาก POST /datasets แทนการอัปโหลดไฟล์"),
+):
+    artifacts = ("xlsx", "pdf", "pdf", "zip")  # Excel + PDF 2 ไฟล์ + ZIP จากข้อมูลชุดเดียว
+    if dataset_id:
+        if file is not None:
+            raise HTTPException(status_code=400, detail="ส่งไฟล์หรือ dataset_id อย่างใดอย่างหนึ่งเท่านั้น")
+        await admit_dataset(dataset_id, artifacts)
+        key, load = f"dataset:{dataset_id}", partial(read_dataset, dataset_id)
+    else:
+        key, load = await _read_upload(file, artifacts)
+
+    # ข้อมูลชุดเดียวกันที่ส่งมาพร้อมกัน → parse + render ครั้งเดียว ทุก request ได้ ZIP ชุดเดียวกัน
+    bundle, _ = await artifact_flight.do(("report-exec", key), _build_bundle, load)
+    return Response(
+        content=bundle,
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=Executive_Report_Bundle.zip"},
+    )
+
+
+async def _read_upload(file: Optional[UploadFile], artifacts):
+    if file is None:
+        raise HTTPException(status_code=400, detail="กรุณาอัปโหลดไฟล์ Excel หรือระบุ dataset_id")
     if file.content_type not in [
         "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         "application/vnd.ms-excel"
@@ -62,28 +86,51 @@ async def report_exec(file: UploadFile = File(...)):
     if len(content) > MAX_UPLOAD_BYTES:
         raise HTTPException(status_code=400, detail="ไฟล์ใหญ่เกินไป")
 
+    # ประเมินต้นทุนรวมก่อนเริ่ม
+    try:
+        await admit(estimate_cost(content, file.filename or "", artifacts))
+    except AdmissionRejected as e:
+        raise rejection_http_error(e)
+
+    digest = content_key(content)
+    return digest, partial(_parse_upload, content, digest)
+
+
+async def _parse_upload(content: bytes, digest: str) -> pd.DataFrame:
     # Read dataframe
     try:
-        df = pd.read_excel(BytesIO(content))
+        df, _ = await parse_excel(content, digest)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"อ่านไฟล์ไม่สำเร็จ: {e}")
+    add_rows(len(df))
+    # frame จาก parse_flight อาจถูกใช้ร่วมกับ request อื่น → shallow copy ก่อนเพิ่มคอลัมน์
+    return df.copy(deep=False)
+
 
+async def _build_bundle(load) -> bytes:
+    return await run_in_threadpool(_render_bundle, await load())
+
+
+def _render_bundle(df: pd.DataFrame) -> bytes:
     # Compute
-    df_calc = calculate_variance(df)
-    actions = suggest_as_dict(df_calc)
+    with stage("variance"):
+        df_calc = calculate_variance(df)
+    with stage("next_actions"):
+        actions = suggest_as_dict(df_calc)
 
     # Select playbooks
     pb_dir = os.path.join(os.path.dirname(__file__), "playbooks")
     if not os.path.isdir(pb_dir):
         pb_dir = "playbooks"  # fallback to CWD
-    pbs_all = load_playbooks(pb_dir)
-    selected = select_playbooks(pbs_all, actions.get("summary", {}))
+    with stage("playbooks"):
+        pbs_all = load_playbooks(pb_dir)
+        selected = select_playbooks(pbs_all, actions.get("summary", {}))
 
     # Build outputs
     # 1) Excel dashboard (then append "Playbooks" sheet)
     with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False) as tmp:
         excel_path = tmp.name
-    generate_excel_dashboard(df_calc, excel_path, actions, top_n=10)
+    generate_excel_dashboard_v2(df_calc, excel_path, next_actions=actions, top_n=10)
     if selected:
         append_playbooks_sheet(excel_path, selected)
     with open(excel_path, "rb") as f:
@@ -91,16 +138,18 @@ async def report_exec(file: UploadFile = File(...)):
     os.remove(excel_path)
 
     # 2) Main PDF report
-    pdf_buf = generate_pdf_default(df_calc)
-    pdf_bytes = pdf_buf.read()
+    with stage("pdf"):
+        pdf_buf = generate_pdf_default(df_calc)
+        pdf_bytes = pdf_buf.read()
 
     # 3) Playbooks PDF appendix
-    pb_pdf_buf = generate_playbooks_pdf(selected)
-    pb_pdf_bytes = pb_pdf_buf.read()
+    with stage("playbooks_pdf"):
+        pb_pdf_buf = generate_playbooks_pdf(selected)
+        pb_pdf_bytes = pb_pdf_buf.read()
 
     # Zip bundle
     zip_buf = BytesIO()
-    with zipfile.ZipFile(zip_buf, "w", zipfile.ZIP_DEFLATED) as z:
+    with stage("zip"), zipfile.ZipFile(zip_buf, "w", zipfile.ZIP_DEFLATED) as z:
         z.writestr("Executive_Dashboard.xlsx", excel_bytes)
         z.writestr("Budget_Executive_Report.pdf", pdf_bytes)
         z.writestr("Executive_Playbooks.pdf", pb_pdf_bytes)
@@ -111,10 +160,4 @@ async def report_exec(file: UploadFile = File(...)):
             "playbooks": [{"id": p.get("id"), "title": p.get("title")} for p in selected]
         }
         z.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
-    zip_buf.seek(0)
-
-    return StreamingResponse(
-        zip_buf,
-        media_type="application/zip",
-        headers={"Content-Disposition": "attachment; filename=Executive_Report_Bundle.zip"},
-    )
+    return zip_buf.getvalue()
@@ -7,9 +7,13 @@ Generate a standalone PDF listing selected playbooks.
 from io import BytesIO
 from typing import List, Dict, Any
 from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
 from reportlab.lib.units import cm
 
+try:
+    from .pdf_canvas import new_canvas, new_page, font_for
+except ImportError:
+    from pdf_canvas import new_canvas, new_page, font_for
+
 def _wrap(text, width=100):
     words = text.split()
     line, n = [], 0
@@ -23,7 +27,7 @@ def _wrap(text, width=100):
 
 def generate_playbooks_pdf(playbooks: List[Dict[str, Any]]) -> BytesIO:
     buf = BytesIO()
-    c = canvas.Canvas(buf, pagesize=A4)
+    c = new_canvas(buf)
     width, height = A4
     x0, y = 2*cm, height - 2*cm
     lh = 14
@@ -32,25 +36,29 @@ def generate_playbooks_pdf(playbooks: List[Dict[str, Any]]) -> BytesIO:
     c.drawString(x0, y, "Executive Playbooks")
     y -= 22
 
+    texts = [str(v) for pb in playbooks
+             for v in (pb.get("title", ""), pb.get("rationale", ""), pb.get("expected_outcome", ""), *pb.get("steps", []))]
+    body_font, title_font = font_for(texts), font_for(texts, "Helvetica-Bold")
+
     for pb in playbooks:
-        c.setFont("Helvetica-Bold", 12)
+        c.setFont(title_font, 12)
         c.drawString(x0, y, f"{pb.get('id','')}: {pb.get('title','')}")
         y -= lh
 
-        c.setFont("Helvetica", 11)
+        c.setFont(body_font, 11)
         for chunk in _wrap(f"Why: {pb.get('rationale','')}", 100):
             c.drawString(x0, y, chunk); y -= lh
-            if y < 2*cm: c.showPage(); y = height - 2*cm
+            if y < 2*cm: new_page(c, body_font, 11); y = height - 2*cm
 
         for step in pb.get("steps", []):
             for chunk in _wrap(f"- {step}", 100):
                 c.drawString(x0+10, y, chunk); y -= lh
-                if y < 2*cm: c.showPage(); y = height - 2*cm
+                if y < 2*cm: new_page(c, body_font, 11); y = height - 2*cm
 
         if pb.get("expected_outcome"):
             for chunk in _wrap(f"Outcome: {pb['expected_outcome']}", 100):
                 c.drawString(x0, y, chunk); y -= lh
-                if y < 2*cm: c.showPage(); y = height - 2*cm
+                if y < 2*cm: new_page(c, body_font, 11); y = height - 2*cm
 
         y -= 6
         if y < 2*cm: c.showPage(); y = height - 2*cm
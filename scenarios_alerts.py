@@ -3,21 +3,28 @@
 scenarios_alerts.py
 Utilities to compute scenarios (±5% FX/Price/Volume) and scan alerts
 (rolling 3M trend crossing > 8%) from a budget dataframe.
+Both are built from additive aggregates (scenario_totals / monthly_totals), which the
+out-of-core path (chunked.py) accumulates chunk by chunk.
 """
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import pandas as pd
 import numpy as np
 
+try:
+    from .utils.variance_utils import calculate_variance
+except ImportError:
+    from utils.variance_utils import calculate_variance
+
 def _ensure_calc(df: pd.DataFrame) -> pd.DataFrame:
-    data = df.copy()
+    data = df.copy(deep=False)   # เพิ่มคอลัมน์ใหม่เท่านั้น ไม่แก้ค่าเดิม (df อาจเป็น view อ่านอย่างเดียว)
     if "FX Adjusted Actual" not in data.columns:
         data["FX Adjusted Actual"] = data.get("Actual", 0)
     if "Variance" not in data.columns:
         data["Variance"] = data["FX Adjusted Actual"] - data.get("Planned", 0)
     return data
 
-def compute_scenarios(df: pd.DataFrame) -> Dict[str, Any]:
+def compute_scenarios(df: pd.DataFrame, fx_store=None, group_currency: Optional[str] = None) -> Dict[str, Any]:
     """
     Returns {"summary": {...}, "scenarios": [{name,total_plan,total_actual_fx,total_variance,delta_vs_base}, ...]}
     Scenarios supported (graceful skip if columns missing):
@@ -25,17 +32,47 @@ def compute_scenarios(df: pd.DataFrame) -> Dict[str, Any]:
       - Price +/-5% if "Price" and "Quantity" exist
       - Volume +/-5% if "Quantity" exists
     Base is totals of df (uses FX Adjusted Actual if present).
+    fx_store (fx_store.FxStore): FX Rate / FX Adjusted Actual come from the store's as-of rates
+    (by Currency / Month) instead of the row-level column.
+    """
+    if fx_store is not None and "Currency" in df.columns:
+        df = calculate_variance(df.copy(deep=False), fx_store, group_currency)
+    return scenarios_from_totals(scenario_totals(df))
+
+def scenario_totals(df: pd.DataFrame) -> Dict[str, float]:
+    """
+    Additive totals every scenario is derived from (each scenario scales one of these sums),
+    so totals of separate chunks can simply be added up (merge_totals).
     """
     data = _ensure_calc(df)
+    t = {
+        "planned": float(data.get("Planned", 0).sum()),
+        "actual_fx": float(data.get("FX Adjusted Actual", 0).sum()),
+    }
+    if "FX Rate" in data.columns and "Actual" in data.columns:
+        t["actual_x_fx"] = float((data["Actual"] * data["FX Rate"]).sum())
+    if "Price" in data.columns and "Quantity" in data.columns:
+        t["price_x_qty"] = float((data["Price"] * data["Quantity"]).sum())
+    elif "Quantity" in data.columns and "Actual" in data.columns:
+        # ไม่มี Price: Actual (FX) ปรับตาม quantity เฉพาะแถวที่มี quantity (≠ 0)
+        q = data["Quantity"].astype(float).replace(0, np.nan)
+        scalable = q.notna() & np.isfinite(q)
+        t["fx_with_qty"] = float(data["FX Adjusted Actual"][scalable].sum())
+        t["fx_without_qty"] = float(data["FX Adjusted Actual"][~scalable].sum())
+    return t
+
+def merge_totals(a: Dict[str, float], b: Dict[str, float]) -> Dict[str, float]:
+    return {k: a.get(k, 0.0) + b.get(k, 0.0) for k in {**a, **b}}
+
+def scenarios_from_totals(t: Dict[str, float]) -> Dict[str, Any]:
     res = {"summary": {}, "scenarios": []}
 
-    base_plan = float(data.get("Planned", 0).sum())
-    base_actual_fx = float(data.get("FX Adjusted Actual", 0).sum())
+    base_plan = t["planned"]
+    base_actual_fx = t["actual_fx"]
     base_var = base_actual_fx - base_plan
     res["summary"] = {"base_planned": base_plan, "base_actual_fx": base_actual_fx, "base_variance": base_var}
 
-    def add_scenario(name: str, actual_fx_series: pd.Series):
-        total_actual_fx = float(actual_fx_series.sum())
+    def add_scenario(name: str, total_actual_fx: float):
         var = total_actual_fx - base_plan
         res["scenarios"].append({
             "name": name,
@@ -46,32 +83,23 @@ def compute_scenarios(df: pd.DataFrame) -> Dict[str, Any]:
         })
 
     # FX scenarios
-    if "FX Rate" in data.columns and "Actual" in data.columns:
+    if "actual_x_fx" in t:
         for pct in (+0.05, -0.05):
-            fx = (data["FX Rate"] * (1.0 + pct))
-            add_scenario(f"FX {int(pct*100)}%", data["Actual"] * fx)
+            add_scenario(f"FX {int(pct*100)}%", t["actual_x_fx"] * (1.0 + pct))
 
     # Price scenarios
-    if "Price" in data.columns and "Quantity" in data.columns:
-        # Recompute actual from price*qty as a baseline if not wildly missing
-        base_actual_from_pq = (data["Price"] * data["Quantity"])
+    if "price_x_qty" in t:
         for pct in (+0.05, -0.05):
-            add_scenario(f"Price {int(pct*100)}%", (data["Price"] * (1.0 + pct)) * data["Quantity"])
+            add_scenario(f"Price {int(pct*100)}%", t["price_x_qty"] * (1.0 + pct))
 
     # Volume scenarios
-    if "Quantity" in data.columns and ("Price" in data.columns or "Actual" in data.columns):
-        # If Price exists, use price*qty; else assume Actual scales with quantity proportionally
-        if "Price" in data.columns:
-            for pct in (+0.05, -0.05):
-                add_scenario(f"Volume {int(pct*100)}%", data["Price"] * (data["Quantity"] * (1.0 + pct)))
-        else:
-            # scale FX Adjusted Actual by qty factor if base qty exists
-            if "Quantity" in data.columns:
-                q = data["Quantity"].astype(float).replace(0, np.nan)
-                scale_up = (q * 1.05) / q
-                scale_dn = (q * 0.95) / q
-                add_scenario("Volume 5%", data["FX Adjusted Actual"] * scale_up.fillna(1.0))
-                add_scenario("Volume -5%", data["FX Adjusted Actual"] * scale_dn.fillna(1.0))
+    # If Price exists, use price*qty; else assume Actual scales with quantity proportionally
+    if "price_x_qty" in t:
+        for pct in (+0.05, -0.05):
+            add_scenario(f"Volume {int(pct*100)}%", t["price_x_qty"] * (1.0 + pct))
+    elif "fx_with_qty" in t:
+        add_scenario("Volume 5%", t["fx_with_qty"] * 1.05 + t["fx_without_qty"])
+        add_scenario("Volume -5%", t["fx_with_qty"] * 0.95 + t["fx_without_qty"])
 
     return res
 
@@ -81,18 +109,27 @@ def scan_alerts(df: pd.DataFrame, pct_threshold: float = 0.08) -> Dict[str, Any]
     Requires a 'Month' column (datetime-like or string convertible).
     Returns { "series": DataFrame-like dict, "crossings": [ {month, ratio, note}, ...] }
     """
-    out: Dict[str, Any] = {"series": [], "crossings": []}
+    return alerts_from_monthly(monthly_totals(df), pct_threshold)
+
+def monthly_totals(df: pd.DataFrame) -> Optional[pd.DataFrame]:
+    """Planned / FX Adjusted Actual summed per Month (None when there is no 'Month' column)."""
     data = _ensure_calc(df)
 
     if "Month" not in data.columns:
-        out["note"] = "No 'Month' column; Alerts skipped."
-        return out
+        return None
 
     s = data.copy()
     s["Month"] = pd.to_datetime(s["Month"], errors="coerce")
     s = s.dropna(subset=["Month"])
+    return s.groupby("Month")[["Planned", "FX Adjusted Actual"]].sum()
+
+def alerts_from_monthly(monthly: Optional[pd.DataFrame], pct_threshold: float = 0.08) -> Dict[str, Any]:
+    out: Dict[str, Any] = {"series": [], "crossings": []}
+    if monthly is None:
+        out["note"] = "No 'Month' column; Alerts skipped."
+        return out
 
-    by_m = s.groupby("Month")[["Planned", "FX Adjusted Actual"]].sum().sort_index()
+    by_m = monthly.sort_index()
     by_m["ratio"] = by_m["FX Adjusted Actual"] / by_m["Planned"].replace(0, pd.NA)
     by_m["ratio"] = by_m["ratio"].fillna(1.0)  # if plan==0, treat as neutral
     by_m["rolling3m"] = by_m["ratio"].rolling(window=3, min_periods=3).mean()
@@ -0,0 +1,106 @@
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import budget_plus.dataset_routes as dataset_routes
+import budget_plus.main as main_mod
+from budget_plus.allocation import allocate_costs, normalize_drivers, parse_rules, share_matrix
+from budget_plus.utils.dataset_store import DatasetStore
+
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+client = TestClient(main_mod.app)
+
+DRIVERS = pd.DataFrame({
+    "Cost Center": ["IT", "HR", "P1", "P2"],
+    "Tickets": [0, 20, 40, 20],
+    "Headcount": [10, 0, 45, 45],
+})
+LEDGER = pd.DataFrame({
+    "Version": "V1", "Scenario": "Base",
+    "Cost Center": ["IT", "HR", "P1", "P2", "P1"],
+    "Planned": [100.0, 50.0, 10.0, 10.0, 5.0],
+    "Actual": [90.0, 60.0, 10.0, 10.0, 5.0],
+})
+RULES = parse_rules("IT=Tickets, HR=Headcount")
+
+
+def _allocated(method):
+    frame = allocate_costs(LEDGER, normalize_drivers(DRIVERS), RULES, method).frame
+    return frame[frame["Cost Type"] == "Allocated"].set_index("Cost Center")["Planned"].to_dict()
+
+
+def test_methods_match_hand_calculation():
+    assert _allocated("direct") == pytest.approx({"P1": 100 * 2 / 3 + 25, "P2": 100 / 3 + 25})
+    # IT → HR 25 / P1 50 / P2 25, แล้ว HR (50 + 25) → P1 / P2 ครึ่งต่อครึ่ง
+    assert _allocated("step_down") == pytest.approx({"P1": 87.5, "P2": 62.5})
+    # T_IT = 100 + 0.1 T_HR, T_HR = 50 + 0.25 T_IT
+    t_it = 105 / 0.975
+    t_hr = 50 + 0.25 * t_it
+    assert _allocated("reciprocal") == pytest.approx({"P1": 0.5 * t_it + 0.45 * t_hr, "P2": 0.25 * t_it + 0.45 * t_hr})
+
+
+def test_reciprocal_scales_and_preserves_totals():
+    rng = np.random.default_rng(5)
+    services = [f"S{i}" for i in range(300)]
+    centers = services + [f"P{i}" for i in range(700)]
+    drivers = pd.DataFrame({"Cost Center": centers, "Headcount": rng.integers(1, 50, len(centers))})
+    ledger = pd.DataFrame({
+        "Version": "V1", "Scenario": rng.choice(["Base", "Stretch"], 5000),
+        "Cost Center": rng.choice(centers, 5000),
+        "Planned": rng.uniform(0, 100, 5000), "Actual": rng.uniform(0, 100, 5000),
+    })
+    rules = {s: "Headcount" for s in services}
+    result = allocate_costs(ledger, normalize_drivers(drivers), rules, "reciprocal")
+
+    assert not result.frame["Cost Center"].isin(services).any()
+    got = result.frame.groupby("Scenario")[["Planned", "Actual"]].sum()
+    assert np.allclose(got, ledger.groupby("Scenario")[["Planned", "Actual"]].sum())
+    shares, _, s = share_matrix(normalize_drivers(drivers), rules, "reciprocal")
+    pool = np.array([[r["pool_planned"], r["direct_planned"]] for r in result.services])
+    assert np.allclose(pool[:, 0], pool[:, 1] + shares[:, :s].T @ pool[:, 0])    # T = C + A_ssᵀ T
+
+
+def test_allocate_endpoint_feeds_analyze(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    store = DatasetStore(str(tmp_path), ttl_seconds=3600, max_bytes=50 * 2 ** 20, max_items=10)
+    monkeypatch.setattr(dataset_routes, "DATASET_STORE", store)
+    monkeypatch.setattr(main_mod, "DATASET_STORE", store)
+    buf = BytesIO()
+    LEDGER.to_excel(buf, index=False)
+    r = client.post(
+        "/allocate", params={"rules": "IT=Tickets,HR=Headcount", "method": "step_down"},
+        files={"file": ("ledger.xlsx", buf.getvalue(), XLSX),
+               "drivers": ("drivers.csv", DRIVERS.to_csv(index=False).encode(), "text/csv")},
+    )
+    assert r.status_code == 201, r.text
+    assert [s["pool_planned"] for s in r.json()["allocation"]["services"]] == [100.0, 75.0]
+
+    rows = client.post("/analyze", params={"dataset_id": r.json()["id"], "raw": "true"}).json()
+    assert {row["Cost Center"]: row["Planned"] for row in rows} == pytest.approx({"P1": 102.5, "P2": 72.5})
+
+    bad = client.post("/allocate", params={"rules": "IT=Seats"},
+                      files={"file": ("ledger.xlsx", buf.getvalue(), XLSX),
+                             "drivers": ("drivers.csv", DRIVERS.to_csv(index=False).encode(), "text/csv")})
+    assert bad.status_code == 400
+
+
+def test_numeric_codes_match_drivers_and_group_once():
+    from budget_plus.utils.variance_utils import calculate_variance, summarize_variance
+
+    drivers = normalize_drivers(pd.DataFrame({"Cost Center": [9001, 1001, 1002], "Headcount": [0, 1, 3]}))
+    rules = parse_rules("9001=Headcount")
+    # read_excel: รหัสตัวเลขที่มีช่องว่างในคอลัมน์ → float64 (9001.0)
+    ledger = pd.DataFrame({"Version": "V1", "Scenario": "Base",
+                           "Cost Center": [9001.0, 1001.0, 1002.0, np.nan],
+                           "Planned": [100.0, 10.0, 10.0, 1.0], "Actual": [80.0, 10.0, 10.0, 1.0]})
+    frame = allocate_costs(ledger, drivers, rules, "direct").frame
+    assert set(frame["Cost Center"].dropna()) == {"1001", "1002"}
+    assert frame["Planned"].sum() == pytest.approx(121.0)
+
+    ints = ledger.dropna().astype({"Cost Center": "int64"})
+    summary = summarize_variance(calculate_variance(allocate_costs(ints, drivers, rules, "direct").frame))
+    assert sorted(summary["Cost Center"]) == ["1001", "1002"]
+    assert summary.set_index("Cost Center").loc["1002", "Planned"] == pytest.approx(10 + 75)
@@ -0,0 +1,64 @@
+import pandas as pd
+
+from budget_plus.benchmarks.runner import Case, compare, time_case
+from budget_plus.benchmarks.synthetic import TEMPLATE_COLUMNS, generate_ledger, to_xlsx_bytes
+
+
+def test_ledger_is_seeded_and_template_shaped():
+    a = generate_ledger(rows=500, cost_centers=7, months=6, seed=3)
+    b = generate_ledger(rows=500, cost_centers=7, months=6, seed=3)
+    pd.testing.assert_frame_equal(a, b)
+    assert not a.equals(generate_ledger(rows=500, cost_centers=7, months=6, seed=4))
+    assert list(a.columns[:len(TEMPLATE_COLUMNS)]) == TEMPLATE_COLUMNS
+    assert a["Cost Center"].nunique() <= 7 and a["Month"].nunique() <= 6
+    assert {"Category", "Department", "Region", "Price", "Quantity"} <= set(a.columns)
+    assert to_xlsx_bytes(a) == to_xlsx_bytes(b)
+
+
+def test_multi_currency_fx_varies():
+    df = generate_ledger(rows=2000, currencies=["THB", "USD"], seed=1)
+    assert (df.loc[df["Currency"] == "THB", "FX Rate"] == 1.0).all()
+    assert df.loc[df["Currency"] == "USD", "FX Rate"].nunique() > 1
+
+
+def test_compare_flags_regressions():
+    base = {"a": {"median_s": 1.0}, "b": {"median_s": 1.0}, "c": {"median_s": 1.0}, "gone": {"median_s": 1.0}}
+    cur = {"a": {"median_s": 1.5}, "b": {"median_s": 1.1}, "c": {"median_s": 0.5}, "new": {"median_s": 1.0}}
+    status = {r["name"]: r["status"] for r in compare(cur, base, tolerance=0.2)}
+    assert status == {"a": "regression", "b": "ok", "c": "improvement"}
+
+    cur.update(b={"skipped": "ModuleNotFoundError"}, c={"error": "ImportError"})
+    status = {r["name"]: r["status"] for r in compare(cur, base, tolerance=0.2)}
+    assert status == {"a": "regression", "b": "failed", "c": "failed"}
+
+
+def test_time_case_reports_skip_and_error():
+    def optional_missing(_):
+        raise ModuleNotFoundError("No module named 'fpdf'", name="fpdf")
+
+    def package_missing(_):
+        import not_a_real_module  # noqa: F401   (เช่น budget_plus import ไม่ได้)
+
+    assert "skipped" in time_case(Case("x", optional_missing), repeat=1, warmup=0)
+    assert "error" in time_case(Case("w", package_missing), repeat=1, warmup=0)
+    assert "error" in time_case(Case("y", lambda _: 1 / 0), repeat=1, warmup=0)
+    assert time_case(Case("z", lambda n: sum(range(n)), lambda: 100), repeat=3)["repeat"] == 3
+
+
+def test_loadtest_mix_and_percentiles():
+    from budget_plus.benchmarks.loadtest import parse_mix, percentiles
+
+    assert parse_mix("analyze=6, report-exec") == [("/analyze", 6.0), ("/report-exec", 1.0)]
+    p = percentiles([i / 1000 for i in range(1, 101)])
+    assert p["p50_ms"] == 50.5 and p["p99_ms"] == 99.0 and p["max_ms"] == 100.0
+    assert percentiles([])["p95_ms"] is None
+
+
+def test_loadtest_users_upload_distinct_workbooks():
+    from io import BytesIO
+    from budget_plus.benchmarks.loadtest import user_workbooks
+
+    books = user_workbooks(rows=50, users=3, seed=1)
+    assert len(set(books)) == 3                       # ไม่ถูก singleflight รวมเป็น request เดียว
+    frames = [pd.read_excel(BytesIO(b)) for b in books]
+    assert frames[0].drop(columns="Planned").equals(frames[2].drop(columns="Planned"))
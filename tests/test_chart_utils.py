@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+from budget_plus.utils.chart_utils import top_n_keys, bucket_other, order_buckets, lttb_indices, downsample_series
+from budget_plus.pdf_summary import _grouped_summary, generate_pdf_with_chart
+
+
+def _many_cost_centers(n=3000):
+    rng = np.random.default_rng(0)
+    planned = rng.uniform(1_000, 50_000, n)
+    actual = planned * rng.uniform(0.8, 1.2, n)
+    return pd.DataFrame({
+        "Cost Center": [f"CC{i:04d}" for i in range(n)],
+        "Planned": planned,
+        "FX Adjusted Actual": actual,
+        "Variance": actual - planned,
+        "Margin": rng.uniform(0.05, 0.4, n),
+    })
+
+
+def test_top_n_with_other_bucket_keeps_totals():
+    df = _many_cost_centers()
+    grouped = _grouped_summary(df, "Cost Center", include_percent=True, top_n=10)
+
+    assert len(grouped) == 11
+    assert grouped["Cost Center"].iloc[-1] == "Other"
+    # top-N เรียงตาม |Variance| จากมากไปน้อย
+    top_abs = grouped["Variance"].iloc[:-1].abs().to_numpy()
+    assert (np.diff(top_abs) <= 0).all()
+    # ยอดรวมต้องเท่าเดิม
+    assert np.isclose(grouped["Planned"].sum(), df["Planned"].sum())
+    assert np.isclose(grouped["Variance"].sum(), df["Variance"].sum())
+    assert "__avg__Margin" in grouped.columns
+
+
+def test_no_bucket_when_under_limit():
+    df = _many_cost_centers(5)
+    assert top_n_keys(df, "Cost Center", 10) is None
+    assert top_n_keys(df, "Cost Center", None) is None
+    grouped = _grouped_summary(df, "Cost Center", include_percent=False, top_n=10)
+    assert "Other" not in set(grouped["Cost Center"])
+
+
+def test_bucket_helpers_order_other_last():
+    df = pd.DataFrame({"k": ["a", "b", "c", "d"], "Variance": [1, -10, 5, 2]})
+    keep = top_n_keys(df, "k", 2)
+    assert keep == ["b", "c"]
+    bucketed = bucket_other(df, "k", keep).groupby("k", as_index=False)["Variance"].sum()
+    ordered = order_buckets(bucketed, "k", keep)
+    assert ordered["k"].tolist() == ["b", "c", "Other"]
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50.0)
+    y[500] = 10.0  # spike ต้องไม่หาย
+    idx = lttb_indices(x, y, 50)
+    assert len(idx) == 50
+    assert idx[0] == 0 and idx[-1] == 999
+    assert 500 in idx
+    assert (np.diff(idx) > 0).all()
+
+
+def test_downsample_series_by_month():
+    months = pd.date_range("2000-01-01", periods=300, freq="MS")
+    df = pd.DataFrame({"Month": months, "Variance": np.arange(300.0)})
+    out = downsample_series(df, "Month", "Variance", max_points=60)
+    assert len(out) == 60
+    assert out["Month"].iloc[0] == months[0] and out["Month"].iloc[-1] == months[-1]
+    assert downsample_series(df, "Month", "Variance", max_points=None) is df
+
+
+def test_pdf_with_thousands_of_cost_centers():
+    buffer = generate_pdf_with_chart(_many_cost_centers(), add_next_actions=False, add_scenarios_alerts=False)
+    assert len(buffer.getvalue()) > 1000
@@ -0,0 +1,94 @@
+import math
+from io import BytesIO
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import budget_plus.main as main_mod
+from budget_plus.benchmarks.synthetic import generate_ledger
+from budget_plus.chunked import LedgerAggregator, process_ledger
+from budget_plus.next_actions import suggest_as_dict
+from budget_plus.scenarios_alerts import compute_scenarios, scan_alerts
+from budget_plus.utils.variance_utils import calculate_variance, summarize_variance
+
+client = TestClient(main_mod.app)
+
+
+def _ledger(rows=3000):
+    return generate_ledger(rows=rows, cost_centers=9, months=8, currencies=["THB", "USD"],
+                           versions=["V1", "V2"], scenarios=["Base", "Stretch"], seed=5)
+
+
+def _csv(df) -> bytes:
+    return df.to_csv(index=False).encode("utf-8")
+
+
+def _assert_close(a, b):
+    if isinstance(a, dict):
+        assert a.keys() == b.keys()
+        for k in a:
+            _assert_close(a[k], b[k])
+    elif isinstance(a, list):
+        assert len(a) == len(b)
+        for x, y in zip(a, b):
+            _assert_close(x, y)
+    elif isinstance(a, float) and isinstance(b, float):
+        assert (math.isnan(a) and math.isnan(b)) or a == pytest.approx(b, rel=1e-9, abs=1e-6)
+    else:
+        assert a == b
+
+
+def test_chunked_matches_whole_frame():
+    df = _ledger()
+    whole = calculate_variance(df.copy())
+    result = process_ledger(BytesIO(_csv(df)), "csv", chunk_rows=700)
+    assert result.rows == len(df) and result.chunks == 5
+
+    expected = summarize_variance(whole).sort_values(["Version", "Scenario", "Cost Center"]).reset_index(drop=True)
+    got = result.summary.sort_values(["Version", "Scenario", "Cost Center"]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(got[expected.columns], expected, check_dtype=False)
+
+    _assert_close(result.suggestions(), suggest_as_dict(whole))
+    _assert_close(result.scenarios(), compute_scenarios(whole))
+    _assert_close(result.alerts(), scan_alerts(whole))
+
+
+def test_columnar_inputs_match_csv(tmp_path):
+    pytest.importorskip("pyarrow")
+    df = _ledger(1500)
+    reference = process_ledger(BytesIO(_csv(df)), "csv", chunk_rows=400)
+    df.to_parquet(tmp_path / "ledger.parquet", index=False)
+    df.to_feather(tmp_path / "ledger.feather")
+    for name in ("ledger.parquet", "ledger.feather"):
+        result = process_ledger(str(tmp_path / name), chunk_rows=400)
+        assert result.rows == reference.rows
+        _assert_close(result.scenarios(), reference.scenarios())
+        _assert_close(result.suggestions(), reference.suggestions())
+
+
+def test_top_k_drivers_heap():
+    whole = calculate_variance(_ledger(2000))
+    agg = LedgerAggregator(top_k=7)
+    for start in range(0, len(whole), 300):
+        agg.add(whole.iloc[start:start + 300])
+    drivers = agg.result().top_drivers
+    expected = whole["Variance"].abs().nlargest(7)
+    assert drivers["Variance"].abs().tolist() == pytest.approx(expected.tolist())
+    assert drivers["Line ID"].tolist() == whole.loc[expected.index, "Line ID"].tolist()
+
+
+def test_analyze_chunked_endpoint():
+    content = _csv(_ledger(1200))
+    files = {"file": ("ledger.csv", content, "text/csv")}
+    r = client.post("/analyze-chunked", params={"chunk_rows": 1000, "top_k": 5}, files=files)
+    assert r.status_code == 200
+    body = r.json()
+    assert body["rows"] == 1200 and body["chunks"] == 2 and len(body["top_drivers"]) == 5
+    assert {"suggestions", "scenarios", "alerts", "summary"} <= set(body)
+
+    pdf = client.post("/analyze-chunked", params={"output": "pdf", "chunk_rows": 1000}, files=files)
+    assert pdf.status_code == 200 and pdf.content.startswith(b"%PDF")
+
+    bad = client.post("/analyze-chunked", files={"file": ("ledger.xlsx", b"x", "application/octet-stream")})
+    assert bad.status_code == 400
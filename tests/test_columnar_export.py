@@ -0,0 +1,56 @@
+import zipfile
+from io import BytesIO
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from budget_plus import main as main_module
+from budget_plus.main import app
+
+client = TestClient(app)
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _excel() -> BytesIO:
+    df = pd.DataFrame({
+        "Version": ["V1", "V1", "V2", "V2"],
+        "Scenario": ["Base"] * 4,
+        "Cost Center": ["IT", "HR", "IT", "HR"],
+        "Planned": [1000.0, 2000.0, 1500.0, 2500.0],
+        "Actual": [1100.0, 1900.0, 1600.0, 2400.0],
+    })
+    buf = BytesIO()
+    df.to_excel(buf, index=False, engine="openpyxl")
+    buf.seek(0)
+    return buf
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow", "feather"])
+def test_download_report_columnar(fmt):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    r = client.post("/download-report", params={"format": fmt}, files={"file": ("in.xlsx", _excel(), XLSX)})
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/zip"
+
+    zf = zipfile.ZipFile(BytesIO(r.content))
+    assert sorted(zf.namelist()) == [f"report.{fmt}", f"summary.{fmt}"]
+    read = pq.read_table if fmt == "parquet" else feather.read_table
+    report = read(BytesIO(zf.read(f"report.{fmt}")))
+    assert pa.types.is_dictionary(report.schema.field("Cost Center").type)
+    variance_type = report.schema.field("Variance").type
+    assert pa.types.is_integer(variance_type) or pa.types.is_floating(variance_type)
+    assert report.num_rows == 4
+    summary = read(BytesIO(zf.read(f"summary.{fmt}"))).to_pandas()
+    assert len(summary) == 4
+
+
+def test_download_report_columnar_without_pyarrow(monkeypatch):
+    monkeypatch.setattr(main_module, "columnar_available", lambda: False)
+    r = client.post("/download-report", params={"format": "parquet"}, files={"file": ("in.xlsx", _excel(), XLSX)})
+    assert r.status_code == 501
+    r = client.post("/download-report", params={"format": "csv"}, files={"file": ("in.xlsx", _excel(), XLSX)})
+    assert r.status_code == 400
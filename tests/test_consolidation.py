@@ -0,0 +1,90 @@
+from io import BytesIO
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import budget_plus.dataset_routes as dataset_routes
+import budget_plus.main as main_mod
+from budget_plus.consolidation import MissingRates, attach_rates, normalize_rate_table
+from budget_plus.utils.dataset_store import DatasetStore
+
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+client = TestClient(main_mod.app)
+
+RATES = normalize_rate_table(pd.DataFrame({
+    "Ccy": ["USD", "USD", "EUR"],
+    "Month": ["2024-01-31", "2024-03-31", "2024-01-31"],
+    "FX Rate": [35.0, 36.0, 38.0],
+}))
+
+
+def test_attach_rates_is_as_of_per_currency():
+    df = pd.DataFrame({
+        "Currency": ["usd", "USD", "USD", "USD", "THB", "EUR"],
+        "Month": ["2024-02-15", "2024-04-01", "2024-03-31", None, "2020-01-01", "2024-06-30"],
+    })
+    assert attach_rates(df, RATES, "THB").tolist() == [35.0, 36.0, 36.0, 36.0, 1.0, 38.0]
+
+    with pytest.raises(MissingRates) as err:
+        attach_rates(pd.DataFrame({"Currency": ["USD", "JPY"], "Month": ["2023-12-31", "2024-02-01"]}), RATES, "THB")
+    assert err.value.missing == [{"currency": "JPY", "month": "2024-02-01"}, {"currency": "USD", "month": "2023-12-31"}]
+
+
+def _excel(frame) -> bytes:
+    buf = BytesIO()
+    frame.to_excel(buf, index=False)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    s = DatasetStore(str(tmp_path), ttl_seconds=3600, max_bytes=50 * 2 ** 20, max_items=10)
+    monkeypatch.setattr(dataset_routes, "DATASET_STORE", s)
+    monkeypatch.setattr(main_mod, "DATASET_STORE", s)
+    return s
+
+
+def test_consolidate_endpoint_feeds_existing_reports(store):
+    us = pd.DataFrame({"Version": "V1", "Scenario": "Base", "Cost Center": ["Sales", "IT"],
+                       "Planned": [100.0, 50.0], "Actual": [110.0, 40.0], "Month": ["2024-02-01", "2024-04-01"]})
+    eu = pd.DataFrame({"Version": "V1", "Scenario": "Base", "Cost Center": ["Sales"],
+                       "Planned": [10.0], "Actual": [12.0], "Month": ["2024-02-01"], "Currency": ["EUR"]})
+    rates = RATES.to_csv(index=False).encode()
+    files = [("files", ("us.xlsx", _excel(us), XLSX)), ("files", ("eu.xlsx", _excel(eu), XLSX)),
+             ("fx_rates", ("rates.csv", rates, "text/csv"))]
+
+    r = client.post("/consolidate", params={"currencies": "USD,", "group_currency": "THB"}, files=files)
+    assert r.status_code == 201, r.text
+    body = r.json()
+    assert [e["entity"] for e in body["entities"]] == ["us", "eu"] and body["rows"] == 3
+    assert {"Entity", "Currency", "Local Planned", "Local Actual", "Translation Rate"} <= set(body["columns"])
+
+    summary = client.post("/analyze", params={"dataset_id": body["id"], "raw": "true"}).json()
+    by_cc = {row["Cost Center"]: row for row in summary}
+    assert by_cc["Sales"]["Planned"] == pytest.approx(100 * 35 + 10 * 38)
+    assert by_cc["IT"]["FX Adjusted Actual"] == pytest.approx(40 * 36)
+    assert by_cc["Sales"]["Actual"] == pytest.approx(110 * 35 + 12 * 38)     # ไม่บวก USD + EUR ดิบ
+    assert by_cc["Sales"]["Variance"] == pytest.approx((110 * 35 + 12 * 38) - (100 * 35 + 10 * 38))
+
+    missing = client.post("/consolidate", params={"currencies": "JPY,"}, files=files)
+    assert missing.status_code == 400 and missing.json()["detail"]["missing"][0]["currency"] == "JPY"
+
+
+def test_consolidate_admits_total_once(store, monkeypatch):
+    from budget_plus.utils.memory_budget import estimate_cost
+
+    frame = pd.DataFrame({"Version": "V1", "Scenario": "Base", "Cost Center": ["Sales"] * 50,
+                          "Planned": 1.0, "Actual": 1.0, "Month": "2024-02-01", "Currency": "EUR"})
+    content = _excel(frame)
+    one = estimate_cost(content, "a.xlsx", ("columnar",)).bytes
+    monkeypatch.setattr(main_mod.MEMORY_BUDGET, "limit", int(one * 2.5))
+    monkeypatch.setattr(main_mod.MEMORY_BUDGET, "queue_timeout", 5.0)
+    files = [("files", (f"{n}.xlsx", content, XLSX)) for n in "abc"]
+    files.append(("fx_rates", ("rates.csv", RATES.to_csv(index=False).encode(), "text/csv")))
+
+    r = client.post("/consolidate", files=files)       # รวมเกินงบ → 413 ทันที (ไม่รอคิวตัวเองจน 503)
+    assert r.status_code == 413 and "retry-after" not in r.headers
+    assert main_mod.MEMORY_BUDGET.in_use == 0
+    assert client.post("/consolidate", files=files[1:]).status_code == 201
@@ -0,0 +1,98 @@
+import os
+import time
+from io import BytesIO
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import budget_plus.dataset_routes as dataset_routes
+import budget_plus.main as main_mod
+from budget_plus.utils.dataset_store import DatasetStore
+
+pytest.importorskip("pyarrow")
+
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+client = TestClient(main_mod.app)
+
+
+def _excel(n=12) -> bytes:
+    buf = BytesIO()
+    pd.DataFrame({
+        "Version": ["V1"] * n,
+        "Scenario": ["Base", "Stretch"] * (n // 2),
+        "CC": ["CC%d" % (i % 3) for i in range(n)],
+        "Budget": [100.0 + i for i in range(n)],
+        "Actual": [95.0 + 2 * i for i in range(n)],
+    }).to_excel(buf, index=False)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    s = DatasetStore(str(tmp_path), ttl_seconds=3600, max_bytes=50 * 2 ** 20, max_items=10)
+    monkeypatch.setattr(dataset_routes, "DATASET_STORE", s)
+    monkeypatch.setattr(main_mod, "DATASET_STORE", s)
+    return s
+
+
+def _upload(content):
+    return client.post("/datasets", files={"file": ("ledger.xlsx", content, XLSX)})
+
+
+def test_upload_once_then_analyze_by_id(store):
+    content = _excel()
+    r = _upload(content)
+    assert r.status_code == 201
+    info = r.json()
+    assert info["rows"] == 12
+    assert {"Cost Center", "Planned", "FX Adjusted Actual", "Variance"} <= set(info["columns"])
+
+    # ไฟล์เดิม → dataset เดิม
+    again = _upload(content)
+    assert again.status_code == 200 and again.json()["id"] == info["id"]
+
+    by_id = client.post("/analyze", params={"dataset_id": info["id"], "raw": "true"})
+    by_file = client.post("/analyze", params={"raw": "true"}, files={"file": ("ledger.xlsx", content, XLSX)})
+    assert by_id.status_code == 200
+    assert by_id.json() == by_file.json()
+
+    pdf = client.post("/download-pdf", params={"dataset_id": info["id"]})
+    assert pdf.status_code == 200 and pdf.content.startswith(b"%PDF")
+
+
+def test_missing_dataset_and_bad_requests(store):
+    assert client.post("/analyze", params={"dataset_id": "0" * 32}).status_code == 404
+    assert client.post("/analyze").status_code == 400
+
+    dataset_id = _upload(_excel()).json()["id"]
+    both = client.post("/analyze", params={"dataset_id": dataset_id},
+                       files={"file": ("ledger.xlsx", _excel(), XLSX)})
+    assert both.status_code == 400
+
+    assert client.delete(f"/datasets/{dataset_id}").status_code == 200
+    assert client.get(f"/datasets/{dataset_id}").status_code == 404
+
+
+def test_ttl_and_lru_eviction(tmp_path):
+    s = DatasetStore(str(tmp_path), ttl_seconds=3600, max_bytes=10 ** 9, max_items=2)
+    frame = pd.DataFrame({"Cost Center": ["A", "B"], "Planned": [1.0, 2.0]})
+    for i, name in enumerate(("a", "b")):
+        s.put(name * 32, frame)
+        os.utime(s._meta_path(name * 32), (time.time() - 100 + i, time.time() - 100 + i))
+    s.load("a" * 32)                 # a ใช้ล่าสุด → b เก่าสุด
+    s.put("c" * 32, frame)
+    assert sorted(i.id[0] for i in s.list()) == ["a", "c"]
+
+    old = time.time() - 7200
+    os.utime(s._meta_path("a" * 32), (old, old))
+    assert s.info("a" * 32) is None and not os.path.exists(s._data_path("a" * 32))
+
+
+def test_load_is_memory_mapped_and_keeps_dtypes(tmp_path):
+    s = DatasetStore(str(tmp_path), ttl_seconds=3600, max_bytes=10 ** 9, max_items=10)
+    frame = pd.DataFrame({"Cost Center": ["A", "B", "A"], "Planned": [1.0, 2.0, 3.0]})
+    s.put("d" * 32, frame)
+    out = s.load("d" * 32)
+    pd.testing.assert_frame_equal(out, frame)
+    assert not out["Planned"].to_numpy().flags.writeable   # ชี้เข้าไฟล์ที่ map ไว้ ไม่ได้คัดลอก
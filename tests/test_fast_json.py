@@ -0,0 +1,53 @@
+import json
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from budget_plus.main import app
+from budget_plus.utils import fast_json
+from budget_plus.utils.fast_json import frame_payload, dumps
+
+client = TestClient(app)
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _excel() -> BytesIO:
+    df = pd.DataFrame({
+        "Version": ["V1", "V2"],
+        "Scenario": ["Base", "Base"],
+        "Cost Center": ["IT", "HR"],
+        "Planned": [10000, 12000],
+        "Actual": [11000, 11500],
+        "FX Rate": [1.0, 1.0],
+    })
+    buf = BytesIO()
+    df.to_excel(buf, index=False, engine="openpyxl")
+    buf.seek(0)
+    return buf
+
+
+def test_analyze_columnar_and_raw():
+    r = client.post("/analyze", params={"format": "columnar"}, files={"file": ("in.xlsx", _excel(), XLSX)})
+    assert r.status_code == 200
+    cols = r.json()
+    assert sorted(cols["Cost Center"]) == ["HR", "IT"]
+    assert set(cols["Planned"]) == {"10,000.00", "12,000.00"}
+
+    r = client.post("/analyze", params={"format": "columnar", "raw": "true"}, files={"file": ("in.xlsx", _excel(), XLSX)})
+    assert sorted(r.json()["Variance"]) == [-500.0, 1000.0]
+
+    r = client.post("/analyze", params={"format": "xml"}, files={"file": ("in.xlsx", _excel(), XLSX)})
+    assert r.status_code == 400
+
+
+def test_dumps_numpy_and_nan(monkeypatch):
+    df = pd.DataFrame({"a": [1.5, np.nan], "b": ["x", None], "n": np.array([1, 2], dtype=np.int64)})
+    expected = {"a": [1.5, None], "b": ["x", None], "n": [1, 2]}
+    assert json.loads(dumps(frame_payload(df, "columnar"))) == expected
+
+    # ไม่มี orjson → stdlib ต้องได้ผลเหมือนกัน
+    monkeypatch.setattr(fast_json, "orjson", None)
+    assert json.loads(dumps(frame_payload(df, "columnar"))) == expected
+    assert json.loads(dumps(frame_payload(df, "records")))[1] == {"a": None, "b": None, "n": 2}
@@ -1,8 +1,9 @@
 import io
+import numpy as np
 import pandas as pd
 
 # ✅ ใช้ package import หลังจากเพิ่ม __init__.py ใน budget_plus/, utils/, tests/
-from budget_plus.utils.number_format_utils import format_number
+from budget_plus.utils.number_format_utils import format_number, format_number_array
 from budget_plus.pdf_summary import generate_pdf_with_chart
 
 def test_format_number_basic():
@@ -33,3 +34,14 @@ def test_generate_pdf_with_chart(tmp_path):
     content = buffer.getvalue()
     # ✅ PDF ต้องไม่ว่าง และมีขนาดมากกว่า 1KB
     assert len(content) > 1000
+
+def test_format_number_array_matches_scalar_edge_values():
+    """bulk formatter ต้องให้ string เหมือน format_number ทุกตัว (ลบ/ศูนย์/ปัดเศษ/ค่าใหญ่/nan)"""
+    values = np.concatenate([
+        np.random.default_rng(0).normal(0, 5e6, 2000),
+        [0.0, -0.0, -0.001, 0.005, 0.015, 999.995, -999.995, 999_999.995, 1e15, -1e15, 1e40, np.nan, np.inf, -np.inf],
+    ])
+    for style in ("number", "percent", "k", "m"):
+        assert format_number_array(values, style).tolist() == [format_number(v, style) for v in values]
+    assert format_number_array(np.array([], dtype=float)).tolist() == []
+    assert format_number_array(np.array([1, -1_234_567])).tolist() == ["1.00", "-1,234,567.00"]
@@ -0,0 +1,108 @@
+from io import BytesIO
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import budget_plus.fx_routes as fx_routes
+import budget_plus.main as main_mod
+from budget_plus.consolidation import MissingRates, attach_rates
+from budget_plus.fx_store import FxStore
+from budget_plus.scenarios_alerts import compute_scenarios
+from budget_plus.utils.variance_utils import calculate_variance
+
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+client = TestClient(main_mod.app)
+TOKEN = "s3cret"
+
+RATES = pd.DataFrame({
+    "Currency": ["USD", "USD", "USD", "EUR"],
+    "Date": ["2024-01-31", "2024-02-29", "2024-03-31", "2024-01-31"],
+    "Rate": [35.0, 35.5, 36.0, 38.0],
+})
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    s = FxStore(str(tmp_path / "fx.csv"))
+    s.update(RATES)
+    monkeypatch.setattr(fx_routes, "FX_STORE", s)
+    monkeypatch.setattr(main_mod, "FX_STORE", s)
+    monkeypatch.setattr(fx_routes, "ADMIN_TOKEN", TOKEN)
+    return s
+
+
+def test_as_of_lookup_persistence_and_reload(store):
+    assert store.rate("usd", "2024-02-15") == 35.0
+    assert store.rate("USD", "2024-02-29") == 35.5
+    assert store.rate("USD") == 36.0 and store.rate("USD", "2023-12-31") is None
+
+    other = FxStore(store.path)                      # worker อื่นอ่านไฟล์เดียวกัน
+    assert other.currencies()["USD"] == {"from": "2024-01-31", "to": "2024-03-31", "points": 3}
+    store.update(pd.DataFrame({"Currency": ["USD"], "Date": ["2024-03-31"], "Rate": [37.0]}))
+    os.utime(store.path, (1e9, 1e9))                 # mtime เปลี่ยนแน่นอน
+    assert other.rate("USD") == 37.0 and other.currencies()["USD"]["points"] == 3
+
+    with pytest.raises(MissingRates):
+        store.rates_for(["USD", "JPY"], ["2024-02-01", "2024-02-01"], "THB")
+
+
+def test_store_matches_merge_asof_and_feeds_variance_and_scenarios(store):
+    rng = np.random.default_rng(0)
+    n = 5000
+    df = pd.DataFrame({
+        "Cost Center": rng.choice(["A", "B", "C"], n),
+        "Currency": rng.choice(["USD", "EUR", "THB"], n),
+        "Month": rng.choice(pd.date_range("2024-01-31", periods=6, freq="ME").strftime("%Y-%m-%d"), n),
+        "Planned": rng.uniform(10, 100, n),
+        "Actual": rng.uniform(10, 100, n),
+    })
+    expected = attach_rates(df, store.table, "THB")
+    assert np.array_equal(store.rates_for(df["Currency"], df["Month"], "THB"), expected)
+
+    calc = calculate_variance(df.copy(), fx_store=store, group_currency="THB")
+    assert np.allclose(calc["FX Adjusted Actual"], df["Actual"] * expected)
+    assert compute_scenarios(df, fx_store=store, group_currency="THB") == compute_scenarios(calc)
+
+
+def test_upload_rates_then_analyze_without_fx_column(store):
+    rates_file = {"file": ("rates.csv", RATES.to_csv(index=False).encode(), "text/csv")}
+    assert client.delete("/fx/rates").status_code == 403                 # เขียน store ได้เฉพาะ admin
+    assert client.post("/fx/rates", files=rates_file, headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.delete("/fx/rates", headers={"X-Admin-Token": TOKEN}).json() == {"cleared": True}
+    r = client.post("/fx/rates", files=rates_file, headers={"X-Admin-Token": TOKEN})
+    assert r.status_code == 200 and set(r.json()["currencies"]) == {"USD", "EUR"}
+    assert client.get("/fx/rates/USD", params={"date": "2024-02-10"}).json()["rate"] == 35.0
+    assert client.get("/fx/rates/JPY").status_code == 404
+
+    buf = BytesIO()
+    pd.DataFrame({"Version": "V1", "Scenario": "Base", "Cost Center": ["A", "B"], "Planned": [3500.0, 100.0],
+                  "Actual": [110.0, 120.0], "Currency": ["USD", "THB"], "Month": ["2024-03-15", "2024-03-15"]}
+                 ).to_excel(buf, index=False)
+    rows = client.post("/analyze", params={"raw": "true"}, files={"file": ("ledger.xlsx", buf.getvalue(), XLSX)}).json()
+    by_cc = {row["Cost Center"]: row for row in rows}
+    assert by_cc["A"]["FX Adjusted Actual"] == pytest.approx(110 * 35.5)
+    assert by_cc["B"]["FX Adjusted Actual"] == pytest.approx(120.0)
+
+
+def test_dataset_id_follows_store_rates(store, tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    import budget_plus.dataset_routes as dataset_routes
+    from budget_plus.utils.dataset_store import DatasetStore
+    datasets = DatasetStore(str(tmp_path / "ds"), ttl_seconds=3600, max_bytes=50 * 2 ** 20, max_items=10)
+    monkeypatch.setattr(dataset_routes, "DATASET_STORE", datasets)
+    monkeypatch.setattr(main_mod, "DATASET_STORE", datasets)
+
+    buf = BytesIO()
+    pd.DataFrame({"Version": "V1", "Scenario": "Base", "Cost Center": ["A"], "Planned": [1.0], "Actual": [1.0],
+                  "Currency": ["USD"], "Month": ["2024-03-15"]}).to_excel(buf, index=False)
+    upload = {"file": ("ledger.xlsx", buf.getvalue(), XLSX)}
+    first = client.post("/datasets", files=upload).json()["id"]
+    store.update(pd.DataFrame({"Currency": ["USD"], "Date": ["2024-02-29"], "Rate": [40.0]}))
+    second = client.post("/datasets", files=upload).json()["id"]
+
+    assert first != second
+    assert datasets.load(first)["FX Rate"].tolist() == [35.5]
+    assert datasets.load(second)["FX Rate"].tolist() == [40.0]
@@ -0,0 +1,110 @@
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from openpyxl import load_workbook
+
+import budget_plus.hierarchy_routes as hierarchy_routes
+import budget_plus.main as main_mod
+from budget_plus.excel_dashboard_v2 import generate_excel_dashboard_v2
+from budget_plus.hierarchy import UNMAPPED, CostCenterHierarchy, HierarchyStore
+from budget_plus.utils.variance_utils import calculate_variance
+
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+client = TestClient(main_mod.app)
+
+EDGES = pd.DataFrame({
+    "Cost Center": ["GROUP", "OPS", "IT", "OPS-N", "OPS-S", "IT-INFRA", "IT-APPS", "OPS-N-1", "OPS-N-2"],
+    "Parent": [None, "GROUP", "GROUP", "OPS", "OPS", "IT", "IT", "OPS-N", "OPS-N"],
+})
+LEAVES = ["OPS-N-1", "OPS-N-2", "OPS-S", "IT-INFRA", "IT-APPS"]
+
+
+@pytest.fixture
+def ledger():
+    rng = np.random.default_rng(3)
+    n = 400
+    return calculate_variance(pd.DataFrame({
+        "Version": rng.choice(["V1", "V2"], n),
+        "Scenario": "Base",
+        "Cost Center": rng.choice(LEAVES + ["OPS", "LEGACY"], n),   # ลงบัญชีที่ node กลาง + นอกต้นไม้
+        "Planned": rng.uniform(10, 100, n).round(2),
+        "Actual": rng.uniform(10, 100, n).round(2),
+    }))
+
+
+def test_rollup_matches_filtering_every_subtree(ledger):
+    tree = CostCenterHierarchy(EDGES)
+    assert tree.depth == 4
+    closure = tree.closure()
+    out = tree.rollup(ledger)
+
+    for rec in out.itertuples(index=False):
+        if rec[2] in (UNMAPPED, "LEGACY"):
+            members = {"LEGACY"}
+        else:
+            members = set(closure.loc[closure["Ancestor"] == rec[2], "Descendant"])
+        part = ledger[(ledger["Version"] == rec[0]) & ledger["Cost Center"].isin(members)]
+        assert rec.Rows == len(part)
+        assert rec.Variance == pytest.approx(part["Variance"].sum())
+    roots = out[out["Level"] == 1].groupby("Version")["Planned"].sum()
+    assert np.allclose(roots, ledger.groupby("Version")["Planned"].sum())
+
+    levels = tree.level_columns(ledger["Cost Center"])
+    assert levels.loc[ledger["Cost Center"] == "OPS-N-2", "CC Level 3"].eq("OPS-N").all()
+    assert levels.loc[ledger["Cost Center"] == "LEGACY", "CC Level 1"].eq(UNMAPPED).all()
+
+
+def test_rejects_cycles_and_duplicates():
+    with pytest.raises(ValueError, match="cycle"):
+        CostCenterHierarchy(pd.DataFrame({"Cost Center": ["A", "B", "C"], "Parent": [None, "C", "B"]}))
+    with pytest.raises(ValueError, match="more than once"):
+        CostCenterHierarchy(pd.DataFrame({"Cost Center": ["A", "B", "B"], "Parent": [None, "A", "A"]}))
+
+
+def test_upload_then_analyze_rollup_and_excel_dimension(tmp_path, monkeypatch, ledger):
+    store = HierarchyStore(str(tmp_path / "hierarchy.csv"))
+    monkeypatch.setattr(hierarchy_routes, "HIERARCHY_STORE", store)
+    monkeypatch.setattr(main_mod, "HIERARCHY_STORE", store)
+
+    buf = BytesIO()
+    ledger[["Version", "Scenario", "Cost Center", "Planned", "Actual"]].to_excel(buf, index=False)
+    upload = {"file": ("ledger.xlsx", buf.getvalue(), XLSX)}
+    assert client.post("/analyze", params={"rollup": "true"}, files=upload).status_code == 400
+
+    monkeypatch.setattr(hierarchy_routes, "ADMIN_TOKEN", "s3cret")
+    tree_file = {"file": ("tree.csv", EDGES.to_csv(index=False).encode(), "text/csv")}
+    assert client.post("/hierarchy", files=tree_file).status_code == 403        # เขียน tree ได้เฉพาะ admin
+    assert client.post("/hierarchy", files=tree_file, headers={"X-Admin-Token": "wrong"}).status_code == 403
+    r = client.post("/hierarchy", files=tree_file, headers={"X-Admin-Token": "s3cret"})
+    assert r.status_code == 200 and r.json()["nodes_per_level"] == [1, 2, 4, 2]
+    assert len(client.get("/hierarchy/closure").json()) == len(store.get().closure())
+
+    rows = client.post("/analyze", params={"rollup": "true", "raw": "true", "level": 2}, files=upload).json()
+    assert {r["Level"] for r in rows} == {1, 2}
+    ops = [r for r in rows if r["Cost Center"] == "OPS" and r["Version"] == "V1"][0]
+    sub = ledger[(ledger["Version"] == "V1") & ledger["Cost Center"].str.startswith("OPS")]
+    assert ops["Planned"] == pytest.approx(sub["Planned"].sum())
+
+    path = str(tmp_path / "dash.xlsx")
+    generate_excel_dashboard_v2(ledger, path, hierarchy=store.get(), hierarchy_level=2)
+    wb = load_workbook(path, read_only=True)
+    assert wb["Executive Dashboard"]["E9"].value == "CC Level 2"
+    assert [c.value for c in next(wb["Hierarchy"].iter_rows(min_row=2, max_row=2))][:2] == ["GROUP", 1]
+
+    assert client.delete("/hierarchy").status_code == 403
+    assert client.delete("/hierarchy", headers={"X-Admin-Token": "s3cret"}).json() == {"cleared": True}
+    assert store.get() is None
+
+
+def test_numeric_cost_center_codes_match_text_tree():
+    tree = CostCenterHierarchy(pd.DataFrame({"Cost Center": ["1", "10", "1001", "1002"],
+                                             "Parent": [None, "1", "10", "10"]}))
+    ledger = pd.DataFrame({"Cost Center": [1001, 1002, 1002], "Planned": [1.0, 2.0, 3.0]})   # int64 จาก read_excel
+    out = tree.rollup(ledger, by=())
+    assert dict(zip(out["Cost Center"], out["Planned"])) == {"1": 6.0, "10": 6.0, "1001": 1.0, "1002": 5.0}
+
+    with_gap = pd.Series([1001.0, None])                                                      # float64 เมื่อมีช่องว่าง
+    assert tree.level_columns(with_gap)["CC Level 2"].tolist() == ["10", None]
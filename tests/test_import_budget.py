@@ -0,0 +1,70 @@
+import json
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+from budget_plus.utils.import_report import HEAVY_MODULES, parse_importtime
+
+# งบเวลา import ของ budget_plus.main แบบ cold (วินาที) — ปรับได้ด้วย env บนเครื่อง CI ที่ช้า
+IMPORT_BUDGET_S = float(os.getenv("BUDGET_IMPORT_BUDGET_S", "4.0"))
+
+_PROBE = """
+import json, sys, time
+t = time.perf_counter()
+import budget_plus.main as m
+elapsed = time.perf_counter() - t
+paths = sorted(r.path for r in m.app.routes)
+print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules), "paths": paths}))
+"""
+
+
+def _cold_import(**env):
+    run_env = {**os.environ, "PYTHONPATH": os.pathsep.join(p for p in sys.path if p), **env}
+    out = subprocess.run([sys.executable, "-c", _PROBE], capture_output=True, text=True, env=run_env, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_cold_import_within_budget_and_no_renderers():
+    probe = _cold_import()
+    heavy = [m for m in HEAVY_MODULES if m in probe["modules"]]
+    assert heavy == [], f"renderer modules imported at startup: {heavy}"
+    assert probe["elapsed"] < IMPORT_BUDGET_S, f"import took {probe['elapsed']:.2f}s (budget {IMPORT_BUDGET_S}s)"
+    assert "/download-pdf" in probe["paths"] and "/report-exec" in probe["paths"]
+
+
+def test_lite_profile_mounts_json_routes_only():
+    paths = _cold_import(BUDGET_APP_PROFILE="lite")["paths"]
+    assert "/analyze" in paths and "/analyze-suggest" in paths and "/diagnostics/imports" in paths
+    for p in ("/download-report", "/download-pdf", "/export-excel-exec", "/report-exec"):
+        assert p not in paths
+
+
+def test_parse_importtime():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   json.decoder\n"
+        "import time:       300 |        420 | json\n"
+    )
+    rows = parse_importtime(stderr)
+    assert [(r["module"], r["depth"], r["cumulative_ms"]) for r in rows] == [("json.decoder", 1, 0.12), ("json", 0, 0.42)]
+
+
+def test_diagnostics_imports_endpoint(monkeypatch):
+    from budget_plus import diagnostics_routes
+    from budget_plus.main import app
+
+    fake = {"target": "budget_plus.main", "total_ms": 1.0, "modules": [{"module": "x"}] * 5,
+            "packages": [], "heavy_imported": []}
+    monkeypatch.setattr(diagnostics_routes, "import_time_report", lambda target, top: fake)
+    monkeypatch.setattr(diagnostics_routes, "_import_report", None)
+    body = TestClient(app).get("/diagnostics/imports", params={"top": 2}).json()
+    assert body["target"] == "budget_plus.main" and len(body["modules"]) == 2
+    assert "profile" in body and "heavy_loaded_now" in body
+
+    monkeypatch.setattr(diagnostics_routes, "ADMIN_TOKEN", "s3cret")
+    client = TestClient(app)
+    assert client.get("/diagnostics/imports", params={"refresh": "true"}).status_code == 403
+    assert client.get("/diagnostics/imports", params={"refresh": "true"},
+                      headers={"X-Admin-Token": "s3cret"}).status_code == 200
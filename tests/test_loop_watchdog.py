@@ -0,0 +1,67 @@
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from budget_plus.main import app as main_app
+from budget_plus.utils.loop_watchdog import LoopWatchdog, RouteTrackerMiddleware
+
+
+def _blocking_app(watchdog: LoopWatchdog) -> FastAPI:
+    @asynccontextmanager
+    async def lifespan(app):
+        await watchdog.start()
+        yield
+        await watchdog.stop()
+
+    app = FastAPI(lifespan=lifespan)
+    app.add_middleware(RouteTrackerMiddleware)
+
+    @app.get("/items/{item_id}/slow")
+    async def slow_sync_work(item_id: int):
+        time.sleep(0.3)   # งาน sync ใน async route → loop ค้าง
+        return {"id": item_id}
+
+    @app.get("/fast")
+    async def fast():
+        return {"ok": True}
+
+    return app
+
+
+def _wait_for_event(watchdog, timeout=2.0):
+    end = time.time() + timeout
+    while not watchdog.events and time.time() < end:
+        time.sleep(0.02)
+    return list(watchdog.events)
+
+
+def test_blocking_route_is_recorded_with_stack():
+    watchdog = LoopWatchdog(threshold=0.1, interval=0.02)
+    with TestClient(_blocking_app(watchdog)) as client:
+        assert client.get("/items/7/slow").json() == {"id": 7}
+        events = _wait_for_event(watchdog)
+
+    assert len(events) == 1
+    ev = events[0]
+    assert ev["endpoint"] == "/items/{item_id}/slow" and ev["method"] == "GET"
+    assert ev["blocked_ms"] >= 200
+    assert any("slow_sync_work" in line for line in ev["stack"])
+    assert watchdog.snapshot()["blocked_total"] == 1
+
+
+def test_non_blocking_route_is_not_reported():
+    watchdog = LoopWatchdog(threshold=0.1, interval=0.02)
+    with TestClient(_blocking_app(watchdog)) as client:
+        for _ in range(5):
+            client.get("/fast")
+        time.sleep(0.1)
+    assert not watchdog.events
+
+
+def test_event_loop_diagnostics_endpoint():
+    with TestClient(main_app) as client:
+        body = client.get("/diagnostics/event-loop").json()
+    assert body["running"] is True
+    assert set(body) >= {"threshold_ms", "lag_ms", "blocked_total", "recent"}
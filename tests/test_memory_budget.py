@@ -0,0 +1,68 @@
+from io import BytesIO
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from budget_plus import main
+from budget_plus.utils.memory_budget import PEAK_MEMORY, estimate_cost, sheet_dimensions
+
+client = TestClient(main.app)
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _excel(n=20) -> bytes:
+    df = pd.DataFrame({
+        "Version": ["V1"] * n,
+        "Scenario": ["Base"] * n,
+        "Cost Center": [f"CC{i % 4}" for i in range(n)],
+        "Planned": [100.0 * (i + 1) for i in range(n)],
+        "Actual": [90.0 * (i + 1) for i in range(n)],
+    })
+    buf = BytesIO()
+    df.to_excel(buf, index=False, engine="openpyxl")
+    return buf.getvalue()
+
+
+def _post(content, path="/analyze"):
+    return client.post(path, files={"file": ("in.xlsx", content, XLSX)})
+
+
+def test_dimensions_read_without_parsing():
+    assert sheet_dimensions(_excel(20), "in.xlsx") == (21, 5)
+    assert sheet_dimensions(b"not a zip", "in.xlsx") is None
+
+
+def test_estimate_grows_with_rows_and_artifacts():
+    small, big = _excel(10), _excel(1000)
+    assert estimate_cost(big).rows == 1000 and estimate_cost(big).cols == 5
+    assert estimate_cost(big).bytes > 50 * estimate_cost(small).bytes
+    assert estimate_cost(big, artifacts=("xlsx", "pdf", "zip")).bytes > estimate_cost(big, artifacts=("json",)).bytes
+
+
+def test_over_budget_request_rejected_with_413(monkeypatch):
+    monkeypatch.setattr(main.MEMORY_BUDGET, "limit", 1024)
+    r = _post(_excel())
+    assert r.status_code == 413
+    assert "เกินงบ" in r.json()["detail"]
+
+
+def test_row_limit(monkeypatch):
+    monkeypatch.setattr(main.MEMORY_BUDGET, "max_rows", 5)
+    r = _post(_excel(20))
+    assert r.status_code == 413 and "แถว" in r.json()["detail"]
+
+
+def test_busy_budget_returns_503(monkeypatch):
+    monkeypatch.setattr(main.MEMORY_BUDGET, "queue_timeout", 0.1)
+    monkeypatch.setattr(main.MEMORY_BUDGET, "in_use", main.MEMORY_BUDGET.limit)
+    r = _post(_excel())
+    assert r.status_code == 503 and "retry-after" in r.headers
+    r = _post(_excel(), "/report-exec")
+    assert r.status_code == 503 and r.headers["retry-after"] == "1"
+
+
+def test_reservation_released_and_peak_recorded():
+    before = PEAK_MEMORY.count(endpoint="/analyze")
+    assert _post(_excel()).status_code == 200
+    assert main.MEMORY_BUDGET.in_use == 0
+    assert PEAK_MEMORY.count(endpoint="/analyze") == before + 1
@@ -0,0 +1,69 @@
+from io import BytesIO
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from budget_plus.main import app
+from budget_plus.utils import metrics
+
+client = TestClient(app)
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _excel(n=5) -> BytesIO:
+    df = pd.DataFrame({
+        "Version": ["V1"] * n,
+        "Scenario": ["Base"] * n,
+        "Cost Center": [f"CC{i}" for i in range(n)],
+        "Planned": [1000.0 * (i + 1) for i in range(n)],
+        "Actual": [900.0 * (i + 1) for i in range(n)],
+    })
+    buf = BytesIO()
+    df.to_excel(buf, index=False, engine="openpyxl")
+    buf.seek(0)
+    return buf
+
+
+def test_histogram_exposition_is_cumulative():
+    reg = metrics.Registry()
+    h = reg.histogram("t_seconds", "test", ("stage",), buckets=(0.1, 1.0))
+    h.observe(0.05, stage="a")
+    h.observe(0.5, stage="a")
+    h.observe(5.0, stage="a")
+    text = reg.render()
+    assert "# TYPE t_seconds histogram" in text
+    assert 't_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 't_seconds_bucket{stage="a",le="1.0"} 2' in text
+    assert 't_seconds_bucket{stage="a",le="+Inf"} 3' in text
+    assert 't_seconds_count{stage="a"} 3' in text
+
+
+def test_stage_outside_request_uses_placeholder_endpoint():
+    before = metrics.STAGE_SECONDS.count(endpoint="-", stage="unit")
+    with metrics.stage("unit"):
+        pass
+    assert metrics.STAGE_SECONDS.count(endpoint="-", stage="unit") == before + 1
+
+
+def test_analyze_records_stages_rows_and_bytes():
+    rows_before = metrics.ROWS_PROCESSED.value(endpoint="/analyze")
+    out_before = metrics.BYTES_OUT.value(endpoint="/analyze")
+    r = client.post("/analyze", files={"file": ("in.xlsx", _excel(), XLSX)})
+    assert r.status_code == 200
+
+    for name in ("parse", "normalize", "variance", "format"):
+        assert metrics.STAGE_SECONDS.count(endpoint="/analyze", stage=name) >= 1
+    assert metrics.ROWS_PROCESSED.value(endpoint="/analyze") == rows_before + 5
+    assert metrics.BYTES_OUT.value(endpoint="/analyze") == out_before + len(r.content)
+    assert metrics.BYTES_IN.value(endpoint="/analyze") > 0
+    assert metrics.REQUEST_SECONDS.count(endpoint="/analyze", method="POST", status="200") >= 1
+
+
+def test_metrics_endpoint_prometheus_text():
+    client.post("/analyze", files={"file": ("in.xlsx", _excel(), XLSX)})
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert '# TYPE budget_stage_duration_seconds histogram' in r.text
+    assert 'budget_stage_duration_seconds_bucket{endpoint="/analyze",stage="parse",le="+Inf"}' in r.text
+    assert 'budget_rows_processed_total{endpoint="/analyze"}' in r.text
@@ -0,0 +1,74 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import budget_plus.parallel_agg as parallel_agg
+from budget_plus.benchmarks.synthetic import generate_ledger
+from budget_plus.scenarios_alerts import scan_alerts
+from budget_plus.utils.process_pool import get_pool, run_all
+from budget_plus.utils.variance_utils import calculate_variance, summarize_variance
+
+
+@pytest.fixture(scope="module")
+def ledger():
+    df = calculate_variance(generate_ledger(rows=6000, cost_centers=40, months=9, versions=["V1", "V2"],
+                                            scenarios=["Base", "Stretch"], seed=11))
+    df.loc[3, "Cost Center"] = None          # groupby ตัดคีย์ว่างทิ้ง
+    return df
+
+
+def _shm_segments():
+    return {n for n in os.listdir("/dev/shm") if n.startswith(("psm_", "bp_frame_"))} if os.path.isdir("/dev/shm") else set()
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_aggregate_matches_pandas(ledger, workers):
+    before = _shm_segments()
+    result = parallel_agg.aggregate(ledger, workers=workers, top_k=8)
+    assert _shm_segments() <= before      # segment ถูก unlink หลังรวมผล
+
+    pd.testing.assert_frame_equal(result.summary, summarize_variance(ledger), check_dtype=False)
+    expected = ledger["Variance"].abs().nlargest(8)
+    assert list(result.top_drivers.index) == list(expected.index)
+    assert result.alerts()["crossings"] == scan_alerts(ledger)["crossings"]
+
+
+def test_cost_center_alerts_match_rolling(ledger):
+    result = parallel_agg.aggregate(ledger, workers=1, top_k=0, pct_threshold=0.05)
+    data = ledger.assign(Month=pd.to_datetime(ledger["Month"])).dropna(subset=["Cost Center"])
+    by = data.pivot_table(index="Cost Center", columns="Month", values=["Planned", "FX Adjusted Actual"],
+                          aggfunc="sum", fill_value=0.0)
+    ratio = (by["FX Adjusted Actual"] / by["Planned"].replace(0, np.nan)).fillna(1.0)
+    rolling = ratio.T.rolling(3).mean().T
+    expected = sorted((str(m.date()), cc) for (cc, m), r in rolling.stack().items() if r >= 1.05)
+    assert sorted((a["month"], a["cost_center"]) for a in result.cost_center_alerts) == expected
+
+
+def test_summarize_switches_on_row_threshold(ledger, monkeypatch):
+    calls = []
+    real = parallel_agg.aggregate
+    monkeypatch.setattr(parallel_agg, "aggregate", lambda df, **kw: calls.append(len(df)) or real(df, workers=1, **kw))
+    monkeypatch.setattr(parallel_agg, "resolve_workers", lambda workers: 4)
+
+    monkeypatch.setattr(parallel_agg, "PARALLEL_AGG_MIN_ROWS", len(ledger) + 1)
+    parallel_agg.summarize(ledger)
+    assert calls == []
+
+    monkeypatch.setattr(parallel_agg, "PARALLEL_AGG_MIN_ROWS", len(ledger))
+    pd.testing.assert_frame_equal(parallel_agg.summarize(ledger), summarize_variance(ledger), check_dtype=False)
+    assert calls == [len(ledger)]
+
+
+def test_pool_shared_across_worker_counts():
+    pool = get_pool()
+    slow = {}
+    thread = threading.Thread(target=lambda: slow.update(out=run_all([(time.sleep, (0.2,))] * 4, 4)))
+    thread.start()
+    assert run_all([(pow, (2, i)) for i in range(6)], 2) == [2 ** i for i in range(6)]
+    thread.join()
+    assert slow["out"] == [None] * 4          # งานที่ค้างอยู่ไม่ถูกยกเลิกเมื่อมีคนขอ workers ต่างกัน
+    assert get_pool() is pool
@@ -0,0 +1,90 @@
+import os
+from io import BytesIO
+
+import pytest
+from reportlab.pdfgen import canvas
+
+from budget_plus import pdf_canvas
+from budget_plus.pdf_canvas import new_canvas, draw_form, font_for
+
+
+def _square(c):
+    c.rect(0, 0, 50, 20, stroke=1, fill=0)
+
+
+def test_new_canvas_compresses_pages():
+    buf = BytesIO()
+    c = new_canvas(buf)
+    c.drawString(100, 100, "hello " * 200)
+    c.showPage(); c.save()
+    assert b"/FlateDecode" in buf.getvalue()
+
+
+def test_draw_form_is_defined_once_and_reused():
+    buf = BytesIO()
+    c = new_canvas(buf, pageCompression=0)
+    for _ in range(5):
+        for y in (100, 200, 300):
+            draw_form(c, "frame", 60, y, _square, bbox=(-1, -1, 51, 21))
+        c.showPage()
+    c.save()
+    data = buf.getvalue()
+    assert data.count(b"/Subtype /Form") == 1
+    assert data.count(b" Do") == 15  # one reference per placement
+
+
+def test_font_for_latin_uses_builtin_font():
+    assert font_for(["Cost Center", "Variance 1,234.00"]) == "Helvetica"
+    assert font_for("Title", default="Helvetica-Bold") == "Helvetica-Bold"
+
+
+def test_thai_font_registered_once(monkeypatch):
+    mpl = pytest.importorskip("matplotlib")
+    ttf = os.path.join(os.path.dirname(mpl.__file__), "mpl-data", "fonts", "ttf", "DejaVuSans.ttf")
+    if not os.path.isfile(ttf):
+        pytest.skip("no TTF font available")
+    monkeypatch.setattr(pdf_canvas, "_registry", {})
+    monkeypatch.setenv("BUDGET_PDF_THAI_FONT", ttf)
+
+    calls = []
+    real_register = pdf_canvas.pdfmetrics.registerFont
+    monkeypatch.setattr(pdf_canvas.pdfmetrics, "registerFont", lambda f: (calls.append(f.fontName), real_register(f)))
+
+    for _ in range(3):
+        assert font_for(["ศูนย์ต้นทุน"]) == pdf_canvas.THAI_FONT_NAME
+    assert calls == [pdf_canvas.THAI_FONT_NAME]
+
+
+def test_thai_font_missing_falls_back(monkeypatch):
+    monkeypatch.setattr(pdf_canvas, "_registry", {})
+    monkeypatch.setattr(pdf_canvas, "THAI_FONT_CANDIDATES", [])
+    monkeypatch.delenv("BUDGET_PDF_THAI_FONT", raising=False)
+    assert font_for(["ศูนย์ต้นทุน"]) == "Helvetica"
+
+
+def test_body_font_survives_page_breaks(monkeypatch):
+    import re
+    from budget_plus import pdf_summary_additions, report_playbooks_pdf
+
+    # ฟอนต์ที่ไม่ใช่ Helvetica แทนฟอนต์ไทย (เครื่อง test อาจไม่มีฟอนต์ไทย)
+    pick = lambda texts, default="Helvetica": "Courier-Bold" if default.endswith("Bold") else "Courier"
+    monkeypatch.setattr(report_playbooks_pdf, "font_for", pick)
+    monkeypatch.setattr(pdf_summary_additions, "font_for", pick)
+    monkeypatch.setattr(report_playbooks_pdf, "new_canvas", lambda buf: canvas.Canvas(buf, pageCompression=0))
+
+    steps = [f"step {i} " + "word " * 30 for i in range(120)]
+    pages = [report_playbooks_pdf.generate_playbooks_pdf(
+        [{"id": "PB1", "title": "t", "rationale": "r", "steps": steps}]).getvalue()]
+    buf = BytesIO()
+    c = canvas.Canvas(buf, pageCompression=0)
+    pdf_summary_additions.draw_next_actions_page(c, {"next_actions": [{"title": "t", "rationale": "r", "how_to": steps}]})
+    c.showPage(); c.save()
+    pages.append(buf.getvalue())
+
+    for pdf in pages:
+        alias = re.search(rb"/BaseFont /Courier /Encoding /WinAnsiEncoding /Name /(F\d+)", pdf).group(1)
+        streams = [s for s in re.findall(rb"stream\r?\n(.*?)endstream", pdf, re.S) if b" Tj" in s]
+        assert len(streams) > 2
+        # หน้าต่อๆ ไปต้องตั้งฟอนต์ body ก่อนข้อความแรก (showPage รีเซ็ตเป็น Helvetica 12)
+        for s in streams[1:]:
+            assert b"/" + alias + b" 11 Tf" in s[:s.index(b" Tj")]
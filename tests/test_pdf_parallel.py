@@ -0,0 +1,64 @@
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pypdf = pytest.importorskip("pypdf")
+
+import budget_plus.pdf_summary as pdf_summary
+from budget_plus.pdf_parallel import merge_sections
+
+
+def _pdf(pages: int) -> bytes:
+    from reportlab.pdfgen import canvas
+    buf = BytesIO()
+    c = canvas.Canvas(buf)
+    for i in range(pages):
+        c.drawString(100, 700, f"body {i}")
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def test_merge_sections_outline_and_page_numbers():
+    merged = merge_sections(["A", "B", "C"], [_pdf(2), _pdf(3), _pdf(1)])
+    reader = pypdf.PdfReader(merged)
+    assert len(reader.pages) == 6
+    outline = [(item.title, reader.get_destination_page_number(item)) for item in reader.outline]
+    assert outline == [("A", 0), ("B", 2), ("C", 5)]
+    assert "Page 4 / 6" in reader.pages[3].extract_text()
+    assert "body 1" in reader.pages[3].extract_text()
+
+
+def test_generate_pdf_parallel_sections(monkeypatch):
+    monkeypatch.setattr(pdf_summary, "PDF_SECTION_ROWS", 400)
+    n = 1000
+    planned = np.linspace(1_000, 9_000, n)
+    df = pd.DataFrame({
+        "Cost Center": [f"CC{i:04d}" for i in range(n)],
+        "Planned": planned,
+        "FX Adjusted Actual": planned * 1.1,
+        "Variance": planned * 0.1,
+    })
+    buffer = pdf_summary.generate_pdf_with_chart(df, summary_top_n=None, parallel=True)
+    reader = pypdf.PdfReader(buffer)
+    titles = [item.title for item in reader.outline]
+    assert titles == [
+        "Executive Summary",
+        "Budget Summary",
+        "Budget Summary (rows 401-800)",
+        "Budget Summary (rows 801-1000)",
+        "Next Actions",
+        "Scenarios & Alerts",
+    ]
+    total = len(reader.pages)
+    assert f"Page {total} / {total}" in reader.pages[-1].extract_text()
+
+
+def test_parallel_pdf_is_opt_in(monkeypatch):
+    calls = []
+    monkeypatch.setattr(pdf_summary, "_generate_pdf_parallel", lambda *a, **k: calls.append(1))
+    df = pd.DataFrame({"Cost Center": [f"CC{i}" for i in range(200)], "Planned": 1.0, "Actual": 1.0})
+    pdf_summary.generate_pdf_with_chart(df, summary_top_n=None)
+    assert calls == []
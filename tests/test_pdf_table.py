@@ -0,0 +1,75 @@
+import re
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from reportlab.pdfgen import canvas
+
+from budget_plus.utils.number_format_utils import format_number, format_number_array
+from budget_plus.pdf_table import TableColumn, format_table, draw_table
+from budget_plus.pdf_summary import generate_pdf_with_chart
+
+
+def _page_count(pdf_bytes: bytes) -> int:
+    return len(re.findall(rb"/Type /Page[^s]", pdf_bytes))
+
+
+def test_format_number_array_matches_scalar():
+    values = np.array([0.0, -0.0, 0.125, 1.005, 1234.5, -98765.4321, 12_345, 2_500_000, 1e15, np.nan, np.inf])
+    for style in ("number", "percent", "k", "m"):
+        expected = [format_number(v, style) for v in values]
+        assert format_number_array(values, style).tolist() == expected
+
+
+def test_format_number_array_non_numeric_fallback():
+    values = pd.Series([1.5, None, "abc"], dtype=object)
+    assert format_number_array(values, "number").tolist() == ["1.50", "None", "abc"]
+
+
+def test_draw_table_repeats_header_on_every_page():
+    n = 500
+    df = pd.DataFrame({"Cost Center": [f"CC{i}" for i in range(n)], "Planned": np.arange(n) * 1000.0})
+    table = format_table(df, [TableColumn("Cost Center", "Cost Center", align="left"),
+                              TableColumn("Planned", "Planned", "number")])
+    assert table.n_rows == n
+
+    buf = BytesIO()
+    c = canvas.Canvas(buf, pageCompression=0)
+    draw_table(c, table, top=700, bottom=60, line_height=14)
+    c.showPage()
+    c.save()
+    pdf = buf.getvalue()
+
+    pages = _page_count(pdf)
+    assert pages > 5
+    assert pdf.count(b"(Planned) Tj") == pages
+    # ทุกแถวถูกวาดครั้งเดียว
+    assert pdf.count(b"(CC499) Tj") == 1
+    assert pdf.count(b"(499,000.00) Tj") == 1
+
+
+def test_pdf_summary_paginates_long_summary():
+    n = 3000
+    rng = np.random.default_rng(1)
+    planned = rng.uniform(1_000, 9_000, n)
+    df = pd.DataFrame({
+        "Cost Center": [f"CC{i:04d}" for i in range(n)],
+        "Planned": planned,
+        "FX Adjusted Actual": planned * 1.05,
+        "Variance": planned * 0.05,
+    })
+    pdf = generate_pdf_with_chart(df, summary_top_n=None, add_next_actions=False, add_scenarios_alerts=False).getvalue()
+    # ~50 แถวต่อหน้า → ต้องมีหลายสิบหน้า (ไม่ถูกตัดทิ้งหรือล้นหน้า)
+    assert _page_count(pdf) >= n // 60
+
+
+def test_draw_table_escapes_pdf_string_delimiters():
+    table = format_table(pd.DataFrame({"Note": ["x"], "Value": [r"(1,234) \ 5"]}),
+                         [TableColumn("Note", "Note", align="left"), TableColumn("Value", "Value")])
+    buf = BytesIO()
+    c = canvas.Canvas(buf, pageCompression=0)
+    draw_table(c, table)
+    c.save()
+    pdf = buf.getvalue()
+    assert rb"(\(1,234\) \\ 5) Tj" in pdf
+    assert b"/F1 10 Tf" in pdf
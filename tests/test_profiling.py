@@ -0,0 +1,103 @@
+import marshal
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from budget_plus import diagnostics_routes
+from budget_plus.main import app as main_app
+from budget_plus.utils.profiling import ProfilingMiddleware, ProfileStore
+from budget_plus.utils.singleflight import artifact_flight
+
+TOKEN = "s3cret"
+
+
+def _client(monkeypatch):
+    monkeypatch.setattr(diagnostics_routes, "ADMIN_TOKEN", TOKEN)
+    store = ProfileStore(2)
+    monkeypatch.setattr(diagnostics_routes, "PROFILE_STORE", store)
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, store=store, admin_token=TOKEN, interval=0.001)
+    app.include_router(diagnostics_routes.router)
+
+    @app.get("/work")
+    async def work():
+        end = time.perf_counter() + 0.05
+        while time.perf_counter() < end:
+            sum(range(1000))
+        return {"ok": True}
+
+    @app.get("/render")
+    async def render():
+        # งานจริงอยู่ใน threadpool (ผ่าน singleflight แบบเดียวกับ /download-pdf)
+        pdf, _ = await artifact_flight.do(("profile-test", time.time()), _render_pdf)
+        return {"bytes": len(pdf)}
+
+    return TestClient(app), store
+
+
+def _render_pdf() -> bytes:
+    import pandas as pd
+    from budget_plus.pdf_summary import generate_pdf_with_chart
+
+    df = pd.DataFrame({"Cost Center": [f"CC{i}" for i in range(400)], "Planned": 100.0,
+                       "FX Adjusted Actual": 90.0, "Variance": -10.0})
+    return generate_pdf_with_chart(df, summary_top_n=None, add_next_actions=False,
+                                   add_scenarios_alerts=False).getvalue()
+
+
+def test_sample_profile_stored_as_collapsed_stacks(monkeypatch):
+    client, store = _client(monkeypatch)
+    r = client.get("/work", params={"profile": 1}, headers={"X-Admin-Token": TOKEN})
+    assert r.status_code == 200 and r.json() == {"ok": True}
+    url = r.headers["x-profile-url"]
+
+    got = client.get(url, headers={"X-Admin-Token": TOKEN})
+    assert got.status_code == 200
+    lines = got.text.splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any(":work" in line for line in lines)
+
+
+def test_cprofile_pstats_download(monkeypatch):
+    client, _ = _client(monkeypatch)
+    r = client.get("/work", params={"profile": "cprofile"}, headers={"X-Admin-Token": TOKEN})
+    pid = r.headers["x-profile-id"]
+    raw = client.get(f"/admin/profiles/{pid}", params={"format": "pstats"}, headers={"X-Admin-Token": TOKEN})
+    stats = marshal.loads(raw.content)
+    assert any(func[2] == "work" for func in stats)
+    text = client.get(f"/admin/profiles/{pid}", headers={"X-Admin-Token": TOKEN})
+    assert "cumulative" in text.text
+
+
+def test_threadpool_work_is_profiled(monkeypatch):
+    client, _ = _client(monkeypatch)
+    r = client.get("/render", params={"profile": 1}, headers={"X-Admin-Token": TOKEN})
+    assert r.status_code == 200 and r.json()["bytes"] > 0
+    collapsed = client.get(r.headers["x-profile-url"], headers={"X-Admin-Token": TOKEN}).text
+    assert "pdf_summary.py:generate_pdf_with_chart" in collapsed
+
+    r = client.get("/render", params={"profile": "cprofile"}, headers={"X-Admin-Token": TOKEN})
+    raw = client.get(f"/admin/profiles/{r.headers['x-profile-id']}", params={"format": "pstats"},
+                     headers={"X-Admin-Token": TOKEN})
+    stats = marshal.loads(raw.content)
+    assert any(func[2] == "generate_pdf_with_chart" for func in stats)
+    assert any(func[2] == "render" for func in stats)      # event loop ยังอยู่ใน profile เดียวกัน
+
+
+def test_profile_requires_token_and_store_is_bounded(monkeypatch):
+    client, store = _client(monkeypatch)
+    r = client.get("/work", params={"profile": 1}, headers={"X-Admin-Token": "wrong"})
+    assert r.status_code == 200 and "x-profile-id" not in r.headers
+    assert client.get("/admin/profiles", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    for _ in range(3):
+        client.get("/work", params={"profile": 1}, headers={"X-Admin-Token": TOKEN})
+    assert len(client.get("/admin/profiles", headers={"X-Admin-Token": TOKEN}).json()["profiles"]) == 2
+
+
+def test_profiling_off_without_admin_token():
+    client = TestClient(main_app)
+    r = client.get("/health", params={"profile": 1}, headers={"X-Admin-Token": ""})
+    assert r.status_code == 200 and "x-profile-id" not in r.headers
+    assert client.get("/admin/profiles").status_code == 404
@@ -0,0 +1,57 @@
+import os
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from budget_plus.utils.shared_frame import PREFIX, attach, frame_from, publish, sweep_stale
+
+pytestmark = pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="POSIX shared memory only")
+
+
+def _frame():
+    return pd.DataFrame({
+        "Cost Center": ["A", None, "B", "A"],
+        "Note": pd.Series([np.nan, "x", None, pd.NA], dtype=object),
+        "Planned": [1.0, 2.5, np.nan, 4.0],
+        "Line ID": np.arange(4, dtype=np.int64),
+        "Flag": [True, False, True, True],
+        "Month": pd.to_datetime(["2024-01-01", "2024-02-01", None, "2024-03-01"]),
+        "Stamp": pd.date_range("2024-01-01", periods=4, freq="D", tz="Asia/Bangkok"),
+    }, index=pd.Index([10, 11, 12, 13], name="row"))
+
+
+def test_round_trip_is_read_only_view():
+    df = _frame()
+    with publish(df) as shared:
+        with attach(shared.handle) as out:
+            pd.testing.assert_frame_equal(out, df)
+            assert out["Cost Center"].tolist() == ["A", None, "B", "A"]    # None กลับมาเป็น None (ไม่ใช่ NaN)
+            assert [type(v) for v in out["Note"]] == [type(v) for v in df["Note"]]
+            planned = out["Planned"].to_numpy()
+            assert not planned.flags.writeable and not planned.flags.owndata
+            with pytest.raises(ValueError):
+                planned[0] = 9.0
+            del planned
+        with attach(shared.handle, 1, 3) as part:
+            pd.testing.assert_frame_equal(part, df.iloc[1:3])
+        with frame_from(shared.handle) as same:
+            assert same["Line ID"].tolist() == [0, 1, 2, 3]
+    with frame_from(df) as same:
+        assert same is df
+
+
+def test_segment_is_unlinked_on_error_and_sweep_removes_dead_owners():
+    with pytest.raises(RuntimeError):
+        with publish(_frame()) as shared:
+            name = shared.handle.name
+            raise RuntimeError("render failed")
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+
+    stale = shared_memory.SharedMemory(name=f"{PREFIX}999999999_deadbeef", create=True, size=64)
+    stale.close()
+    resource_tracker.unregister(stale._name, "shared_memory")   # ปล่อยให้ sweep_stale เป็นคนลบ
+    assert f"{PREFIX}999999999_deadbeef" in sweep_stale()
+    assert not os.path.exists(f"/dev/shm/{PREFIX}999999999_deadbeef")
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+from io import BytesIO
+
+import httpx
+import pandas as pd
+
+import budget_plus.main as main_mod
+from budget_plus.utils.singleflight import SingleFlight
+
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def test_concurrent_calls_share_one_computation():
+    flight = SingleFlight("test")
+    calls = []
+
+    def work(x):
+        calls.append(x)
+        time.sleep(0.1)
+        return {"value": x}
+
+    async def run():
+        return await asyncio.gather(*(flight.do("k", work, 7) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert [shared for _, shared in results].count(False) == 1
+    assert all(r is results[0][0] for r, _ in results)
+    assert flight.in_flight() == 0
+
+
+def test_errors_reach_every_waiter_and_key_is_released():
+    flight = SingleFlight("test")
+    gate = threading.Event()
+
+    def fail():
+        gate.wait(1)
+        raise ValueError("broken workbook")
+
+    async def run():
+        tasks = [asyncio.ensure_future(flight.do("k", fail)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        gate.set()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flight.in_flight() == 0
+
+    # เรียกใหม่หลังจบ = คำนวณใหม่ (ไม่ cache)
+    assert asyncio.run(flight.do("k", lambda: 1)) == (1, False)
+
+
+def test_cancelled_waiter_does_not_cancel_the_others():
+    flight = SingleFlight("test")
+
+    async def run():
+        first = asyncio.ensure_future(flight.do("k", time.sleep, 0.1))
+        second = asyncio.ensure_future(flight.do("k", time.sleep, 0.1))
+        await asyncio.sleep(0.02)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == (None, True)
+
+
+def test_identical_pdf_uploads_render_once(monkeypatch):
+    n = 30
+    buf = BytesIO()
+    pd.DataFrame({"Cost Center": ["CC%d" % (i % 5) for i in range(n)],
+                  "Planned": [100.0] * n, "Actual": [90.0 + i for i in range(n)]}).to_excel(buf, index=False)
+    content = buf.getvalue()
+
+    parses, renders = [], []
+    real_parse = pd.read_excel
+
+    def counting_parse(*args, **kwargs):
+        parses.append(1)
+        time.sleep(0.2)
+        return real_parse(*args, **kwargs)
+
+    def fake_pdf(df):
+        renders.append(len(df))
+        time.sleep(0.2)
+        return BytesIO(b"%PDF-1.4 rendered " + str(len(df)).encode())
+
+    monkeypatch.setattr(pd, "read_excel", counting_parse)
+    monkeypatch.setattr(main_mod, "generate_pdf_default", fake_pdf)
+
+    async def run():
+        transport = httpx.ASGITransport(app=main_mod.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(
+                client.post(path, files={"file": ("board.xlsx", content, XLSX)})
+                for path in ["/download-pdf"] * 4 + ["/report-exec"]))
+
+    responses = asyncio.run(run())
+    assert [r.status_code for r in responses] == [200] * 5
+    assert len({r.content for r in responses[:4]}) == 1
+    assert renders == [n]
+    assert len(parses) == 1          # /report-exec ใช้ parse เดียวกับ /download-pdf (key + reader เดียวกัน)
+
+
+def test_bad_upload_error_is_shared():
+    async def run():
+        transport = httpx.ASGITransport(app=main_mod.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(
+                client.post("/download-pdf", files={"file": ("broken.xlsx", b"not a workbook", XLSX)})
+                for _ in range(3)))
+
+    assert [r.status_code for r in asyncio.run(run())] == [400] * 3
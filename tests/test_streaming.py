@@ -0,0 +1,60 @@
+import json
+from io import BytesIO
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from budget_plus.main import app
+from budget_plus.utils.streaming import ndjson_lines, sse_events
+
+client = TestClient(app)
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _excel(n=7) -> BytesIO:
+    df = pd.DataFrame({
+        "Version": ["V1"] * n,
+        "Scenario": ["Base"] * n,
+        "Cost Center": [f"CC{i}" for i in range(n)],
+        "Planned": [1000.0 * (i + 1) for i in range(n)],
+        "Actual": [1100.0 * (i + 1) for i in range(n)],
+    })
+    buf = BytesIO()
+    df.to_excel(buf, index=False, engine="openpyxl")
+    buf.seek(0)
+    return buf
+
+
+def test_analyze_ndjson_stream():
+    r = client.post("/analyze", params={"stream": "ndjson", "chunk_rows": 3}, files={"file": ("in.xlsx", _excel(), XLSX)})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert len(rows) == 7
+    assert rows[0]["Cost Center"] == "CC0" and rows[0]["Planned"] == "1,000.00"
+
+
+def test_analyze_sse_stream_raw():
+    r = client.post("/analyze", params={"stream": "sse", "chunk_rows": 3, "raw": "true"}, files={"file": ("in.xlsx", _excel(), XLSX)})
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = [e for e in r.text.split("\n\n") if e]
+    assert [line for e in events for line in e.splitlines() if line.startswith("event:")] == ["event: records"] * 3 + ["event: end"]
+    records = [rec for e in events[:-1] for rec in json.loads(e.splitlines()[2][len("data: "):])]
+    assert [rec["Variance"] for rec in records] == [100.0 * (i + 1) for i in range(7)]
+    assert json.loads(events[-1].split("data: ")[1]) == {"rows": 7}
+
+
+def test_chunks_are_transformed_lazily():
+    df = pd.DataFrame({"x": range(10)})
+    seen = []
+
+    def transform(chunk):
+        seen.append(len(chunk))
+        return chunk
+
+    lines = ndjson_lines(df, chunk_rows=4, transform=transform)
+    assert next(lines).count(b"\n") == 4
+    assert seen == [4]
+    assert sum(part.count(b"\n") for part in lines) == 6
+    assert seen == [4, 4, 2]
+    assert list(sse_events(df.iloc[:0]))[-1] == b'event: end\ndata: {"rows":0}\n\n'
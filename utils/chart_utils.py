@@ -0,0 +1,87 @@
+"""
+chart_utils.py
+Keep chart inputs small no matter how many entities are in the upload:
+- top_n_keys / bucket_other → keep the top-N categories by |Variance|, fold the rest into "Other"
+- lttb_indices / downsample_series → Largest-Triangle-Three-Buckets for Month time series
+"""
+
+from typing import List, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+OTHER_LABEL = "Other"
+MAX_SERIES_POINTS = 120  # จำนวนจุดสูงสุดของกราฟ time series ราย Month
+
+
+def top_n_keys(df: pd.DataFrame, key: str, top_n: Optional[int], rank_col: str = "Variance") -> Optional[List]:
+    """
+    คืนรายการ key ที่ติด top-N ตาม |sum(rank_col)| (เรียงจากมากไปน้อย)
+    คืน None ถ้าไม่ต้องตัด (top_n=None หรือจำนวนกลุ่ม <= top_n)
+    """
+    if top_n is None or key not in df.columns:
+        return None
+    totals = df.groupby(key, sort=False)[rank_col].sum()
+    if len(totals) <= top_n:
+        return None
+    return totals.abs().nlargest(max(int(top_n), 1)).index.tolist()
+
+
+def bucket_other(df: pd.DataFrame, key: str, keep: Sequence, other_label: str = OTHER_LABEL) -> pd.DataFrame:
+    """แทนค่า key ที่ไม่อยู่ใน keep ด้วย other_label (คอลัมน์อื่นไม่ถูกคัดลอกซ้ำ)"""
+    return df.assign(**{key: df[key].where(df[key].isin(keep), other_label)})
+
+
+def order_buckets(grouped: pd.DataFrame, key: str, keep: Sequence, other_label: str = OTHER_LABEL) -> pd.DataFrame:
+    """เรียงแถวตามลำดับ keep แล้วให้ 'Other' อยู่ท้ายสุด"""
+    rank = {k: i for i, k in enumerate(keep)}
+    pos = grouped[key].map(rank).fillna(len(rank))
+    return grouped.iloc[np.argsort(pos.to_numpy(), kind="stable")].reset_index(drop=True)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+    x ต้องเรียงจากน้อยไปมาก; คืน index ของจุดที่เลือก (รวมจุดแรก/สุดท้ายเสมอ)
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    out = np.empty(threshold, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+
+    # แบ่งจุดกลาง (ไม่รวมหัว/ท้าย) เป็น threshold-2 bucket
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # ค่าเฉลี่ยของ bucket ถัดไป (bucket สุดท้ายใช้จุดท้าย)
+        if i + 2 < len(edges):
+            nlo, nhi = edges[i + 1], edges[i + 2]
+            avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        else:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def downsample_series(df: pd.DataFrame, x_col: str, y_col: str, max_points: Optional[int] = MAX_SERIES_POINTS) -> pd.DataFrame:
+    """
+    ลดจำนวนจุดของ time series (เช่น Month) ด้วย LTTB โดยใช้ y_col เป็นตัวกำหนดรูปทรง
+    คอลัมน์อื่นในแถวที่ถูกเลือกจะตามมาด้วย
+    """
+    if max_points is None or len(df) <= max_points:
+        return df
+    data = df.sort_values(x_col)
+    xs = data[x_col]
+    if pd.api.types.is_datetime64_any_dtype(xs):
+        xs = xs.astype("int64")
+    idx = lttb_indices(xs.to_numpy(dtype=float), data[y_col].to_numpy(dtype=float), int(max_points))
+    return data.iloc[idx]
@@ -0,0 +1,92 @@
+"""
+columnar_export.py
+Columnar binary exports (Parquet / Arrow IPC / Feather) of the analysis results for BI tools:
+- text dimension columns (Version, Scenario, Cost Center, ...) are dictionary-encoded
+- output is zstd-compressed; numeric columns stay numeric (no string formatting)
+- export_bundle(): details + summary tables packed in one ZIP
+pyarrow is optional and imported on first use: columnar_available() is False when it is not installed.
+"""
+
+from functools import lru_cache
+from io import BytesIO
+from typing import Dict, Optional
+import zipfile
+
+import pandas as pd
+
+EXPORT_FORMATS = ("parquet", "arrow", "feather")
+EXTENSIONS = {"parquet": "parquet", "arrow": "arrow", "feather": "feather"}
+COMPRESSION = "zstd"
+
+# คอลัมน์ข้อความที่ค่าไม่ซ้ำเกินสัดส่วนนี้ไม่ทำ dictionary (เช่น คำอธิบายรายบรรทัด)
+DICTIONARY_MAX_RATIO = 0.5
+
+
+@lru_cache(maxsize=None)
+def _arrow():
+    """(pyarrow, pyarrow.feather, pyarrow.parquet) หรือ None ถ้าไม่ได้ติดตั้ง"""
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except Exception:
+        return None
+    return pyarrow, pyarrow.feather, pyarrow.parquet
+
+
+def columnar_available() -> bool:
+    return _arrow() is not None
+
+
+def _is_dimension(s: pd.Series) -> bool:
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return True
+    if s.dtype != object and not pd.api.types.is_string_dtype(s.dtype):
+        return False
+    n = len(s)
+    return n == 0 or s.nunique(dropna=True) <= max(1, int(n * DICTIONARY_MAX_RATIO))
+
+
+def to_arrow_table(df: pd.DataFrame) -> "pa.Table":
+    """DataFrame → Arrow table; คอลัมน์มิติ (ข้อความซ้ำเยอะ) เป็น dictionary<int32, string>"""
+    df = df.copy(deep=False)
+    df.columns = [str(c) for c in df.columns]
+    for col in df.columns:
+        s = df[col]
+        if s.dtype == object:
+            # คอลัมน์ object ผสมชนิด (เช่น ตัวเลข + ข้อความ) → ข้อความทั้งคอลัมน์
+            if pd.api.types.infer_dtype(s, skipna=True) not in ("string", "empty"):
+                s = s.where(s.isna(), s.astype(str))
+        if _is_dimension(s):
+            s = s.astype("category")
+        df[col] = s
+    pa = _arrow()[0]
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def write_table(table: "pa.Table", fmt: str) -> bytes:
+    _, feather, pq = _arrow()
+    sink = BytesIO()
+    if fmt == "parquet":
+        pq.write_table(table, sink, compression=COMPRESSION, use_dictionary=True)
+    elif fmt in ("arrow", "feather"):
+        # Feather V2 = Arrow IPC file format (ไฟล์เดียวกัน ต่างกันแค่นามสกุล)
+        feather.write_feather(table, sink, compression=COMPRESSION)
+    else:
+        raise ValueError(f"unsupported format: {fmt}")
+    return sink.getvalue()
+
+
+def export_bundle(tables: Dict[str, Optional[pd.DataFrame]], fmt: str) -> BytesIO:
+    """
+    {ชื่อ: DataFrame} → ZIP ของไฟล์ <ชื่อ>.<ext>
+    (ZIP_STORED: ไฟล์ข้างในบีบอัดด้วย zstd แล้ว ไม่ต้องบีบซ้ำ)
+    """
+    out = BytesIO()
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_STORED) as zf:
+        for name, df in tables.items():
+            if df is None:
+                continue
+            zf.writestr(f"{name}.{EXTENSIONS[fmt]}", write_table(to_arrow_table(df), fmt))
+    out.seek(0)
+    return out
@@ -0,0 +1,182 @@
+"""
+dataset_store.py
+Local store of normalized datasets (upload once, analyze many times by dataset_id):
+- each dataset is one uncompressed Feather V2 file (<id>.feather) + a small JSON sidecar (<id>.json)
+- reads are memory-mapped: later requests map the columns instead of re-parsing the workbook
+- TTL counted from the last access, then LRU eviction by total bytes / number of datasets
+- the directory is the source of truth, so every uvicorn worker sees the same datasets
+  (last access = mtime of the sidecar)
+The dataset id is derived from the upload's sha256, so re-uploading the same workbook reuses it.
+pyarrow is optional: DatasetStore.available() is False when it is not installed.
+"""
+
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+try:
+    from .columnar_export import _arrow, columnar_available, to_arrow_table
+except ImportError:
+    from utils.columnar_export import _arrow, columnar_available, to_arrow_table
+
+_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def dataset_id_for(digest: str) -> str:
+    return digest[:32]
+
+
+@dataclass
+class DatasetInfo:
+    id: str
+    rows: int
+    cols: int
+    bytes: int
+    columns: List[str]
+    filename: str = ""
+    created: float = field(default_factory=time.time)
+    last_access: float = 0.0
+
+    def expires_at(self, ttl: float) -> float:
+        return self.last_access + ttl
+
+    def to_dict(self, ttl: float) -> Dict:
+        out = asdict(self)
+        out["expires_at"] = round(self.expires_at(ttl), 3)
+        return out
+
+
+class DatasetStore:
+    def __init__(self, root: str, ttl_seconds: float, max_bytes: int, max_items: int):
+        self.root = root
+        self.ttl = float(ttl_seconds)
+        self.max_bytes = int(max_bytes)
+        self.max_items = int(max_items)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def available() -> bool:
+        return columnar_available()
+
+    # ---------- paths ----------
+    def _data_path(self, dataset_id: str) -> str:
+        return os.path.join(self.root, f"{dataset_id}.feather")
+
+    def _meta_path(self, dataset_id: str) -> str:
+        return os.path.join(self.root, f"{dataset_id}.json")
+
+    def _read_meta(self, dataset_id: str) -> Optional[DatasetInfo]:
+        path = self._meta_path(dataset_id)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            meta["last_access"] = os.stat(path).st_mtime
+            return DatasetInfo(**meta)
+        except (OSError, ValueError, TypeError):
+            return None
+
+    # ---------- public ----------
+    def info(self, dataset_id: str, touch: bool = False) -> Optional[DatasetInfo]:
+        """metadata ของ dataset; None ถ้าไม่มี / id ไม่ถูกรูปแบบ / หมดอายุ (ลบทิ้งทันที); touch=True ต่ออายุ"""
+        if not _ID_RE.match(dataset_id or ""):
+            return None
+        info = self._read_meta(dataset_id)
+        if info is None or not os.path.exists(self._data_path(dataset_id)):
+            return None
+        if time.time() > info.expires_at(self.ttl):
+            self.delete(dataset_id)
+            return None
+        if touch:
+            self.touch(dataset_id)
+            info.last_access = time.time()
+        return info
+
+    def put(self, dataset_id: str, df: pd.DataFrame, filename: str = "") -> DatasetInfo:
+        """เขียน DataFrame เป็น Feather (ไม่บีบอัด → mmap ได้) แล้ว evict ตาม TTL / LRU"""
+        _, feather, _ = _arrow()
+        os.makedirs(self.root, exist_ok=True)
+        table = to_arrow_table(df)
+        tmp = os.path.join(self.root, f".{dataset_id}.{uuid.uuid4().hex}.tmp")
+        try:
+            feather.write_feather(table, tmp, compression="uncompressed")
+            os.replace(tmp, self._data_path(dataset_id))
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        info = DatasetInfo(id=dataset_id, rows=table.num_rows, cols=table.num_columns,
+                           bytes=os.path.getsize(self._data_path(dataset_id)),
+                           columns=list(table.column_names), filename=filename)
+        meta = {k: v for k, v in asdict(info).items() if k != "last_access"}
+        tmp = self._meta_path(dataset_id) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, self._meta_path(dataset_id))
+        info.last_access = os.stat(self._meta_path(dataset_id)).st_mtime
+
+        self.evict(keep=dataset_id)
+        return info
+
+    def load(self, dataset_id: str) -> Optional[pd.DataFrame]:
+        """อ่านแบบ memory-mapped; คอลัมน์มิติที่เก็บเป็น dictionary กลับเป็น object ตามเดิม"""
+        if self.info(dataset_id) is None:
+            return None
+        _, feather, _ = _arrow()
+        table = feather.read_table(self._data_path(dataset_id), memory_map=True)
+        df = table.to_pandas(split_blocks=True)
+        for col in df.columns:
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype(object)
+        self.touch(dataset_id)
+        return df
+
+    def touch(self, dataset_id: str):
+        try:
+            os.utime(self._meta_path(dataset_id))
+        except OSError:
+            pass
+
+    def delete(self, dataset_id: str) -> bool:
+        removed = False
+        for path in (self._data_path(dataset_id), self._meta_path(dataset_id)):
+            try:
+                os.remove(path)
+                removed = True
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def list(self) -> List[DatasetInfo]:
+        if not os.path.isdir(self.root):
+            return []
+        out = []
+        for name in os.listdir(self.root):
+            stem, ext = os.path.splitext(name)
+            if ext == ".json" and _ID_RE.match(stem):
+                info = self.info(stem)
+                if info is not None:
+                    out.append(info)
+        return sorted(out, key=lambda i: i.last_access, reverse=True)
+
+    def evict(self, keep: Optional[str] = None) -> List[str]:
+        """ลบที่หมดอายุ (ใน list()) แล้วลบตัวที่ใช้ล่าสุดนานที่สุดจนขนาดรวม/จำนวนไม่เกินเพดาน"""
+        evicted = []
+        with self._lock:
+            items = self.list()
+            total = sum(i.bytes for i in items)
+            for info in reversed(items):   # เก่าสุดก่อน
+                if total <= self.max_bytes and len(items) - len(evicted) <= self.max_items:
+                    break
+                if info.id == keep:
+                    continue
+                self.delete(info.id)
+                evicted.append(info.id)
+                total -= info.bytes
+        return evicted
@@ -0,0 +1,84 @@
+"""
+fast_json.py
+JSON responses for large tables:
+- FastJSONResponse: orjson (NumPy arrays / scalars serialized natively, NaN/Inf → null);
+  falls back to the stdlib encoder with the same NaN → null behaviour when orjson is missing
+- frame_payload(df, orient): "records" → [{col: value}], "columnar" → {col: [values]}
+  built straight from the column arrays (no per-row dict)
+"""
+
+from typing import Any
+import json
+import math
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import JSONResponse
+
+# orjson เป็น optional: ไม่มีก็ใช้ json ของ stdlib
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+RESPONSE_FORMATS = ("records", "columnar")
+
+
+def _default(obj: Any):
+    """ชนิดข้อมูลที่ encoder ไม่รู้จัก (numpy / pandas / datetime)"""
+    if obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _finite_or_none(obj: Any):
+    """stdlib fallback: NaN/Inf → None ให้ผลลัพธ์เหมือน orjson"""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _finite_or_none(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite_or_none(v) for v in obj]
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return _finite_or_none(obj.tolist())
+    return obj
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(
+            content, default=_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
+    return json.dumps(
+        _finite_or_none(content), default=_default,
+        ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _column_values(s: pd.Series):
+    """คอลัมน์ตัวเลข → numpy array (orjson encode ได้ทั้งก้อน); อื่นๆ → list"""
+    arr = s.to_numpy()
+    if orjson is not None and arr.dtype.kind in "biuf" and arr.flags.c_contiguous:
+        return arr
+    if s.dtype.kind == "M":
+        return [None if pd.isna(v) else v.isoformat() for v in s.tolist()]
+    return s.tolist()
+
+
+def frame_payload(df: pd.DataFrame, orient: str = "records"):
+    """DataFrame → payload ตาม orient ("records" | "columnar")"""
+    if orient == "columnar":
+        return {str(col): _column_values(df[col]) for col in df.columns}
+    return df.to_dict(orient="records")
@@ -0,0 +1,91 @@
+"""
+import_report.py
+Per-module import timing for cold-start analysis (parsed from `python -X importtime`).
+The import runs in a fresh interpreter, so the numbers are a real cold import
+even when called from a server that already has everything loaded.
+
+    python -m budget_plus.utils.import_report [target] [--top N]
+"""
+
+from typing import Dict, List, Optional
+import os
+import subprocess
+import sys
+
+# โมดูล render หนักที่ไม่ควรถูก import ตอน start (โหลดเมื่อมี request แรกที่ต้องใช้)
+# (pyarrow ไม่อยู่ในรายการ: pandas import เองอยู่แล้วถ้าติดตั้งไว้)
+HEAVY_MODULES = ("matplotlib", "reportlab", "openpyxl", "xlsxwriter", "yaml", "pypdf")
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """แปลงบรรทัด 'import time: self [us] | cumulative | name' → list ของ dict (หน่วย ms)"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cum_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # บรรทัดหัวตาราง
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append({
+            "module": name.strip(),
+            "self_ms": self_us / 1000,
+            "cumulative_ms": cum_us / 1000,
+            "depth": depth,
+        })
+    return rows
+
+
+def import_time_report(target: str, top: int = 30, env: Optional[Dict[str, str]] = None) -> Dict:
+    """import target ใน interpreter ใหม่ แล้วสรุปเวลาแยกตามโมดูลและตาม top-level package"""
+    run_env = dict(os.environ if env is None else env)
+    run_env["PYTHONPATH"] = os.pathsep.join(p for p in sys.path if p)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True, text=True, env=run_env, timeout=120,
+    )
+    if proc.returncode != 0:
+        tail = proc.stderr.strip().splitlines()[-1:] or ["unknown error"]
+        raise RuntimeError(f"import {target} failed: {tail[0]}")
+
+    rows = parse_importtime(proc.stderr)
+    by_package: Dict[str, float] = {}
+    for r in rows:
+        pkg = r["module"].split(".")[0]
+        by_package[pkg] = by_package.get(pkg, 0.0) + r["self_ms"]
+
+    total = next((r["cumulative_ms"] for r in rows if r["module"] == target), sum(by_package.values()))
+    loaded = {r["module"] for r in rows}
+    return {
+        "target": target,
+        "total_ms": round(total, 1),
+        "modules": [
+            {k: round(v, 2) if isinstance(v, float) else v for k, v in r.items()}
+            for r in sorted(rows, key=lambda r: r["cumulative_ms"], reverse=True)[:top]
+        ],
+        "packages": [
+            {"package": k, "self_ms": round(v, 1)}
+            for k, v in sorted(by_package.items(), key=lambda kv: kv[1], reverse=True)[:top]
+        ],
+        "heavy_imported": [m for m in HEAVY_MODULES if m in loaded],
+    }
+
+
+def main(argv=None):
+    import argparse
+    import json
+
+    ap = argparse.ArgumentParser(description="Per-module import timing (python -X importtime)")
+    ap.add_argument("target", nargs="?", default="budget_plus.main")
+    ap.add_argument("--top", type=int, default=30)
+    args = ap.parse_args(argv)
+    print(json.dumps(import_time_report(args.target, args.top), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+lazy_import.py
+Defer heavy renderer imports (matplotlib / reportlab / openpyxl / PyYAML / pyarrow) to first use,
+so JSON-only traffic never pays for them on a cold start.
+- lazy(module, attr, package): callable proxy; imports "<package>.<module>" (falling back to a
+  top-level "<module>" like the try/except imports elsewhere) the first time it is called
+- proxy.available(): True when the import succeeds (replaces "is None" checks for optional packs)
+"""
+
+from typing import Any, Optional
+import importlib
+import threading
+
+
+class LazyCallable:
+    def __init__(self, module: str, attr: str, package: Optional[str] = None):
+        self.module = module
+        self.attr = attr
+        self.package = package
+        self._target: Any = None
+        self._error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+
+    def _import(self):
+        if self.package:
+            try:
+                return importlib.import_module(f".{self.module}", self.package)
+            except ImportError:
+                pass
+        return importlib.import_module(self.module)
+
+    def resolve(self):
+        if self._target is None and self._error is None:
+            with self._lock:
+                if self._target is None and self._error is None:
+                    try:
+                        self._target = getattr(self._import(), self.attr)
+                    except Exception as e:   # จำผลไว้ ไม่ลอง import ซ้ำทุก request
+                        self._error = e
+        if self._error is not None:
+            raise self._error
+        return self._target
+
+    def available(self) -> bool:
+        try:
+            self.resolve()
+            return True
+        except Exception:
+            return False
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __repr__(self):
+        state = "loaded" if self._target is not None else "failed" if self._error else "pending"
+        return f"<lazy {self.module}.{self.attr} ({state})>"
+
+
+def lazy(module: str, attr: str, package: Optional[str] = None) -> LazyCallable:
+    return LazyCallable(module, attr, package)
@@ -0,0 +1,172 @@
+"""
+loop_watchdog.py
+Event-loop blocking detector for async routes that do synchronous work (pandas, rendering).
+- a heartbeat task on the loop sleeps `interval` seconds and measures how late it wakes up (lag)
+- a watchdog thread notices when the heartbeat is overdue by more than `threshold` and, while
+  the loop is still blocked, captures the loop thread's stack and the route of the running task
+- when the loop recovers the stall is logged, counted in /metrics and kept in a bounded list
+  for GET /diagnostics/event-loop
+RouteTrackerMiddleware maps the running asyncio task → ASGI scope so a stall names its route.
+"""
+
+from collections import deque
+from typing import Deque, Dict, Optional
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+try:
+    from .metrics import REGISTRY
+except ImportError:
+    from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_SECONDS = REGISTRY.histogram(
+    "budget_event_loop_lag_seconds", "Event-loop heartbeat lag.",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+LOOP_BLOCKED = REGISTRY.counter(
+    "budget_event_loop_blocked_total", "Event-loop stalls longer than the threshold.", ("endpoint",))
+
+MAX_STACK_FRAMES = 40
+
+# task ที่กำลังรันบน loop → ASGI scope ของ request นั้น (เขียนจาก loop, อ่านจาก watchdog thread)
+_task_scopes: Dict[int, dict] = {}
+
+
+def _route_of(scope: Optional[dict]) -> Dict[str, str]:
+    if scope is None:
+        return {"endpoint": "-", "method": "", "path": ""}
+    route = getattr(scope.get("route"), "path", None)
+    return {"endpoint": route or "unmatched", "method": scope.get("method", ""), "path": scope.get("path", "")}
+
+
+class RouteTrackerMiddleware:
+    """Pure ASGI middleware: จด task ปัจจุบัน → scope ระหว่างที่ request ทำงาน"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        task = asyncio.current_task() if scope["type"] == "http" else None
+        if task is None:
+            await self.app(scope, receive, send)
+            return
+        key = id(task)
+        _task_scopes[key] = scope
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _task_scopes.pop(key, None)
+
+
+class LoopWatchdog:
+    def __init__(self, threshold: float, interval: float = 0.05, max_events: int = 50):
+        self.threshold = threshold
+        self.interval = interval
+        self.events: Deque[Dict] = deque(maxlen=max_events)
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+        self.blocked_total = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._expected_wake = 0.0
+        self._pending: Optional[Dict] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    async def start(self):
+        """เรียกจากบน event loop (lifespan startup)"""
+        if self.threshold <= 0 or self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._expected_wake = time.perf_counter() + self.interval
+        self._stop.clear()
+        self._heartbeat = self._loop.create_task(self._beat())
+        self._thread = threading.Thread(target=self._watch, name="budget-loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            try:
+                await self._heartbeat
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    async def _beat(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = max(0.0, now - self._expected_wake)
+            # ตั้งเวลาตื่นรอบถัดไปก่อน ไม่ให้ watchdog เห็น stall เดิมซ้ำ
+            self._expected_wake = now + self.interval
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            LOOP_LAG_SECONDS.observe(lag)
+            with self._lock:
+                pending, self._pending = self._pending, None
+            if pending is not None:
+                self._record(pending, lag)
+
+    def _watch(self):
+        step = min(self.interval, self.threshold) / 2
+        while not self._stop.wait(step):
+            overdue = time.perf_counter() - self._expected_wake
+            if overdue < self.threshold:
+                continue
+            with self._lock:
+                if self._pending is not None:
+                    continue   # stall เดิม จับ stack ไปแล้ว
+                self._pending = self._capture()
+
+    def _capture(self) -> Dict:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame, limit=MAX_STACK_FRAMES) if frame is not None else []
+        task = asyncio.current_task(self._loop)
+        scope = _task_scopes.get(id(task)) if task is not None else None
+        return {
+            **_route_of(scope),
+            "started_at": time.time() - self.threshold,
+            "stack": [line.rstrip() for line in stack],
+        }
+
+    def _record(self, event: Dict, lag: float):
+        event["blocked_ms"] = round(lag * 1000, 1)
+        self.events.append(event)
+        self.blocked_total += 1
+        LOOP_BLOCKED.inc(endpoint=event["endpoint"])
+        where = event["stack"][-1].strip().splitlines()[0] if event["stack"] else "?"
+        logger.warning("event loop blocked %.0f ms in %s %s (%s)",
+                       lag * 1000, event["method"], event["endpoint"], where)
+
+    def snapshot(self, limit: int = 20) -> Dict:
+        recent = list(self.events)[-limit:]
+        return {
+            "running": self.running,
+            "threshold_ms": round(self.threshold * 1000, 1),
+            "interval_ms": round(self.interval * 1000, 1),
+            "lag_ms": {"last": round(self.last_lag * 1000, 2), "max": round(self.max_lag * 1000, 2)},
+            "blocked_total": self.blocked_total,
+            "recent": list(reversed(recent)),
+        }
+
+    def reset(self):
+        self.events.clear()
+        self.max_lag = self.last_lag = 0.0
+        self.blocked_total = 0
@@ -0,0 +1,286 @@
+"""
+memory_budget.py
+Per-request memory accounting and cost-based admission control.
+- estimate_cost(): rows × columns of the uploaded sheet (from the xlsx <dimension> tag, no parse)
+  × bytes-per-cell for parsing and for each artifact the endpoint produces (JSON, Excel, PDF, ZIP);
+  estimate_frame_cost() does the same for a stored dataset (no parse cost)
+- MemoryBudget: a byte budget shared by in-flight requests; admit() reserves the estimate,
+  waits (up to a timeout) while other requests hold the budget, and rejects requests whose
+  estimate alone exceeds it or that exceed the row limit
+- MemoryBudgetMiddleware: samples process RSS while the request runs (peak above the RSS at
+  start → budget_request_peak_memory_bytes{endpoint}) and releases the reservation when the
+  response is finished
+Bytes-per-cell constants were measured on pandas + openpyxl + xlsxwriter (100k × 6 sheet);
+compare budget_request_estimated_bytes with the peak histogram to recalibrate.
+"""
+
+from contextvars import ContextVar
+from io import BytesIO
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+import asyncio
+import os
+import re
+import threading
+import time
+import zipfile
+
+try:
+    from .metrics import REGISTRY
+except ImportError:
+    from utils.metrics import REGISTRY
+
+from fastapi import HTTPException
+
+# ~70 B/cell peak ระหว่าง read_excel (openpyxl) และ DataFrame ~45 B/cell
+PARSE_BYTES_PER_CELL = 80
+ARTIFACT_BYTES_PER_CELL: Dict[str, int] = {
+    "frame": 96,      # normalize + variance (สำเนา DataFrame ~2 ชุด)
+    "json": 120,      # format เป็นข้อความ + serialize
+    "xlsx": 120,      # xlsxwriter เก็บทุก cell ไว้ในหน่วยความจำจนปิดไฟล์
+    "columnar": 48,   # Arrow table + buffer ที่บีบอัดแล้ว
+    "pdf": 16,        # PDF ใช้ข้อมูลที่สรุปตามกลุ่มแล้ว
+    "zip": 32,        # สำเนา bytes ของไฟล์ทั้งหมดใน ZIP
+}
+# ขนาด xml ต่อ cell โดยประมาณ ใช้เมื่อไฟล์ไม่มี <dimension>
+XML_BYTES_PER_CELL = 40
+# .xls (binary) ไม่มี dimension ให้อ่านเร็ว ๆ → ประมาณจากขนาดไฟล์
+XLS_BYTES_PER_CELL = 12
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+_DIMENSION = re.compile(rb'<dimension ref="([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?"')
+
+MB = 1024 * 1024
+_SIZE_BUCKETS = tuple(float(2 ** i * MB) for i in range(0, 14))   # 1 MB … 8 GB
+
+PEAK_MEMORY = REGISTRY.histogram(
+    "budget_request_peak_memory_bytes", "Peak RSS growth while the request ran.", ("endpoint",), _SIZE_BUCKETS)
+ESTIMATED_MEMORY = REGISTRY.histogram(
+    "budget_request_estimated_bytes", "Admission-time memory estimate.", ("endpoint",), _SIZE_BUCKETS)
+ADMISSION_REJECTED = REGISTRY.counter(
+    "budget_admission_rejected_total", "Requests rejected by admission control.", ("endpoint", "reason"))
+
+
+class CostEstimate(NamedTuple):
+    rows: int
+    cols: int
+    bytes: int
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, reason: str, estimate: CostEstimate, limit: int,
+                 retry_after: Optional[float] = None):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.estimate = estimate
+        self.limit = limit
+        self.retry_after = retry_after
+
+
+def _col_number(letters: bytes) -> int:
+    n = 0
+    for ch in letters:
+        n = n * 26 + (ch - 64)
+    return n
+
+
+def sheet_dimensions(content: bytes, filename: str = "") -> Optional[Tuple[int, int]]:
+    """(rows, cols) ของชีตแรก (รวมหัวตาราง) โดยไม่ parse ไฟล์; None ถ้าประมาณไม่ได้"""
+    if filename.lower().endswith(".xls"):
+        cells = len(content) // XLS_BYTES_PER_CELL
+        return (max(cells // 8, 1), 8) if cells else None
+    try:
+        with zipfile.ZipFile(BytesIO(content)) as zf:
+            sheets = sorted(n for n in zf.namelist() if n.startswith("xl/worksheets/sheet") and n.endswith(".xml"))
+            if not sheets:
+                return None
+            name = "xl/worksheets/sheet1.xml" if "xl/worksheets/sheet1.xml" in sheets else sheets[0]
+            with zf.open(name) as f:
+                head = f.read(4096)
+            m = _DIMENSION.search(head)
+            if m and m.group(3):
+                rows = int(m.group(4)) - int(m.group(2)) + 1
+                cols = _col_number(m.group(3)) - _col_number(m.group(1)) + 1
+                return rows, cols
+            # ไม่มี dimension (เขียนโดยบางโปรแกรม) → ประมาณจากขนาด xml ที่ยังไม่บีบอัด
+            cells = zf.getinfo(name).file_size // XML_BYTES_PER_CELL
+            return (max(cells // 8, 1), 8) if cells else None
+    except (zipfile.BadZipFile, KeyError, ValueError):
+        return None
+
+
+def estimate_cost(content: bytes, filename: str = "", artifacts: Sequence[str] = ("json",)) -> CostEstimate:
+    dims = sheet_dimensions(content, filename)
+    rows, cols = dims if dims else (max(len(content) // (XML_BYTES_PER_CELL * 8), 1), 8)
+    per_cell = PARSE_BYTES_PER_CELL + ARTIFACT_BYTES_PER_CELL["frame"]
+    per_cell += sum(ARTIFACT_BYTES_PER_CELL.get(a, 0) for a in artifacts)
+    return CostEstimate(rows=max(rows - 1, 0), cols=cols, bytes=rows * cols * per_cell)
+
+
+def estimate_frame_cost(rows: int, cols: int, artifacts: Sequence[str] = ("json",)) -> CostEstimate:
+    """dataset ที่เก็บไว้แล้ว (อ่านแบบ mmap ไม่ต้อง parse) → คิดเฉพาะ frame + ไฟล์ที่สร้าง"""
+    per_cell = ARTIFACT_BYTES_PER_CELL["frame"] + sum(ARTIFACT_BYTES_PER_CELL.get(a, 0) for a in artifacts)
+    return CostEstimate(rows=rows, cols=cols, bytes=max(rows, 1) * cols * per_cell)
+
+
+def rss_bytes() -> Optional[int]:
+    """resident set size ของ process (Linux: /proc/self/statm); None ถ้าอ่านไม่ได้"""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class MemoryBudget:
+    def __init__(self, limit_bytes: int, max_rows: Optional[int] = None, queue_timeout: float = 10.0):
+        self.limit = int(limit_bytes)
+        self.max_rows = max_rows
+        self.queue_timeout = queue_timeout
+        self.in_use = 0
+        self._lock = threading.Lock()
+
+    def try_reserve(self, n: int) -> bool:
+        with self._lock:
+            # งานเดียวที่ใหญ่เกือบเต็มงบยังรันได้เมื่อไม่มีงานอื่นค้างอยู่
+            if self.in_use and self.in_use + n > self.limit:
+                return False
+            self.in_use += n
+            return True
+
+    def release(self, n: int):
+        with self._lock:
+            self.in_use = max(0, self.in_use - n)
+
+    async def acquire(self, n: int) -> bool:
+        """รอจนกว่างบพอ (poll; ใช้ได้ทุก event loop) — False เมื่อหมดเวลา"""
+        deadline = time.monotonic() + self.queue_timeout
+        while not self.try_reserve(n):
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+
+class _Ticket:
+    __slots__ = ("budget", "endpoint", "reserved")
+
+    def __init__(self, budget: MemoryBudget, endpoint):
+        self.budget = budget
+        self.endpoint = endpoint
+        self.reserved = 0
+
+
+_ticket: ContextVar[Optional[_Ticket]] = ContextVar("budget_memory_ticket", default=None)
+
+
+def rejection_detail(e: AdmissionRejected) -> str:
+    est_mb, limit_mb = e.estimate.bytes / MB, e.limit / MB
+    if e.reason == "rows":
+        return f"ข้อมูลมีประมาณ {e.estimate.rows:,} แถว เกินที่รองรับต่อครั้ง โปรดแบ่งไฟล์"
+    if e.reason == "memory":
+        return (f"ไฟล์นี้คาดว่าต้องใช้หน่วยความจำ ~{est_mb:,.0f} MB "
+                f"({e.estimate.rows:,} แถว × {e.estimate.cols} คอลัมน์) เกินงบ {limit_mb:,.0f} MB")
+    return "เซิร์ฟเวอร์กำลังประมวลผลงานใหญ่อยู่ โปรดลองใหม่อีกครั้ง"
+
+
+def rejection_http_error(e: AdmissionRejected) -> HTTPException:
+    """AdmissionRejected → HTTPException (413 / 503 + Retry-After) — ใช้ร่วมกันทุก endpoint ที่เรียก admit()"""
+    headers = {"Retry-After": str(max(1, int(e.retry_after)))} if e.retry_after is not None else None
+    return HTTPException(status_code=e.status_code, detail=rejection_detail(e), headers=headers)
+
+
+async def admit(estimate: CostEstimate):
+    """
+    จองหน่วยความจำตาม estimate ให้ request ปัจจุบัน (คืนอัตโนมัติเมื่อส่ง response เสร็จ)
+    raise AdmissionRejected(413) ถ้าเกินงบ/เกินจำนวนแถว, (503) ถ้ารอคิวนานเกิน queue_timeout
+    นอก MemoryBudgetMiddleware (เช่น เรียกจากสคริปต์) ไม่ทำอะไร
+    """
+    ticket = _ticket.get()
+    if ticket is None:
+        return
+    budget, endpoint = ticket.budget, ticket.endpoint()
+    ESTIMATED_MEMORY.observe(estimate.bytes, endpoint=endpoint)
+    if budget.max_rows is not None and estimate.rows > budget.max_rows:
+        ADMISSION_REJECTED.inc(endpoint=endpoint, reason="rows")
+        raise AdmissionRejected(413, "rows", estimate, budget.limit)
+    if estimate.bytes > budget.limit:
+        ADMISSION_REJECTED.inc(endpoint=endpoint, reason="memory")
+        raise AdmissionRejected(413, "memory", estimate, budget.limit)
+    if not await budget.acquire(estimate.bytes):
+        ADMISSION_REJECTED.inc(endpoint=endpoint, reason="busy")
+        raise AdmissionRejected(503, "busy", estimate, budget.limit, retry_after=budget.queue_timeout)
+    ticket.reserved += estimate.bytes
+
+
+class _RssSampler:
+    """thread เดียวอ่าน RSS ทุก interval แล้วอัปเดต peak ของทุก request ที่กำลังรัน"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.active: Dict[int, list] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                trackers = list(self.active.values())
+            if not trackers:
+                continue
+            now = rss_bytes() or 0
+            for t in trackers:
+                if now > t[1]:
+                    t[1] = now
+
+    def begin(self) -> Optional[list]:
+        start = rss_bytes()
+        if start is None:
+            return None
+        tracker = [start, start]
+        with self._lock:
+            self.active[id(tracker)] = tracker
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="budget-rss-sampler", daemon=True)
+                self._thread.start()
+        return tracker
+
+    def end(self, tracker: list) -> int:
+        with self._lock:
+            self.active.pop(id(tracker), None)
+        tracker[1] = max(tracker[1], rss_bytes() or 0)
+        return tracker[1] - tracker[0]
+
+
+class MemoryBudgetMiddleware:
+    """Pure ASGI middleware: peak RSS ต่อ request + คืนงบที่ admit() จองไว้หลังส่ง response เสร็จ"""
+
+    def __init__(self, app, budget: MemoryBudget, sample_interval: float = 0.01):
+        self.app = app
+        self.budget = budget
+        self.sampler = _RssSampler(sample_interval)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        def endpoint() -> str:
+            return getattr(scope.get("route"), "path", None) or "unmatched"
+
+        ticket = _Ticket(self.budget, endpoint)
+        token = _ticket.set(ticket)
+        tracker = self.sampler.begin()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _ticket.reset(token)
+            if ticket.reserved:
+                self.budget.release(ticket.reserved)
+            if tracker is not None:
+                PEAK_MEMORY.observe(self.sampler.end(tracker), endpoint=endpoint())
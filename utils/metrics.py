@@ -0,0 +1,213 @@
+"""
+metrics.py
+In-process latency / volume metrics rendered in the Prometheus text exposition format (0.0.4).
+No client library or external service: a small registry of labelled histograms and counters.
+- stage("parse"): times a block into budget_stage_duration_seconds{endpoint, stage}
+- add_rows(n): budget_rows_processed_total{endpoint}
+- MetricsMiddleware: request latency + bytes in/out per route template, and the
+  "current endpoint" used as the label by stage()/add_rows() further down the call stack
+"""
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+UNMATCHED = "unmatched"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(v: float) -> str:
+    return "+Inf" if v == float("inf") else repr(float(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, label_names=()):
+        super().__init__(name, help_text, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_labels(self.label_names, k)} {_fmt(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # key → [count ต่อ bucket (ไม่สะสม) ..., +Inf], sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[idx] += 1
+            total[0] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(c), s[0])) for k, (c, s) in self._series.items())
+        lines = self._header()
+        for key, (counts, total) in items:
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                running += n
+                le = 'le="%s"' % _fmt(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {running}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def counter(self, name, help_text, label_names=()) -> Counter:
+        m = Counter(name, help_text, label_names)
+        self._metrics.append(m)
+        return m
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        m = Histogram(name, help_text, label_names, buckets)
+        self._metrics.append(m)
+        return m
+
+    def render(self) -> str:
+        return "\n".join(line for m in self._metrics for line in m.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "budget_stage_duration_seconds", "Time spent in each processing stage.", ("endpoint", "stage"))
+REQUEST_SECONDS = REGISTRY.histogram(
+    "budget_request_duration_seconds", "End-to-end HTTP request latency.", ("endpoint", "method", "status"))
+ROWS_PROCESSED = REGISTRY.counter(
+    "budget_rows_processed_total", "Input rows processed.", ("endpoint",))
+BYTES_IN = REGISTRY.counter(
+    "budget_request_bytes_total", "Request body bytes received.", ("endpoint",))
+BYTES_OUT = REGISTRY.counter(
+    "budget_response_bytes_total", "Response body bytes sent.", ("endpoint",))
+
+# ASGI scope ของ request ปัจจุบัน (route template ถูกใส่ลง scope หลัง routing)
+_current_scope: ContextVar[Optional[dict]] = ContextVar("budget_metrics_scope", default=None)
+
+
+def _endpoint_of(scope: Optional[dict]) -> str:
+    if scope is None:
+        return "-"   # เรียกนอก request (เช่น สคริปต์/เทสต์)
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED
+
+
+def current_endpoint() -> str:
+    return _endpoint_of(_current_scope.get())
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """จับเวลาบล็อกเป็น stage หนึ่งของ endpoint ปัจจุบัน (บันทึกแม้เกิด exception)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, endpoint=current_endpoint(), stage=name)
+
+
+def add_rows(n: int):
+    ROWS_PROCESSED.inc(int(n), endpoint=current_endpoint())
+
+
+def render_latest() -> str:
+    return REGISTRY.render()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (ไม่ buffer body; ใช้กับ StreamingResponse ได้)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = _current_scope.set(scope)
+        start = time.perf_counter()
+        status = {"code": 500}
+        sizes = {"in": 0, "out": 0}
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request":
+                sizes["in"] += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            elif message["type"] == "http.response.body":
+                sizes["out"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            endpoint = _endpoint_of(scope)
+            REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint,
+                                    method=scope.get("method", ""), status=str(status["code"]))
+            BYTES_IN.inc(sizes["in"], endpoint=endpoint)
+            BYTES_OUT.inc(sizes["out"], endpoint=endpoint)
+            _current_scope.reset(token)
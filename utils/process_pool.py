@@ -0,0 +1,76 @@
+"""
+process_pool.py
+One spawn-based ProcessPoolExecutor per server process, shared by the CPU-bound stages that
+fan out to worker processes (pdf_parallel section rendering, parallel_agg shard aggregation,
+consolidation workbook parsing).
+spawn (not fork) because the server runs threads. The pool is sized once from the core count on
+first use and is never torn down while requests use it — callers that want less parallelism pass
+workers=N to run_all, which keeps at most N of *their* tasks in flight. It is only re-created
+after a worker crashed (BrokenProcessPool).
+"""
+
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import multiprocessing
+import os
+import threading
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def resolve_workers(workers: Optional[int]) -> int:
+    return max(int(workers or os.cpu_count() or 1), 1)
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=resolve_workers(None),
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def reset_pool(broken: Optional[ProcessPoolExecutor] = None):
+    """ทิ้ง pool (broken = เฉพาะถ้ายังเป็น pool ตัวนั้น — request อื่นอาจสร้างใหม่ไปแล้ว)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or (broken is not None and _pool is not broken):
+            return
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def run_all(calls: Iterable[Tuple[Callable[..., Any], Tuple[Any, ...]]], workers: Optional[int] = None) -> List[Any]:
+    """
+    (fn, args) ทุกตัวใน pool กลาง → ผลลัพธ์ตามลำดับ; fn ต้องเป็นฟังก์ชันระดับโมดูล
+    workers = จำนวนงานของ call นี้ที่ส่งเข้า pool พร้อมกันได้สูงสุด (ไม่เปลี่ยนขนาด pool)
+    """
+    calls = list(calls)
+    results: List[Any] = [None] * len(calls)
+    limit = min(resolve_workers(workers), len(calls))
+    pool = get_pool()
+    pending: Dict[Future, int] = {}
+    queued = iter(enumerate(calls))
+    try:
+        for i, (fn, args) in queued:
+            pending[pool.submit(fn, *args)] = i
+            if len(pending) >= limit:
+                break
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[pending.pop(future)] = future.result()
+                nxt = next(queued, None)
+                if nxt is not None:
+                    i, (fn, args) = nxt
+                    pending[pool.submit(fn, *args)] = i
+        return results
+    except BrokenProcessPool:
+        reset_pool(pool)
+        raise
+    finally:
+        for future in pending:
+            future.cancel()        # งานของ call นี้ที่ยังไม่เริ่ม (เมื่อมีงานก่อนหน้าล้มเหลว)
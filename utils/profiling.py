@@ -0,0 +1,277 @@
+"""
+profiling.py
+On-demand, admin-gated request profiling:
+- ?profile=1 (or =sample): sampling profiler on the event-loop thread → collapsed stacks
+  ("a;b;c N" lines, the input format of flamegraph.pl / speedscope)
+- ?profile=cprofile: deterministic cProfile → pstats dump + text summary
+Work the request hands to the threadpool (parse, render, dataset writes) is profiled too:
+routes call run_in_threadpool from this module, which finds the request's profile in a
+contextvar and samples / cProfiles the worker thread for the duration of the call.
+The request must carry X-Admin-Token matching BUDGET_ADMIN_TOKEN. The result is kept in a
+bounded in-memory store; the response gets X-Profile-Id / X-Profile-Url headers pointing
+at /admin/profiles/{id}.
+When the query string has no "profile=" the middleware is a single bytes search per request.
+"""
+
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from io import StringIO
+from typing import Callable, Dict, List, Optional, TypeVar
+from urllib.parse import parse_qs
+import cProfile
+import functools
+import hmac
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool as _starlette_run_in_threadpool
+
+PROFILE_MODES = ("sample", "cprofile")
+PROFILE_FORMATS = ("collapsed", "pstats", "text")
+MAX_STACK_DEPTH = 200
+T = TypeVar("T")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class StackSampler:
+    """เก็บ stack ของ thread เป้าหมาย (event loop + worker ที่ทำงานให้ request นี้) ทุก interval วินาที"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_ids = {thread_id}
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="budget-profile-sampler", daemon=True)
+
+    def add_thread(self, thread_id: int):
+        self.thread_ids = self.thread_ids | {thread_id}
+
+    def discard_thread(self, thread_id: int):
+        self.thread_ids = self.thread_ids - {thread_id}
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in self.thread_ids:
+                frame = frames.get(thread_id)
+                stack: List[str] = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if stack:
+                    self.stacks[";".join(reversed(stack))] += 1
+                    self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+
+class _RequestProfile:
+    """profiler ของ request ที่กำลังถูก profile — worker thread เพิ่ม cProfile ของตัวเองเข้ามา"""
+
+    def __init__(self, sampler: Optional[StackSampler], cprofile: bool):
+        self.sampler = sampler
+        self.cprofile = cprofile
+        self.worker_profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def call(self, fn: Callable[..., T], args: tuple) -> T:
+        """รันใน worker thread: ให้ sampler เห็น thread นี้ / เปิด cProfile แยก (cProfile เปิดได้ทีละ thread)"""
+        thread_id = threading.get_ident()
+        prof = cProfile.Profile() if self.cprofile else None
+        if self.sampler is not None:
+            self.sampler.add_thread(thread_id)
+        if prof is not None:
+            prof.enable()
+        try:
+            return fn(*args)
+        finally:
+            if prof is not None:
+                prof.disable()
+                with self._lock:
+                    self.worker_profiles.append(prof)
+            if self.sampler is not None:
+                self.sampler.discard_thread(thread_id)
+
+
+_active_profile: ContextVar[Optional[_RequestProfile]] = ContextVar("budget_active_profile", default=None)
+
+
+async def run_in_threadpool(fn: Callable[..., T], *args, **kwargs) -> T:
+    """starlette.concurrency.run_in_threadpool ที่พา profile ของ request ไปยัง worker thread ด้วย"""
+    if kwargs:
+        fn = functools.partial(fn, **kwargs)
+    active = _active_profile.get()
+    if active is None:
+        return await _starlette_run_in_threadpool(fn, *args)
+    return await _starlette_run_in_threadpool(active.call, fn, args)
+
+
+class ProfileStore:
+    """profile ล่าสุด N รายการ (เก่าสุดถูกทิ้งก่อน)"""
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._items: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, entry: Dict, profile_id: Optional[str] = None) -> str:
+        profile_id = profile_id or new_profile_id()
+        with self._lock:
+            self._items[profile_id] = {**entry, "id": profile_id}
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        with self._lock:
+            return self._items.get(profile_id)
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            entries = list(self._items.values())
+        return [{k: v for k, v in e.items() if k not in PROFILE_FORMATS} for e in reversed(entries)]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+def new_profile_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def token_ok(expected: str, given: Optional[str]) -> bool:
+    return bool(expected) and given is not None and hmac.compare_digest(expected.encode(), given.encode())
+
+
+def require_admin(expected: str, given: Optional[str]):
+    """endpoint สำหรับ admin: ไม่ตั้ง BUDGET_ADMIN_TOKEN = ปิด (404), token ผิด = 403"""
+    if not expected:
+        raise HTTPException(status_code=404, detail="ไม่ได้เปิดใช้ admin (ตั้งค่า BUDGET_ADMIN_TOKEN)")
+    if not token_ok(expected, given):
+        raise HTTPException(status_code=403, detail="X-Admin-Token ไม่ถูกต้อง")
+
+
+def _requested_mode(query_string: bytes) -> Optional[str]:
+    if b"profile=" not in query_string:
+        return None
+    value = parse_qs(query_string.decode("latin-1")).get("profile", [""])[-1].lower()
+    if value in ("1", "true", "sample"):
+        return "sample"
+    if value == "cprofile":
+        return "cprofile"
+    return None
+
+
+def _cprofile_outputs(profiles: List[cProfile.Profile]) -> Dict[str, bytes]:
+    # event loop + ทุก worker thread รวมเป็น stats ชุดเดียว
+    text = StringIO()
+    stats = pstats.Stats(profiles[0], stream=text)
+    for prof in profiles[1:]:
+        stats.add(prof)
+    # รูปแบบเดียวกับ Profile.dump_stats → โหลดด้วย pstats.Stats(<ไฟล์>) / snakeviz ได้
+    dump = marshal.dumps(stats.stats)
+    stats.sort_stats("cumulative").print_stats(60)
+    return {"pstats": dump, "text": text.getvalue().encode()}
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware. profile ได้ทีละ request (cProfile มี profiler ได้ตัวเดียวต่อ process);
+    ถ้ามี request อื่นกำลังถูก profile อยู่ จะรันตามปกติและตอบ X-Profile: busy
+    หมายเหตุ: งานของ request อื่นที่รันบน event loop เดียวกันในช่วงนั้นจะติดมาใน profile ด้วย
+    (ส่วน worker thread นับเฉพาะงานที่ request นี้ส่งผ่าน run_in_threadpool ของโมดูลนี้)
+    """
+
+    def __init__(self, app, store: ProfileStore, admin_token: str, interval: float = 0.005):
+        self.app = app
+        self.store = store
+        self.admin_token = admin_token
+        self.interval = interval
+        self._busy = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.admin_token:
+            await self.app(scope, receive, send)
+            return
+        mode = _requested_mode(scope.get("query_string", b""))
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        token = headers.get(b"x-admin-token", b"").decode("latin-1")
+        if not token_ok(self.admin_token, token):
+            await self.app(scope, receive, send)   # ไม่มีสิทธิ์ → รันปกติ ไม่บอกว่ามี hook
+            return
+        if not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, self._with_headers(send, [(b"x-profile", b"busy")]))
+            return
+
+        # id ต้องรู้ก่อนส่ง header → จองไว้ตอนเริ่ม แล้วเติมผลตอนจบ
+        profile_id = new_profile_id()
+        extra = [(b"x-profile-id", profile_id.encode()), (b"x-profile-url", f"/admin/profiles/{profile_id}".encode())]
+        start = time.perf_counter()
+        sampler = prof = None
+        if mode == "sample":
+            sampler = StackSampler(threading.get_ident(), self.interval)
+        else:
+            prof = cProfile.Profile()
+        active = _RequestProfile(sampler, cprofile=prof is not None)
+        reset = _active_profile.set(active)
+        try:
+            if sampler is not None:
+                sampler.start()
+            else:
+                prof.enable()
+            await self.app(scope, receive, self._with_headers(send, extra))
+        finally:
+            _active_profile.reset(reset)
+            outputs: Dict[str, bytes] = {}
+            samples = None
+            if sampler is not None:
+                sampler.stop()
+                outputs["collapsed"] = sampler.collapsed().encode()
+                samples = sampler.samples
+            if prof is not None:
+                prof.disable()
+                with active._lock:
+                    workers = list(active.worker_profiles)
+                outputs.update(_cprofile_outputs([prof] + workers))
+            self._busy.release()
+            self.store.put({
+                "path": scope.get("path", ""),
+                "method": scope.get("method", ""),
+                "mode": mode,
+                "wall_seconds": round(time.perf_counter() - start, 4),
+                "samples": samples,
+                "created": time.time(),
+                "formats": sorted(outputs),
+                **outputs,
+            }, profile_id)
+
+    @staticmethod
+    def _with_headers(send, extra):
+        async def wrapped(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + extra}
+            await send(message)
+        return wrapped
@@ -0,0 +1,216 @@
+"""
+shared_frame.py
+Zero-copy DataFrame hand-off to worker processes through multiprocessing.shared_memory:
+- publish(df) copies the column buffers once into one segment and returns a SharedFrame whose
+  .handle (segment name + column layout, a few hundred bytes) is what gets pickled to workers
+- attach(handle) maps the segment in the worker and rebuilds a read-only DataFrame whose numeric /
+  bool / datetime columns are views into it (no copy); text and other object columns travel
+  dictionary-encoded (int32 codes in the segment + the unique values, missing values kept as the
+  original None / NaN / NA object) and are rebuilt per column
+- frame_from(obj) accepts either a DataFrame (in-process path) or a handle, so section renderers
+  work the same whether they run in the parent or in a pool worker
+Lifetime: the publisher owns the segment. `with publish(df) as shared:` unlinks it when the
+request finishes or raises; segments of a server process that died are unlinked by the
+multiprocessing resource tracker, and sweep_stale() removes any left behind by a dead pid
+(segment names carry the publisher's pid).
+"""
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Hashable, Iterator, List, Optional, Tuple, Union
+import os
+import pickle
+import uuid
+
+import numpy as np
+import pandas as pd
+
+PREFIX = "bp_frame_"
+_SHM_DIR = "/dev/shm"
+
+
+@dataclass(frozen=True)
+class ColumnSpec:
+    name: Hashable
+    kind: str                 # "array" | "dict" (codes + uniques) | "datetimetz"
+    offset: int
+    dtype: str                # numpy dtype ของข้อมูลใน segment
+    extra_offset: int = 0     # "dict": ตำแหน่ง/ขนาดของ uniques (pickle)
+    extra_size: int = 0
+    tz: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class FrameHandle:
+    name: str
+    rows: int
+    columns: Tuple[ColumnSpec, ...]
+    index: Optional[ColumnSpec] = None     # None = RangeIndex(rows)
+
+
+def _encode(values: pd.Series) -> Tuple[str, np.ndarray, Optional[bytes], Optional[str]]:
+    dtype = values.dtype
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        return "datetimetz", values.dt.tz_convert("UTC").dt.tz_localize(None).to_numpy(), None, str(dtype.tz)
+    if isinstance(dtype, np.dtype) and dtype.kind in "biufcmM":
+        return "array", values.to_numpy(), None, None
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    codes, uniques = codes.astype(np.int32), np.asarray(uniques, dtype=object)
+    na = np.flatnonzero(codes < 0)
+    if len(na):
+        # NA แต่ละชนิด (None / NaN / pd.NA / NaT) เป็น unique ของตัวเอง → ได้ object เดิมกลับ ไม่ใช่ NaN ทั้งหมด
+        na_values = values.to_numpy(dtype=object)[na]
+        kind_codes, kinds = pd.factorize(np.array([type(v).__name__ for v in na_values], dtype=object))
+        first = np.unique(kind_codes, return_index=True)[1]
+        codes[na] = len(uniques) + kind_codes
+        uniques = np.concatenate([uniques, na_values[first]])
+    return "dict", codes, pickle.dumps(uniques), None
+
+
+class SharedFrame:
+    """segment ที่ publish แล้ว (ฝั่งเจ้าของ) — close() = unlink"""
+
+    def __init__(self, df: pd.DataFrame, order: Optional[np.ndarray] = None):
+        encoded: List[Tuple[Hashable, str, np.ndarray, Optional[bytes], Optional[str]]] = []
+        for name in df.columns:
+            encoded.append((name, *_encode(df[name])))
+        index_entry = None
+        if not isinstance(df.index, pd.RangeIndex) or df.index.start != 0 or df.index.step != 1:
+            index_entry = (df.index.name, *_encode(df.index.to_series()))
+
+        rows = len(df)
+        size, layout = 0, []
+        for entry in encoded + ([index_entry] if index_entry else []):
+            _, kind, data, extra, _ = entry
+            offset = size
+            size += _align(rows * data.dtype.itemsize)
+            extra_offset = size
+            size += _align(len(extra)) if extra else 0
+            layout.append((entry, offset, extra_offset))
+
+        self.shm = shared_memory.SharedMemory(name=f"{PREFIX}{os.getpid()}_{uuid.uuid4().hex[:12]}",
+                                              create=True, size=max(size, 1))
+        specs = []
+        for (name, kind, data, extra, tz), offset, extra_offset in layout:
+            view = np.ndarray((rows,), dtype=data.dtype, buffer=self.shm.buf, offset=offset)
+            if order is None:
+                view[:] = data
+            else:
+                np.take(data, order, out=view)       # คัดลอกพร้อมเรียงแถวใหม่ (เช่น เรียงตาม shard)
+            del view
+            if extra:
+                self.shm.buf[extra_offset:extra_offset + len(extra)] = extra
+            specs.append(ColumnSpec(name, kind, offset, data.dtype.str, extra_offset, len(extra or b""), tz))
+        index_spec = specs.pop() if index_entry else None
+        self.handle = FrameHandle(self.shm.name, rows, tuple(specs), index_spec)
+        self._closed = False
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "SharedFrame":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def _align(n: int, to: int = 64) -> int:
+    return (n + to - 1) // to * to
+
+
+def publish(df: pd.DataFrame, order: Optional[np.ndarray] = None) -> SharedFrame:
+    """คัดลอกคอลัมน์ลง shared memory ครั้งเดียว (order = ลำดับแถวใหม่, ถ้ามี)"""
+    return SharedFrame(df, order)
+
+
+def _column(shm: shared_memory.SharedMemory, spec: ColumnSpec, rows: int, start: int, stop: int):
+    data = np.ndarray((rows,), dtype=np.dtype(spec.dtype), buffer=shm.buf, offset=spec.offset)[start:stop]
+    data.flags.writeable = False
+    if spec.kind == "array":
+        return data
+    if spec.kind == "datetimetz":
+        return pd.DatetimeIndex(data).tz_localize("UTC").tz_convert(spec.tz)
+    uniques = pickle.loads(shm.buf[spec.extra_offset:spec.extra_offset + spec.extra_size])
+    return uniques.take(data) if len(uniques) else np.empty(len(data), dtype=object)
+
+
+@contextmanager
+def attach(handle: FrameHandle, start: int = 0, stop: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """
+    DataFrame อ่านอย่างเดียวของแถว [start, stop) — คอลัมน์ตัวเลขเป็น view ใน segment
+    ห้ามเก็บ DataFrame (หรือ array ของมัน) ไว้ใช้หลังออกจาก with
+    """
+    shm = shared_memory.SharedMemory(name=handle.name)
+    stop = handle.rows if stop is None else stop
+    df = None
+    try:
+        columns = {spec.name: _column(shm, spec, handle.rows, start, stop) for spec in handle.columns}
+        if handle.index is not None:
+            index = pd.Index(_column(shm, handle.index, handle.rows, start, stop), name=handle.index.name)
+        else:
+            index = pd.RangeIndex(start, stop)
+        df = pd.DataFrame(columns, index=index, copy=False)
+        del columns
+        yield df
+    finally:
+        del df
+        try:
+            shm.close()
+        except BufferError:
+            pass     # ยังมีคนถือ view อยู่: mapping จะถูกปิดเมื่อ object ถูกเก็บกวาด
+
+
+@contextmanager
+def frame_from(obj: Union[pd.DataFrame, FrameHandle]) -> Iterator[pd.DataFrame]:
+    if isinstance(obj, FrameHandle):
+        with attach(obj) as df:
+            yield df
+    else:
+        yield obj
+
+
+def sweep_stale() -> List[str]:
+    """ลบ segment ที่ process เจ้าของตายไปแล้ว (เช่น worker ของ uvicorn ถูก kill)"""
+    removed = []
+    if not os.path.isdir(_SHM_DIR):
+        return removed
+    for name in os.listdir(_SHM_DIR):
+        if not name.startswith(PREFIX):
+            continue
+        try:
+            pid = int(name[len(PREFIX):].split("_", 1)[0])
+        except ValueError:
+            continue
+        if _alive(pid):
+            continue
+        try:
+            os.remove(os.path.join(_SHM_DIR, name))
+            removed.append(name)
+        except OSError:
+            pass
+    return removed
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,98 @@
+"""
+singleflight.py
+Coalesce concurrent identical work: the first caller for a key starts the function (sync
+functions run in the threadpool, so the event loop stays free), every caller that arrives
+while it is in flight awaits the same result. Nothing is cached once the call finishes.
+- parse_flight   : upload bytes → DataFrame, keyed by content hash (shared across endpoints:
+                   every route parses through parse_excel, so the key and the reader match)
+- artifact_flight: rendered bytes (PDF / ZIP), keyed by endpoint + content hash + parameters
+The shared frame from parse_flight must not be mutated: callers take a shallow copy first.
+"""
+
+from concurrent.futures import Future
+from io import BytesIO
+from typing import Any, Callable, Dict, Hashable, Set, Tuple
+import asyncio
+import hashlib
+import threading
+
+import pandas as pd
+
+try:
+    from .metrics import REGISTRY, stage
+    from .profiling import run_in_threadpool
+except ImportError:
+    from utils.metrics import REGISTRY, stage
+    from utils.profiling import run_in_threadpool
+
+COALESCED = REGISTRY.counter(
+    "budget_singleflight_shared_total", "Requests served from another request's in-flight work.", ("stage",))
+
+
+def content_key(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        # concurrent.futures.Future: รอได้จากทุก event loop / thread
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[..., Any], *args) -> Tuple[Any, bool]:
+        """
+        คืน (ผลลัพธ์, shared) — shared=True เมื่อได้ผลจาก request อื่นที่กำลังทำอยู่
+        fn แบบ sync รันใน threadpool, แบบ async รันเป็น task แยก (request ต้นทางถูกยกเลิก ≠ งานถูกยกเลิก)
+        """
+        with self._lock:
+            fut = self._calls.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._calls[key] = Future()
+        if leader:
+            task = asyncio.ensure_future(self._run(key, fut, fn, args))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            COALESCED.inc(stage=self.name)
+        # shield: waiter ที่ถูกยกเลิกต้องไม่ยกเลิก future ที่คนอื่นรออยู่
+        return await asyncio.shield(asyncio.wrap_future(fut)), not leader
+
+    async def _run(self, key: Hashable, fut: Future, fn: Callable[..., Any], args: tuple):
+        try:
+            if asyncio.iscoroutinefunction(fn):
+                result = await fn(*args)
+            else:
+                result = await run_in_threadpool(fn, *args)
+        except BaseException as e:
+            self._finish(key)
+            fut.set_exception(e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        else:
+            self._finish(key)
+            fut.set_result(result)
+
+    def _finish(self, key: Hashable):
+        with self._lock:
+            self._calls.pop(key, None)
+
+
+parse_flight = SingleFlight("parse")
+artifact_flight = SingleFlight("artifact")
+
+
+def read_excel_bytes(content: bytes) -> pd.DataFrame:
+    with stage("parse"):
+        return pd.read_excel(BytesIO(content), engine="openpyxl")
+
+
+async def parse_excel(content: bytes, digest: str) -> Tuple[pd.DataFrame, bool]:
+    """Excel ที่อัปโหลด → (DataFrame ที่อาจใช้ร่วมกับ request อื่น, shared)"""
+    return await parse_flight.do((digest, "openpyxl"), read_excel_bytes, content)
@@ -0,0 +1,62 @@
+"""
+streaming.py
+Stream large record outputs chunk by chunk instead of one JSON body:
+- ndjson: one JSON object per line (application/x-ndjson)
+- sse:    one "records" event per chunk (JSON array) + a final "end" event (text/event-stream)
+Each chunk is converted (and optionally transformed, e.g. formatted) only when the
+client is ready for it, so memory stays at one chunk of records and the first rows
+go out before the rest is serialized.
+"""
+
+from typing import Callable, Iterator, Optional
+
+import pandas as pd
+from fastapi.responses import StreamingResponse
+
+try:
+    from .fast_json import dumps
+except ImportError:
+    from utils.fast_json import dumps
+
+STREAM_MODES = ("ndjson", "sse")
+DEFAULT_CHUNK_ROWS = 5_000
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+ChunkTransform = Callable[[pd.DataFrame], pd.DataFrame]
+
+
+def iter_chunks(df: pd.DataFrame, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                transform: Optional[ChunkTransform] = None) -> Iterator[pd.DataFrame]:
+    """แบ่ง df เป็นช่วงละ chunk_rows แถว (transform ทำทีละ chunk)"""
+    step = max(int(chunk_rows), 1)
+    for start in range(0, len(df), step):
+        chunk = df.iloc[start:start + step]
+        yield transform(chunk) if transform is not None else chunk
+
+
+def ndjson_lines(df: pd.DataFrame, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                 transform: Optional[ChunkTransform] = None) -> Iterator[bytes]:
+    for chunk in iter_chunks(df, chunk_rows, transform):
+        yield b"".join(dumps(rec) + b"\n" for rec in chunk.to_dict(orient="records"))
+
+
+def sse_events(df: pd.DataFrame, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+               transform: Optional[ChunkTransform] = None) -> Iterator[bytes]:
+    sent = 0
+    for i, chunk in enumerate(iter_chunks(df, chunk_rows, transform)):
+        sent += len(chunk)
+        yield b"id: %d\nevent: records\ndata: %s\n\n" % (i, dumps(chunk.to_dict(orient="records")))
+    yield b"event: end\ndata: %s\n\n" % dumps({"rows": sent})
+
+
+def stream_frame(df: pd.DataFrame, mode: str = "ndjson", chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                 transform: Optional[ChunkTransform] = None) -> StreamingResponse:
+    """StreamingResponse ของ df ตาม mode ("ndjson" | "sse")"""
+    body = sse_events if mode == "sse" else ndjson_lines
+    return StreamingResponse(
+        body(df, chunk_rows, transform),
+        media_type=MEDIA_TYPES.get(mode, MEDIA_TYPES["ndjson"]),
+        # ปิด buffering ของ proxy (nginx) ให้ chunk ถึง client ทันที
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
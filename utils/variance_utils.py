@@ -1,10 +1,14 @@
 import pandas as pd
 
-def calculate_variance(df: pd.DataFrame) -> pd.DataFrame:
+def calculate_variance(df: pd.DataFrame, fx_store=None, group_currency=None) -> pd.DataFrame:
     """
     เพิ่มคอลัมน์ FX Adjusted Actual และ Variance
     คืน DataFrame พร้อมค่าตัวเลข (numeric) ใช้ต่อในคำนวณได้
+    fx_store (fx_store.FxStore): ตั้ง FX Rate จากอัตรา as-of ตาม Currency/Month แทนค่าที่กรอกในไฟล์
     """
+    if fx_store is not None and "Currency" in df.columns:
+        df["FX Rate"] = fx_store.rates_for(df["Currency"], df["Month"] if "Month" in df.columns else None,
+                                           group_currency)
     if "FX Rate" in df.columns:
         df["FX Adjusted Actual"] = df["Actual"] * df["FX Rate"]
     else: